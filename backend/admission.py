@@ -0,0 +1,232 @@
+"""
+Admission control for LLM work
+
+Every chat turn and assessment job holds an admission slot while its LLM
+calls run. Beyond max_in_flight slots, work waits in a bounded queue for
+at most queue_timeout seconds; requests that cannot be queued, or wait too
+long, are rejected with Overloaded, which the API turns into 429 with a
+Retry-After estimated from recent service times. Rejecting early keeps
+latency bounded when the LLM slows down, instead of letting requests pile
+up on session locks and provider queues.
+
+Two priorities share the slots:
+
+- interactive: chat turns over REST and WebSocket. Queued interactive
+  work is always started first.
+- batch: assessment jobs. At most batch_max_in_flight run at once, so
+  part of the capacity is always left to chat. Jobs wait for a slot as
+  long as it takes, but new submissions are shed first: they are rejected
+  while chat is queueing or too many jobs already wait.
+
+Per-session and per-client limits count admitted and queued work, so a
+single session or client cannot fill the queue.
+
+Limits apply per worker process; 0 disables a limit.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+
+PRIORITIES = ("interactive", "batch")
+
+
+class Overloaded(Exception):
+    """Work rejected by admission control; retry after retry_after seconds"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server overloaded: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Slots, queues and limits for interactive and batch LLM work"""
+
+    def __init__(
+        self,
+        max_in_flight: int = 8,
+        max_queue: int = 32,
+        queue_timeout: float = 15.0,
+        batch_max_in_flight: int = 2,
+        batch_max_queue: int = 8,
+        session_limit: int = 2,
+        client_limit: int = 10,
+        max_retry_after: int = 120
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.batch_max_in_flight = batch_max_in_flight
+        self.batch_max_queue = batch_max_queue
+        self.session_limit = session_limit
+        self.client_limit = client_limit
+        self.max_retry_after = max_retry_after
+
+        self.in_flight = {priority: 0 for priority in PRIORITIES}
+        self.waiters: Dict[str, Deque[asyncio.Future]] = {priority: deque() for priority in PRIORITIES}
+        self.per_session: Dict[str, int] = {}
+        self.per_client: Dict[str, int] = {}
+        # Moving averages of how long admitted work holds its slot
+        self.service_seconds = {"interactive": 10.0, "batch": 120.0}
+
+        self.admitted = {priority: 0 for priority in PRIORITIES}
+        self.queued = {priority: 0 for priority in PRIORITIES}
+        self.rejected: Dict[str, int] = {}
+        self.queue_wait_seconds = 0.0
+
+    @asynccontextmanager
+    async def admit(
+        self,
+        priority: str = "interactive",
+        session_id: Optional[str] = None,
+        client: Optional[str] = None
+    ) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block, waiting for one if needed"""
+        self._check_limits(priority, session_id, client)
+        self._count(self.per_session, session_id, 1)
+        self._count(self.per_client, client, 1)
+        try:
+            await self._acquire(priority)
+            started = time.monotonic()
+            try:
+                yield
+            finally:
+                elapsed = time.monotonic() - started
+                self.service_seconds[priority] += 0.2 * (elapsed - self.service_seconds[priority])
+                self._release(priority)
+        finally:
+            self._count(self.per_session, session_id, -1)
+            self._count(self.per_client, client, -1)
+
+    def check_batch_submission(self, client: Optional[str] = None):
+        """Shed a new assessment job before any chat turn is turned away"""
+        if self.waiters["interactive"]:
+            self._reject("chat is queueing", self.retry_after("interactive"))
+        if self.batch_max_queue and len(self.waiters["batch"]) >= self.batch_max_queue:
+            self._reject("too many assessments waiting", self.retry_after("batch"))
+        if self.client_limit and self.per_client.get(client, 0) >= self.client_limit:
+            self._reject("too many requests from this client", self.retry_after("interactive"))
+
+    def retry_after(self, priority: str) -> int:
+        """Seconds until a slot is likely to be free for new work"""
+        slots = self.max_in_flight or 1
+        if priority == "batch":
+            slots = self.batch_max_in_flight or slots
+        ahead = len(self.waiters[priority]) + 1
+        estimate = self.service_seconds[priority] * ahead / slots
+        return max(1, min(self.max_retry_after, math.ceil(estimate)))
+
+    def _check_limits(self, priority: str, session_id: Optional[str], client: Optional[str]):
+        if self.session_limit and self.per_session.get(session_id, 0) >= self.session_limit:
+            self._reject("too many requests for this session", self.retry_after(priority))
+        if self.client_limit and self.per_client.get(client, 0) >= self.client_limit:
+            self._reject("too many requests from this client", self.retry_after(priority))
+        if (
+            priority == "interactive" and not self._can_start(priority)
+            and self.max_queue and len(self.waiters[priority]) >= self.max_queue
+        ):
+            self._reject("queue is full", self.retry_after(priority))
+
+    def _reject(self, reason: str, retry_after: int):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        raise Overloaded(reason, retry_after)
+
+    @staticmethod
+    def _count(counts: Dict[str, int], key: Optional[str], delta: int):
+        if key is None:
+            return
+        value = counts.get(key, 0) + delta
+        if value:
+            counts[key] = value
+        else:
+            counts.pop(key, None)
+
+    def _can_start(self, priority: str) -> bool:
+        if self.max_in_flight and sum(self.in_flight.values()) >= self.max_in_flight:
+            return False
+        if priority == "batch":
+            if self.waiters["interactive"]:
+                return False
+            if self.batch_max_in_flight and self.in_flight["batch"] >= self.batch_max_in_flight:
+                return False
+        return True
+
+    async def _acquire(self, priority: str):
+        # Work already waiting goes first
+        if not self.waiters[priority] and self._can_start(priority):
+            self.in_flight[priority] += 1
+            self.admitted[priority] += 1
+            return
+
+        self.queued[priority] += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters[priority].append(waiter)
+        started = time.monotonic()
+        # Batch work is deferred rather than rejected once it was accepted
+        timeout = self.queue_timeout if priority == "interactive" and self.queue_timeout else None
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as the wait ended
+                self._release(priority)
+            else:
+                self._remove(priority, waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("queue wait timed out", self.retry_after(priority))
+            raise
+        finally:
+            self.queue_wait_seconds += time.monotonic() - started
+        self.admitted[priority] += 1
+
+    def _remove(self, priority: str, waiter: asyncio.Future):
+        try:
+            self.waiters[priority].remove(waiter)
+        except ValueError:
+            pass
+        # A waiting chat turn may have been what held batch work back
+        self._dispatch()
+
+    def _release(self, priority: str):
+        self.in_flight[priority] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to waiting work, interactive first"""
+        for priority in PRIORITIES:
+            waiters = self.waiters[priority]
+            while waiters and self._can_start(priority):
+                waiter = waiters.popleft()
+                if waiter.done():
+                    continue
+                self.in_flight[priority] += 1
+                waiter.set_result(None)
+
+    def metrics(self) -> Dict[str, Any]:
+        queued_total = sum(self.queued.values())
+        return {
+            "limits": {
+                "max_in_flight": self.max_in_flight,
+                "max_queue": self.max_queue,
+                "queue_timeout": self.queue_timeout,
+                "batch_max_in_flight": self.batch_max_in_flight,
+                "batch_max_queue": self.batch_max_queue,
+                "session_limit": self.session_limit,
+                "client_limit": self.client_limit
+            },
+            "in_flight": dict(self.in_flight),
+            "waiting": {priority: len(self.waiters[priority]) for priority in PRIORITIES},
+            "admitted": dict(self.admitted),
+            "queued": dict(self.queued),
+            "rejected": dict(self.rejected),
+            "avg_queue_wait_ms": (
+                round(self.queue_wait_seconds / queued_total * 1000, 1) if queued_total else None
+            ),
+            "avg_service_seconds": {p: round(s, 2) for p, s in self.service_seconds.items()},
+            "retry_after": {priority: self.retry_after(priority) for priority in PRIORITIES}
+        }
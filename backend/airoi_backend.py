@@ -1,480 +1,1109 @@
 """
-AIROI FastAPI Server
-Complete REST API for the AIROI assessment system
+AIROI - AI Return on Investment Assessment System
+Backend Architecture for POC with Ollama/Llama 3.1
+
+This system orchestrates multiple specialized agents to assess,
+analyze, and roadmap AI transformation opportunities.
 """
 
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Optional, Any
 import asyncio
+import hashlib
 import json
-from datetime import datetime
-import sqlite3
+import time
 from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
+from dataclasses import dataclass, asdict
+from enum import Enum
+from datetime import datetime
+import httpx
 
-#Import the AIROI backend (assuming it's in airoi_backend.py)
-from airoi_backend import (
-    AIROIOrchestrator, LLMProvider, Phase, ConfidenceLevel
- )
-
-
-# Database setup
-def init_db():
-    """Initialize SQLite database"""
-    conn = sqlite3.connect('airoi.db')
-    cursor = conn.cursor()
-    
-    # Sessions table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sessions (
-            id TEXT PRIMARY KEY,
-            company_name TEXT,
-            created_at TIMESTAMP,
-            updated_at TIMESTAMP,
-            status TEXT
-        )
-    ''')
-    
-    # Conversations table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS conversations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id TEXT,
-            role TEXT,
-            agent TEXT,
-            content TEXT,
-            timestamp TIMESTAMP,
-            FOREIGN KEY (session_id) REFERENCES sessions(id)
-        )
-    ''')
-    
-    # Assessments table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS assessments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id TEXT,
-            audit_data TEXT,
-            opportunities TEXT,
-            roadmap TEXT,
-            created_at TIMESTAMP,
-            FOREIGN KEY (session_id) REFERENCES sessions(id)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+from cassette import Cassette, StreamRecorder
+from history_manager import (
+    HistoryManager, ConversationMemory, DEFAULT_TOKEN_BUDGET, SUMMARY_SYSTEM_PROMPT
+)
+from llm_resilience import LatencyTracker, CircuitBreaker
+from llm_tracing import (
+    TraceStore, TraceSpan, current_agent, current_attributes, call_attributes, traced_agent
+)
+from prompt_builder import PromptBuilder, DEFAULT_PROMPT_BUDGETS
+from structured_output import generate_structured, AUDIT_DATA_SCHEMA, OPPORTUNITIES_SCHEMA
+from tokens import estimate_tokens, estimate_message_tokens, CHARS_PER_TOKEN
 
 
-# Pydantic models
-class LLMConfig(BaseModel):
-    provider: str = "ollama"
-    url: Optional[str] = "http://localhost:11434"
-    model: Optional[str] = "llama3.1"
-    api_key: Optional[str] = None
+class Phase(Enum):
+    QUICK_WIN = "quick_win"
+    FOUNDATION = "foundation"
+    STRATEGIC = "strategic"
 
 
-class ChatMessage(BaseModel):
-    role: str
-    content: str
-    agent: Optional[str] = None
+class ConfidenceLevel(Enum):
+    LOW = "low"
+    MEDIUM = "medium"
+    HIGH = "high"
 
 
-class SessionCreate(BaseModel):
-    company_name: str
-    llm_config: LLMConfig
+@dataclass
+class Opportunity:
+    """Represents an AI/automation opportunity"""
+    title: str
+    description: str
+    phase: Phase
+    can_do: List[str]  # What AI can reliably do
+    cannot_do: List[str]  # What requires human judgment
+    estimated_roi: float
+    confidence: ConfidenceLevel
+    timeframe_months: int
+    risk_factors: List[str]
+    dependencies: List[str]
+    next_steps: List[str]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable representation"""
+        data = asdict(self)
+        data["phase"] = self.phase.value
+        data["confidence"] = self.confidence.value
+        return data
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Opportunity":
+        return cls(
+            title=data['title'],
+            description=data['description'],
+            phase=Phase(data['phase']),
+            can_do=data['can_do'],
+            cannot_do=data['cannot_do'],
+            estimated_roi=data['estimated_roi'],
+            confidence=ConfidenceLevel(data['confidence']),
+            timeframe_months=data['timeframe_months'],
+            risk_factors=data['risk_factors'],
+            dependencies=data['dependencies'],
+            next_steps=data['next_steps']
+        )
 
 
-class SessionResponse(BaseModel):
-    session_id: str
+@dataclass
+class AuditData:
+    """Structured audit data from discovery"""
     company_name: str
-    created_at: str
-    status: str
-
+    industry: str
+    employee_count: int
+    systems: List[Dict[str, Any]]
+    processes: List[Dict[str, Any]]
+    data_sources: List[Dict[str, Any]]
+    pain_points: List[str]
+    current_costs: Dict[str, float]
+    technical_capabilities: Dict[str, str]
+    compliance_requirements: List[str]
 
-class AssessmentResponse(BaseModel):
-    session_id: str
-    audit_data: Dict[str, Any]
-    opportunities: List[Dict[str, Any]]
-    roadmap: Dict[str, Any]
-    generated_at: str
 
+# Providers speaking the OpenAI chat-completions protocol: (base URL, model).
+# "openai" covers any compatible server and uses the configured model;
+# base_url in the provider config overrides the URL for all of them.
+OPENAI_COMPATIBLE_PROVIDERS = {
+    "groq": ("https://api.groq.com/openai/v1", "llama-3.1-70b-versatile"),
+    "openrouter": ("https://openrouter.ai/api/v1", "meta-llama/llama-3.1-70b-instruct"),
+    "openai": ("https://api.openai.com/v1", None),
+}
 
-# Initialize FastAPI app
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Startup
-    init_db()
-    yield
-    # Shutdown
-    pass
 
+class LLMProvider:
+    """Handles communication with different LLM providers"""
+    
+    def __init__(
+        self,
+        provider: str = "ollama",
+        tracer: Optional[TraceStore] = None,
+        cassette: Optional[Cassette] = None,
+        **config
+    ):
+        self.provider = provider
+        self.config = config
+        self.tracer = tracer
+        # Records every request/response pair, or answers from a recording
+        self.cassette = cassette
+        # Requests beyond max_concurrency wait here; the wait is traced
+        max_concurrency = config.get('max_concurrency')
+        self._slots = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+    
+    @property
+    def model(self) -> str:
+        if self.provider in OPENAI_COMPATIBLE_PROVIDERS:
+            model = OPENAI_COMPATIBLE_PROVIDERS[self.provider][1]
+            if model:
+                return model
+        return self.config.get('model', 'llama3.1:latest')
+    
+    @asynccontextmanager
+    async def _traced(self, messages: List[Dict], system_prompt: str, streamed: bool):
+        """Wait for a provider slot and record the call as a trace span"""
+        span = TraceSpan(
+            agent=current_agent.get(),
+            provider=self.provider,
+            model=self.model,
+            prompt_hash=hashlib.sha1(system_prompt.encode()).hexdigest()[:12],
+            prompt_chars=len(system_prompt) + sum(len(m.get("content") or "") for m in messages),
+            streamed=streamed,
+            attributes=dict(current_attributes.get())
+        )
+        try:
+            if self._slots is None:
+                span.mark_sent()
+                yield span
+            else:
+                async with self._slots:
+                    span.mark_sent()
+                    yield span
+            span.status = "ok"
+        except asyncio.CancelledError:
+            span.status = "cancelled"
+            raise
+        except Exception as e:
+            span.status = "error"
+            span.error = str(e)[:500]
+            raise
+        finally:
+            span.finish()
+            if self.tracer is not None:
+                self.tracer.record(span)
+    
+    def _record_usage(self, span: TraceSpan, result: Dict[str, Any]):
+        """Copy token counts and timings reported by the provider onto the span"""
+        if self.provider == "ollama":
+            span.prompt_tokens = result.get("prompt_eval_count")
+            span.completion_tokens = result.get("eval_count")
+            if span.ttft_ms is None and result.get("prompt_eval_duration") is not None:
+                # Durations are reported in nanoseconds
+                span.ttft_ms = (result.get("load_duration", 0) + result["prompt_eval_duration"]) / 1e6
+            if span.prompt_tokens is not None:
+                # Ollama only evaluates the part of the prompt that is not
+                # already in its KV cache, so a short evaluation means a hit
+                estimated = int(span.prompt_chars / CHARS_PER_TOKEN)
+                span.cache_hit = span.prompt_tokens < estimated * 0.5
+            return
+        
+        usage = result.get("usage") or {}
+        span.prompt_tokens = usage.get("prompt_tokens")
+        span.completion_tokens = usage.get("completion_tokens")
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+        if cached is not None:
+            span.cached_tokens = cached
+            span.cache_hit = cached > 0
+    
+    async def call(
+        self,
+        messages: List[Dict],
+        system_prompt: str,
+        response_schema: Optional[Dict] = None
+    ) -> str:
+        """
+        Call the configured LLM provider
+        
+        With response_schema the provider is constrained to emit JSON that
+        matches the schema (Ollama format, OpenAI response_format).
+        """
+        url, headers, payload = self._build_request(
+            messages, system_prompt, response_schema, stream=False
+        )
+        
+        async with self._traced(messages, system_prompt, streamed=False) as span:
+            result = await self._post(url, headers, payload)
+            self._record_usage(span, result)
+        
+        if self.provider == "ollama":
+            return result["message"]["content"]
+        return result["choices"][0]["message"]["content"]
+    
+    async def stream(
+        self,
+        messages: List[Dict],
+        system_prompt: str,
+        response_schema: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """Call the configured LLM provider and yield content as it arrives"""
+        url, headers, payload = self._build_request(
+            messages, system_prompt, response_schema, stream=True
+        )
+        
+        async with self._traced(messages, system_prompt, streamed=True) as span:
+            async for line in self._post_lines(url, headers, payload):
+                if self.provider == "ollama":
+                    chunk = json.loads(line)
+                    content = chunk.get("message", {}).get("content")
+                    if content:
+                        span.mark_first_token()
+                        yield content
+                    if chunk.get("done"):
+                        self._record_usage(span, chunk)
+                    continue
+                
+                # OpenAI-compatible server-sent events
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    continue
+                chunk = json.loads(data)
+                if chunk.get("usage"):
+                    self._record_usage(span, chunk)
+                choices = chunk.get("choices") or []
+                content = choices[0].get("delta", {}).get("content") if choices else None
+                if content:
+                    span.mark_first_token()
+                    yield content
+    
+    async def _post(self, url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a chat request and return the JSON response"""
+        if self.cassette is not None and self.cassette.replaying:
+            return await self.cassette.replay_response(payload)
+        
+        started = time.monotonic()
+        async with httpx.AsyncClient(timeout=120.0) as client:
+            response = await client.post(url, headers=headers, json=payload)
+            response.raise_for_status()
+            result = response.json()
+        
+        if self.cassette is not None:
+            self.cassette.record_response(payload, result, time.monotonic() - started)
+        return result
+    
+    async def _post_lines(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any]
+    ) -> AsyncIterator[str]:
+        """Send a streaming chat request and yield the non-empty response lines"""
+        if self.cassette is not None and self.cassette.replaying:
+            async for line in self.cassette.replay_lines(payload):
+                yield line
+            return
+        
+        recorder = StreamRecorder(self.cassette, payload)
+        async with httpx.AsyncClient(timeout=120.0) as client:
+            async with client.stream("POST", url, headers=headers, json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line.strip():
+                        recorder.add(line)
+                        yield line
+        # Only complete responses are recorded
+        recorder.save()
+    
+    def _build_request(
+        self,
+        messages: List[Dict],
+        system_prompt: str,
+        response_schema: Optional[Dict],
+        stream: bool
+    ) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        """URL, headers and JSON payload of a chat request"""
+        
+        full_messages = [
+            {"role": "system", "content": system_prompt}
+        ] + messages
+        
+        if self.provider == "ollama":
+            url = self.config.get('url', 'http://localhost:11434')
+            payload = {
+                "model": self.config.get('model', 'llama3.1:latest'),
+                "messages": full_messages,
+                "stream": stream
+            }
+            if self.config.get('keep_alive') is not None:
+                payload["keep_alive"] = self.config['keep_alive']
+            if response_schema is not None:
+                payload["format"] = response_schema
+            return f"{url}/api/chat", {}, payload
+        
+        if self.provider in OPENAI_COMPATIBLE_PROVIDERS:
+            base_url = self.config.get('base_url') or OPENAI_COMPATIBLE_PROVIDERS[self.provider][0]
+            endpoint = f"{base_url.rstrip('/')}/chat/completions"
+            payload = {
+                "model": self.model,
+                "messages": full_messages
+            }
+            if stream:
+                payload["stream"] = True
+                payload["stream_options"] = {"include_usage": True}
+            if response_schema is not None:
+                payload["response_format"] = {
+                    "type": "json_schema",
+                    "json_schema": {"name": "response", "schema": response_schema}
+                }
+            headers = {
+                "Authorization": f"Bearer {self.config.get('api_key')}",
+                "Content-Type": "application/json"
+            }
+            return endpoint, headers, payload
+        
+        raise ValueError(f"Unknown provider: {self.provider}")
+    
+    async def warm_up(self, system_prompts: List[str]) -> None:
+        """
+        Load the model and prefill the given system prompts
+        
+        Only Ollama needs this; hosted providers keep their models loaded
+        and cache prompt prefixes on their side.
+        """
+        if self.provider != "ollama" or (self.cassette is not None and self.cassette.replaying):
+            return
+        
+        url = self.config.get('url', 'http://localhost:11434')
+        model = self.config.get('model', 'llama3.1:latest')
+        keep_alive = self.config.get('keep_alive')
+        
+        async with httpx.AsyncClient(timeout=300.0) as client:
+            # An empty prompt makes Ollama load the model without generating
+            payload = {"model": model, "prompt": ""}
+            if keep_alive is not None:
+                payload["keep_alive"] = keep_alive
+            response = await client.post(f"{url}/api/generate", json=payload)
+            response.raise_for_status()
+            
+            # Evaluate each fixed system prompt once so its KV prefix is cached.
+            # Ollama keeps one cached prefix per parallel slot, so the most
+            # frequently used prompt should come last.
+            for system_prompt in system_prompts:
+                payload = {
+                    "model": model,
+                    "messages": [{"role": "system", "content": system_prompt}],
+                    "stream": False,
+                    "options": {"num_predict": 1}
+                }
+                if keep_alive is not None:
+                    payload["keep_alive"] = keep_alive
+                response = await client.post(f"{url}/api/chat", json=payload)
+                response.raise_for_status()
+    
+    async def is_model_loaded(self) -> bool:
+        """Check whether the model is resident in Ollama's memory"""
+        if self.provider != "ollama" or (self.cassette is not None and self.cassette.replaying):
+            return True
+        
+        url = self.config.get('url', 'http://localhost:11434')
+        model = self.config.get('model', 'llama3.1:latest')
+        
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            response = await client.get(f"{url}/api/ps")
+            response.raise_for_status()
+            loaded = response.json().get("models", [])
+            return any(m.get("name") == model or m.get("model") == model for m in loaded)
 
-app = FastAPI(
-    title="AIROI API",
-    description="AI Return on Investment Assessment System",
-    version="1.0.0",
-    lifespan=lifespan
-)
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+class MultiProviderLLM:
+    """
+    Spreads calls over several LLM providers for lower tail latency
+    
+    Providers are tried in order of preference. When the active provider
+    takes longer than its observed p95 latency, the same request is sent to
+    the next provider and whichever answer arrives first wins; the other
+    request is cancelled. Failed calls fail over immediately, and providers
+    that keep failing are skipped by their circuit breaker.
+    """
+    
+    provider = "multi"
+    
+    def __init__(
+        self,
+        providers: List[LLMProvider],
+        hedge_percentile: float = 0.95,
+        default_hedge_delay: float = 20.0,
+        min_hedge_delay: float = 0.5,
+        failure_threshold: int = 3,
+        recovery_timeout: float = 30.0
+    ):
+        if not providers:
+            raise ValueError("MultiProviderLLM needs at least one provider")
+        self.providers = providers
+        self.hedge_percentile = hedge_percentile
+        # Used until a provider has enough latency samples
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.latency = [LatencyTracker() for _ in providers]
+        self.breakers = [
+            CircuitBreaker(failure_threshold, recovery_timeout) for _ in providers
+        ]
+    
+    @property
+    def config(self) -> Dict[str, Any]:
+        return self.providers[0].config
+    
+    def _hedge_delay(self, index: int) -> float:
+        observed = self.latency[index].percentile(self.hedge_percentile)
+        if observed is None:
+            return self.default_hedge_delay
+        return max(observed, self.min_hedge_delay)
+    
+    async def _timed_call(self, index: int, messages: List[Dict], system_prompt: str, **kwargs):
+        started = time.monotonic()
+        try:
+            return await self.providers[index].call(messages, system_prompt, **kwargs)
+        finally:
+            # Calls that fail or lose to a hedge are sampled too, with the
+            # time so far as a lower bound: sampling only the calls that
+            # finish would drop the slow ones and keep lowering the delay
+            self.latency[index].record(time.monotonic() - started)
+    
+    async def call(self, messages: List[Dict], system_prompt: str, **kwargs) -> str:
+        """Call the fastest healthy provider, hedging slow requests"""
+        
+        candidates = iter(range(len(self.providers)))
+        pending: Dict[asyncio.Task, int] = {}
+        last_error: Optional[Exception] = None
+        
+        def launch_next() -> Optional[int]:
+            for index in candidates:
+                if self.breakers[index].allow():
+                    task = asyncio.create_task(
+                        self._timed_call(index, messages, system_prompt, **kwargs)
+                    )
+                    pending[task] = index
+                    return index
+            return None
+        
+        newest = launch_next()
+        if newest is None:
+            raise RuntimeError("All LLM providers are unavailable (circuit open)")
+        
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending.keys(),
+                    timeout=self._hedge_delay(newest),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                if not done:
+                    # Slower than usual: hedge to the next provider, if any
+                    hedged = launch_next()
+                    if hedged is not None:
+                        newest = hedged
+                    continue
+                
+                for task in done:
+                    index = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        self.breakers[index].record_success()
+                        return task.result()
+                    
+                    self.breakers[index].record_failure()
+                    last_error = error
+                    print(f"LLM provider {self.providers[index].provider} failed: {error}")
+                
+                if not pending:
+                    # Everything in flight failed: fail over right away
+                    failover = launch_next()
+                    if failover is not None:
+                        newest = failover
+        finally:
+            for task, index in pending.items():
+                task.cancel()
+                self.breakers[index].release()
+            if pending:
+                await asyncio.gather(*pending.keys(), return_exceptions=True)
+        
+        raise RuntimeError("All LLM providers failed") from last_error
+    
+    async def stream(self, messages: List[Dict], system_prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Stream from the first healthy provider, failing over before output starts"""
+        
+        last_error: Optional[Exception] = None
+        for index, provider in enumerate(self.providers):
+            if not self.breakers[index].allow():
+                continue
+            
+            started = time.monotonic()
+            emitted = False
+            try:
+                async for chunk in provider.stream(messages, system_prompt, **kwargs):
+                    emitted = True
+                    yield chunk
+            except Exception as e:
+                self.breakers[index].record_failure()
+                self.latency[index].record(time.monotonic() - started)
+                if emitted:
+                    # Part of the answer is already out, it cannot be swapped
+                    raise
+                last_error = e
+                print(f"LLM provider {provider.provider} failed: {e}")
+                continue
+            except BaseException:
+                self.breakers[index].release()
+                self.latency[index].record(time.monotonic() - started)
+                raise
+            
+            self.breakers[index].record_success()
+            self.latency[index].record(time.monotonic() - started)
+            return
+        
+        raise RuntimeError("All LLM providers failed") from last_error
+    
+    async def warm_up(self, system_prompts: List[str]) -> None:
+        for provider in self.providers:
+            await provider.warm_up(system_prompts)
+    
+    async def is_model_loaded(self) -> bool:
+        return await self.providers[0].is_model_loaded()
 
 
-# In-memory storage for active sessions (use Redis in production)
-active_sessions: Dict[str, Any] = {}
+class DiscoveryAgent:
+    """
+    Phase 1: Discovery & Audit Agent
+    
+    Capabilities:
+    - Structured information gathering through conversation
+    - System and process documentation
+    - Cost baseline establishment
+    
+    Limitations:
+    - Cannot access systems directly (requires human input)
+    - Cannot guarantee complete discovery
+    - Requires validation of critical systems
+    """
+    
+    name = "discovery"
+    
+    def __init__(self, llm: LLMProvider, history_token_budget: int = DEFAULT_TOKEN_BUDGET):
+        self.llm = llm
+        self.history = HistoryManager(llm, token_budget=history_token_budget)
+        # Summary cache used when callers do not track their own memory
+        self.memory = ConversationMemory()
+        self.system_prompt = """You are the Discovery Agent of AIROI, an AI ROI assessment system.
 
+Your role is to conduct a thorough audit of the client's current state through structured questioning.
 
-@app.get("/")
-async def root():
-    """Health check endpoint"""
-    return {
-        "service": "AIROI",
-        "version": "1.0.0",
-        "status": "operational"
-    }
+FOCUS AREAS:
+1. Technology Infrastructure: What systems, platforms, databases are in use?
+2. Business Processes: What are the key workflows? Where are bottlenecks?
+3. Data Landscape: What data is available? What's its quality and accessibility?
+4. Pain Points: Where is the team spending manual effort? What's frustrating?
+5. Costs: Current IT costs, operational costs, staffing costs
+6. Capabilities: Team's technical skills, existing automation, change readiness
 
+IMPORTANT PRINCIPLES:
+- Ask 3-5 targeted questions at a time, not overwhelming lists
+- Probe for specifics: "Can you give an example?" "How long does that take?"
+- Acknowledge what you've learned and build on it
+- Flag areas needing deeper investigation
+- Be conversational but systematic
 
-@app.post("/sessions", response_model=SessionResponse)
-async def create_session(session_data: SessionCreate):
-    """Create a new assessment session"""
+When you have sufficient information, output a structured JSON summary with:
+{
+  "company_name": "",
+  "industry": "",
+  "employee_count": 0,
+  "systems": [...],
+  "processes": [...],
+  "data_sources": [...],
+  "pain_points": [...],
+  "current_costs": {...},
+  "technical_capabilities": {...},
+  "compliance_requirements": [...]
+}"""
     
-    import uuid
-    session_id = str(uuid.uuid4())
+    @traced_agent
+    async def start_audit(self) -> str:
+        """Begin the discovery process"""
+        messages = [{
+            "role": "user",
+            "content": "Begin the discovery audit. Introduce yourself and ask the first set of questions."
+        }]
+        return await self.llm.call(messages, self.system_prompt)
     
-    # Initialize LLM provider
-    llm_config = session_data.llm_config
-    llm = None  # LLMProvider implementation here
-    
-    # Store in database
-    conn = sqlite3.connect('airoi.db')
-    cursor = conn.cursor()
+    @traced_agent
+    async def continue_audit(
+        self,
+        conversation_history: List[Dict],
+        memory: Optional[ConversationMemory] = None
+    ) -> str:
+        """Continue the audit conversation"""
+        messages = await self.history.build_messages(
+            conversation_history,
+            memory if memory is not None else self.memory,
+            reserve_tokens=estimate_tokens(self.system_prompt)
+        )
+        return await self.llm.call(messages, self.system_prompt)
     
-    now = datetime.now().isoformat()
-    cursor.execute(
-        "INSERT INTO sessions (id, company_name, created_at, updated_at, status) VALUES (?, ?, ?, ?, ?)",
-        (session_id, session_data.company_name, now, now, "active")
-    )
-    conn.commit()
-    conn.close()
-    
-    # Store in memory
-    active_sessions[session_id] = {
-        "company_name": session_data.company_name,
-        "llm_config": llm_config.dict(),
-        "conversation_history": [],
-        "created_at": now
-    }
-    
-    return SessionResponse(
-        session_id=session_id,
-        company_name=session_data.company_name,
-        created_at=now,
-        status="active"
-    )
+    @traced_agent
+    async def extract_audit_data(
+        self,
+        conversation_history: List[Dict],
+        memory: Optional[ConversationMemory] = None
+    ) -> Optional[AuditData]:
+        """Extract structured audit data from the conversation"""
+        instruction = {
+            "role": "user",
+            "content": "Based on our conversation, please provide the complete structured JSON audit summary."
+        }
+        messages = await self.history.build_messages(
+            conversation_history,
+            memory if memory is not None else self.memory,
+            reserve_tokens=estimate_tokens(self.system_prompt) + estimate_message_tokens(instruction)
+        )
+        messages = messages + [instruction]
+        
+        data, errors = await generate_structured(
+            self.llm, messages, self.system_prompt, AUDIT_DATA_SCHEMA
+        )
+        if data is None:
+            print(f"Could not extract audit data: {'; '.join(errors)}")
+            return None
+        
+        return AuditData(**data)
 
 
-@app.get("/sessions/{session_id}")
-async def get_session(session_id: str):
-    """Get session information"""
+class OpportunityAnalyzer:
+    """
+    Phase 2: Opportunity Analysis Agent
     
-    conn = sqlite3.connect('airoi.db')
-    cursor = conn.cursor()
+    Capabilities:
+    - Pattern matching against proven AI use cases
+    - ROI calculation with confidence intervals
+    - Risk assessment based on industry patterns
+    - Priority ranking
     
-    cursor.execute(
-        "SELECT id, company_name, created_at, status FROM sessions WHERE id = ?",
-        (session_id,)
-    )
-    row = cursor.fetchone()
-    conn.close()
+    Limitations:
+    - Cannot predict market disruptions or external factors
+    - ROI estimates are projections, not guarantees
+    - Cannot fully assess organizational change readiness
+    - Cannot replace domain expertise in specialized fields
+    """
     
-    if not row:
-        raise HTTPException(status_code=404, detail="Session not found")
+    name = "opportunity_analyzer"
     
-    return {
-        "session_id": row[0],
-        "company_name": row[1],
-        "created_at": row[2],
-        "status": row[3]
-    }
+    def __init__(
+        self,
+        llm: LLMProvider,
+        prompt_token_budget: int = DEFAULT_PROMPT_BUDGETS["opportunity_analyzer"]
+    ):
+        self.llm = llm
+        self.prompt_token_budget = prompt_token_budget
+        self.system_prompt = """You are the Opportunity Analyzer of AIROI.
 
+Given audit data about a business, identify AI/automation opportunities with brutal honesty about what AI can and cannot do.
 
-@app.post("/sessions/{session_id}/chat")
-async def chat(session_id: str, message: ChatMessage):
-    """Send a message in the chat"""
-    
-    if session_id not in active_sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    session = active_sessions[session_id]
+ANALYSIS FRAMEWORK:
+
+For each opportunity, you MUST clearly specify:
+
+1. WHAT AI CAN DO (Concrete Capabilities):
+   - Specific tasks AI can reliably automate
+   - Pattern recognition capabilities
+   - Data processing abilities
+   - Quality thresholds it can achieve
+
+2. WHAT AI CANNOT DO (Critical Limitations):
+   - Tasks requiring human judgment
+   - Edge cases needing human review
+   - Compliance/legal decisions
+   - Complex negotiations or ethical choices
+   - Areas where errors would be unacceptable
+
+3. ROI ESTIMATION:
+   - Time savings (hours/week)
+   - Cost reduction ($/month)
+   - Revenue opportunity (if applicable)
+   - Confidence level: LOW (50-70%), MEDIUM (70-85%), HIGH (85%+)
+   - Payback period
+
+4. PHASE CLASSIFICATION:
+   - QUICK WIN (0-3 months): Simple, proven, low-risk
+   - FOUNDATION (3-12 months): Infrastructure, moderate complexity
+   - STRATEGIC (1-3+ years): Transformational, high complexity
+
+5. RISK FACTORS:
+   - Technical risks
+   - Organizational risks
+   - Compliance/regulatory risks
+   - Vendor/dependency risks
+
+6. DEPENDENCIES & PREREQUISITES:
+   - What must be in place first?
+   - What other systems/processes must work?
+
+OUTPUT FORMAT: JSON object {"opportunities": [...]} where each opportunity has:
+title, description, phase (quick_win | foundation | strategic), can_do (list),
+cannot_do (list), estimated_roi (annual USD), confidence (low | medium | high),
+timeframe_months, risk_factors (list), dependencies (list), next_steps (list)
+
+CRITICAL: Be conservative in estimates. Under-promise and over-deliver."""
     
-    # Add user message to history
-    session["conversation_history"].append({
-        "role": message.role,
-        "content": message.content
-    })
+    @traced_agent
+    async def analyze(self, audit_data: AuditData) -> List[Opportunity]:
+        """Analyze audit data and identify opportunities"""
+        
+        lead = "Analyze this business audit and identify AI/automation opportunities:"
+        tail = "Provide a detailed analysis with concrete opportunities."
+        builder = PromptBuilder(self.prompt_token_budget)
+        builder.add("AUDIT DATA", asdict(audit_data))
+        
+        messages = [{
+            "role": "user",
+            "content": f"{lead}\n\n{builder.build()}\n\n{tail}"
+        }]
+        
+        with call_attributes(**builder.stats):
+            data, errors = await generate_structured(
+                self.llm, messages, self.system_prompt, OPPORTUNITIES_SCHEMA
+            )
+        if errors:
+            print(f"Dropped invalid opportunities: {'; '.join(errors)}")
+        
+        return [Opportunity.from_dict(item) for item in (data or {}).get("opportunities", [])]
+
+
+class RoadmapStrategist:
+    """
+    Phase 3: Roadmap Strategist Agent
     
-    # Store in database
-    conn = sqlite3.connect('airoi.db')
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO conversations (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
-        (session_id, message.role, message.content, datetime.now().isoformat())
-    )
-    conn.commit()
-    conn.close()
+    Capabilities:
+    - Create phased implementation plans
+    - Ensure forward compatibility
+    - Design progressive capability building
+    - Plan for rollback strategies
     
-    # TODO: Call appropriate agent based on conversation state
-    # For now, return a placeholder response
+    Limitations:
+    - Cannot predict future technology disruptions
+    - Assumes reasonable organizational cooperation
+    - Requires periodic human strategic review
+    - Cannot account for unforeseen business changes
+    """
     
-    response_content = "This is a placeholder response. Integrate with AIROI agents."
+    name = "roadmap_strategist"
     
-    # Add assistant response to history
-    session["conversation_history"].append({
-        "role": "assistant",
-        "content": response_content,
-        "agent": "general"
-    })
+    def __init__(
+        self,
+        llm: LLMProvider,
+        prompt_token_budget: int = DEFAULT_PROMPT_BUDGETS["roadmap_strategist"]
+    ):
+        self.llm = llm
+        self.prompt_token_budget = prompt_token_budget
+        self.system_prompt = """You are the Roadmap Strategist of AIROI.
+
+Create a phased implementation roadmap that:
+
+1. BUILDS PROGRESSIVELY:
+   - Quick wins fund foundation projects
+   - Foundation enables strategic initiatives
+   - Each phase prepares for the next
+   - No dead-end investments
+
+2. ENSURES FUTURE-PROOFING:
+   - Modular architecture
+   - API-first approach
+   - Cloud-native where appropriate
+   - Vendor flexibility
+
+3. MANAGES RISK:
+   - Rollback plans for each phase
+   - Pilot programs before full deployment
+   - Parallel running during transitions
+   - Clear success metrics
+
+4. MAINTAINS MOMENTUM:
+   - Early wins build confidence
+   - Consistent progress demonstrations
+   - Regular ROI reporting
+   - Stakeholder engagement strategy
+
+5. HUMAN OVERSIGHT POINTS:
+   - Decision gates requiring approval
+   - Quality review checkpoints
+   - Compliance validation
+   - Performance assessment
+
+OUTPUT: Detailed roadmap with timelines, dependencies, success metrics, and governance."""
     
-    return {
-        "role": "assistant",
-        "content": response_content,
-        "agent": "general"
-    }
+    @traced_agent
+    async def create_roadmap(
+        self, 
+        audit_data: AuditData, 
+        opportunities: List[Opportunity]
+    ) -> Dict[str, Any]:
+        """Create implementation roadmap"""
+        
+        lead = "Create a detailed implementation roadmap for these opportunities:"
+        tail = "Provide a comprehensive phased roadmap."
+        # The opportunities already distill the audit, so the audit data is
+        # the first to be cut when the prompt runs over budget
+        builder = PromptBuilder(self.prompt_token_budget)
+        builder.add("OPPORTUNITIES", [o.to_dict() for o in opportunities], priority=1)
+        builder.add("AUDIT DATA", asdict(audit_data), priority=0)
+        
+        messages = [{
+            "role": "user",
+            "content": f"{lead}\n\n{builder.build()}\n\n{tail}"
+        }]
+        
+        with call_attributes(**builder.stats):
+            response = await self.llm.call(messages, self.system_prompt)
+        
+        return {
+            "roadmap": response,
+            "created_at": datetime.now().isoformat()
+        }
 
 
-@app.get("/sessions/{session_id}/conversation")
-async def get_conversation(session_id: str):
-    """Get full conversation history"""
+class ImplementationAssistant:
+    """
+    Phase 4: Implementation Assistant Agent
     
-    conn = sqlite3.connect('airoi.db')
-    cursor = conn.cursor()
+    Capabilities:
+    - Generate infrastructure code (Terraform, CloudFormation)
+    - Create API integration specifications
+    - Provide testing frameworks
+    - Monitor implementation progress
     
-    cursor.execute(
-        "SELECT role, agent, content, timestamp FROM conversations WHERE session_id = ? ORDER BY timestamp",
-        (session_id,)
-    )
-    rows = cursor.fetchall()
-    conn.close()
-    
-    return {
-        "session_id": session_id,
-        "messages": [
-            {
-                "role": row[0],
-                "agent": row[1],
-                "content": row[2],
-                "timestamp": row[3]
-            }
-            for row in rows
-        ]
-    }
+    Limitations:
+    - Cannot execute without human approval
+    - Cannot guarantee zero-downtime migrations
+    - Requires human oversight for production
+    - Cannot replace DevOps expertise
+    """
+    
+    name = "implementation_assistant"
+    
+    def __init__(
+        self,
+        llm: LLMProvider,
+        prompt_token_budget: int = DEFAULT_PROMPT_BUDGETS["implementation_assistant"]
+    ):
+        self.llm = llm
+        self.prompt_token_budget = prompt_token_budget
+        self.system_prompt = """You are the Implementation Assistant of AIROI.
 
+Help execute the roadmap by:
 
-@app.post("/sessions/{session_id}/start-discovery")
-async def start_discovery(session_id: str):
-    """Start the discovery audit process"""
-    
-    if session_id not in active_sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
+1. GENERATING CODE:
+   - Infrastructure as Code (Terraform/CloudFormation)
+   - API integration code
+   - Data pipeline scripts
+   - Testing frameworks
+
+2. CREATING SPECIFICATIONS:
+   - API contracts
+   - Data schemas
+   - Integration patterns
+   - Security requirements
+
+3. PROVIDING GUIDANCE:
+   - Step-by-step implementation guides
+   - Best practices
+   - Common pitfalls to avoid
+   - Rollback procedures
+
+CRITICAL SAFETY PRINCIPLES:
+- All code is for review, not direct execution
+- Include extensive comments explaining decisions
+- Provide multiple implementation options when appropriate
+- Highlight security considerations
+- Emphasize testing requirements
+- Always include rollback mechanisms
+
+OUTPUT: Clear, well-documented code and specifications."""
     
-    # TODO: Initialize DiscoveryAgent and get first message
-    initial_message = """Hello! I'm the Discovery Agent of AIROI. I'll help you systematically assess your current systems and identify opportunities for AI-powered improvements.
+    @traced_agent
+    async def generate_implementation_guide(
+        self, 
+        opportunity: Opportunity
+    ) -> str:
+        """Generate implementation guide for an opportunity"""
+        
+        lead = "Generate a detailed implementation guide for this opportunity:"
+        tail = "Include code examples, architecture diagrams (in text/ASCII), and step-by-step instructions."
+        builder = PromptBuilder(self.prompt_token_budget)
+        builder.add("OPPORTUNITY", opportunity.to_dict())
+        
+        messages = [{
+            "role": "user",
+            "content": f"{lead}\n\n{builder.build()}\n\n{tail}"
+        }]
+        
+        with call_attributes(**builder.stats):
+            return await self.llm.call(messages, self.system_prompt)
+
+
+# Bump when the prompt templates inside the agents change; system prompts,
+# schemas and budgets are covered by the stage prompt versions automatically
+ASSESSMENT_PROMPT_VERSION = 3
+
 
-Let's start with understanding your business:
+def input_hash(*parts: Any) -> str:
+    """Digest of JSON-serializable stage inputs"""
+    return hashlib.sha256(
+        json.dumps(parts, sort_keys=True, default=str).encode()
+    ).hexdigest()
 
-1. What industry are you in, and what are your primary business activities?
-2. Approximately how many employees do you have?
-3. What are the main technology systems you currently use (e.g., CRM, ERP, databases)?
 
-Please share what you're comfortable with, and we'll go from there."""
+class AIROIOrchestrator:
+    """
+    Main orchestrator that coordinates all agents
+    """
     
-    session = active_sessions[session_id]
-    session["conversation_history"].append({
-        "role": "assistant",
-        "content": initial_message,
-        "agent": "discovery"
-    })
+    def __init__(
+        self,
+        llm_provider: LLMProvider,
+        history_token_budget: int = DEFAULT_TOKEN_BUDGET,
+        prompt_budgets: Optional[Dict[str, int]] = None
+    ):
+        budgets = {**DEFAULT_PROMPT_BUDGETS, **(prompt_budgets or {})}
+        self.llm = llm_provider
+        self.discovery = DiscoveryAgent(llm_provider, history_token_budget=history_token_budget)
+        self.analyzer = OpportunityAnalyzer(llm_provider, budgets["opportunity_analyzer"])
+        self.strategist = RoadmapStrategist(llm_provider, budgets["roadmap_strategist"])
+        self.implementer = ImplementationAssistant(llm_provider, budgets["implementation_assistant"])
+        # Version of everything besides the data that shapes each stage's prompt
+        self.prompt_versions = {
+            "audit_data": input_hash(
+                ASSESSMENT_PROMPT_VERSION, self.discovery.system_prompt, AUDIT_DATA_SCHEMA,
+                history_token_budget
+            ),
+            "opportunities": input_hash(
+                ASSESSMENT_PROMPT_VERSION, self.analyzer.system_prompt, OPPORTUNITIES_SCHEMA,
+                self.analyzer.prompt_token_budget
+            ),
+            "roadmap": input_hash(
+                ASSESSMENT_PROMPT_VERSION, self.strategist.system_prompt,
+                self.strategist.prompt_token_budget
+            ),
+            "implementation_guide": input_hash(
+                ASSESSMENT_PROMPT_VERSION, self.implementer.system_prompt,
+                self.implementer.prompt_token_budget
+            ),
+        }
     
-    # Store in database
-    conn = sqlite3.connect('airoi.db')
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO conversations (session_id, role, agent, content, timestamp) VALUES (?, ?, ?, ?, ?)",
-        (session_id, "assistant", "discovery", initial_message, datetime.now().isoformat())
-    )
-    conn.commit()
-    conn.close()
-    
-    return {
-        "role": "assistant",
-        "agent": "discovery",
-        "content": initial_message
-    }
-
-
-@app.post("/sessions/{session_id}/generate-assessment")
-async def generate_assessment(session_id: str):
-    """Generate full assessment from conversation history"""
-    
-    if session_id not in active_sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    session = active_sessions[session_id]
-    
-    # TODO: Run full assessment pipeline
-    # orchestrator.run_full_assessment(session["conversation_history"])
-    
-    # Placeholder response
-    assessment = {
-        "session_id": session_id,
-        "audit_data": {
-            "company_name": session["company_name"],
-            "industry": "Example Industry",
-            "employee_count": 50
-        },
-        "opportunities": [
-            {
-                "title": "Email Response Automation",
-                "phase": "quick_win",
-                "estimated_roi": 25000,
-                "confidence": "high"
-            }
-        ],
-        "roadmap": {
-            "phases": ["Quick Wins", "Foundation", "Strategic"]
-        },
-        "generated_at": datetime.now().isoformat()
-    }
-    
-    # Store in database
-    conn = sqlite3.connect('airoi.db')
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO assessments (session_id, audit_data, opportunities, roadmap, created_at) VALUES (?, ?, ?, ?, ?)",
-        (
-            session_id,
-            json.dumps(assessment["audit_data"]),
-            json.dumps(assessment["opportunities"]),
-            json.dumps(assessment["roadmap"]),
-            assessment["generated_at"]
-        )
-    )
-    conn.commit()
-    conn.close()
+    def system_prompts(self) -> List[str]:
+        """Fixed system prompts of all agents, most frequently used last"""
+        return [
+            self.implementer.system_prompt,
+            self.strategist.system_prompt,
+            self.analyzer.system_prompt,
+            SUMMARY_SYSTEM_PROMPT,
+            self.discovery.system_prompt,
+        ]
+    
+    async def _stage(self, checkpoint, name: str, inputs: List[Any], compute, encode=None, decode=None):
+        """
+        Run one assessment stage, or reuse a stored result for the same inputs
+        
+        checkpoint is any object with async load(stage, input_hash) returning
+        a stored JSON-serializable result or None, started(stage) and
+        save(stage, input_hash, result). The hash covers the stage kind, its
+        prompt version and its inputs, so a result is reused exactly when
+        recomputing it would send the same prompt.
+        """
+        kind = name.split(":")[0]
+        digest = input_hash(kind, self.prompt_versions[kind], inputs)
+        if checkpoint is not None:
+            stored = await checkpoint.load(name, digest)
+            if stored is not None:
+                return decode(stored) if decode else stored
+            await checkpoint.started(name)
+        
+        result = await compute()
+        if checkpoint is not None and result is not None:
+            await checkpoint.save(name, digest, encode(result) if encode else result)
+        return result
     
-    return assessment
+    async def run_full_assessment(
+        self, 
+        conversation_history: List[Dict],
+        memory: Optional[ConversationMemory] = None,
+        checkpoint=None
+    ) -> Dict[str, Any]:
+        """
+        Run complete assessment workflow
+        
+        With a checkpoint every completed stage is stored as it finishes, and
+        stages whose inputs did not change since a stored result are not
+        recomputed: a retry after a failure repeats only the unfinished
+        stages, and a regeneration after new chat messages that leave the
+        audit data unchanged skips every later stage.
+        
+        Returns comprehensive assessment package
+        """
+        
+        # Extract audit data
+        summary = (memory if memory is not None else self.discovery.memory).summary
+        audit_data = await self._stage(
+            checkpoint, "audit_data",
+            [summary, [[m.get("role"), m.get("content")] for m in conversation_history]],
+            lambda: self.discovery.extract_audit_data(conversation_history, memory),
+            asdict, lambda data: AuditData(**data)
+        )
+        if not audit_data:
+            return {"error": "Could not extract audit data"}
+        audit_dict = asdict(audit_data)
+        
+        # Analyze opportunities
+        opportunities = await self._stage(
+            checkpoint, "opportunities", [audit_dict],
+            lambda: self.analyzer.analyze(audit_data),
+            lambda items: [o.to_dict() for o in items],
+            lambda items: [Opportunity.from_dict(o) for o in items]
+        )
+        opportunity_dicts = [o.to_dict() for o in opportunities]
+        
+        # Generate implementation guides for quick wins
+        quick_wins = [o for o in opportunities if o.phase == Phase.QUICK_WIN][:3]  # Limit to top 3 quick wins
+        if checkpoint is not None:
+            await checkpoint.plan(
+                ["audit_data", "opportunities", "roadmap"]
+                + [f"implementation_guide:{i}" for i in range(len(quick_wins))]
+            )
+        
+        # Create roadmap
+        roadmap = await self._stage(
+            checkpoint, "roadmap", [audit_dict, opportunity_dicts],
+            lambda: self.strategist.create_roadmap(audit_data, opportunities)
+        )
+        
+        implementation_guides = {}
+        for i, qw in enumerate(quick_wins):
+            # Titles are not guaranteed to be unique; positions are
+            implementation_guides[qw.title] = await self._stage(
+                checkpoint, f"implementation_guide:{i}", [qw.to_dict()],
+                lambda qw=qw: self.implementer.generate_implementation_guide(qw)
+            )
+        
+        return {
+            "audit_data": audit_dict,
+            "opportunities": opportunity_dicts,
+            "roadmap": roadmap,
+            "implementation_guides": implementation_guides,
+            "generated_at": datetime.now().isoformat()
+        }
 
 
-@app.get("/sessions/{session_id}/assessment")
-async def get_assessment(session_id: str):
-    """Get the generated assessment"""
+# Example usage
+async def main():
+    """Example of using the AIROI system"""
     
-    conn = sqlite3.connect('airoi.db')
-    cursor = conn.cursor()
-    
-    cursor.execute(
-        "SELECT audit_data, opportunities, roadmap, created_at FROM assessments WHERE session_id = ? ORDER BY created_at DESC LIMIT 1",
-        (session_id,)
+    # Initialize with Ollama
+    llm = LLMProvider(
+        provider="ollama",
+        url="http://localhost:11434",
+        model="llama3.1"
     )
-    row = cursor.fetchone()
-    conn.close()
     
-    if not row:
-        raise HTTPException(status_code=404, detail="Assessment not found")
+    # Or with Groq
+    # llm = LLMProvider(provider="groq", api_key="your-groq-key")
     
-    return {
-        "session_id": session_id,
-        "audit_data": json.loads(row[0]),
-        "opportunities": json.loads(row[1]),
-        "roadmap": json.loads(row[2]),
-        "generated_at": row[3]
-    }
-
-
-@app.websocket("/ws/{session_id}")
-async def websocket_endpoint(websocket: WebSocket, session_id: str):
-    """WebSocket for real-time chat"""
+    orchestrator = AIROIOrchestrator(llm)
     
-    await websocket.accept()
+    # Start discovery
+    print("Starting discovery audit...")
+    initial_message = await orchestrator.discovery.start_audit()
+    print(initial_message)
     
-    try:
-        while True:
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
-            
-            # Process message
-            # TODO: Integrate with agents
-            
-            response = {
-                "role": "assistant",
-                "content": f"Received: {message_data['content']}",
-                "agent": "general"
-            }
-            
-            await websocket.send_text(json.dumps(response))
-            
-    except WebSocketDisconnect:
-        print(f"WebSocket disconnected for session {session_id}")
-
-
-# Agent-specific endpoints
-@app.get("/capabilities")
-async def get_capabilities():
-    """Get information about what AI can and cannot do"""
-    
-    return {
-        "quick_wins": {
-            "can_do": [
-                "Pattern recognition in documents",
-                "Classify and route based on content",
-                "Extract structured data from forms",
-                "Answer questions from knowledge base"
-            ],
-            "cannot_do": [
-                "Make legal or compliance decisions",
-                "Replace human judgment in ambiguous cases",
-                "Guarantee 100% accuracy without human review",
-                "Handle complex negotiations"
-            ]
-        },
-        "foundation": {
-            "can_do": [
-                "Consolidate data from multiple sources",
-                "Create unified APIs for legacy systems",
-                "Build searchable knowledge repositories",
-                "Automate repetitive workflows"
-            ],
-            "cannot_do": [
-                "Migrate without business validation",
-                "Replace all legacy systems immediately",
-                "Eliminate need for IT governance",
-                "Automatically resolve data quality issues"
-            ]
-        },
-        "strategic": {
-            "can_do": [
-                "Identify patterns and trends in data",
-                "Provide data-driven recommendations",
-                "Optimize complex workflows",
-                "Personalize user experiences"
-            ],
-            "cannot_do": [
-                "Replace executive decision-making",
-                "Guarantee predictions in volatile markets",
-                "Eliminate need for domain expertise",
-                "Make ethical judgments"
-            ]
-        }
-    }
+    # In a real implementation, this would be interactive
+    # conversation_history = [...]
+    
+    # Run full assessment
+    # assessment = await orchestrator.run_full_assessment(conversation_history)
+    # print(json.dumps(assessment, indent=2))
 
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    asyncio.run(main())
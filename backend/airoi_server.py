@@ -1,571 +1,966 @@
 """
-AIROI - AI Return on Investment Assessment System
-Backend Architecture for POC with Ollama/Llama 3.1
-
-This system orchestrates multiple specialized agents to assess,
-analyze, and roadmap AI transformation opportunities.
+AIROI FastAPI Server
+Complete REST API for the AIROI assessment system
 """
 
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from typing import List, Dict, Optional, Any
 import asyncio
 import json
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
-from enum import Enum
+import uuid
 from datetime import datetime
-import httpx
+from contextlib import asynccontextmanager
+
+import config
+
+# Import the AIROI backend
+from airoi_backend import (
+    AIROIOrchestrator, LLMProvider, MultiProviderLLM, Phase, ConfidenceLevel
+ )
+from admission import AdmissionController, Overloaded
+from archive import SessionArchive
+from assessment_jobs import AssessmentJobs
+from cassette import Cassette
+from column_codec import ColumnCodec
+from conversation_writer import ConversationWriter
+from database import Database
+from http_compression import CompressionMiddleware, Compressor, not_modified, strong_etag
+from migrations import migrate
+import queries
+from queries import now_us, to_iso, encode_cursor, decode_cursor
+from llm_tracing import TraceStore
+import search
+from session_backend import RedisSessionBackend, SessionLockTimeout, SQLiteSessionBackend
+from session_store import Session, SessionStore
+from ws_hub import Hub
+
+
+# Database setup
+db = Database(
+    config.DATABASE_PATH,
+    pool_size=config.DATABASE_POOL_SIZE,
+    busy_timeout_ms=config.DATABASE_BUSY_TIMEOUT_MS,
+    synchronous=config.DATABASE_SYNCHRONOUS,
+    codec=ColumnCodec(
+        config.COLUMN_COMPRESSION,
+        level=config.COLUMN_COMPRESSION_LEVEL,
+        min_bytes=config.COLUMN_COMPRESSION_MIN_BYTES
+    )
+)
+conversation_writer = ConversationWriter(
+    db,
+    durability=config.CONVERSATION_WRITE_DURABILITY,
+    batch_size=config.CONVERSATION_WRITE_BATCH_SIZE,
+    flush_interval=config.CONVERSATION_WRITE_FLUSH_INTERVAL,
+    max_queue=config.CONVERSATION_WRITE_MAX_QUEUE
+)
+session_archive = SessionArchive(
+    db,
+    config.ARCHIVE_DIR,
+    after_days=config.ARCHIVE_AFTER_DAYS,
+    batch_size=config.ARCHIVE_BATCH_SESSIONS,
+    interval=config.ARCHIVE_INTERVAL,
+    algorithm=config.ARCHIVE_COMPRESSION
+)
+
+
+def build_session_backend():
+    if config.SESSION_BACKEND == "redis":
+        return RedisSessionBackend(config.REDIS_URL, lock_timeout=config.SESSION_LOCK_TIMEOUT)
+    if config.SESSION_BACKEND != "sqlite":
+        raise ValueError(f"Unknown session backend: {config.SESSION_BACKEND}")
+    return SQLiteSessionBackend(
+        db,
+        conversation_writer,
+        shared=config.SESSION_SHARED,
+        lock_timeout=config.SESSION_LOCK_TIMEOUT,
+        archive=session_archive
+    )
 
 
-class Phase(Enum):
-    QUICK_WIN = "quick_win"
-    FOUNDATION = "foundation"
-    STRATEGIC = "strategic"
+session_backend = build_session_backend()
+session_store = SessionStore(
+    session_backend,
+    max_sessions=config.SESSION_CACHE_MAX_SESSIONS,
+    max_bytes=config.SESSION_CACHE_MAX_MB * 1024 * 1024,
+    idle_timeout=config.SESSION_IDLE_TIMEOUT
+)
+admission = AdmissionController(
+    max_in_flight=config.ADMISSION_MAX_IN_FLIGHT,
+    max_queue=config.ADMISSION_MAX_QUEUE,
+    queue_timeout=config.ADMISSION_QUEUE_TIMEOUT,
+    batch_max_in_flight=config.ADMISSION_BATCH_MAX_IN_FLIGHT,
+    batch_max_queue=config.ADMISSION_BATCH_MAX_QUEUE,
+    session_limit=config.ADMISSION_SESSION_LIMIT,
+    client_limit=config.ADMISSION_CLIENT_LIMIT
+)
+response_compressor = Compressor(minimum_size=config.HTTP_COMPRESSION_MIN_BYTES)
+ws_hub = Hub(
+    session_backend,
+    max_queue=config.WS_MAX_QUEUE,
+    overflow=config.WS_OVERFLOW,
+    batch_max_messages=config.WS_BATCH_MAX_MESSAGES,
+    batch_max_bytes=config.WS_BATCH_MAX_BYTES,
+    send_timeout=config.WS_SEND_TIMEOUT,
+    heartbeat_interval=config.WS_HEARTBEAT_INTERVAL,
+    idle_timeout=config.WS_IDLE_TIMEOUT
+)
+
+
+async def open_database():
+    db.open()
+    await db.write(migrate)
+    await db.read(db.codec.load)
+    conversation_writer.start()
+    await session_backend.start()
+
+
+async def close_database():
+    await session_backend.close()
+    # Buffered messages are written before the connections go away
+    await conversation_writer.close()
+    db.close()
+
+
+# Pydantic models
+class LLMConfig(BaseModel):
+    provider: str = "ollama"
+    url: Optional[str] = "http://localhost:11434"
+    model: Optional[str] = "llama3.1"
+    api_key: Optional[str] = None
+
+
+class ChatMessage(BaseModel):
+    role: str
+    content: str
+    agent: Optional[str] = None
+
+
+class SessionCreate(BaseModel):
+    company_name: str
+    llm_config: LLMConfig
 
 
-class ConfidenceLevel(Enum):
-    LOW = "low"
-    MEDIUM = "medium"
-    HIGH = "high"
+class SessionResponse(BaseModel):
+    session_id: str
+    company_name: str
+    created_at: str
+    status: str
+
+
+class AssessmentResponse(BaseModel):
+    session_id: str
+    audit_data: Dict[str, Any]
+    opportunities: List[Dict[str, Any]]
+    roadmap: Dict[str, Any]
+    generated_at: str
+
+
+# LLM call traces, summarized on /metrics
+trace_store = TraceStore(db, retention_days=config.LLM_TRACE_RETENTION_DAYS)
+cassette = (
+    Cassette(config.LLM_CASSETTE, config.LLM_CASSETTE_MODE, config.LLM_CASSETTE_TIMING)
+    if config.LLM_CASSETTE else None
+)
+
+
+# Model warm-up
+model_status: Dict[str, Any] = {
+    "ready": False,
+    "provider": config.DEFAULT_LLM_PROVIDER,
+    "model": config.OLLAMA_MODEL,
+    "warmed_at": None,
+    "error": None
+}
+
+
+def configured_api_key(provider: str) -> Optional[str]:
+    """Server-side API key of a provider, if any"""
+    return {
+        "groq": config.GROQ_API_KEY,
+        "openrouter": config.OPENROUTER_API_KEY
+    }.get(provider)
+
+
+def build_provider(provider: str) -> LLMProvider:
+    """Single LLM provider configured from config.py"""
+    return LLMProvider(
+        provider=provider,
+        url=config.OLLAMA_URL,
+        model=config.OLLAMA_MODEL,
+        api_key=configured_api_key(provider),
+        keep_alive=config.OLLAMA_KEEP_ALIVE,
+        max_concurrency=config.LLM_MAX_CONCURRENCY or None,
+        tracer=trace_store,
+        cassette=cassette
+    )
 
 
-@dataclass
-class Opportunity:
-    """Represents an AI/automation opportunity"""
-    title: str
-    description: str
-    phase: Phase
-    can_do: List[str]  # What AI can reliably do
-    cannot_do: List[str]  # What requires human judgment
-    estimated_roi: float
-    confidence: ConfidenceLevel
-    timeframe_months: int
-    risk_factors: List[str]
-    dependencies: List[str]
-    next_steps: List[str]
+def build_default_llm():
+    """Default LLM, hedged across the fallback providers when configured"""
+    primary = build_provider(config.DEFAULT_LLM_PROVIDER)
+    if not config.LLM_FALLBACK_PROVIDERS:
+        return primary
+    
+    return MultiProviderLLM(
+        [primary] + [build_provider(p) for p in config.LLM_FALLBACK_PROVIDERS],
+        hedge_percentile=config.LLM_HEDGE_PERCENTILE,
+        default_hedge_delay=config.LLM_HEDGE_DEFAULT_DELAY,
+        failure_threshold=config.LLM_BREAKER_FAILURES,
+        recovery_timeout=config.LLM_BREAKER_RECOVERY
+    )
 
 
-@dataclass
-class AuditData:
-    """Structured audit data from discovery"""
-    company_name: str
-    industry: str
-    employee_count: int
-    systems: List[Dict[str, Any]]
-    processes: List[Dict[str, Any]]
-    data_sources: List[Dict[str, Any]]
-    pain_points: List[str]
-    current_costs: Dict[str, float]
-    technical_capabilities: Dict[str, str]
-    compliance_requirements: List[str]
-
-
-class LLMProvider:
-    """Handles communication with different LLM providers"""
-    
-    def __init__(self, provider: str = "ollama", **config):
-        self.provider = provider
-        self.config = config
-        
-    async def call(self, messages: List[Dict], system_prompt: str) -> str:
-        """Call the configured LLM provider"""
-        
-        if self.provider == "ollama":
-            return await self._call_ollama(messages, system_prompt)
-        elif self.provider == "groq":
-            return await self._call_groq(messages, system_prompt)
-        elif self.provider == "openrouter":
-            return await self._call_openrouter(messages, system_prompt)
-        else:
-            raise ValueError(f"Unknown provider: {self.provider}")
+async def warm_up_model(llm):
+    """Load the model and prefill agent prompts, retrying until it succeeds"""
+    system_prompts = AIROIOrchestrator(llm).system_prompts()
+    delay = 1.0
     
-    async def _call_ollama(self, messages: List[Dict], system_prompt: str) -> str:
-        url = self.config.get('url', 'http://localhost:11434')
-        model = self.config.get('model', 'llama3.1:latest')
-        
-        full_messages = [
-            {"role": "system", "content": system_prompt}
-        ] + messages
-        
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                f"{url}/api/chat",
-                json={
-                    "model": model,
-                    "messages": full_messages,
-                    "stream": False
-                }
-            )
-            result = response.json()
-            return result["message"]["content"]
+    while True:
+        try:
+            await llm.warm_up(system_prompts)
+            model_status.update({
+                "ready": True,
+                "warmed_at": datetime.now().isoformat(),
+                "error": None
+            })
+            print(f"Model {config.OLLAMA_MODEL} is warm")
+            return
+        except Exception as e:
+            model_status["error"] = str(e)
+            print(f"Model warm-up failed, retrying in {delay:.0f}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60.0)
+
+
+async def keep_model_resident(llm):
+    """Reload the model if Ollama has evicted it despite the keep-alive"""
+    while True:
+        await asyncio.sleep(config.OLLAMA_KEEP_ALIVE_CHECK_INTERVAL)
+        if not model_status["ready"]:
+            continue
+        try:
+            if not await llm.is_model_loaded():
+                model_status["ready"] = False
+                print(f"Model {config.OLLAMA_MODEL} was unloaded, warming up again")
+                await warm_up_model(llm)
+        except Exception as e:
+            print(f"Keep-alive check failed: {e}")
+
+
+# Orchestrators shared by all sessions with the same LLM configuration
+default_llm = None
+orchestrators: Dict[tuple, AIROIOrchestrator] = {}
+
+
+def orchestrator_for(llm_config: Dict[str, Any]) -> AIROIOrchestrator:
+    """Orchestrator for a session's LLM configuration"""
+    global default_llm
     
-    async def _call_groq(self, messages: List[Dict], system_prompt: str) -> str:
-        api_key = self.config.get('api_key')
-        
-        full_messages = [
-            {"role": "system", "content": system_prompt}
-        ] + messages
-        
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                "https://api.groq.com/openai/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "llama-3.1-70b-versatile",
-                    "messages": full_messages
-                }
-            )
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
+    provider = llm_config.get("provider") or config.DEFAULT_LLM_PROVIDER
+    url = llm_config.get("url") or config.OLLAMA_URL
+    model = llm_config.get("model") or config.OLLAMA_MODEL
+    api_key = llm_config.get("api_key")
+    key = (provider, url, model, api_key)
     
-    async def _call_openrouter(self, messages: List[Dict], system_prompt: str) -> str:
-        api_key = self.config.get('api_key')
-        
-        full_messages = [
-            {"role": "system", "content": system_prompt}
-        ] + messages
-        
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "meta-llama/llama-3.1-70b-instruct",
-                    "messages": full_messages
-                }
+    if key not in orchestrators:
+        is_default = (
+            provider == config.DEFAULT_LLM_PROVIDER
+            and url == config.OLLAMA_URL
+            and model == config.OLLAMA_MODEL
+            and not api_key
+        )
+        if is_default:
+            if default_llm is None:
+                default_llm = build_default_llm()
+            llm = default_llm
+        else:
+            llm = LLMProvider(
+                provider=provider,
+                url=url,
+                model=model,
+                # Client keys are not persisted, so a session rehydrated
+                # from the database uses the server's key
+                api_key=api_key or configured_api_key(provider),
+                # A generic OpenAI-compatible server is addressed by its URL
+                base_url=url if provider == "openai" else None,
+                keep_alive=config.OLLAMA_KEEP_ALIVE,
+                max_concurrency=config.LLM_MAX_CONCURRENCY or None,
+                tracer=trace_store,
+                cassette=cassette
             )
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
+        orchestrators[key] = AIROIOrchestrator(
+            llm,
+            history_token_budget=config.HISTORY_TOKEN_BUDGET,
+            prompt_budgets=config.PROMPT_TOKEN_BUDGETS
+        )
+    
+    return orchestrators[key]
 
 
-class DiscoveryAgent:
-    """
-    Phase 1: Discovery & Audit Agent
+# Initialize FastAPI app
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup
+    await open_database()
     
-    Capabilities:
-    - Structured information gathering through conversation
-    - System and process documentation
-    - Cost baseline establishment
+    global default_llm
+    default_llm = build_default_llm()
     
-    Limitations:
-    - Cannot access systems directly (requires human input)
-    - Cannot guarantee complete discovery
-    - Requires validation of critical systems
-    """
+    background_tasks = [
+        asyncio.create_task(trace_store.run()),
+        asyncio.create_task(session_store.run()),
+        asyncio.create_task(ws_hub.run()),
+        # Also resumes jobs interrupted by the last shutdown
+        asyncio.create_task(assessment_jobs.run())
+    ]
+    if config.SESSION_BACKEND == "sqlite" and config.ARCHIVE_AFTER_DAYS > 0:
+        # Sessions in use in this process stay hot
+        background_tasks.append(asyncio.create_task(session_archive.run(
+            lambda session_id: session_id in session_store.sessions or conversation_writer.pending(session_id)
+        )))
+    if config.OLLAMA_WARMUP:
+        background_tasks.append(asyncio.create_task(warm_up_model(default_llm)))
+        background_tasks.append(asyncio.create_task(keep_model_resident(default_llm)))
+    else:
+        model_status["ready"] = True
     
-    def __init__(self, llm: LLMProvider):
-        self.llm = llm
-        self.system_prompt = """You are the Discovery Agent of AIROI, an AI ROI assessment system.
-
-Your role is to conduct a thorough audit of the client's current state through structured questioning.
-
-FOCUS AREAS:
-1. Technology Infrastructure: What systems, platforms, databases are in use?
-2. Business Processes: What are the key workflows? Where are bottlenecks?
-3. Data Landscape: What data is available? What's its quality and accessibility?
-4. Pain Points: Where is the team spending manual effort? What's frustrating?
-5. Costs: Current IT costs, operational costs, staffing costs
-6. Capabilities: Team's technical skills, existing automation, change readiness
-
-IMPORTANT PRINCIPLES:
-- Ask 3-5 targeted questions at a time, not overwhelming lists
-- Probe for specifics: "Can you give an example?" "How long does that take?"
-- Acknowledge what you've learned and build on it
-- Flag areas needing deeper investigation
-- Be conversational but systematic
-
-When you have sufficient information, output a structured JSON summary with:
-{
-  "company_name": "",
-  "industry": "",
-  "employee_count": 0,
-  "systems": [...],
-  "processes": [...],
-  "data_sources": [...],
-  "pain_points": [...],
-  "current_costs": {...},
-  "technical_capabilities": {...},
-  "compliance_requirements": [...]
-}"""
-    
-    async def start_audit(self) -> str:
-        """Begin the discovery process"""
-        messages = [{
-            "role": "user",
-            "content": "Begin the discovery audit. Introduce yourself and ask the first set of questions."
-        }]
-        return await self.llm.call(messages, self.system_prompt)
-    
-    async def continue_audit(self, conversation_history: List[Dict]) -> str:
-        """Continue the audit conversation"""
-        return await self.llm.call(conversation_history, self.system_prompt)
-    
-    async def extract_audit_data(self, conversation_history: List[Dict]) -> Optional[AuditData]:
-        """Extract structured audit data from the conversation"""
-        messages = conversation_history + [{
-            "role": "user",
-            "content": "Based on our conversation, please provide the complete structured JSON audit summary."
-        }]
-        
-        response = await self.llm.call(messages, self.system_prompt)
-        
-        try:
-            # Try to extract JSON from the response
-            json_start = response.find('{')
-            json_end = response.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                data = json.loads(response[json_start:json_end])
-                return AuditData(**data)
-        except:
-            return None
-        
-        return None
+    yield
+    
+    # Shutdown
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await assessment_jobs.close()
+    await ws_hub.close()
+    await close_database()
+
+
+app = FastAPI(
+    title="AIROI API",
+    description="AI Return on Investment Assessment System",
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+app.add_middleware(CompressionMiddleware, compressor=response_compressor)
+
+# CORS middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # Configure appropriately for production
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+@app.get("/")
+async def root():
+    """Health check endpoint"""
+    return {
+        "service": "AIROI",
+        "version": "1.0.0",
+        "status": "operational"
+    }
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness check: succeeds once the model is loaded and warm"""
+    if not model_status["ready"]:
+        return JSONResponse(status_code=503, content={"status": "warming_up", **model_status})
+    return {"status": "ready", **model_status}
+
+
+@app.get("/metrics")
+async def metrics(window_hours: float = 24.0, slowest: int = Query(10, ge=0, le=100)):
+    """LLM statistics per agent, database writes, compression and archive, sessions, WebSockets and HTTP"""
+    return {
+        "llm": await trace_store.summary(window_hours, slowest),
+        "conversation_writes": conversation_writer.metrics(),
+        "column_compression": db.codec.metrics(),
+        "sessions": session_store.metrics(),
+        "archive": session_archive.metrics(),
+        "websockets": ws_hub.metrics(),
+        "admission": admission.metrics(),
+        "http_compression": response_compressor.metrics(),
+        "process": {"rss_bytes": resident_memory()}
+    }
+
+
+def resident_memory() -> Optional[int]:
+    """Resident set size of this worker, where /proc is available"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+@app.post("/sessions", response_model=SessionResponse)
+async def create_session(session_data: SessionCreate):
+    """Create a new assessment session"""
+    
+    session_id = str(uuid.uuid4())
+    
+    session = await session_store.create(
+        session_id, session_data.company_name, session_data.llm_config.dict()
+    )
+    
+    return SessionResponse(
+        session_id=session_id,
+        company_name=session.company_name,
+        created_at=session.created_at,
+        status=session.status
+    )
 
 
-class OpportunityAnalyzer:
-    """
-    Phase 2: Opportunity Analysis Agent
-    
-    Capabilities:
-    - Pattern matching against proven AI use cases
-    - ROI calculation with confidence intervals
-    - Risk assessment based on industry patterns
-    - Priority ranking
-    
-    Limitations:
-    - Cannot predict market disruptions or external factors
-    - ROI estimates are projections, not guarantees
-    - Cannot fully assess organizational change readiness
-    - Cannot replace domain expertise in specialized fields
-    """
-    
-    def __init__(self, llm: LLMProvider):
-        self.llm = llm
-        self.system_prompt = """You are the Opportunity Analyzer of AIROI.
+async def require_session(session_id: str) -> Session:
+    session = await session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
 
-Given audit data about a business, identify AI/automation opportunities with brutal honesty about what AI can and cannot do.
 
-ANALYSIS FRAMEWORK:
+@asynccontextmanager
+async def session_turn(session_id: str):
+    """Exclusive access to a session, saved afterwards for the other workers"""
+    try:
+        async with session_store.turn(session_id) as session:
+            if session is None:
+                raise HTTPException(status_code=404, detail="Session not found")
+            yield session
+    except SessionLockTimeout as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
-For each opportunity, you MUST clearly specify:
 
-1. WHAT AI CAN DO (Concrete Capabilities):
-   - Specific tasks AI can reliably automate
-   - Pattern recognition capabilities
-   - Data processing abilities
-   - Quality thresholds it can achieve
+def client_key(connection) -> str:
+    """The client a request or WebSocket counts against for admission limits"""
+    forwarded = connection.headers.get("x-forwarded-for")
+    if config.ADMISSION_TRUST_PROXY and forwarded:
+        return forwarded.split(",")[0].strip()
+    return connection.client.host if connection.client else "unknown"
 
-2. WHAT AI CANNOT DO (Critical Limitations):
-   - Tasks requiring human judgment
-   - Edge cases needing human review
-   - Compliance/legal decisions
-   - Complex negotiations or ethical choices
-   - Areas where errors would be unacceptable
 
-3. ROI ESTIMATION:
-   - Time savings (hours/week)
-   - Cost reduction ($/month)
-   - Revenue opportunity (if applicable)
-   - Confidence level: LOW (50-70%), MEDIUM (70-85%), HIGH (85%+)
-   - Payback period
+def too_many_requests(e: Overloaded) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
-4. PHASE CLASSIFICATION:
-   - QUICK WIN (0-3 months): Simple, proven, low-risk
-   - FOUNDATION (3-12 months): Infrastructure, moderate complexity
-   - STRATEGIC (1-3+ years): Transformational, high complexity
 
-5. RISK FACTORS:
-   - Technical risks
-   - Organizational risks
-   - Compliance/regulatory risks
-   - Vendor/dependency risks
+@asynccontextmanager
+async def admitted(session_id: str, client: str):
+    """An admission slot for a chat turn, or 429 when the server is overloaded"""
+    try:
+        async with admission.admit("interactive", session_id, client):
+            yield
+    except Overloaded as e:
+        raise too_many_requests(e)
 
-6. DEPENDENCIES & PREREQUISITES:
-   - What must be in place first?
-   - What other systems/processes must work?
 
-OUTPUT FORMAT: JSON array of opportunities
+async def publish_message(session_id: str, message: Dict[str, Any], source: Optional[str] = None):
+    """
+    Deliver a message to the session's WebSocket clients on every worker
+    
+    source identifies the connection that produced the message, which has
+    already received it directly.
+    """
+    await ws_hub.publish(session_id, message, source)
+
 
-CRITICAL: Be conservative in estimates. Under-promise and over-deliver."""
+assessment_jobs = AssessmentJobs(
+    db,
+    session_store,
+    orchestrator_for,
+    publish_message,
+    lease=config.ASSESSMENT_JOB_LEASE,
+    scan_interval=config.ASSESSMENT_JOB_SCAN_INTERVAL,
+    admission=admission
+)
+
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    """Get session information"""
     
-    async def analyze(self, audit_data: AuditData) -> List[Opportunity]:
-        """Analyze audit data and identify opportunities"""
-        
-        messages = [{
-            "role": "user",
-            "content": f"""Analyze this business audit and identify AI/automation opportunities:
+    # An archived session is reported as such, not restored
+    info = await session_store.info(session_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    return {"session_id": session_id, **info}
 
-{json.dumps(asdict(audit_data), indent=2)}
 
-Provide a detailed analysis with concrete opportunities."""
-        }]
-        
-        response = await self.llm.call(messages, self.system_prompt)
-        
-        # Parse opportunities from response
-        opportunities = []
-        try:
-            json_start = response.find('[')
-            json_end = response.rfind(']') + 1
-            if json_start >= 0 and json_end > json_start:
-                data = json.loads(response[json_start:json_end])
-                for item in data:
-                    opp = Opportunity(
-                        title=item['title'],
-                        description=item['description'],
-                        phase=Phase(item['phase']),
-                        can_do=item['can_do'],
-                        cannot_do=item['cannot_do'],
-                        estimated_roi=item['estimated_roi'],
-                        confidence=ConfidenceLevel(item['confidence']),
-                        timeframe_months=item['timeframe_months'],
-                        risk_factors=item['risk_factors'],
-                        dependencies=item['dependencies'],
-                        next_steps=item['next_steps']
-                    )
-                    opportunities.append(opp)
-        except Exception as e:
-            print(f"Error parsing opportunities: {e}")
-        
-        return opportunities
+async def run_chat_turn(session_id: str, session: Session, role: str, content: str) -> Dict[str, Any]:
+    """Record a client message and answer it with the Discovery Agent"""
+    
+    # Add user message to history
+    session.conversation_history.append({
+        "role": role,
+        "content": content
+    })
+    
+    # Store in database
+    await conversation_writer.append(session_id, role, content, now_us())
+    
+    orchestrator = orchestrator_for(session.llm_config)
+    response_content = await orchestrator.discovery.continue_audit(
+        session.conversation_history, memory=session.memory
+    )
+    
+    # Add assistant response to history
+    session.conversation_history.append({
+        "role": "assistant",
+        "content": response_content,
+        "agent": "discovery"
+    })
+    
+    await conversation_writer.append(
+        session_id, "assistant", response_content, now_us(), agent="discovery"
+    )
+    
+    return {
+        "role": "assistant",
+        "content": response_content,
+        "agent": "discovery"
+    }
 
 
-class RoadmapStrategist:
+@app.post("/sessions/{session_id}/chat")
+async def chat(request: Request, session_id: str, message: ChatMessage):
     """
-    Phase 3: Roadmap Strategist Agent
-    
-    Capabilities:
-    - Create phased implementation plans
-    - Ensure forward compatibility
-    - Design progressive capability building
-    - Plan for rollback strategies
-    
-    Limitations:
-    - Cannot predict future technology disruptions
-    - Assumes reasonable organizational cooperation
-    - Requires periodic human strategic review
-    - Cannot account for unforeseen business changes
+    Send a message in the chat
+    
+    Answers 429 with Retry-After when the server has too much LLM work.
     """
     
-    def __init__(self, llm: LLMProvider):
-        self.llm = llm
-        self.system_prompt = """You are the Roadmap Strategist of AIROI.
-
-Create a phased implementation roadmap that:
-
-1. BUILDS PROGRESSIVELY:
-   - Quick wins fund foundation projects
-   - Foundation enables strategic initiatives
-   - Each phase prepares for the next
-   - No dead-end investments
-
-2. ENSURES FUTURE-PROOFING:
-   - Modular architecture
-   - API-first approach
-   - Cloud-native where appropriate
-   - Vendor flexibility
-
-3. MANAGES RISK:
-   - Rollback plans for each phase
-   - Pilot programs before full deployment
-   - Parallel running during transitions
-   - Clear success metrics
-
-4. MAINTAINS MOMENTUM:
-   - Early wins build confidence
-   - Consistent progress demonstrations
-   - Regular ROI reporting
-   - Stakeholder engagement strategy
-
-5. HUMAN OVERSIGHT POINTS:
-   - Decision gates requiring approval
-   - Quality review checkpoints
-   - Compliance validation
-   - Performance assessment
-
-OUTPUT: Detailed roadmap with timelines, dependencies, success metrics, and governance."""
-    
-    async def create_roadmap(
-        self, 
-        audit_data: AuditData, 
-        opportunities: List[Opportunity]
-    ) -> Dict[str, Any]:
-        """Create implementation roadmap"""
-        
-        opps_data = [asdict(o) for o in opportunities]
-        
-        messages = [{
-            "role": "user",
-            "content": f"""Create a detailed implementation roadmap for these opportunities:
+    async with admitted(session_id, client_key(request)), session_turn(session_id) as session:
+        try:
+            response = await run_chat_turn(session_id, session, message.role, message.content)
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"LLM call failed: {e}")
+    
+    await publish_message(session_id, response)
+    return response
 
-AUDIT DATA:
-{json.dumps(asdict(audit_data), indent=2)}
 
-OPPORTUNITIES:
-{json.dumps(opps_data, indent=2)}
+def conversation_message(row) -> Dict[str, Any]:
+    return {
+        "role": row["role"],
+        "agent": row["agent"],
+        "content": db.codec.decode(row["content"]),
+        "timestamp": to_iso(row["timestamp"])
+    }
 
-Provide a comprehensive phased roadmap."""
-        }]
-        
-        response = await self.llm.call(messages, self.system_prompt)
-        
-        return {
-            "roadmap": response,
-            "created_at": datetime.now().isoformat()
-        }
 
+async def fetch_conversation_page(session_id: str, after: Optional[tuple], limit: int) -> List[Any]:
+    """One page of messages after the (timestamp, id) position, oldest first"""
+    if conversation_writer.pending(session_id):
+        # Make this session's buffered messages readable before paging
+        await conversation_writer.flush()
+    if after is None:
+        return await db.fetchall(queries.SELECT_CONVERSATION_FIRST_PAGE, (session_id, limit))
+    return await db.fetchall(queries.SELECT_CONVERSATION_PAGE, (session_id, *after, limit))
 
-class ImplementationAssistant:
+
+def parse_cursor(cursor: Optional[str]) -> Optional[tuple]:
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/sessions/{session_id}/conversation")
+async def get_conversation(
+    session_id: str,
+    limit: int = Query(config.CONVERSATION_PAGE_SIZE, ge=1, le=config.CONVERSATION_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
     """
-    Phase 4: Implementation Assistant Agent
-    
-    Capabilities:
-    - Generate infrastructure code (Terraform, CloudFormation)
-    - Create API integration specifications
-    - Provide testing frameworks
-    - Monitor implementation progress
-    
-    Limitations:
-    - Cannot execute without human approval
-    - Cannot guarantee zero-downtime migrations
-    - Requires human oversight for production
-    - Cannot replace DevOps expertise
+    Get one page of the conversation history
+    
+    Pass next_cursor back as cursor to get the following page; it is null on
+    the last page.
     """
     
-    def __init__(self, llm: LLMProvider):
-        self.llm = llm
-        self.system_prompt = """You are the Implementation Assistant of AIROI.
-
-Help execute the roadmap by:
-
-1. GENERATING CODE:
-   - Infrastructure as Code (Terraform/CloudFormation)
-   - API integration code
-   - Data pipeline scripts
-   - Testing frameworks
-
-2. CREATING SPECIFICATIONS:
-   - API contracts
-   - Data schemas
-   - Integration patterns
-   - Security requirements
-
-3. PROVIDING GUIDANCE:
-   - Step-by-step implementation guides
-   - Best practices
-   - Common pitfalls to avoid
-   - Rollback procedures
-
-CRITICAL SAFETY PRINCIPLES:
-- All code is for review, not direct execution
-- Include extensive comments explaining decisions
-- Provide multiple implementation options when appropriate
-- Highlight security considerations
-- Emphasize testing requirements
-- Always include rollback mechanisms
-
-OUTPUT: Clear, well-documented code and specifications."""
-    
-    async def generate_implementation_guide(
-        self, 
-        opportunity: Opportunity
-    ) -> str:
-        """Generate implementation guide for an opportunity"""
-        
-        messages = [{
-            "role": "user",
-            "content": f"""Generate a detailed implementation guide for this opportunity:
+    await session_archive.ensure_hot(session_id)
+    # One extra row tells whether another page follows
+    rows = await fetch_conversation_page(session_id, parse_cursor(cursor), limit + 1)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    return {
+        "session_id": session_id,
+        "messages": [conversation_message(row) for row in rows],
+        "next_cursor": encode_cursor(rows[-1]["timestamp"], rows[-1]["id"]) if has_more else None
+    }
 
-{json.dumps(asdict(opportunity), indent=2)}
 
-Include code examples, architecture diagrams (in text/ASCII), and step-by-step instructions."""
-        }]
+@app.get("/sessions/{session_id}/conversation/stream")
+async def stream_conversation(session_id: str, cursor: Optional[str] = None):
+    """Full conversation history as NDJSON, one message per line"""
+    
+    after = parse_cursor(cursor)
+    await session_archive.ensure_hot(session_id)
+    
+    async def lines():
+        position = after
+        while True:
+            rows = await fetch_conversation_page(session_id, position, config.CONVERSATION_STREAM_CHUNK)
+            for row in rows:
+                yield json.dumps(conversation_message(row)) + "\n"
+            if len(rows) < config.CONVERSATION_STREAM_CHUNK:
+                return
+            position = (rows[-1]["timestamp"], rows[-1]["id"])
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/sessions/{session_id}/start-discovery")
+async def start_discovery(session_id: str):
+    """Start the discovery audit process"""
+    
+    # TODO: Initialize DiscoveryAgent and get first message
+    initial_message = """Hello! I'm the Discovery Agent of AIROI. I'll help you systematically assess your current systems and identify opportunities for AI-powered improvements.
+
+Let's start with understanding your business:
+
+1. What industry are you in, and what are your primary business activities?
+2. Approximately how many employees do you have?
+3. What are the main technology systems you currently use (e.g., CRM, ERP, databases)?
+
+Please share what you're comfortable with, and we'll go from there."""
+    
+    async with session_turn(session_id) as session:
+        session.conversation_history.append({
+            "role": "assistant",
+            "content": initial_message,
+            "agent": "discovery"
+        })
         
-        return await self.llm.call(messages, self.system_prompt)
+        # Store in database
+        await conversation_writer.append(
+            session_id, "assistant", initial_message, now_us(), agent="discovery"
+        )
+    
+    response = {
+        "role": "assistant",
+        "agent": "discovery",
+        "content": initial_message
+    }
+    await publish_message(session_id, response)
+    return response
 
 
-class AIROIOrchestrator:
+@app.post("/sessions/{session_id}/generate-assessment")
+async def generate_assessment(request: Request, session_id: str, wait: bool = False):
     """
-    Main orchestrator that coordinates all agents
+    Generate the full assessment from the conversation history in the background
+    
+    Returns the job (202). Progress events are pushed over /ws/{session_id}
+    and the job can be polled at /sessions/{session_id}/assessment-jobs/{job_id}.
+    Submitting again while a job runs returns that job; after a failure the
+    job resumes from its last completed stage. With wait=true the request
+    blocks until the job finishes and returns the assessment. While chat
+    turns queue up, new jobs are refused with 429 and Retry-After.
     """
     
-    def __init__(self, llm_provider: LLMProvider):
-        self.llm = llm_provider
-        self.discovery = DiscoveryAgent(llm_provider)
-        self.analyzer = OpportunityAnalyzer(llm_provider)
-        self.strategist = RoadmapStrategist(llm_provider)
-        self.implementer = ImplementationAssistant(llm_provider)
-    
-    async def run_full_assessment(
-        self, 
-        conversation_history: List[Dict]
-    ) -> Dict[str, Any]:
-        """
-        Run complete assessment workflow
-        
-        Returns comprehensive assessment package
-        """
-        
-        # Extract audit data
-        audit_data = await self.discovery.extract_audit_data(conversation_history)
-        if not audit_data:
-            return {"error": "Could not extract audit data"}
-        
-        # Analyze opportunities
-        opportunities = await self.analyzer.analyze(audit_data)
-        
-        # Create roadmap
-        roadmap = await self.strategist.create_roadmap(audit_data, opportunities)
-        
-        # Generate implementation guides for quick wins
-        quick_wins = [o for o in opportunities if o.phase == Phase.QUICK_WIN]
-        implementation_guides = {}
-        
-        for qw in quick_wins[:3]:  # Limit to top 3 quick wins
-            guide = await self.implementer.generate_implementation_guide(qw)
-            implementation_guides[qw.title] = guide
-        
-        return {
-            "audit_data": asdict(audit_data),
-            "opportunities": [asdict(o) for o in opportunities],
-            "roadmap": roadmap,
-            "implementation_guides": implementation_guides,
-            "generated_at": datetime.now().isoformat()
-        }
+    await require_session(session_id)
+    
+    try:
+        admission.check_batch_submission(client_key(request))
+        job = await assessment_jobs.submit(session_id)
+    except Overloaded as e:
+        raise too_many_requests(e)
+    except SessionLockTimeout as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if not wait:
+        return JSONResponse(status_code=202, content=job)
+    
+    job = await assessment_jobs.wait(job["job_id"])
+    if job["status"] == "failed":
+        raise HTTPException(status_code=502, detail=job["error"])
+    
+    row = await db.fetchone(queries.SELECT_ASSESSMENT, (job["assessment_id"],))
+    return assessment_response(session_id, row)
 
 
-# Example usage
-async def main():
-    """Example of using the AIROI system"""
+@app.get("/sessions/{session_id}/assessment-jobs/{job_id}")
+async def get_assessment_job(session_id: str, job_id: str):
+    """Status and completed stages of an assessment job"""
     
-    # Initialize with Ollama
-    llm = LLMProvider(
-        provider="ollama",
-        url="http://localhost:11434",
-        model="llama3.1"
-    )
+    await session_archive.ensure_hot(session_id)
+    job = await assessment_jobs.get(job_id)
+    if job is None or job["session_id"] != session_id:
+        raise HTTPException(status_code=404, detail="Assessment job not found")
+    return job
+
+
+def assessment_response(session_id: str, row) -> Dict[str, Any]:
+    return {
+        "session_id": session_id,
+        "version": row["version"],
+        "audit_data": json.loads(db.codec.decode(row["audit_data"])),
+        "opportunities": json.loads(db.codec.decode(row["opportunities"])),
+        "roadmap": json.loads(db.codec.decode(row["roadmap"])),
+        "generated_at": to_iso(row["created_at"])
+    }
+
+
+@app.get("/sessions/{session_id}/assessment")
+async def get_assessment(request: Request, session_id: str, version: Optional[int] = None):
+    """Get the generated assessment, by default its latest version"""
     
-    # Or with Groq
-    # llm = LLMProvider(provider="groq", api_key="your-groq-key")
+    await session_archive.ensure_hot(session_id)
+    if version is None:
+        row = await db.fetchone(queries.SELECT_LATEST_ASSESSMENT, (session_id,))
+    else:
+        row = await db.fetchone(queries.SELECT_ASSESSMENT_VERSION, (session_id, version))
     
-    orchestrator = AIROIOrchestrator(llm)
+    if not row:
+        raise HTTPException(status_code=404, detail="Assessment not found")
     
-    # Start discovery
-    print("Starting discovery audit...")
-    initial_message = await orchestrator.discovery.start_audit()
-    print(initial_message)
+    # Stored versions never change, so the row identifies the document and a
+    # revalidation is answered without decompressing it
+    headers = {
+        "ETag": f'"assessment-{row["id"]}-{row["created_at"]}"',
+        "Cache-Control": "private, no-cache" if version is None else "private, max-age=31536000, immutable"
+    }
+    if not_modified(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(assessment_response(session_id, row), headers=headers)
+
+
+@app.get("/sessions/{session_id}/assessments")
+async def list_assessments(session_id: str):
+    """All assessment versions of the session, oldest first"""
     
-    # In a real implementation, this would be interactive
-    # conversation_history = [...]
+    await session_archive.ensure_hot(session_id)
+    rows = await db.fetchall(queries.SELECT_ASSESSMENT_VERSIONS, (session_id,))
+    return {
+        "session_id": session_id,
+        "versions": [
+            {
+                "version": row["version"],
+                "job_id": row["job_id"],
+                "stages": sorted(json.loads(row["input_hashes"])) if row["input_hashes"] else None,
+                "generated_at": to_iso(row["created_at"])
+            }
+            for row in rows
+        ]
+    }
+
+
+@app.get("/sessions/{session_id}/assessments/compare")
+async def compare_assessments(session_id: str, base: int, target: int):
+    """Which stages and opportunities changed between two assessment versions"""
     
-    # Run full assessment
-    # assessment = await orchestrator.run_full_assessment(conversation_history)
-    # print(json.dumps(assessment, indent=2))
+    await session_archive.ensure_hot(session_id)
+    rows = {}
+    for version in (base, target):
+        rows[version] = await db.fetchone(queries.SELECT_ASSESSMENT_VERSION, (session_id, version))
+        if rows[version] is None:
+            raise HTTPException(status_code=404, detail=f"Assessment version {version} not found")
+    
+    # Versions from before stage hashing have no hashes to compare
+    hashes = {v: json.loads(rows[v]["input_hashes"] or "{}") for v in (base, target)}
+    stages = {}
+    for stage in sorted(set(hashes[base]) | set(hashes[target])):
+        if stage not in hashes[base]:
+            stages[stage] = "added"
+        elif stage not in hashes[target]:
+            stages[stage] = "removed"
+        else:
+            stages[stage] = "unchanged" if hashes[base][stage] == hashes[target][stage] else "changed"
+    
+    titles = {
+        v: {o["title"] for o in json.loads(db.codec.decode(rows[v]["opportunities"]))}
+        for v in (base, target)
+    }
+    return {
+        "session_id": session_id,
+        "base": base,
+        "target": target,
+        "stages": stages,
+        "opportunities": {
+            "added": sorted(titles[target] - titles[base]),
+            "removed": sorted(titles[base] - titles[target])
+        }
+    }
+
+
+@app.get("/search")
+async def search_sessions(
+    q: str,
+    kind: str = "all",
+    session_id: Optional[str] = None,
+    company: Optional[str] = None,
+    sort: str = "relevance",
+    limit: int = Query(config.SEARCH_PAGE_SIZE, ge=1, le=config.SEARCH_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0)
+):
+    """
+    Full-text search over conversation messages and assessments
+    
+    All words must match; "quoted phrases" match exactly and word* matches
+    prefixes. kind is all, conversations or assessments; sort is relevance
+    or recent. Snippets are HTML-escaped text with the matches in <mark> tags.
+    """
+    if session_id is not None and conversation_writer.pending(session_id):
+        await conversation_writer.flush()
+    if kind != "all" and kind not in search.KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown kind: {kind}")
+    kinds = search.KINDS if kind == "all" else (kind,)
+    try:
+        results = await db.read(search.search, q, kinds, session_id, company, sort, limit, offset)
+    except search.SearchQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"query": q, "sort": sort, "limit": limit, "offset": offset, **results}
+
+
+@app.websocket("/ws/{session_id}")
+async def websocket_endpoint(websocket: WebSocket, session_id: str):
+    """
+    WebSocket for real-time chat
+    
+    Replies produced on other workers, e.g. for a client using the REST chat
+    endpoint, and assessment progress arrive through the session's pub/sub
+    channel. Clients answer {"type": "ping"} with {"type": "pong"} or any
+    other message. A message the server has no capacity for is answered
+    with {"type": "error", "retry_after": seconds} instead of a reply. A
+    frame that is not a JSON object with a content string is answered with
+    {"type": "error", "error": ...} and the connection stays open.
+    """
+    
+    await websocket.accept()
+    
+    if await session_store.get(session_id) is None:
+        await websocket.close(code=4404, reason="Session not found")
+        return
+    
+    client = client_key(websocket)
+    connection = await ws_hub.connect(session_id, websocket)
+    try:
+        while True:
+            data = await websocket.receive_text()
+            connection.touch()
+            try:
+                message_data = json.loads(data)
+                if isinstance(message_data, dict) and message_data.get("type") == "pong":
+                    continue
+                message = ChatMessage(**{"role": "user", **message_data})
+            except (ValueError, TypeError) as e:
+                # Malformed frames are answered; the connection stays open
+                connection.send({"type": "error", "error": f"Invalid message: {e}"})
+                continue
+            
+            connection.busy = True
+            try:
+                async with admission.admit("interactive", session_id, client):
+                    async with session_store.turn(session_id) as session:
+                        if session is None:
+                            await connection.close(code=4404, reason="Session not found")
+                            return
+                        response = await run_chat_turn(
+                            session_id, session, message.role, message.content
+                        )
+            except Overloaded as e:
+                connection.send({"type": "error", "error": str(e), "retry_after": e.retry_after})
+                continue
+            except SessionLockTimeout as e:
+                connection.send({"error": str(e)})
+                continue
+            except Exception as e:
+                connection.send({"error": f"LLM call failed: {e}"})
+                continue
+            finally:
+                connection.busy = False
+                connection.touch()
+            
+            connection.send(response)
+            await publish_message(session_id, response, source=connection.id)
+            
+    except WebSocketDisconnect:
+        print(f"WebSocket disconnected for session {session_id}")
+    except RuntimeError:
+        # Receiving after the hub closed an idle or slow connection
+        pass
+    finally:
+        await ws_hub.disconnect(connection)
+
+
+# Agent-specific endpoints
+CAPABILITIES = {
+    "quick_wins": {
+        "can_do": [
+            "Pattern recognition in documents",
+            "Classify and route based on content",
+            "Extract structured data from forms",
+            "Answer questions from knowledge base"
+        ],
+        "cannot_do": [
+            "Make legal or compliance decisions",
+            "Replace human judgment in ambiguous cases",
+            "Guarantee 100% accuracy without human review",
+            "Handle complex negotiations"
+        ]
+    },
+    "foundation": {
+        "can_do": [
+            "Consolidate data from multiple sources",
+            "Create unified APIs for legacy systems",
+            "Build searchable knowledge repositories",
+            "Automate repetitive workflows"
+        ],
+        "cannot_do": [
+            "Migrate without business validation",
+            "Replace all legacy systems immediately",
+            "Eliminate need for IT governance",
+            "Automatically resolve data quality issues"
+        ]
+    },
+    "strategic": {
+        "can_do": [
+            "Identify patterns and trends in data",
+            "Provide data-driven recommendations",
+            "Optimize complex workflows",
+            "Personalize user experiences"
+        ],
+        "cannot_do": [
+            "Replace executive decision-making",
+            "Guarantee predictions in volatile markets",
+            "Eliminate need for domain expertise",
+            "Make ethical judgments"
+        ]
+    }
+}
+
+# The document is static: serialized once, revalidated by its ETag
+CAPABILITIES_BODY = json.dumps(CAPABILITIES).encode()
+CAPABILITIES_HEADERS = {"ETag": strong_etag(CAPABILITIES_BODY), "Cache-Control": "public, max-age=3600"}
+
+
+@app.get("/capabilities")
+async def get_capabilities():
+    """Get information about what AI can and cannot do"""
+    
+    return Response(CAPABILITIES_BODY, media_type="application/json", headers=CAPABILITIES_HEADERS)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    import uvicorn
+    # Several workers need SESSION_SHARED or SESSION_BACKEND=redis
+    uvicorn.run(
+        "airoi_server:app",
+        host=config.HOST,
+        port=config.PORT,
+        workers=config.SERVER_WORKERS
+    )
@@ -0,0 +1,282 @@
+"""
+Analytics API as an ASGI service
+
+Serves the endpoints of api_server.py with the same requests and responses.
+Uploads are parsed from the request stream and spooled to a temporary file
+instead of being held in memory, and CSV parsing and analyses run in a
+process pool, so /health and /api/describe (computed at upload time) answer
+right away while large analyses run.
+
+Pool workers import the analysis libraries when they first need them. With
+ANALYTICS_PREWARM they are started at startup and import them ahead of the
+first request instead.
+
+Uploaded datasets are published once to shared memory (shared_datasets.py)
+and pool tasks receive their data_id rather than a pickled DataFrame, so
+several server workers (ANALYTICS_WORKERS) can serve the same datasets.
+
+    python analytics_asgi.py
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+from starlette.datastructures import UploadFile
+
+import analytics_core
+import config
+from http_compression import CompressionMiddleware, Compressor
+from shared_datasets import DatasetNotFound, SharedDatasets
+
+
+COPY_CHUNK_BYTES = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Upload above ANALYTICS_MAX_UPLOAD_MB"""
+
+
+class AnalysisPool:
+    """Process pool for the CPU-bound work, replaced if a worker dies"""
+
+    def __init__(self, workers: Optional[int] = None, prewarm: str = ""):
+        self.workers = workers or os.cpu_count() or 1
+        # Analysis types whose modules each worker imports when it starts
+        self.prewarm = prewarm.strip()
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.restarts = 0
+
+    def start(self):
+        # Workers are spawned: forking a process with threads running can
+        # deadlock in the child
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=analytics_core.prewarm if self.prewarm else None,
+            initargs=(self.prewarm_types(),) if self.prewarm else ()
+        )
+
+    def prewarm_types(self) -> Optional[List[str]]:
+        if self.prewarm == "all":
+            return None
+        return [t.strip() for t in self.prewarm.split(",") if t.strip()]
+
+    async def warm_up(self):
+        """Start every worker now rather than on the first requests"""
+        # Workers are started on demand, one per task without an idle worker
+        await asyncio.gather(*(self.run(os.getpid) for _ in range(self.workers)))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def run(self, function: Callable, *args) -> Any:
+        if self.executor is None:
+            self.start()
+        executor = self.executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+        except BrokenProcessPool:
+            # A worker was killed, e.g. out of memory: later requests get a new pool
+            if self.executor is executor:
+                self.close()
+                self.restarts += 1
+            raise
+
+
+pool = AnalysisPool(config.ANALYTICS_POOL_WORKERS, config.ANALYTICS_PREWARM)
+
+datasets = SharedDatasets(config.ANALYTICS_DATASET_DIR, ttl=config.ANALYTICS_DATASET_TTL)
+
+
+async def sweep_datasets():
+    while True:
+        await asyncio.sleep(config.ANALYTICS_DATASET_SWEEP_INTERVAL)
+        try:
+            await asyncio.to_thread(datasets.sweep)
+        except Exception as e:
+            print(f"Dataset sweep failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    pool.start()
+    if pool.prewarm:
+        # /health answers once the workers are ready
+        await pool.warm_up()
+    sweeper = asyncio.create_task(sweep_datasets())
+    yield
+    sweeper.cancel()
+    pool.close()
+
+
+app = FastAPI(title="Analytics API", lifespan=lifespan)
+app.add_middleware(CompressionMiddleware, compressor=Compressor())
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+
+def respond(content: Dict[str, Any], status_code: int = 200) -> Response:
+    """JSON as Flask's jsonify writes it, NaN statistics included"""
+    return Response(json.dumps(content), status_code=status_code, media_type="application/json")
+
+
+def upload_limit() -> Optional[int]:
+    return config.ANALYTICS_MAX_UPLOAD_MB * 1024 * 1024 or None
+
+
+def save_upload(upload: UploadFile, limit: Optional[int]) -> str:
+    """Copy the spooled upload to a file the pool workers can open"""
+    with tempfile.NamedTemporaryFile(
+        "wb", suffix=".csv", dir=config.ANALYTICS_UPLOAD_DIR, delete=False
+    ) as target:
+        try:
+            size = 0
+            upload.file.seek(0)
+            while True:
+                chunk = upload.file.read(COPY_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if limit and size > limit:
+                    raise UploadTooLarge()
+                target.write(chunk)
+        except BaseException:
+            os.remove(target.name)
+            raise
+    return target.name
+
+
+async def store_upload(request: Request, missing_error: str) -> Response:
+    """Parse an uploaded CSV in the pool and keep it under a new id"""
+    limit = upload_limit()
+    declared = request.headers.get("content-length")
+    if limit and declared and declared.isdigit() and int(declared) > limit:
+        return respond({'success': False, 'error': 'File too large'}, 413)
+
+    form = await request.form()
+    try:
+        upload = form.get('file')
+        if not isinstance(upload, UploadFile):
+            return respond({'success': False, 'error': missing_error}, 400)
+        path = await asyncio.to_thread(save_upload, upload, limit)
+    except UploadTooLarge:
+        return respond({'success': False, 'error': 'File too large'}, 413)
+    finally:
+        await form.close()
+
+    try:
+        # The worker publishes the frame; only the id and description come back
+        data_id, description = await pool.run(datasets.publish_from, analytics_core.load_csv, path)
+    finally:
+        os.remove(path)
+
+    return respond({
+        'success': True,
+        'data': {
+            'id': data_id,
+            'rows': description['description']['rows'],
+            'columns': description['description']['columns']
+        }
+    })
+
+
+@app.post('/api/upload')
+async def upload_data(request: Request):
+    """Upload and store CSV data"""
+    try:
+        return await store_upload(request, 'No file uploaded')
+    except Exception as e:
+        return respond({'success': False, 'error': str(e)}, 500)
+
+
+@app.post('/api/describe')
+async def describe_data(request: Request):
+    """Describe uploaded data"""
+    try:
+        data_id = (await request.json()).get('data_id')
+        description = await asyncio.to_thread(datasets.info, data_id)
+
+        return respond({'success': True, **description})
+    except DatasetNotFound:
+        return respond({'success': False, 'error': 'Data not found'}, 404)
+    except Exception as e:
+        return respond({'success': False, 'error': str(e)}, 500)
+
+
+@app.post('/api/analyze')
+async def analyze_data(request: Request):
+    """Run specific analysis"""
+    try:
+        body = await request.json()
+        data_id = body.get('data_id')
+        analysis_type = body.get('analysis_type')
+
+        if not await asyncio.to_thread(datasets.exists, data_id):
+            return respond({'success': False, 'error': 'Data not found'}, 404)
+
+        if analysis_type not in analytics_core.ANALYSES:
+            return respond({'success': False, 'error': 'Unknown analysis type'}, 400)
+        results = await pool.run(datasets.call, data_id, analytics_core.run_analysis, analysis_type)
+
+        return respond({'success': True, 'results': results})
+    except DatasetNotFound:
+        return respond({'success': False, 'error': 'Data not found'}, 404)
+    except Exception as e:
+        print(f"Error in analyze_data: {str(e)}")
+        traceback.print_exc()
+        return respond({'success': False, 'error': str(e)}, 500)
+
+
+@app.post('/api/sixbox/upload')
+async def sixbox_upload(request: Request):
+    """Upload data for 6 boxes analysis"""
+    try:
+        return await store_upload(request, 'No file')
+    except Exception as e:
+        return respond({'success': False, 'error': str(e)}, 500)
+
+
+@app.post('/api/sixbox/analyze')
+async def sixbox_analyze(request: Request):
+    """Run 6 boxes analysis"""
+    try:
+        body = await request.json()
+        data_id = body.get('data_id')
+        box_type = body.get('box_type')
+
+        if not await asyncio.to_thread(datasets.exists, data_id):
+            return respond({'success': False, 'error': 'Data not found'}, 404)
+
+        if box_type not in analytics_core.SIXBOXES:
+            return respond({'success': False, 'error': 'Unknown box type'}, 400)
+        results = await pool.run(datasets.call, data_id, analytics_core.run_sixbox, box_type)
+
+        return respond({'success': True, 'results': results})
+    except DatasetNotFound:
+        return respond({'success': False, 'error': 'Data not found'}, 404)
+    except Exception as e:
+        return respond({'success': False, 'error': str(e)}, 500)
+
+
+@app.get('/health')
+async def health_check():
+    return {'status': 'healthy'}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(
+        "analytics_asgi:app", host=config.HOST, port=config.ANALYTICS_PORT, workers=config.ANALYTICS_WORKERS
+    )
@@ -0,0 +1,568 @@
+"""
+Hot/cold tiering of sessions
+
+Sessions idle for longer than the retention period are moved out of the
+database into archive segments: immutable, compressed, columnar files in
+one directory per month of the sessions' last activity (2026-05/...).
+A segment holds the conversation messages, assessments and assessment
+jobs of a batch of sessions, sorted by session and split into row groups,
+so restoring one session decompresses only the groups holding its rows.
+
+The session row stays in the database as a stub, with status "archived"
+and the segment it was moved to. Its other rows leave the database, and
+with them their full-text index entries: archived sessions are not found
+by search until they are restored.
+
+Reading an archived session restores it: SessionArchive.ensure_hot() runs
+before any read of a session's rows (SQLiteSessionBackend.load and the
+conversation and assessment endpoints). Restored rows keep their ids, so
+pagination cursors, ETags and job references stay valid.
+
+Archiving is optimistic: a batch is read and its segment written without
+holding the database writer, then every session is checked for changes
+before its rows are deleted; a session that changed meanwhile stays hot.
+Segments no stub points to any more (every session in them was restored)
+are removed by prune().
+
+    python archive.py run [--days 90] [--vacuum]
+    python archive.py restore SESSION_ID
+    python archive.py stats
+"""
+
+import argparse
+import asyncio
+import json
+import lzma
+import os
+import sqlite3
+import struct
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from column_codec import ColumnCodec
+from database import Database
+import queries
+from queries import now_us
+import search
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+MAGIC = b"AIROIARC"
+FORMAT_VERSION = 1
+# Offset of the footer and the magic again, at the end of the file
+TRAILER = struct.Struct("!Q8s")
+SUFFIX = ".arc"
+
+ROW_GROUP_ROWS = 1024
+
+# Cold data is written once and rarely read: compress hard
+LEVELS = {"zstd": 19, "lzma": 6, "zlib": 9}
+
+# Rows that move with their session. Every table is stored with a
+# session_id column; values of the compressed columns are stored decoded,
+# so a segment does not depend on the codec or its dictionaries
+ARCHIVED_TABLES: Dict[str, Dict[str, Any]] = {
+    "conversations": {
+        "columns": ("id", "session_id", "role", "agent", "content", "timestamp"),
+        "compressed": ("content",),
+        "select": "SELECT {columns} FROM conversations WHERE session_id = ? ORDER BY timestamp, id",
+    },
+    "assessments": {
+        "columns": (
+            "id", "session_id", "version", "job_id", "input_hashes",
+            "audit_data", "opportunities", "roadmap", "created_at"
+        ),
+        "compressed": ("audit_data", "opportunities", "roadmap"),
+        "select": "SELECT {columns} FROM assessments WHERE session_id = ? ORDER BY version",
+    },
+    "assessment_jobs": {
+        "columns": (
+            "id", "session_id", "status", "stage", "stages", "error", "owner",
+            "lease_expires_at", "assessment_id", "created_at", "updated_at"
+        ),
+        "compressed": (),
+        "select": "SELECT {columns} FROM assessment_jobs WHERE session_id = ? ORDER BY created_at",
+    },
+    # Stages have no session_id of their own; it is taken from their job
+    "assessment_stages": {
+        "columns": ("session_id", "job_id", "stage", "input_hash", "result", "completed_at"),
+        "compressed": (),
+        "select": (
+            "SELECT j.session_id, s.job_id, s.stage, s.input_hash, s.result, s.completed_at "
+            "FROM assessment_stages AS s JOIN assessment_jobs AS j ON j.id = s.job_id "
+            "WHERE j.session_id = ? ORDER BY s.job_id, s.completed_at"
+        ),
+    },
+}
+
+
+def available_algorithms() -> List[str]:
+    return (["zstd"] if zstandard is not None else []) + ["lzma", "zlib"]
+
+
+def _compress(data: bytes, algorithm: str) -> bytes:
+    if algorithm == "zstd":
+        return zstandard.ZstdCompressor(level=LEVELS["zstd"]).compress(data)
+    if algorithm == "lzma":
+        return lzma.compress(data, preset=LEVELS["lzma"])
+    return zlib.compress(data, LEVELS["zlib"])
+
+
+def _decompress(data: bytes, algorithm: str) -> bytes:
+    if algorithm == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Archive segment is zstd-compressed; install the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if algorithm == "lzma":
+        return lzma.decompress(data)
+    return zlib.decompress(data)
+
+
+def month_of(timestamp_us: int) -> str:
+    """Partition of a session: the month of its last activity, in UTC"""
+    return datetime.fromtimestamp(timestamp_us / 1_000_000, timezone.utc).strftime("%Y-%m")
+
+
+# Segments
+
+def write_segment(
+    path: str,
+    tables: Dict[str, List[Sequence]],
+    algorithm: str = "auto"
+) -> int:
+    """
+    Write rows, given per table in ARCHIVED_TABLES column order, to a new
+    segment; returns its size in bytes
+
+    Rows of one session must be adjacent within each table. The file is
+    written under a temporary name and synced before it takes its name.
+    """
+    if algorithm == "auto":
+        algorithm = available_algorithms()[0]
+    footer: Dict[str, Any] = {
+        "format": FORMAT_VERSION,
+        "algorithm": algorithm,
+        "created_at": now_us(),
+        "tables": {},
+        "sessions": {}
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC + bytes([FORMAT_VERSION]))
+        for table, rows in tables.items():
+            columns = ARCHIVED_TABLES[table]["columns"]
+            session_column = columns.index("session_id")
+            groups = []
+            for start in range(0, len(rows), ROW_GROUP_ROWS):
+                group = rows[start:start + ROW_GROUP_ROWS]
+                blocks = []
+                for i in range(len(columns)):
+                    data = _compress(
+                        json.dumps([row[i] for row in group], ensure_ascii=False).encode(), algorithm
+                    )
+                    blocks.append([f.tell(), len(data)])
+                    f.write(data)
+                groups.append({"rows": len(group), "blocks": blocks})
+            footer["tables"][table] = {"columns": list(columns), "rows": len(rows), "groups": groups}
+
+            for position, row in enumerate(rows):
+                ranges = footer["sessions"].setdefault(row[session_column], {})
+                first, count = ranges.get(table, (position, 0))
+                ranges[table] = (first, count + 1)
+
+        offset = f.tell()
+        f.write(zlib.compress(json.dumps(footer).encode(), 9))
+        f.write(TRAILER.pack(offset, MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+        size = f.tell()
+    os.replace(temporary, path)
+    _sync_directory(os.path.dirname(path))
+    return size
+
+
+def _sync_directory(path: str):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+# Footers of recently read segments; segments never change once written
+_footers: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_MAX_FOOTERS = 64
+
+
+def read_footer(path: str) -> Dict[str, Any]:
+    footer = _footers.get(path)
+    if footer is not None:
+        return footer
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not an archive segment: {path}")
+        f.seek(-TRAILER.size, os.SEEK_END)
+        trailer_at = f.tell()
+        offset, magic = TRAILER.unpack(f.read(TRAILER.size))
+        if magic != MAGIC:
+            raise ValueError(f"Truncated archive segment: {path}")
+        f.seek(offset)
+        footer = json.loads(zlib.decompress(f.read(trailer_at - offset)))
+    _footers[path] = footer
+    while len(_footers) > _MAX_FOOTERS:
+        _footers.popitem(last=False)
+    return footer
+
+
+def read_session(path: str, session_id: str) -> Dict[str, List[List[Any]]]:
+    """Rows of one session per table, decompressing only the row groups holding them"""
+    footer = read_footer(path)
+    ranges = footer["sessions"].get(session_id, {})
+    result: Dict[str, List[List[Any]]] = {}
+    with open(path, "rb") as f:
+        for table, (first, count) in ranges.items():
+            rows: List[List[Any]] = []
+            group_start = 0
+            for group in footer["tables"][table]["groups"]:
+                group_end = group_start + group["rows"]
+                if group_end > first and group_start < first + count:
+                    values = []
+                    for offset, length in group["blocks"]:
+                        f.seek(offset)
+                        values.append(json.loads(_decompress(f.read(length), footer["algorithm"])))
+                    lo = max(first, group_start) - group_start
+                    hi = min(first + count, group_end) - group_start
+                    rows.extend([list(row) for row in zip(*values)][lo:hi])
+                group_start = group_end
+            result[table] = rows
+    return result
+
+
+# Moving sessions between the database and the archive
+
+def idle_sessions(conn: sqlite3.Connection, cutoff_us: int, limit: int) -> List[Tuple[str, int]]:
+    """(session_id, last activity) of hot sessions idle since before cutoff_us, oldest first"""
+    rows = conn.execute(queries.SELECT_IDLE_SESSIONS, (cutoff_us, now_us(), cutoff_us, limit))
+    return [tuple(row) for row in rows]
+
+
+def _watermark(conn: sqlite3.Connection, session_id: str) -> Optional[Tuple]:
+    """Changes whenever anything the archive holds for the session does"""
+    row = conn.execute(queries.SELECT_SESSION_WATERMARK, (session_id,) * 4).fetchone()
+    return tuple(row) if row is not None else None
+
+
+def collect(
+    conn: sqlite3.Connection, codec: ColumnCodec, session_ids: Iterable[str]
+) -> Tuple[Dict[str, List[List[Any]]], Dict[str, Tuple]]:
+    """Rows of the sessions per table, decoded, and each session's watermark"""
+    tables: Dict[str, List[List[Any]]] = {table: [] for table in ARCHIVED_TABLES}
+    watermarks = {}
+    for session_id in session_ids:
+        watermark = _watermark(conn, session_id)
+        if watermark is None:
+            continue
+        watermarks[session_id] = watermark
+        for table, spec in ARCHIVED_TABLES.items():
+            columns = spec["columns"]
+            compressed = [columns.index(c) for c in spec["compressed"]]
+            sql = spec["select"].format(columns=", ".join(columns))
+            for row in conn.execute(sql, (session_id,)):
+                row = list(row)
+                for i in compressed:
+                    row[i] = codec.decode(row[i])
+                tables[table].append(row)
+    return tables, watermarks
+
+
+def commit_archive(
+    conn: sqlite3.Connection, segment: str, watermarks: Dict[str, Tuple]
+) -> List[str]:
+    """
+    Replace the sessions' rows by stubs pointing at segment, in the
+    caller's transaction; returns the sessions archived. Sessions changed
+    since their watermark was taken are left as they are.
+    """
+    archived = []
+    for session_id, watermark in watermarks.items():
+        if _watermark(conn, session_id) != watermark:
+            continue
+        # External content indexes are told the exact text they indexed
+        conn.execute(queries.DELETE_SESSION_CONVERSATIONS_FTS, (session_id,))
+        conn.execute(queries.DELETE_SESSION_ASSESSMENTS_FTS, (session_id,))
+        for sql in queries.DELETE_ARCHIVED_ROWS:
+            conn.execute(sql, (session_id,))
+        conn.execute(queries.ARCHIVE_SESSION, (segment, now_us(), session_id))
+        archived.append(session_id)
+    return archived
+
+
+def restore_rows(
+    conn: sqlite3.Connection,
+    codec: ColumnCodec,
+    session_id: str,
+    segment: str,
+    tables: Dict[str, List[List[Any]]]
+) -> bool:
+    """
+    Put an archived session's rows back, in the caller's transaction
+
+    Returns False when the session no longer points at segment, because
+    another request or worker restored it first.
+    """
+    if conn.execute(queries.RESTORE_SESSION, (now_us(), session_id, segment)).rowcount == 0:
+        return False
+    for table, rows in tables.items():
+        spec = ARCHIVED_TABLES[table]
+        columns = list(spec["columns"])
+        compressed = [columns.index(c) for c in spec["compressed"]]
+        texts = [list(row) for row in rows]
+        for row in rows:
+            for i in compressed:
+                row[i] = codec.encode(row[i])
+        if table == "assessment_stages":
+            # session_id was only stored to locate the rows
+            columns = columns[1:]
+            rows = [row[1:] for row in rows]
+        conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            rows
+        )
+        if table == "conversations":
+            content = spec["columns"].index("content")
+            search.index_conversations(conn, [(row[0], row[1], row[content]) for row in texts])
+        elif table == "assessments":
+            for row in rows:
+                search.index_assessment(conn, row[0])
+    return True
+
+
+def segment_files(directory: str) -> List[str]:
+    """Segments under directory, as paths relative to it"""
+    found = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(SUFFIX):
+                found.append(os.path.relpath(os.path.join(root, name), directory))
+    return sorted(found)
+
+
+def prune(conn: sqlite3.Connection, directory: str, grace_seconds: float = 86400) -> int:
+    """
+    Remove segments no session points at; returns how many
+
+    Segments younger than the grace period are kept: they may belong to an
+    archive run that has not committed yet.
+    """
+    referenced = {row[0] for row in conn.execute(queries.SELECT_ARCHIVE_SEGMENTS)}
+    removed = 0
+    cutoff = time.time() - grace_seconds
+    for segment in segment_files(directory):
+        path = os.path.join(directory, segment)
+        if segment in referenced or os.path.getmtime(path) > cutoff:
+            continue
+        os.remove(path)
+        _footers.pop(path, None)
+        removed += 1
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass
+    return removed
+
+
+class SessionArchive:
+    """Moves idle sessions to archive segments and restores them on access"""
+
+    def __init__(
+        self,
+        db: Database,
+        directory: str,
+        after_days: float = 90,
+        batch_size: int = 100,
+        interval: float = 3600,
+        algorithm: str = "auto",
+        prune_grace: float = 86400
+    ):
+        self.db = db
+        self.directory = directory
+        self.after_days = after_days
+        self.batch_size = batch_size
+        self.interval = interval
+        self.algorithm = algorithm if algorithm != "auto" else available_algorithms()[0]
+        self.prune_grace = prune_grace
+        self.sessions_archived = 0
+        self.sessions_restored = 0
+        self.segments_written = 0
+        self.segments_pruned = 0
+        self.bytes_written = 0
+        self.restore_ms_total = 0.0
+        self.last_run: Optional[int] = None
+
+    async def archive_idle(self, busy: Callable[[str], bool] = lambda session_id: False) -> int:
+        """Archive every session idle for longer than after_days; returns how many"""
+        cutoff = now_us() - int(self.after_days * 86400 * 1_000_000)
+        total = 0
+        while True:
+            candidates = await self.db.read(idle_sessions, cutoff, self.batch_size)
+            archived = await self.archive([(s, last) for s, last in candidates if not busy(s)])
+            total += archived
+            # Stop once a batch makes no progress, e.g. every candidate is busy
+            if len(candidates) < self.batch_size or archived == 0:
+                break
+        self.last_run = now_us()
+        return total
+
+    async def archive(self, sessions: List[Tuple[str, int]]) -> int:
+        """Archive (session_id, last activity) pairs, one segment per month"""
+        months: Dict[str, List[str]] = {}
+        for session_id, last_active in sessions:
+            months.setdefault(month_of(last_active), []).append(session_id)
+
+        archived = 0
+        for month, session_ids in sorted(months.items()):
+            tables, watermarks = await self.db.read(collect, self.db.codec, session_ids)
+            if not watermarks:
+                continue
+            segment = f"{month}/{now_us()}-{uuid.uuid4().hex[:8]}{SUFFIX}"
+            path = os.path.join(self.directory, segment)
+            size = await asyncio.to_thread(write_segment, path, tables, self.algorithm)
+            moved = await self.db.write(commit_archive, segment, watermarks)
+            if not moved:
+                os.remove(path)
+                continue
+            self.segments_written += 1
+            self.bytes_written += size
+            archived += len(moved)
+        self.sessions_archived += archived
+        if archived:
+            await self.merge_index()
+        return archived
+
+    async def merge_index(self, max_steps: int = 1000):
+        """Free the index pages of the archived rows, a step per transaction"""
+        for _ in range(max_steps):
+            if not await self.db.write(search.merge_index):
+                break
+
+    async def ensure_hot(self, session_id: str) -> bool:
+        """Restore the session if it is archived; returns whether it was"""
+        row = await self.db.fetchone(queries.SELECT_SESSION_ARCHIVE, (session_id,))
+        if row is None or row[0] is None:
+            return False
+        return await self.restore(session_id, row[0])
+
+    async def restore(self, session_id: str, segment: str) -> bool:
+        started = time.perf_counter()
+        tables = await asyncio.to_thread(read_session, os.path.join(self.directory, segment), session_id)
+        restored = await self.db.write(restore_rows, self.db.codec, session_id, segment, tables)
+        if restored:
+            self.sessions_restored += 1
+            self.restore_ms_total += (time.perf_counter() - started) * 1000
+        return restored
+
+    async def prune(self) -> int:
+        removed = await self.db.read(prune, self.directory, self.prune_grace)
+        self.segments_pruned += removed
+        return removed
+
+    async def run(self, busy: Callable[[str], bool] = lambda session_id: False):
+        """Background task archiving idle sessions every interval until cancelled"""
+        while True:
+            try:
+                archived = await self.archive_idle(busy)
+                if archived:
+                    print(f"Archived {archived} idle sessions")
+                await self.prune()
+            except Exception as e:
+                print(f"Failed to archive sessions: {e}")
+            await asyncio.sleep(self.interval)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "after_days": self.after_days,
+            "algorithm": self.algorithm,
+            "sessions_archived": self.sessions_archived,
+            "sessions_restored": self.sessions_restored,
+            "avg_restore_ms": (
+                round(self.restore_ms_total / self.sessions_restored, 1) if self.sessions_restored else None
+            ),
+            "segments_written": self.segments_written,
+            "segments_pruned": self.segments_pruned,
+            "bytes_written": self.bytes_written,
+            "last_run": queries.to_iso(self.last_run)
+        }
+
+
+def archive_stats(conn: sqlite3.Connection, directory: str) -> Dict[str, Any]:
+    """Sessions per tier and segment sizes per month"""
+    tiers = dict(conn.execute(queries.SELECT_SESSION_TIERS).fetchall())
+    months: Dict[str, Dict[str, int]] = {}
+    for segment in segment_files(directory):
+        entry = months.setdefault(segment.split("/")[0], {"segments": 0, "bytes": 0})
+        entry["segments"] += 1
+        entry["bytes"] += os.path.getsize(os.path.join(directory, segment))
+    return {"sessions": tiers, "months": months}
+
+
+def main():
+    import config
+    from migrations import migrate
+
+    parser = argparse.ArgumentParser(description="Session archive maintenance")
+    parser.add_argument("command", choices=["run", "restore", "stats"])
+    parser.add_argument("session_id", nargs="?")
+    parser.add_argument("--database", default=config.DATABASE_PATH)
+    parser.add_argument("--directory", default=config.ARCHIVE_DIR)
+    parser.add_argument("--days", type=float, default=config.ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--vacuum", action="store_true", help="Give the freed pages back to the filesystem")
+    args = parser.parse_args()
+
+    async def run():
+        db = Database(args.database, pool_size=1, codec=ColumnCodec(config.COLUMN_COMPRESSION))
+        db.open()
+        await db.write(migrate)
+        await db.read(db.codec.load)
+        archive = SessionArchive(db, args.directory, args.days, algorithm=config.ARCHIVE_COMPRESSION)
+        try:
+            if args.command == "run":
+                print(f"Archived {await archive.archive_idle()} sessions idle for {args.days:g} days, "
+                      f"{archive.bytes_written / 1024:.1f} KB in {archive.segments_written} segments")
+                print(f"Removed {await archive.prune()} segments no session points at")
+            elif args.command == "restore":
+                if not args.session_id:
+                    parser.error("restore needs a session id")
+                restored = await archive.ensure_hot(args.session_id)
+                print(f"Restored {args.session_id}" if restored else f"{args.session_id} is not archived")
+        finally:
+            db.close()
+
+    asyncio.run(run())
+
+    conn = sqlite3.connect(args.database)
+    if args.command == "run" and args.vacuum:
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    stats = archive_stats(conn, args.directory)
+    conn.close()
+    print(f"Database: {os.path.getsize(args.database) / 1024:.1f} KB, sessions {stats['sessions']}")
+    for month, entry in sorted(stats["months"].items()):
+        print(f"{month}  {entry['segments']:>5} segments {entry['bytes'] / 1024:>10.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
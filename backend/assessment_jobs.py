@@ -0,0 +1,328 @@
+"""
+Background assessment generation
+
+A full assessment takes a dozen LLM calls, far longer than a proxy keeps an
+HTTP request open. POST /generate-assessment submits a job instead and the
+stages run in a background task. Every completed stage (audit extraction,
+opportunities, roadmap, each implementation guide) is checkpointed to the
+assessment_stages table with a hash of its inputs. A stage is only computed
+when no job of the session has a result for the same inputs, so a job that
+failed, or whose worker went away, continues after its last completed stage,
+and a regeneration after a few more chat messages only recomputes the
+stages whose inputs changed.
+
+Each completed job stores a new numbered version of the session's
+assessment, unless nothing changed since the latest version.
+
+Jobs are leased: the worker running a job renews its lease while it runs,
+and any worker picks up unfinished jobs whose lease expired. Progress is
+published on the session's channel and reaches its WebSocket clients on
+every worker.
+"""
+
+import asyncio
+import json
+import os
+import uuid
+from dataclasses import replace
+from typing import Any, Callable, Dict, List, Optional
+
+from admission import AdmissionController
+from database import Database
+import queries
+from queries import now_us, to_iso, to_us
+from search import index_assessment
+from session_store import SessionStore
+
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+class AssessmentFailed(Exception):
+    """The pipeline ran but could not produce an assessment"""
+
+
+class LeaseLost(Exception):
+    """Another worker took the job over"""
+
+
+class JobCheckpoint:
+    """Stage checkpoints of one job, as used by AIROIOrchestrator.run_full_assessment"""
+
+    def __init__(self, jobs: "AssessmentJobs", job_id: str, session_id: str):
+        self.jobs = jobs
+        self.job_id = job_id
+        self.session_id = session_id
+        self.stages: List[str] = []
+        self.completed: List[str] = []
+        self.input_hashes: Dict[str, str] = {}
+        self.reused: List[str] = []
+
+    async def load(self, stage: str, input_hash: str) -> Optional[Any]:
+        self.input_hashes[stage] = input_hash
+        row = await self.jobs.db.fetchone(
+            queries.SELECT_REUSABLE_STAGE, (input_hash, self.session_id)
+        )
+        if row is None:
+            return None
+        if row["job_id"] != self.job_id:
+            # Record the reused result as a stage of this job as well
+            await self.jobs.db.execute(
+                queries.INSERT_ASSESSMENT_STAGE,
+                (self.job_id, stage, input_hash, row["result"], now_us())
+            )
+            self.reused.append(stage)
+        self.completed.append(stage)
+        await self.jobs._progress(self, stage, "reused")
+        return json.loads(row["result"])
+
+    async def plan(self, stages: List[str]):
+        self.stages = stages
+
+    async def started(self, stage: str):
+        await self.jobs._progress(self, stage, "started")
+
+    async def save(self, stage: str, input_hash: str, result: Any):
+        await self.jobs.db.execute(
+            queries.INSERT_ASSESSMENT_STAGE,
+            (self.job_id, stage, input_hash, json.dumps(result), now_us())
+        )
+        self.completed.append(stage)
+        await self.jobs._progress(self, stage, "completed")
+
+
+class AssessmentJobs:
+    """Submits, runs and resumes assessment jobs"""
+
+    def __init__(
+        self,
+        db: Database,
+        sessions: SessionStore,
+        orchestrator_for: Callable,
+        publish: Callable,
+        lease: float = 120.0,
+        scan_interval: float = 30.0,
+        admission: Optional[AdmissionController] = None
+    ):
+        self.db = db
+        self.sessions = sessions
+        self.orchestrator_for = orchestrator_for
+        self.publish = publish
+        self.lease = lease
+        self.scan_interval = scan_interval
+        # Without admission control, jobs start right away
+        self.admission = admission or AdmissionController(
+            max_in_flight=0, batch_max_in_flight=0, session_limit=0, client_limit=0
+        )
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def submit(self, session_id: str) -> Dict[str, Any]:
+        """
+        Start an assessment of the session
+
+        A job that is still running is returned as is, and a failed job is
+        resumed; only after a completed job does a new one start.
+        """
+        # Concurrent submissions for one session must agree on the job
+        async with self.sessions.backend.lock(session_id):
+            job = await self._latest(session_id)
+            if job is None or job["status"] == "completed":
+                job_id = uuid.uuid4().hex
+                now = now_us()
+                await self.db.execute(queries.INSERT_ASSESSMENT_JOB, (job_id, session_id, now, now))
+            else:
+                job_id = job["job_id"]
+            await self._claim(job_id, session_id)
+        return await self.get(job_id)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = await self.db.fetchone(queries.SELECT_ASSESSMENT_JOB, (job_id,))
+        if row is None:
+            return None
+        stages = await self.db.fetchall(queries.SELECT_ASSESSMENT_STAGES, (job_id,))
+        return self._job(row, [stage["stage"] for stage in stages])
+
+    async def wait(self, job_id: str, poll_interval: float = 0.5) -> Dict[str, Any]:
+        """Wait until the job completed or failed, wherever it runs"""
+        while True:
+            task = self._tasks.get(job_id)
+            if task is not None:
+                await asyncio.gather(asyncio.shield(task), return_exceptions=True)
+            job = await self.get(job_id)
+            if job is None or job["status"] in TERMINAL_STATUSES:
+                return job
+            if task is None:
+                await asyncio.sleep(poll_interval)
+
+    async def _latest(self, session_id: str) -> Optional[Dict[str, Any]]:
+        row = await self.db.fetchone(queries.SELECT_LATEST_ASSESSMENT_JOB, (session_id,))
+        return self._job(row) if row else None
+
+    @staticmethod
+    def _job(row, completed_stages: Optional[List[str]] = None) -> Dict[str, Any]:
+        job = {
+            "job_id": row["id"],
+            "session_id": row["session_id"],
+            "status": row["status"],
+            "stage": row["stage"],
+            "stages": json.loads(row["stages"]) if row["stages"] else None,
+            "error": row["error"],
+            "assessment_id": row["assessment_id"],
+            "created_at": to_iso(row["created_at"]),
+            "updated_at": to_iso(row["updated_at"])
+        }
+        if completed_stages is not None:
+            job["completed_stages"] = completed_stages
+        return job
+
+    async def _claim(self, job_id: str, session_id: str) -> bool:
+        """Take the job over and run it here, unless another worker holds it"""
+        if job_id in self._tasks:
+            return True
+        now = now_us()
+        claimed = await self.db.write(
+            lambda conn: conn.execute(
+                queries.CLAIM_ASSESSMENT_JOB,
+                (self.owner, now + int(self.lease * 1_000_000), now, job_id, now)
+            ).rowcount
+        )
+        if not claimed:
+            return False
+        task = asyncio.create_task(self._execute(job_id, session_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        return True
+
+    async def _execute(self, job_id: str, session_id: str):
+        heartbeat = asyncio.create_task(self._renew(job_id))
+        checkpoint = JobCheckpoint(self, job_id, session_id)
+        try:
+            session = await self.sessions.get(session_id)
+            if session is None:
+                raise AssessmentFailed("Session not found")
+            # Work on a snapshot so chat turns can go on during the assessment
+            history = list(session.conversation_history)
+            memory = replace(session.memory)
+            orchestrator = self.orchestrator_for(session.llm_config)
+
+            # Batch work waits while chat turns use the LLM; the lease is kept
+            # meanwhile. A session has one job at a time, so no session limit
+            async with self.admission.admit("batch"):
+                result = await orchestrator.run_full_assessment(history, memory, checkpoint=checkpoint)
+            if "error" in result:
+                raise AssessmentFailed(result["error"])
+
+            assessment_id = await self.db.write(
+                self._store, job_id, session_id, result, checkpoint.input_hashes
+            )
+            await self._publish(
+                session_id, job_id, "completed",
+                assessment_id=assessment_id,
+                reused_stages=checkpoint.reused
+            )
+        except asyncio.CancelledError:
+            # Shutting down: leave the job to be resumed by the next worker
+            await self.db.execute(queries.RELEASE_ASSESSMENT_JOB, (job_id, self.owner))
+            raise
+        except LeaseLost:
+            print(f"Assessment job {job_id} was taken over by another worker")
+        except Exception as e:
+            error = str(e) if isinstance(e, AssessmentFailed) else f"LLM call failed: {e}"
+            await self.db.execute(
+                queries.FINISH_ASSESSMENT_JOB, ("failed", error, None, now_us(), job_id, self.owner)
+            )
+            await self._publish(session_id, job_id, "failed", error=error)
+        finally:
+            heartbeat.cancel()
+
+    def _store(
+        self, conn, job_id: str, session_id: str, result: Dict[str, Any], input_hashes: Dict[str, str]
+    ) -> int:
+        """Write the assessment and complete the job in one transaction"""
+        latest = conn.execute(queries.SELECT_LATEST_ASSESSMENT, (session_id,)).fetchone()
+        if latest is not None and latest["input_hashes"] == json.dumps(input_hashes, sort_keys=True):
+            # Every stage had the same inputs as the latest version
+            assessment_id = latest["id"]
+        else:
+            roadmap = {**result["roadmap"], "implementation_guides": result["implementation_guides"]}
+            encode = self.db.codec.encode
+            assessment_id = conn.execute(
+                queries.INSERT_ASSESSMENT,
+                (
+                    session_id,
+                    encode(json.dumps(result["audit_data"])),
+                    encode(json.dumps(result["opportunities"])),
+                    encode(json.dumps(roadmap)),
+                    to_us(result["generated_at"]),
+                    job_id,
+                    json.dumps(input_hashes, sort_keys=True),
+                    session_id
+                )
+            ).lastrowid
+            index_assessment(conn, assessment_id)
+        finished = conn.execute(
+            queries.FINISH_ASSESSMENT_JOB,
+            ("completed", None, assessment_id, now_us(), job_id, self.owner)
+        ).rowcount
+        if not finished:
+            raise LeaseLost(job_id)
+        return assessment_id
+
+    async def _renew(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            renewed = await self.db.write(
+                lambda conn: conn.execute(
+                    queries.RENEW_ASSESSMENT_JOB,
+                    (now_us() + int(self.lease * 1_000_000), job_id, self.owner)
+                ).rowcount
+            )
+            if not renewed:
+                task = self._tasks.get(job_id)
+                if task is not None:
+                    task.cancel()
+                return
+
+    async def _progress(self, checkpoint: JobCheckpoint, stage: str, stage_status: str):
+        await self.db.execute(
+            queries.UPDATE_ASSESSMENT_JOB_PROGRESS,
+            (stage, json.dumps(checkpoint.stages) if checkpoint.stages else None,
+             now_us(), checkpoint.job_id, self.owner)
+        )
+        await self._publish(
+            checkpoint.session_id, checkpoint.job_id, "running",
+            stage=stage,
+            stage_status=stage_status,
+            completed_stages=len(checkpoint.completed),
+            # Known once the opportunities are in
+            total_stages=len(checkpoint.stages) or None
+        )
+
+    async def _publish(self, session_id: str, job_id: str, status: str, **details):
+        try:
+            await self.publish(session_id, {
+                "type": "assessment_progress",
+                "job_id": job_id,
+                "status": status,
+                **details
+            })
+        except Exception as e:
+            # Progress events are best effort; the job state is in the database
+            print(f"Failed to publish assessment progress: {e}")
+
+    async def run(self):
+        """Background task resuming jobs left behind by stopped workers"""
+        while True:
+            try:
+                for row in await self.db.fetchall(queries.SELECT_ORPHANED_ASSESSMENT_JOBS, (now_us(),)):
+                    await self._claim(row["id"], row["session_id"])
+            except Exception as e:
+                print(f"Failed to resume assessment jobs: {e}")
+            await asyncio.sleep(self.scan_interval)
+
+    async def close(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
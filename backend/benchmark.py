@@ -0,0 +1,376 @@
+"""
+Deterministic assessment benchmark
+
+Replays a recorded cassette through AIROIOrchestrator and through the
+session endpoints, and reports for every stage how much time was spent
+outside the LLM (prompt building, parsing, database writes, orchestration).
+Results are appended to a history file keyed by git commit so regressions
+show up across commits. The endpoints scenario also reports how large the
+stored conversation and assessment columns are and what each compression
+codec would cost on them.
+
+    # Record once against a real model
+    python benchmark.py record --cassette benchmarks/assessment.jsonl
+
+    # Replay instantly and compare with the previous run
+    python benchmark.py run --cassette benchmarks/assessment.jsonl --iterations 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from load_test import CLIENT_MESSAGES
+
+
+class SpanCollector:
+    """Tracer that keeps the wall-clock interval of every LLM call"""
+
+    def __init__(self):
+        self.intervals: List[Tuple[float, float]] = []
+
+    def record(self, span):
+        end = time.monotonic()
+        duration = ((span.queue_wait_ms or 0) + (span.latency_ms or 0)) / 1000
+        self.intervals.append((end - duration, end))
+
+    def llm_seconds(self, start: float, end: float) -> float:
+        """Time inside [start, end] during which at least one LLM call was running"""
+        clipped = sorted(
+            (max(s, start), min(e, end)) for s, e in self.intervals if s < end and e > start
+        )
+        total = 0.0
+        current_start, current_end = None, None
+        for s, e in clipped:
+            if current_end is None or s > current_end:
+                if current_end is not None:
+                    total += current_end - current_start
+                current_start, current_end = s, e
+            else:
+                current_end = max(current_end, e)
+        if current_end is not None:
+            total += current_end - current_start
+        return total
+
+
+class StageTimer:
+    """Wall and LLM time per named stage"""
+
+    def __init__(self, collector: SpanCollector):
+        self.collector = collector
+        self.stages: Dict[str, Dict[str, float]] = {}
+
+    async def run(self, stage: str, coro):
+        start = time.monotonic()
+        try:
+            return await coro
+        finally:
+            end = time.monotonic()
+            llm = self.collector.llm_seconds(start, end)
+            totals = self.stages.setdefault(stage, {"calls": 0, "wall_ms": 0.0, "llm_ms": 0.0})
+            totals["calls"] += 1
+            totals["wall_ms"] += (end - start) * 1000
+            totals["llm_ms"] += llm * 1000
+
+
+async def orchestrator_scenario(llm, timer: StageTimer, turns: int):
+    """Discovery conversation followed by the full assessment, stage by stage"""
+    from airoi_backend import AIROIOrchestrator, Phase
+    from history_manager import ConversationMemory
+
+    import config
+
+    orchestrator = AIROIOrchestrator(
+        llm,
+        history_token_budget=config.HISTORY_TOKEN_BUDGET,
+        prompt_budgets=config.PROMPT_TOKEN_BUDGETS
+    )
+    history: List[Dict[str, Any]] = []
+    memory = ConversationMemory()
+
+    for turn in range(turns):
+        history.append({"role": "user", "content": CLIENT_MESSAGES[turn % len(CLIENT_MESSAGES)]})
+        reply = await timer.run("continue_audit", orchestrator.discovery.continue_audit(history, memory=memory))
+        history.append({"role": "assistant", "content": reply})
+
+    # The same steps as run_full_assessment, timed one by one
+    audit_data = await timer.run(
+        "extract_audit_data", orchestrator.discovery.extract_audit_data(history, memory)
+    )
+    if audit_data is None:
+        raise RuntimeError("Audit data extraction failed")
+    opportunities = await timer.run("analyze", orchestrator.analyzer.analyze(audit_data))
+    await timer.run("create_roadmap", orchestrator.strategist.create_roadmap(audit_data, opportunities))
+    for opportunity in [o for o in opportunities if o.phase == Phase.QUICK_WIN][:3]:
+        await timer.run(
+            "implementation_guide",
+            orchestrator.implementer.generate_implementation_guide(opportunity)
+        )
+
+    await timer.run("run_full_assessment", orchestrator.run_full_assessment(history, memory))
+
+
+async def endpoints_scenario(server, timer: StageTimer, turns: int):
+    """The same conversation driven through the session endpoints in-process"""
+    import httpx
+
+    import config
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        async def request(stage: str, method: str, url: str, **kwargs) -> httpx.Response:
+            response = await timer.run(stage, client.request(method, url, **kwargs))
+            response.raise_for_status()
+            return response
+
+        response = await request("POST /sessions", "POST", "/sessions", json={
+            "company_name": "Benchmark",
+            "llm_config": {
+                "provider": config.DEFAULT_LLM_PROVIDER,
+                "url": config.OLLAMA_URL,
+                "model": config.OLLAMA_MODEL
+            }
+        })
+        session_id = response.json()["session_id"]
+
+        await request("POST /start-discovery", "POST", f"/sessions/{session_id}/start-discovery")
+        for turn in range(turns):
+            await request("POST /chat", "POST", f"/sessions/{session_id}/chat", json={
+                "role": "user",
+                "content": CLIENT_MESSAGES[turn % len(CLIENT_MESSAGES)]
+            })
+        await request("GET /conversation", "GET", f"/sessions/{session_id}/conversation")
+        await request("POST /generate-assessment", "POST", f"/sessions/{session_id}/generate-assessment?wait=true")
+        await request("GET /assessment", "GET", f"/sessions/{session_id}/assessment")
+
+
+async def load_server(collector: SpanCollector):
+    """Import the FastAPI app with its LLM calls traced by the collector"""
+    import airoi_server
+
+    await airoi_server.open_database()
+    airoi_server.trace_store = collector
+    return airoi_server
+
+
+async def storage_report(server) -> Dict[str, Any]:
+    """Size at rest of the rows the endpoints scenario wrote, and codec costs on them"""
+    from column_codec import column_stats, compare, read_samples
+
+    db = server.db
+    samples = await db.read(read_samples, db.codec, 1000)
+    return {
+        "codec": db.codec.metrics(),
+        "columns": await db.read(column_stats),
+        # Dictionaries are trained on half the rows and measured on the rest
+        "codecs": compare(samples[1::2], trained_on=samples[::2]) if len(samples) > 1 else []
+    }
+
+
+def build_llm(cassette, collector: SpanCollector):
+    from airoi_backend import LLMProvider
+
+    import config
+
+    api_keys = {
+        "groq": config.GROQ_API_KEY,
+        "openrouter": config.OPENROUTER_API_KEY
+    }
+    return LLMProvider(
+        provider=config.DEFAULT_LLM_PROVIDER,
+        url=config.OLLAMA_URL,
+        model=config.OLLAMA_MODEL,
+        api_key=api_keys.get(config.DEFAULT_LLM_PROVIDER),
+        keep_alive=config.OLLAMA_KEEP_ALIVE,
+        tracer=collector,
+        cassette=cassette
+    )
+
+
+async def run_scenarios(args, scenarios: List[str], iterations: int):
+    from cassette import Cassette
+
+    import config
+
+    collector = SpanCollector()
+    if args.command == "record":
+        if os.path.exists(args.cassette):
+            os.remove(args.cassette)
+        cassette = Cassette(args.cassette, Cassette.RECORD)
+    else:
+        cassette = Cassette(args.cassette, Cassette.REPLAY, timing=args.timing)
+
+    # The server sets up its cassette from config when it is imported
+    config.LLM_CASSETTE = args.cassette
+    config.LLM_CASSETTE_MODE = cassette.mode
+    config.LLM_CASSETTE_TIMING = args.timing
+
+    results: Dict[str, List[Dict[str, Dict[str, float]]]] = {name: [] for name in scenarios}
+    server = await load_server(collector) if "endpoints" in scenarios else None
+    if server is not None:
+        # Share one cassette so recorded requests are not appended twice
+        server.cassette = cassette
+
+    llm = build_llm(cassette, collector)
+    for _ in range(iterations):
+        for name in scenarios:
+            cassette.rewind()
+            timer = StageTimer(collector)
+            if name == "orchestrator":
+                await orchestrator_scenario(llm, timer, args.turns)
+            else:
+                await endpoints_scenario(server, timer, args.turns)
+            results[name].append(timer.stages)
+
+    storage = None
+    if server is not None:
+        storage = await storage_report(server)
+        await server.close_database()
+
+    return results, len(cassette), storage
+
+
+def summarize(runs: List[Dict[str, Dict[str, float]]]) -> Dict[str, Dict[str, float]]:
+    """Median per stage over the iterations"""
+    summary = {}
+    for stage in runs[0]:
+        samples = [run[stage] for run in runs if stage in run]
+        wall = statistics.median(s["wall_ms"] for s in samples)
+        llm = statistics.median(s["llm_ms"] for s in samples)
+        summary[stage] = {
+            "calls": samples[0]["calls"],
+            "wall_ms": round(wall, 2),
+            "llm_ms": round(llm, 2),
+            "overhead_ms": round(max(0.0, wall - llm), 2)
+        }
+    return summary
+
+
+def git_revision() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+def previous_entry(history_path: str, cassette: str, scenario: str):
+    if not os.path.exists(history_path):
+        return None
+    last = None
+    with open(history_path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                if entry["cassette"] == cassette and entry["scenario"] == scenario:
+                    last = entry
+    return last
+
+
+def print_summary(scenario: str, summary: Dict[str, Dict[str, float]], previous):
+    reference = f" vs {previous['commit']}" if previous else ""
+    print(f"\n{scenario}{reference}")
+    header = f"{'stage':<28} {'calls':>6} {'wall ms':>10} {'llm ms':>10} {'overhead ms':>12} {'change':>9}"
+    print(header)
+    print("-" * len(header))
+    for stage, row in summary.items():
+        change = ""
+        if previous and stage in previous["stages"]:
+            before = previous["stages"][stage]["overhead_ms"]
+            if before > 0:
+                change = f"{(row['overhead_ms'] - before) / before * 100:+.1f}%"
+        print(
+            f"{stage:<28} {row['calls']:>6} {row['wall_ms']:>10.2f} {row['llm_ms']:>10.2f} "
+            f"{row['overhead_ms']:>12.2f} {change:>9}"
+        )
+
+
+def print_storage(storage: Dict[str, Any]):
+    print("\nstorage")
+    for column in storage["columns"]:
+        print(f"{column['column']:<28} {column['rows']:>6} rows {column['compressed']:>6} compressed "
+              f"{column['bytes']:>10} bytes")
+    header = f"{'codec':<28} {'ratio':>8} {'encode us':>10} {'decode us':>10}"
+    print(header)
+    print("-" * len(header))
+    for row in storage["codecs"]:
+        print(f"{row['codec']:<28} {row['ratio']:>8.2f} {row['encode_us_per_value']:>10.1f} "
+              f"{row['decode_us_per_value']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic AIROI assessment benchmark")
+    parser.add_argument("command", choices=["record", "run"])
+    parser.add_argument("--cassette", default="benchmarks/assessment.jsonl")
+    parser.add_argument("--scenario", choices=["orchestrator", "endpoints", "all"], default="all")
+    parser.add_argument("--turns", type=int, default=4, help="Discovery chat turns before the assessment")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--timing", type=float, default=0.0,
+                        help="Replay speed: 0 answers instantly, 1 reproduces the recorded timing")
+    parser.add_argument("--history", default="benchmarks/history.jsonl",
+                        help="Results of previous runs, one JSON object per line")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    args.cassette = os.path.abspath(args.cassette)
+    args.history = os.path.abspath(args.history)
+    scenarios = ["orchestrator", "endpoints"] if args.scenario == "all" else [args.scenario]
+    iterations = 1 if args.command == "record" else args.iterations
+
+    # The server writes its database to the working directory
+    workdir = tempfile.mkdtemp(prefix="airoi-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        results, interactions, storage = asyncio.run(run_scenarios(args, scenarios, iterations))
+    finally:
+        os.chdir(cwd)
+
+    if args.command == "record":
+        print(f"Recorded {interactions} LLM interactions to {args.cassette}")
+        return
+
+    revision = git_revision()
+    entries = []
+    for scenario, runs in results.items():
+        summary = summarize(runs)
+        previous = previous_entry(args.history, args.cassette, scenario)
+        entries.append({
+            **revision,
+            "timestamp": datetime.now().isoformat(),
+            "cassette": args.cassette,
+            "scenario": scenario,
+            "iterations": iterations,
+            "timing": args.timing,
+            "stages": summary
+        })
+        if scenario == "endpoints" and storage is not None:
+            entries[-1]["storage"] = storage
+        if not args.json:
+            print_summary(scenario, summary, previous)
+    if storage is not None and not args.json:
+        print_storage(storage)
+
+    os.makedirs(os.path.dirname(args.history), exist_ok=True)
+    with open(args.history, "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+
+    if args.json:
+        print(json.dumps(entries, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Record/replay cassettes for LLM calls
+
+In record mode every request sent by an LLMProvider is saved with its
+response and timing to a JSON Lines cassette. In replay mode the same
+requests are answered from the cassette, either instantly or with the
+recorded timing, so assessments can be re-run deterministically without a
+model and our own overhead measured on its own.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+
+class CassetteMiss(LookupError):
+    """A replayed request was never recorded"""
+
+
+def request_key(payload: Dict[str, Any]) -> str:
+    """Stable identity of a request payload (credentials live in headers)"""
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class Cassette:
+    """
+    A recorded set of LLM interactions
+
+    Identical requests are matched in the order they were recorded; once
+    the recorded occurrences are used up the last one is served again.
+    timing scales the recorded delays on replay: 0 answers instantly, 1
+    reproduces the recorded time to first token and generation speed.
+    """
+
+    RECORD = "record"
+    REPLAY = "replay"
+
+    def __init__(self, path: str, mode: str = REPLAY, timing: float = 0.0):
+        if mode not in (self.RECORD, self.REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.timing = timing
+        self.interactions: Dict[str, List[Dict[str, Any]]] = {}
+        self.cursor: Dict[str, int] = {}
+
+        if mode == self.REPLAY:
+            self._load()
+        elif os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == self.REPLAY
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    interaction = json.loads(line)
+                    self.interactions.setdefault(interaction["key"], []).append(interaction)
+
+    def __len__(self) -> int:
+        return sum(len(items) for items in self.interactions.values())
+
+    def rewind(self):
+        """Serve recorded interactions from the start again"""
+        self.cursor.clear()
+
+    def _append(self, interaction: Dict[str, Any]):
+        self.interactions.setdefault(interaction["key"], []).append(interaction)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(interaction, ensure_ascii=False) + "\n")
+
+    def _next(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        key = request_key(payload)
+        recorded = self.interactions.get(key)
+        if not recorded:
+            model = payload.get("model")
+            raise CassetteMiss(f"No recorded response for request {key[:12]} (model {model}) in {self.path}")
+        index = self.cursor.get(key, 0)
+        self.cursor[key] = index + 1
+        return recorded[min(index, len(recorded) - 1)]
+
+    async def _wait(self, seconds: float):
+        if self.timing > 0 and seconds > 0:
+            await asyncio.sleep(seconds * self.timing)
+
+    def record_response(self, payload: Dict[str, Any], response: Dict[str, Any], elapsed: float):
+        self._append({
+            "key": request_key(payload),
+            "stream": False,
+            "request": payload,
+            "response": response,
+            "elapsed": round(elapsed, 4)
+        })
+
+    def record_stream(self, payload: Dict[str, Any], lines: List[str], offsets: List[float]):
+        self._append({
+            "key": request_key(payload),
+            "stream": True,
+            "request": payload,
+            "lines": lines,
+            "offsets": [round(o, 4) for o in offsets]
+        })
+
+    async def replay_response(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        interaction = self._next(payload)
+        if interaction["stream"]:
+            raise CassetteMiss("Request was recorded as a stream but replayed as a single call")
+        await self._wait(interaction["elapsed"])
+        return interaction["response"]
+
+    async def replay_lines(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        interaction = self._next(payload)
+        if not interaction["stream"]:
+            raise CassetteMiss("Request was recorded as a single call but replayed as a stream")
+        previous = 0.0
+        for line, offset in zip(interaction["lines"], interaction["offsets"]):
+            await self._wait(offset - previous)
+            previous = offset
+            yield line
+
+
+class StreamRecorder:
+    """Collects the lines of a streamed response with their arrival times"""
+
+    def __init__(self, cassette: Optional[Cassette], payload: Dict[str, Any]):
+        self.cassette = cassette
+        self.payload = payload
+        self.started = time.monotonic()
+        self.lines: List[str] = []
+        self.offsets: List[float] = []
+
+    def add(self, line: str):
+        if self.cassette is not None:
+            self.lines.append(line)
+            self.offsets.append(time.monotonic() - self.started)
+
+    def save(self):
+        if self.cassette is not None:
+            self.cassette.record_stream(self.payload, self.lines, self.offsets)
@@ -0,0 +1,363 @@
+"""
+Transparent compression of large text columns
+
+Conversation messages and assessment JSON (audit data, opportunities,
+roadmap with implementation guides) are verbose LLM output that compresses
+well. Values are compressed when written and decompressed only for the rows
+a query actually returns:
+
+- Values shorter than min_bytes, or that do not get smaller, stay plain
+  TEXT, as do all rows written before compression was enabled, so readers
+  tell the formats apart by the SQLite type alone.
+- Compressed values are BLOBs with a 5 byte header: the codec (1 = zlib,
+  2 = zstd) and the id of the dictionary in compression_dictionaries used
+  to compress them (0 = none).
+
+zstd needs the optional zstandard package; without it the codec falls back
+to zlib. A dictionary trained on the database's own rows lets even short
+chat messages compress, since they share most of their vocabulary and JSON
+structure:
+
+    python column_codec.py train --database airoi.db
+    python column_codec.py recompress --database airoi.db
+    python column_codec.py stats --database airoi.db
+
+Workers pick up a new dictionary for writes when they restart, and load it
+for reads as soon as they meet a row compressed with it.
+"""
+
+import argparse
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import queries
+from queries import now_us
+
+
+CODEC_IDS = {"zlib": 1, "zstd": 2}
+CODEC_NAMES = {v: k for k, v in CODEC_IDS.items()}
+HEADER = struct.Struct("!BI")
+
+DEFAULT_LEVELS = {"zlib": 6, "zstd": 3}
+# zlib only looks back 32 KB, so a larger dictionary is wasted
+MAX_DICTIONARY_BYTES = {"zlib": 32 * 1024, "zstd": 112 * 1024}
+
+# (table, column) pairs stored through the codec
+COMPRESSED_COLUMNS = [
+    ("conversations", "content"),
+    ("assessments", "audit_data"),
+    ("assessments", "opportunities"),
+    ("assessments", "roadmap"),
+]
+
+
+def available_algorithms() -> List[str]:
+    return ["zlib", "zstd"] if zstandard is not None else ["zlib"]
+
+
+class ColumnCodec:
+    """Compresses column values on write and decompresses them on read"""
+
+    def __init__(self, algorithm: str = "auto", level: Optional[int] = None, min_bytes: int = 256):
+        if algorithm == "auto":
+            algorithm = "zstd" if zstandard is not None else "zlib"
+        if algorithm not in ("off", *CODEC_IDS):
+            raise ValueError(f"Unknown compression algorithm: {algorithm}")
+        if algorithm == "zstd" and zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        self.algorithm = algorithm
+        self.level = level if level is not None else DEFAULT_LEVELS.get(algorithm)
+        self.min_bytes = min_bytes
+        # Dictionary used for writes; 0 until one is trained and loaded
+        self.dictionary_id = 0
+        self.dictionaries: Dict[int, Tuple[str, bytes]] = {}
+        self.fetch_dictionary: Optional[Callable[[int], Optional[Tuple[str, bytes]]]] = None
+        # zstd (de)compressors are not thread-safe; keep one per thread
+        self._local = threading.local()
+        self.values_encoded = 0
+        self.values_compressed = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.encode_seconds = 0.0
+        self.values_decoded = 0
+        self.decode_seconds = 0.0
+
+    def load(self, conn: sqlite3.Connection):
+        """Use the newest dictionary trained for this codec's algorithm"""
+        row = conn.execute(queries.SELECT_LATEST_COMPRESSION_DICTIONARY, (self.algorithm,)).fetchone()
+        if row is not None:
+            self.dictionaries[row[0]] = (self.algorithm, bytes(row[1]))
+            self.dictionary_id = row[0]
+
+    # Writing
+
+    def encode(self, text: Optional[str]) -> Union[str, bytes, None]:
+        """The value to store for text"""
+        if text is None or self.algorithm == "off":
+            return text
+        data = text.encode("utf-8")
+        if len(data) < self.min_bytes:
+            return text
+        started = time.perf_counter()
+        compressed = self._compress(data)
+        self.encode_seconds += time.perf_counter() - started
+        self.values_encoded += 1
+        self.raw_bytes += len(data)
+        if len(compressed) + HEADER.size >= len(data):
+            self.stored_bytes += len(data)
+            return text
+        self.values_compressed += 1
+        self.stored_bytes += len(compressed) + HEADER.size
+        return HEADER.pack(CODEC_IDS[self.algorithm], self.dictionary_id) + compressed
+
+    def _compress(self, data: bytes) -> bytes:
+        dictionary = self.dictionaries[self.dictionary_id][1] if self.dictionary_id else None
+        if self.algorithm == "zlib":
+            if dictionary is None:
+                return zlib.compress(data, self.level)
+            compressor = zlib.compressobj(self.level, zdict=dictionary)
+            return compressor.compress(data) + compressor.flush()
+        compressors = self._thread_cache("compressors")
+        compressor = compressors.get(self.dictionary_id)
+        if compressor is None:
+            dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            compressor = zstandard.ZstdCompressor(level=self.level, dict_data=dict_data)
+            compressors[self.dictionary_id] = compressor
+        return compressor.compress(data)
+
+    # Reading
+
+    def decode(self, value: Union[str, bytes, None]) -> Optional[str]:
+        """The text of a stored value, compressed or not"""
+        if not isinstance(value, bytes):
+            return value
+        started = time.perf_counter()
+        codec, dictionary_id = HEADER.unpack_from(value)
+        payload = memoryview(value)[HEADER.size:]
+        dictionary = self._dictionary(dictionary_id) if dictionary_id else None
+        if codec == CODEC_IDS["zlib"]:
+            if dictionary is None:
+                data = zlib.decompress(payload)
+            else:
+                decompressor = zlib.decompressobj(zdict=dictionary)
+                data = decompressor.decompress(payload) + decompressor.flush()
+        elif codec == CODEC_IDS["zstd"]:
+            if zstandard is None:
+                raise RuntimeError("Reading zstd compressed rows needs the zstandard package")
+            decompressors = self._thread_cache("decompressors")
+            decompressor = decompressors.get(dictionary_id)
+            if decompressor is None:
+                dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+                decompressor = zstandard.ZstdDecompressor(dict_data=dict_data)
+                decompressors[dictionary_id] = decompressor
+            data = decompressor.decompress(payload)
+        else:
+            raise ValueError(f"Unknown compression codec {codec}")
+        self.values_decoded += 1
+        self.decode_seconds += time.perf_counter() - started
+        return data.decode("utf-8")
+
+    def _dictionary(self, dictionary_id: int) -> bytes:
+        entry = self.dictionaries.get(dictionary_id)
+        if entry is None and self.fetch_dictionary is not None:
+            # Trained by another process after this one started
+            entry = self.fetch_dictionary(dictionary_id)
+            if entry is not None:
+                self.dictionaries[dictionary_id] = entry
+        if entry is None:
+            raise ValueError(f"Compression dictionary {dictionary_id} not found")
+        return entry[1]
+
+    def _thread_cache(self, name: str) -> Dict[int, Any]:
+        cache = getattr(self._local, name, None)
+        if cache is None:
+            cache = {}
+            setattr(self._local, name, cache)
+        return cache
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "algorithm": self.algorithm,
+            "dictionary_id": self.dictionary_id or None,
+            "values_encoded": self.values_encoded,
+            "values_compressed": self.values_compressed,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "ratio": round(self.raw_bytes / self.stored_bytes, 2) if self.stored_bytes else None,
+            "encode_us_per_value": (
+                round(self.encode_seconds / self.values_encoded * 1e6, 1) if self.values_encoded else None
+            ),
+            "values_decoded": self.values_decoded,
+            "decode_us_per_value": (
+                round(self.decode_seconds / self.values_decoded * 1e6, 1) if self.values_decoded else None
+            )
+        }
+
+
+def train_dictionary(algorithm: str, samples: List[str], size: int = 64 * 1024) -> bytes:
+    """Build a compression dictionary from sample column values"""
+    size = min(size, MAX_DICTIONARY_BYTES[algorithm])
+    encoded = [s.encode("utf-8") for s in samples if s]
+    if not encoded:
+        raise ValueError("No samples to train a dictionary on")
+    if algorithm == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        try:
+            return zstandard.train_dictionary(size, encoded).as_bytes()
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Not enough samples to train a dictionary: {e}")
+    # zlib has no trainer: use the samples themselves as the preset
+    # dictionary, the most recent ones last where matches are cheapest
+    return b"".join(reversed(encoded))[-size:]
+
+
+def read_samples(conn: sqlite3.Connection, codec: ColumnCodec, limit: int) -> List[str]:
+    """The most recent values of every compressed column"""
+    samples = []
+    for table, column in COMPRESSED_COLUMNS:
+        rows = conn.execute(
+            f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL ORDER BY id DESC LIMIT ?",
+            (limit,)
+        )
+        samples.extend(codec.decode(row[0]) for row in rows)
+    return samples
+
+
+def train(conn: sqlite3.Connection, algorithm: str, samples: int = 2000, size: int = 64 * 1024) -> int:
+    """Train a dictionary on the database's rows and store it; returns its id"""
+    reader = ColumnCodec("off")
+    reader.fetch_dictionary = dictionary_fetcher(conn)
+    values = read_samples(conn, reader, samples)
+    dictionary = train_dictionary(algorithm, values, size)
+    dictionary_id = conn.execute(
+        queries.INSERT_COMPRESSION_DICTIONARY, (algorithm, dictionary, len(values), now_us())
+    ).lastrowid
+    conn.commit()
+    return dictionary_id
+
+
+def dictionary_fetcher(conn: sqlite3.Connection) -> Callable[[int], Optional[Tuple[str, bytes]]]:
+    def fetch(dictionary_id: int) -> Optional[Tuple[str, bytes]]:
+        row = conn.execute(queries.SELECT_COMPRESSION_DICTIONARY, (dictionary_id,)).fetchone()
+        return (row[0], bytes(row[1])) if row else None
+    return fetch
+
+
+def recompress(conn: sqlite3.Connection, codec: ColumnCodec, batch_size: int = 500) -> int:
+    """Rewrite every compressed column with the codec; returns the rows changed"""
+    changed = 0
+    for table, column in COMPRESSED_COLUMNS:
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                f"SELECT id, {column} FROM {table} WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            updates = []
+            for row_id, value in rows:
+                stored = codec.encode(codec.decode(value))
+                if stored != value:
+                    updates.append((stored, row_id))
+            conn.executemany(f"UPDATE {table} SET {column} = ? WHERE id = ?", updates)
+            conn.commit()
+            changed += len(updates)
+            last_id = rows[-1][0]
+    return changed
+
+
+def column_stats(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+    """Stored size of every compressed column, plain and compressed rows"""
+    stats = []
+    for table, column in COMPRESSED_COLUMNS:
+        row = conn.execute(
+            f"SELECT COUNT(*), SUM(typeof({column}) = 'blob'), "
+            f"COALESCE(SUM(length(CAST({column} AS BLOB))), 0) FROM {table}"
+        ).fetchone()
+        stats.append({"column": f"{table}.{column}", "rows": row[0], "compressed": row[1] or 0, "bytes": row[2]})
+    return stats
+
+
+def compare(samples: List[str], trained_on: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Size and speed of every available codec on the samples
+
+    Dictionaries are trained on trained_on, the samples themselves by
+    default; pass a separate set to avoid flattering the dictionary.
+    """
+    raw = sum(len(s.encode("utf-8")) for s in samples)
+    results = []
+    for algorithm in ["off", *available_algorithms()]:
+        variants = [False] if algorithm == "off" else [False, True]
+        for with_dictionary in variants:
+            codec = ColumnCodec(algorithm, min_bytes=0)
+            if with_dictionary:
+                try:
+                    codec.dictionaries[1] = (algorithm, train_dictionary(algorithm, trained_on or samples))
+                except ValueError:
+                    continue
+                codec.dictionary_id = 1
+
+            started = time.perf_counter()
+            stored = [codec.encode(s) for s in samples]
+            encode_seconds = time.perf_counter() - started
+            started = time.perf_counter()
+            for value in stored:
+                codec.decode(value)
+            decode_seconds = time.perf_counter() - started
+
+            size = sum(len(v) if isinstance(v, bytes) else len(v.encode("utf-8")) for v in stored)
+            results.append({
+                "codec": algorithm + ("+dictionary" if with_dictionary else ""),
+                "raw_bytes": raw,
+                "stored_bytes": size,
+                "ratio": round(raw / size, 2) if size else None,
+                "encode_us_per_value": round(encode_seconds / len(samples) * 1e6, 1) if samples else None,
+                "decode_us_per_value": round(decode_seconds / len(samples) * 1e6, 1) if samples else None
+            })
+    return results
+
+
+def main():
+    import config
+
+    parser = argparse.ArgumentParser(description="Column compression maintenance")
+    parser.add_argument("command", choices=["train", "recompress", "stats"])
+    parser.add_argument("--database", default=config.DATABASE_PATH)
+    parser.add_argument("--algorithm", default=config.COLUMN_COMPRESSION)
+    parser.add_argument("--samples", type=int, default=2000, help="Most recent rows per column to train on")
+    parser.add_argument("--dictionary-kb", type=int, default=64)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.database)
+    codec = ColumnCodec(args.algorithm, config.COLUMN_COMPRESSION_LEVEL, config.COLUMN_COMPRESSION_MIN_BYTES)
+    codec.fetch_dictionary = dictionary_fetcher(conn)
+
+    if args.command == "train":
+        dictionary_id = train(conn, codec.algorithm, args.samples, args.dictionary_kb * 1024)
+        print(f"Trained {codec.algorithm} dictionary {dictionary_id}; restart the server to use it for writes")
+    elif args.command == "recompress":
+        codec.load(conn)
+        changed = recompress(conn, codec)
+        print(f"Rewrote {changed} values with {codec.algorithm}, dictionary {codec.dictionary_id or 'none'}")
+        conn.execute("VACUUM")
+
+    for entry in column_stats(conn):
+        print(f"{entry['column']:<28} {entry['rows']:>8} rows {entry['compressed']:>8} compressed "
+              f"{entry['bytes'] / 1024:>10.1f} KB")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -10,12 +10,163 @@ OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1:latest")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "")
 
+
+def _parse_keep_alive(value: str):
+    """Ollama takes either seconds as a number or a duration string like 30m"""
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+# Model residency: -1 keeps the model loaded until Ollama restarts
+OLLAMA_KEEP_ALIVE = _parse_keep_alive(os.getenv("OLLAMA_KEEP_ALIVE", "30m"))
+OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "true").lower() == "true"
+OLLAMA_KEEP_ALIVE_CHECK_INTERVAL = int(os.getenv("OLLAMA_KEEP_ALIVE_CHECK_INTERVAL", 300))
+
+# Failover: comma-separated providers tried after LLM_PROVIDER, e.g. "groq,openrouter"
+LLM_FALLBACK_PROVIDERS = [p.strip() for p in os.getenv("LLM_FALLBACK_PROVIDERS", "").split(",") if p.strip()]
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", 0.95))
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", 20.0))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 3))
+LLM_BREAKER_RECOVERY = float(os.getenv("LLM_BREAKER_RECOVERY", 30.0))
+
+# Calls above this many in flight per provider are queued (0 = unlimited)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 0))
+
+# Record/replay of LLM calls: LLM_CASSETTE_MODE is "record" or "replay",
+# LLM_CASSETTE_TIMING scales recorded delays on replay (0 = instant)
+LLM_CASSETTE = os.getenv("LLM_CASSETTE", "")
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "replay")
+LLM_CASSETTE_TIMING = float(os.getenv("LLM_CASSETTE_TIMING", 0.0))
+
+# LLM call traces older than this are deleted (0 = kept)
+LLM_TRACE_RETENTION_DAYS = float(os.getenv("LLM_TRACE_RETENTION_DAYS", 30))
+
 # Database
 DATABASE_PATH = os.getenv("DATABASE_PATH", "airoi.db")
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", 4))
+DATABASE_BUSY_TIMEOUT_MS = int(os.getenv("DATABASE_BUSY_TIMEOUT_MS", 5000))
+# NORMAL is durable across application crashes, FULL also across power loss
+DATABASE_SYNCHRONOUS = os.getenv("DATABASE_SYNCHRONOUS", "NORMAL").upper()
+
+# Compression of conversation content and assessment JSON: "auto" (zstd if
+# the zstandard package is installed, else zlib), "zstd", "zlib" or "off".
+# Dictionaries are trained with column_codec.py
+COLUMN_COMPRESSION = os.getenv("COLUMN_COMPRESSION", "auto")
+# 0 uses the algorithm's default level
+COLUMN_COMPRESSION_LEVEL = int(os.getenv("COLUMN_COMPRESSION_LEVEL", 0)) or None
+COLUMN_COMPRESSION_MIN_BYTES = int(os.getenv("COLUMN_COMPRESSION_MIN_BYTES", 256))
+
+# Sessions idle for ARCHIVE_AFTER_DAYS move, with their conversations and
+# assessments, to compressed monthly segments under ARCHIVE_DIR and are
+# restored on access (0 disables archiving). ARCHIVE_COMPRESSION is "auto"
+# (zstd if installed, else lzma), "zstd", "lzma" or "zlib"
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(os.path.dirname(DATABASE_PATH) or ".", "archive"))
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", 90))
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", 3600))
+ARCHIVE_BATCH_SESSIONS = int(os.getenv("ARCHIVE_BATCH_SESSIONS", 100))
+ARCHIVE_COMPRESSION = os.getenv("ARCHIVE_COMPRESSION", "auto")
+
+# Conversation messages are written behind in batches. "async" acknowledges
+# messages once buffered, "group" waits for the batch commit
+CONVERSATION_WRITE_DURABILITY = os.getenv("CONVERSATION_WRITE_DURABILITY", "async")
+CONVERSATION_WRITE_BATCH_SIZE = int(os.getenv("CONVERSATION_WRITE_BATCH_SIZE", 200))
+CONVERSATION_WRITE_FLUSH_INTERVAL = float(os.getenv("CONVERSATION_WRITE_FLUSH_INTERVAL", 0.1))
+CONVERSATION_WRITE_MAX_QUEUE = int(os.getenv("CONVERSATION_WRITE_MAX_QUEUE", 10000))
+
+# Conversation history pagination
+CONVERSATION_PAGE_SIZE = int(os.getenv("CONVERSATION_PAGE_SIZE", 100))
+CONVERSATION_MAX_PAGE_SIZE = int(os.getenv("CONVERSATION_MAX_PAGE_SIZE", 1000))
+CONVERSATION_STREAM_CHUNK = int(os.getenv("CONVERSATION_STREAM_CHUNK", 500))
+
+# Full-text search results per page
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", 20))
+SEARCH_MAX_PAGE_SIZE = int(os.getenv("SEARCH_MAX_PAGE_SIZE", 100))
+
+# Resident sessions. Least recently used and idle sessions are evicted and
+# rehydrated from the database on their next request
+SESSION_CACHE_MAX_SESSIONS = int(os.getenv("SESSION_CACHE_MAX_SESSIONS", 1000))
+SESSION_CACHE_MAX_MB = int(os.getenv("SESSION_CACHE_MAX_MB", 256))
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", 1800))
 
 # Server
 HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", 8000))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", 1))
+
+# Shared session state for running several workers. "sqlite" shares through
+# the database file (workers on one host, needs SESSION_SHARED), "redis"
+# through a Redis-protocol server (workers on any number of hosts)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")
+SESSION_SHARED = os.getenv("SESSION_SHARED", str(SERVER_WORKERS > 1)).lower() == "true"
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Longest a turn (including a full assessment) may hold a session
+SESSION_LOCK_TIMEOUT = float(os.getenv("SESSION_LOCK_TIMEOUT", 600))
+
+# Background assessment jobs. A job whose worker stops renewing its lease
+# is resumed by another worker after at most lease + scan interval seconds
+ASSESSMENT_JOB_LEASE = float(os.getenv("ASSESSMENT_JOB_LEASE", 120))
+ASSESSMENT_JOB_SCAN_INTERVAL = float(os.getenv("ASSESSMENT_JOB_SCAN_INTERVAL", 30))
+
+# WebSocket connections. Messages queued beyond WS_MAX_QUEUE per connection
+# drop the oldest one, or close the connection with WS_OVERFLOW=close
+WS_MAX_QUEUE = int(os.getenv("WS_MAX_QUEUE", 256))
+WS_OVERFLOW = os.getenv("WS_OVERFLOW", "drop_oldest")
+WS_BATCH_MAX_MESSAGES = int(os.getenv("WS_BATCH_MAX_MESSAGES", 50))
+WS_BATCH_MAX_BYTES = int(os.getenv("WS_BATCH_MAX_BYTES", 64 * 1024))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", 10))
+WS_HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", 20))
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", 60))
+
+# Admission control for chat turns and assessment jobs, per worker (0 =
+# unlimited). Chat beyond ADMISSION_MAX_IN_FLIGHT waits up to
+# ADMISSION_QUEUE_TIMEOUT seconds in a queue of ADMISSION_MAX_QUEUE, then
+# gets 429 with Retry-After. Assessment jobs use at most
+# ADMISSION_BATCH_MAX_IN_FLIGHT slots and new ones are refused first.
+# Clients are told apart by X-Forwarded-For with ADMISSION_TRUST_PROXY
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", 8))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", 32))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 15))
+ADMISSION_BATCH_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_BATCH_MAX_IN_FLIGHT", 2))
+ADMISSION_BATCH_MAX_QUEUE = int(os.getenv("ADMISSION_BATCH_MAX_QUEUE", 8))
+ADMISSION_SESSION_LIMIT = int(os.getenv("ADMISSION_SESSION_LIMIT", 2))
+ADMISSION_CLIENT_LIMIT = int(os.getenv("ADMISSION_CLIENT_LIMIT", 10))
+ADMISSION_TRUST_PROXY = os.getenv("ADMISSION_TRUST_PROXY", "false").lower() == "true"
+
+# HTTP responses of at least this size are compressed (gzip, or br/zstd when
+# the brotli/zstandard packages are installed and the client accepts them)
+HTTP_COMPRESSION_MIN_BYTES = int(os.getenv("HTTP_COMPRESSION_MIN_BYTES", 1024))
+
+# Analytics API (analytics_asgi.py). CSV parsing and analyses run in a pool
+# of ANALYTICS_POOL_WORKERS processes (0 = one per CPU); uploads above
+# ANALYTICS_MAX_UPLOAD_MB are refused (0 = unlimited)
+ANALYTICS_PORT = int(os.getenv("ANALYTICS_PORT", 5002))
+ANALYTICS_POOL_WORKERS = int(os.getenv("ANALYTICS_POOL_WORKERS", 0))
+ANALYTICS_MAX_UPLOAD_MB = int(os.getenv("ANALYTICS_MAX_UPLOAD_MB", 200))
+ANALYTICS_UPLOAD_DIR = os.getenv("ANALYTICS_UPLOAD_DIR") or None
+# Analysis types whose libraries pool workers import as they start, e.g.
+# "regression,sem", or "all"; by default they are imported on first use.
+# Costs startup time and memory, see startup_bench.py
+ANALYTICS_PREWARM = os.getenv("ANALYTICS_PREWARM", "")
+# Uploaded datasets are published as memory-mapped Arrow files under
+# ANALYTICS_DATASET_DIR (default /dev/shm/airoi-datasets) that every worker
+# attaches to, so ANALYTICS_WORKERS server processes can share them. Datasets
+# unused for ANALYTICS_DATASET_TTL seconds are removed (0 = kept)
+ANALYTICS_WORKERS = int(os.getenv("ANALYTICS_WORKERS", 1))
+ANALYTICS_DATASET_DIR = os.getenv("ANALYTICS_DATASET_DIR") or None
+ANALYTICS_DATASET_TTL = float(os.getenv("ANALYTICS_DATASET_TTL", 86400))
+ANALYTICS_DATASET_SWEEP_INTERVAL = float(os.getenv("ANALYTICS_DATASET_SWEEP_INTERVAL", 600))
 
 # CORS
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "*").split(",")
+
+# Conversation history
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 6000))
+
+# Token budget of the data embedded in each agent's prompt
+PROMPT_TOKEN_BUDGETS = {
+    "opportunity_analyzer": int(os.getenv("PROMPT_BUDGET_OPPORTUNITY_ANALYZER", 3000)),
+    "roadmap_strategist": int(os.getenv("PROMPT_BUDGET_ROADMAP_STRATEGIST", 4000)),
+    "implementation_assistant": int(os.getenv("PROMPT_BUDGET_IMPLEMENTATION_ASSISTANT", 1500)),
+}
@@ -0,0 +1,177 @@
+"""
+Write-behind persistence for conversation messages
+
+Chat messages are buffered in memory and written to the conversations table
+in batched transactions, so a burst of messages costs one commit instead of
+one per message. A flush is triggered when the buffer reaches batch_size or
+after flush_interval seconds, and everything left is written on shutdown.
+
+Durability modes:
+- "async": append() returns as soon as the message is buffered. A crash can
+  lose the messages of the last flush interval.
+- "group": append() waits until the batch holding the message is committed.
+  Concurrent messages still share one commit.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from database import Database
+from llm_resilience import LatencyTracker
+from queries import INSERT_CONVERSATION
+from search import index_conversations
+
+
+DURABILITY_MODES = ("async", "group")
+
+
+class ConversationWriter:
+    """Buffers conversation rows and writes them in batches"""
+
+    def __init__(
+        self,
+        db: Database,
+        durability: str = "async",
+        batch_size: int = 200,
+        flush_interval: float = 0.1,
+        max_queue: int = 10000
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability}")
+        self.db = db
+        self.durability = durability
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.buffer: List[Tuple[tuple, Optional[asyncio.Future]]] = []
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.flush_latency = LatencyTracker(window=512, min_samples=1)
+        self.max_depth = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the background flusher and write everything still buffered"""
+        if self._task is not None:
+            # Let the flusher finish its current batch rather than cancelling
+            # it halfway through a write
+            self._closing = True
+            self._wake.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.buffer:
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Dropping {len(self.buffer)} unwritten conversation messages: {e}")
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Failed to write conversation messages: {e}")
+
+    async def append(
+        self,
+        session_id: str,
+        role: str,
+        content: str,
+        timestamp: int,
+        agent: Optional[str] = None
+    ):
+        """Queue a message; in "group" mode wait until it is committed"""
+        if len(self.buffer) >= self.max_queue:
+            # The database is not keeping up: write instead of queueing more
+            await self.flush()
+
+        future = asyncio.get_running_loop().create_future() if self.durability == "group" else None
+        self.buffer.append(((session_id, role, agent, content, timestamp), future))
+        self.max_depth = max(self.max_depth, len(self.buffer))
+        if len(self.buffer) >= self.batch_size:
+            self._wake.set()
+
+        if future is not None:
+            await future
+
+    def pending(self, session_id: str) -> List[Dict[str, Any]]:
+        """Buffered messages of a session that are not in the database yet"""
+        return [
+            {"role": row[1], "agent": row[2], "content": row[3], "timestamp": row[4]}
+            for row, _ in self.buffer
+            if row[0] == session_id
+        ]
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self.buffer:
+                return
+            batch, self.buffer = self.buffer, []
+
+            started = time.monotonic()
+            try:
+                await self.db.write(self._insert, [row for row, _ in batch])
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                # Waiting callers get the error; write-behind rows are retried
+                retry = []
+                for entry in batch:
+                    if entry[1] is None:
+                        retry.append(entry)
+                    elif not entry[1].done():
+                        entry[1].set_exception(e)
+                self.buffer = retry + self.buffer
+                raise
+
+            self.flush_latency.record(time.monotonic() - started)
+            self.flushes += 1
+            self.rows_written += len(batch)
+            for _, future in batch:
+                if future is not None and not future.done():
+                    future.set_result(None)
+
+    def _insert(self, conn, rows: List[tuple]):
+        # Compress on the writer thread rather than the event loop
+        encode = self.db.codec.encode
+        indexed = []
+        for session_id, role, agent, content, timestamp in rows:
+            message_id = conn.execute(
+                INSERT_CONVERSATION, (session_id, role, agent, encode(content), timestamp)
+            ).lastrowid
+            indexed.append((message_id, session_id, content))
+        index_conversations(conn, indexed)
+
+    def metrics(self) -> Dict[str, Any]:
+        def ms(q: float) -> Optional[float]:
+            value = self.flush_latency.percentile(q)
+            return round(value * 1000, 2) if value is not None else None
+
+        return {
+            "durability": self.durability,
+            "queue_depth": len(self.buffer),
+            "max_queue_depth": self.max_depth,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "rows_per_flush": round(self.rows_written / self.flushes, 1) if self.flushes else None,
+            "p50_flush_ms": ms(0.50),
+            "p95_flush_ms": ms(0.95),
+            "p99_flush_ms": ms(0.99),
+            "failures": self.failures,
+            "last_error": self.last_error
+        }
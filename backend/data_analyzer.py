@@ -2,8 +2,6 @@ import pandas as pd
 import numpy as np
 import json
 from typing import Dict, List, Any
-import matplotlib.pyplot as plt
-import seaborn as sns
 from io import BytesIO
 import base64
 
@@ -236,6 +234,8 @@ class SmartDataAnalyzer:
     
     def generate_visualization(self, viz_type: str, columns: List[str]) -> str:
         """Generate visualization and return as base64 encoded image"""
+        # Plotting libraries are only loaded when a chart is drawn
+        import matplotlib.pyplot as plt
         plt.figure(figsize=(10, 6))
         
         if viz_type == 'histogram':
@@ -260,6 +260,7 @@ class SmartDataAnalyzer:
             plt.title('Trend Over Time')
             
         elif viz_type == 'heatmap':
+            import seaborn as sns
             corr = self.data[columns].corr()
             sns.heatmap(corr, annot=True, cmap='coolwarm', center=0)
             plt.title('Correlation Heatmap')
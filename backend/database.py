@@ -0,0 +1,139 @@
+"""
+Non-blocking SQLite access for the AIROI server
+
+A small pool of long-lived connections in WAL mode serves reads from a
+thread pool, while all writes go through a single writer connection on its
+own thread. SQLite allows one writer at a time, so funnelling writes through
+one connection avoids busy retries, and WAL lets readers run alongside it.
+No query ever runs on the event loop.
+"""
+
+import asyncio
+import queue
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+from column_codec import ColumnCodec, dictionary_fetcher
+from search import register_functions
+
+
+class Database:
+    """Pooled SQLite connections driven from async code"""
+
+    def __init__(
+        self,
+        path: str,
+        pool_size: int = 4,
+        busy_timeout_ms: int = 5000,
+        synchronous: str = "NORMAL",
+        cache_size_kb: int = 16384,
+        mmap_size_mb: int = 256,
+        codec: Optional[ColumnCodec] = None
+    ):
+        self.path = path
+        self.pool_size = pool_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size_mb = mmap_size_mb
+        # Compression of the large text columns
+        self.codec = codec or ColumnCodec()
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._read_executor: Optional[ThreadPoolExecutor] = None
+        self._write_executor: Optional[ThreadPoolExecutor] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL only syncs at checkpoints in WAL mode: a power loss can drop
+        # the last transactions but never corrupts the database
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size_mb) * 1024 * 1024}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        register_functions(conn, self.codec)
+        return conn
+
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+
+    def open(self):
+        if self.is_open:
+            return
+        self._writer = self._connect()
+        for _ in range(self.pool_size):
+            self._readers.put(self._connect())
+        self._read_executor = ThreadPoolExecutor(self.pool_size, thread_name_prefix="db-read")
+        self._write_executor = ThreadPoolExecutor(1, thread_name_prefix="db-write")
+        self.codec.fetch_dictionary = self._fetch_dictionary
+
+    def close(self):
+        if not self.is_open:
+            return
+        self._read_executor.shutdown(wait=True)
+        self._write_executor.shutdown(wait=True)
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+        # Fold the WAL back into the main file so it does not grow unbounded
+        self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._writer.close()
+        self._writer = None
+
+    def _fetch_dictionary(self, dictionary_id: int):
+        # Only needed for rows compressed with a dictionary another process
+        # trained after this one started, so once per dictionary. Runs on its
+        # own connection: the caller may be a query on a pooled one
+        conn = sqlite3.connect(self.path)
+        try:
+            return dictionary_fetcher(conn)(dictionary_id)
+        finally:
+            conn.close()
+
+    def _read(self, fn: Callable, *args) -> Any:
+        conn = self._readers.get()
+        try:
+            return fn(conn, *args)
+        finally:
+            self._readers.put(conn)
+
+    def _write(self, fn: Callable, *args) -> Any:
+        conn = self._writer
+        try:
+            result = fn(conn, *args)
+            conn.commit()
+            return result
+        except BaseException:
+            conn.rollback()
+            raise
+
+    async def read(self, fn: Callable, *args) -> Any:
+        """Run fn(conn, *args) on a pooled reader connection"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._read_executor, self._read, fn, *args)
+
+    async def write(self, fn: Callable, *args) -> Any:
+        """Run fn(conn, *args) in a transaction on the writer connection"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._write_executor, self._write, fn, *args)
+
+    async def execute(self, sql: str, params: Sequence = ()) -> int:
+        """Run a single write statement; returns the last inserted row id"""
+        return await self.write(lambda conn: conn.execute(sql, params).lastrowid)
+
+    async def executemany(self, sql: str, rows: Iterable[Sequence]) -> None:
+        await self.write(lambda conn: conn.executemany(sql, rows))
+
+    async def fetchone(self, sql: str, params: Sequence = ()) -> Optional[sqlite3.Row]:
+        return await self.read(lambda conn: conn.execute(sql, params).fetchone())
+
+    async def fetchall(self, sql: str, params: Sequence = ()) -> List[sqlite3.Row]:
+        return await self.read(lambda conn: conn.execute(sql, params).fetchall())
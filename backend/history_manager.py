@@ -0,0 +1,234 @@
+"""
+Conversation history management for long-running agent sessions
+
+Recent turns are sent verbatim. Older turns are folded into a rolling
+summary that is updated incrementally, so every prompt stays under a fixed
+token budget no matter how long the session runs.
+"""
+
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, List
+
+from llm_tracing import agent_context, current_agent
+from tokens import (
+    estimate_tokens, estimate_message_tokens, estimate_messages_tokens,
+    truncate_to_tokens, MESSAGE_OVERHEAD_TOKENS
+)
+
+
+DEFAULT_TOKEN_BUDGET = 6000
+
+SUMMARY_SYSTEM_PROMPT = """You maintain the running summary of an AIROI discovery audit conversation.
+
+Merge the new conversation turns into the existing summary.
+
+RULES:
+- Keep every concrete fact: company details, systems, processes, data sources, pain points, costs, capabilities, compliance requirements
+- Keep open questions the client has not answered yet
+- Drop greetings, pleasantries and repetition
+- Write compact bullet points grouped by topic
+- Never invent information
+
+OUTPUT: The updated summary only."""
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+
+@dataclass
+class ConversationMemory:
+    """Rolling summary state for one conversation"""
+    summary: str = ""
+    folded: int = 0  # Leading messages of the history covered by the summary
+    fingerprint: str = ""  # Digest of the folded messages
+
+    def reset(self):
+        self.summary = ""
+        self.folded = 0
+        self.fingerprint = ""
+
+
+def _chain_digest(digest: str, message: Dict) -> str:
+    """Extend a running digest with one message"""
+    h = hashlib.sha256(digest.encode())
+    h.update(str(message.get("role", "")).encode())
+    h.update(b"\0")
+    h.update((message.get("content") or "").encode())
+    return h.hexdigest()
+
+
+def _format_transcript(messages: List[Dict]) -> str:
+    return "\n\n".join(
+        f"{m.get('role', 'user').upper()}: {m.get('content') or ''}" for m in messages
+    )
+
+
+class HistoryManager:
+    """
+    Builds token-budgeted message lists from a conversation history
+
+    The summary is cached in a ConversationMemory and only the turns that
+    newly fall out of the verbatim window are summarized, so each fold costs
+    one small LLM call instead of re-reading the whole history.
+    """
+
+    def __init__(
+        self,
+        llm,
+        token_budget: int = DEFAULT_TOKEN_BUDGET,
+        summary_tokens: int = 800,
+        min_recent_messages: int = 4,
+        fold_ratio: float = 0.5
+    ):
+        self.llm = llm
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.min_recent_messages = min_recent_messages
+        # When folding, shrink the verbatim window to this share of its budget
+        # so that the next few turns fit without another summary call
+        self.fold_ratio = fold_ratio
+
+    async def build_messages(
+        self,
+        history: List[Dict],
+        memory: ConversationMemory,
+        reserve_tokens: int = 0
+    ) -> List[Dict]:
+        """
+        Return the messages to send for this turn
+
+        reserve_tokens accounts for everything else in the prompt (system
+        prompt, trailing instructions) so the total stays within budget.
+        """
+        available = self.token_budget - reserve_tokens
+        if available <= MESSAGE_OVERHEAD_TOKENS:
+            raise ValueError(
+                f"Token budget {self.token_budget} leaves no room for history "
+                f"after reserving {reserve_tokens} tokens"
+            )
+
+        self._validate(history, memory)
+
+        messages = self._assemble(history, memory)
+        if estimate_messages_tokens(messages) <= available:
+            return messages
+
+        keep_from = self._window_start(history, memory, available)
+        if keep_from > memory.folded:
+            await self._fold(history, memory, keep_from)
+
+        return self._fit(self._assemble(history, memory), available)
+
+    def _validate(self, history: List[Dict], memory: ConversationMemory):
+        """Drop the cached summary if it does not belong to this history"""
+        if memory.folded > len(history):
+            memory.reset()
+            return
+
+        digest = ""
+        for message in history[:memory.folded]:
+            digest = _chain_digest(digest, message)
+        if digest != memory.fingerprint:
+            memory.reset()
+
+    def _assemble(self, history: List[Dict], memory: ConversationMemory) -> List[Dict]:
+        messages = []
+        if memory.summary:
+            messages.append({
+                "role": "system",
+                "content": SUMMARY_PREFIX + memory.summary
+            })
+        for m in history[memory.folded:]:
+            messages.append({"role": m["role"], "content": m.get("content") or ""})
+        return messages
+
+    def _window_start(
+        self,
+        history: List[Dict],
+        memory: ConversationMemory,
+        available: int
+    ) -> int:
+        """Index of the first message to keep verbatim after folding"""
+        summary_cost = self.summary_tokens + estimate_tokens(SUMMARY_PREFIX) + MESSAGE_OVERHEAD_TOKENS
+        window_budget = max(0, available - summary_cost) * self.fold_ratio
+
+        keep_from = len(history)
+        used = 0
+        while keep_from > memory.folded:
+            cost = estimate_message_tokens(history[keep_from - 1])
+            recent = len(history) - keep_from
+            if used + cost > window_budget and recent >= self.min_recent_messages:
+                break
+            if used + cost > available - summary_cost and recent > 0:
+                # The latest message is always kept, _fit trims it if needed
+                break
+            used += cost
+            keep_from -= 1
+
+        return keep_from
+
+    async def _fold(self, history: List[Dict], memory: ConversationMemory, keep_from: int):
+        """Summarize history[memory.folded:keep_from] into the memory"""
+        # Each summary call must itself respect the token budget
+        chunk_budget = (
+            self.token_budget
+            - estimate_tokens(SUMMARY_SYSTEM_PROMPT)
+            - self.summary_tokens
+            - 2 * MESSAGE_OVERHEAD_TOKENS
+            - 32
+        )
+        chunk_budget = max(chunk_budget, 64)
+
+        start = memory.folded
+        while start < keep_from:
+            end = start
+            used = 0
+            while end < keep_from:
+                cost = estimate_message_tokens(history[end])
+                if used + cost > chunk_budget and end > start:
+                    break
+                used += cost
+                end += 1
+
+            chunk = [
+                {
+                    "role": m.get("role", "user"),
+                    "content": truncate_to_tokens(m.get("content") or "", chunk_budget)
+                }
+                for m in history[start:end]
+            ]
+            with agent_context(f"{current_agent.get()}:summary"):
+                summary = await self.llm.call(
+                    [{
+                        "role": "user",
+                        "content": f"""EXISTING SUMMARY:
+{memory.summary or '(none yet)'}
+
+NEW TURNS:
+{_format_transcript(chunk)}"""
+                    }],
+                    SUMMARY_SYSTEM_PROMPT
+                )
+
+            memory.summary = truncate_to_tokens(summary.strip(), self.summary_tokens)
+            for message in history[start:end]:
+                memory.fingerprint = _chain_digest(memory.fingerprint, message)
+            memory.folded = end
+            start = end
+
+    def _fit(self, messages: List[Dict], available: int) -> List[Dict]:
+        """Truncate the largest messages until the list fits the budget"""
+        total = estimate_messages_tokens(messages)
+        while total > available:
+            largest = max(range(len(messages)), key=lambda i: estimate_message_tokens(messages[i]))
+            content = messages[largest]["content"]
+            current = estimate_tokens(content)
+            target = max(0, current - (total - available) - 8)
+            messages[largest] = {**messages[largest], "content": truncate_to_tokens(content, target)}
+            new_total = estimate_messages_tokens(messages)
+            if new_total >= total:
+                # Nothing left to cut in this message, drop the oldest instead
+                messages.pop(0)
+                new_total = estimate_messages_tokens(messages)
+            total = new_total
+        return messages
@@ -0,0 +1,385 @@
+"""
+Negotiated response compression and conditional GET
+
+Responses are compressed with the best encoding the client accepts, in
+the order zstd, br, gzip. gzip is always available; br and zstd need the
+optional brotli and zstandard packages. Bodies smaller than the minimum
+size, or of types that do not compress (images, archives), are sent as
+they are.
+
+Complete GET responses also get a strong ETag, unless the endpoint set
+one (versioned resources use their version), and a request whose
+If-None-Match matches it is answered with 304 and no body. Compressed
+representations carry the ETag with the encoding appended, so a cache
+never confuses them with the identity one. Compressed bodies are cached
+by ETag, so an ETag an endpoint sets must change whenever its body does.
+
+CompressionMiddleware wraps an ASGI app (airoi_server.py) and
+init_flask() installs the same behaviour on a Flask app (api_server.py);
+both take a Compressor, which holds the settings and statistics.
+Streamed responses are passed through untouched.
+"""
+
+import base64
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Server preference when the client accepts several with the same q-value
+PREFERENCE = ("zstd", "br", "gzip")
+
+# Levels that keep compression of dynamic responses well under a millisecond per 100 KB
+LEVELS = {"gzip": 6, "br": 4, "zstd": 3}
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/x-ndjson", "application/javascript",
+    "application/xml", "image/svg+xml"
+)
+
+
+def available_encodings() -> List[str]:
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Accept-Encoding as {coding: q}, lowercased; malformed q-values count as 0"""
+    accepted = {}
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(header: Optional[str], encodings: Optional[List[str]] = None) -> Optional[str]:
+    """The encoding to send for an Accept-Encoding header, None for identity"""
+    encodings = encodings or available_encodings()
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in PREFERENCE:
+        if encoding not in encodings:
+            continue
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        # mtime=0 keeps the output, and so the representation, deterministic
+        return gzip.compress(body, LEVELS["gzip"], mtime=0)
+    if encoding == "br":
+        return brotli.compress(body, quality=LEVELS["br"])
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=LEVELS["zstd"]).compress(body)
+    raise ValueError(f"Unknown encoding: {encoding}")
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    content_type = (content_type or "").lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def strong_etag(body: bytes) -> str:
+    digest = hashlib.blake2b(body, digest_size=16).digest()
+    return '"' + base64.urlsafe_b64encode(digest).decode().rstrip("=") + '"'
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """ETag of a compressed representation: "tag" becomes "tag-gzip" """
+    weak = etag.startswith("W/")
+    tag = etag[2:] if weak else etag
+    return ("W/" if weak else "") + tag[:-1] + f"-{encoding}" + '"'
+
+
+def _base_tag(etag: str) -> str:
+    """Opaque tag without weakness prefix, quotes or encoding suffix"""
+    tag = etag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    tag = tag.strip('"')
+    for encoding in PREFERENCE:
+        if tag.endswith("-" + encoding):
+            return tag[:-len(encoding) - 1]
+    return tag
+
+
+def not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether If-None-Match matches etag
+
+    Uses the weak comparison RFC 9110 requires for If-None-Match, and
+    treats every encoding of a resource as the same, so a client that
+    cached the gzip representation revalidates it against the identity
+    ETag.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tag = _base_tag(etag)
+    return any(_base_tag(candidate) == tag for candidate in if_none_match.split(","))
+
+
+class CompressedCache:
+    """
+    Compressed bodies by (ETag, encoding)
+
+    Repeat fetches of the same document (capabilities, a stored assessment
+    version) skip compressing it again; hashing the body is much cheaper.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, etag: str, encoding: str, body: bytes) -> bytes:
+        key = (etag, encoding)
+        with self._lock:
+            cached = self.entries.get(key)
+            if cached is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        compressed = compress(body, encoding)
+        if len(compressed) <= self.max_bytes // 8:
+            with self._lock:
+                if key not in self.entries:
+                    self.entries[key] = compressed
+                    self.bytes += len(compressed)
+                while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                    _, evicted = self.entries.popitem(last=False)
+                    self.bytes -= len(evicted)
+        return compressed
+
+
+class Compressor:
+    """Compression settings, compressed body cache and statistics"""
+
+    def __init__(
+        self,
+        minimum_size: int = 1024,
+        encodings: Optional[List[str]] = None,
+        cache_entries: int = 256
+    ):
+        self.minimum_size = minimum_size
+        self.encodings = encodings or available_encodings()
+        self.cache = CompressedCache(cache_entries)
+        self.responses = {"compressed": 0, "not_modified": 0, "identity": 0}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def encoding_for(self, accept_encoding: Optional[str], size: int) -> Optional[str]:
+        if size < self.minimum_size:
+            return None
+        return negotiate(accept_encoding, self.encodings)
+
+    def compress(self, body: bytes, encoding: str, etag: Optional[str] = None) -> bytes:
+        """Compressed body, from the cache when the response has an ETag"""
+        compressed = self.cache.get(etag, encoding, body) if etag else compress(body, encoding)
+        self.bytes_in += len(body)
+        self.bytes_out += len(compressed)
+        self.responses["compressed"] += 1
+        return compressed
+
+    def respond(self, start, body: bytes, accept_encoding: str, if_none_match: str, conditional: bool):
+        """The ASGI start and body messages to send for a complete response"""
+        status = start["status"]
+        headers = [(name.lower(), value) for name, value in start.get("headers", [])]
+        header_map = dict(headers)
+        content_type = header_map.get(b"content-type", b"").decode("latin-1")
+        compressible = (
+            is_compressible(content_type) and b"content-encoding" not in header_map
+            and status not in (204, 206, 304)
+        )
+
+        etag = header_map.get(b"etag", b"").decode("latin-1") or None
+        if status == 304:
+            # The endpoint validated the request itself
+            self.responses["not_modified"] += 1
+            return [{**start, "headers": _add_vary(headers)}, {"type": "http.response.body", "body": body}]
+        if conditional and status == 200:
+            if etag is None:
+                etag = strong_etag(body)
+                headers.append((b"etag", etag.encode("latin-1")))
+            if not_modified(if_none_match, etag):
+                self.responses["not_modified"] += 1
+                kept = [
+                    (name, value) for name, value in headers
+                    if name in (b"etag", b"cache-control", b"vary", b"expires", b"content-location")
+                ]
+                if compressible:
+                    kept = _add_vary(kept)
+                return [
+                    {"type": "http.response.start", "status": 304, "headers": kept},
+                    {"type": "http.response.body", "body": b""}
+                ]
+
+        encoding = None
+        if compressible:
+            headers = _add_vary(headers)
+            encoding = self.encoding_for(accept_encoding, len(body))
+        if encoding is None:
+            self.responses["identity"] += 1
+            return [{**start, "headers": headers}, {"type": "http.response.body", "body": body}]
+
+        body = self.compress(body, encoding, etag)
+        headers = [
+            (name, encoded_etag(etag, encoding).encode("latin-1") if name == b"etag" else value)
+            for name, value in headers if name != b"content-length"
+        ]
+        headers.append((b"content-encoding", encoding.encode()))
+        headers.append((b"content-length", str(len(body)).encode()))
+        return [{**start, "headers": headers}, {"type": "http.response.body", "body": body}]
+
+    def metrics(self) -> Dict:
+        return {
+            "encodings": self.encodings,
+            "responses": dict(self.responses),
+            "ratio": round(self.bytes_in / self.bytes_out, 2) if self.bytes_out else None,
+            "cache": {
+                "entries": len(self.cache.entries),
+                "bytes": self.cache.bytes,
+                "hits": self.cache.hits,
+                "misses": self.cache.misses
+            }
+        }
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing and validating complete responses"""
+
+    def __init__(self, app, compressor: Optional[Compressor] = None):
+        self.app = app
+        self.compressor = compressor or Compressor()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = _header_map(scope["headers"])
+        accept_encoding = request_headers.get(b"accept-encoding", b"").decode("latin-1")
+        if_none_match = request_headers.get(b"if-none-match", b"").decode("latin-1")
+        conditional = scope["method"] in ("GET", "HEAD")
+        start = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            if message.get("more_body", False):
+                # Streaming (NDJSON export): chunks go out as they are produced
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+            for response in self.compressor.respond(
+                start, message.get("body", b""), accept_encoding, if_none_match, conditional
+            ):
+                await send(response)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def _header_map(headers) -> Dict[bytes, bytes]:
+    return {name.lower(): value for name, value in headers}
+
+
+def _add_vary(headers):
+    for i, (name, value) in enumerate(headers):
+        if name == b"vary":
+            if b"accept-encoding" not in value.lower() and value.strip() != b"*":
+                headers = list(headers)
+                headers[i] = (name, value + b", Accept-Encoding")
+            return headers
+    return list(headers) + [(b"vary", b"Accept-Encoding")]
+
+
+def init_flask(app, compressor: Optional[Compressor] = None) -> Compressor:
+    """Compress and validate the responses of a Flask app"""
+    from flask import request
+
+    compressor = compressor or Compressor()
+
+    @app.after_request
+    def compress_response(response):
+        if response.direct_passthrough or response.is_streamed:
+            return response
+        etag = None
+        if request.method in ("GET", "HEAD") and response.status_code == 200:
+            if response.get_etag()[0] is None:
+                response.set_etag(strong_etag(response.get_data()).strip('"'))
+            etag = response.headers["ETag"]
+            if not_modified(request.headers.get("If-None-Match"), etag):
+                compressor.responses["not_modified"] += 1
+                response.status_code = 304
+                response.set_data(b"")
+                for header in ("Content-Type", "Content-Length"):
+                    response.headers.pop(header, None)
+                return response
+
+        if (
+            not is_compressible(response.content_type)
+            or "Content-Encoding" in response.headers
+            or response.status_code in (204, 206, 304)
+        ):
+            return response
+        response.vary.add("Accept-Encoding")
+        body = response.get_data()
+        encoding = compressor.encoding_for(request.headers.get("Accept-Encoding"), len(body))
+        if encoding is None:
+            compressor.responses["identity"] += 1
+            return response
+        response.set_data(compressor.compress(body, encoding, etag))
+        response.headers["Content-Encoding"] = encoding
+        if etag is not None:
+            response.headers["ETag"] = encoded_etag(etag, encoding)
+        return response
+
+    return compressor
@@ -0,0 +1,259 @@
+"""
+LLM call tracing
+
+Every LLM call is recorded as a span with timing, token usage and cache
+information. Spans are buffered in memory and written to the llm_traces
+table in batches through the database writer, so that tracing never adds a
+disk write to a chat turn. Spans older than the retention period are deleted.
+"""
+
+import asyncio
+import functools
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional
+
+import queries
+from queries import now_us, to_iso
+
+
+# Name of the agent on whose behalf LLM calls are made
+current_agent: ContextVar[str] = ContextVar("current_agent", default="unknown")
+
+# Extra attributes attached to the spans of the LLM calls made in a block
+current_attributes: ContextVar[Dict[str, Any]] = ContextVar("current_attributes", default={})
+
+
+@contextmanager
+def agent_context(name: str):
+    """Attribute the LLM calls made inside the block to an agent"""
+    token = current_agent.set(name)
+    # Call attributes describe the enclosing agent's own calls only
+    attributes_token = current_attributes.set({})
+    try:
+        yield
+    finally:
+        current_attributes.reset(attributes_token)
+        current_agent.reset(token)
+
+
+@contextmanager
+def call_attributes(**attributes):
+    """Attach attributes to the trace spans of the LLM calls made inside the block"""
+    token = current_attributes.set({**current_attributes.get(), **attributes})
+    try:
+        yield
+    finally:
+        current_attributes.reset(token)
+
+
+def traced_agent(method):
+    """Attribute the LLM calls made by an agent method to the agent's name"""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        with agent_context(self.name):
+            return await method(self, *args, **kwargs)
+    return wrapper
+
+
+@dataclass
+class TraceSpan:
+    """
+    One LLM call
+
+    queue_wait_ms is the time spent waiting for a free provider slot.
+    ttft_ms and latency_ms are measured from the moment the request is sent.
+    started_at is in epoch microseconds.
+    """
+    agent: str
+    provider: str
+    model: str
+    prompt_hash: str = ""
+    prompt_chars: int = 0
+    streamed: bool = False
+    started_at: int = field(default_factory=now_us)
+    queue_wait_ms: float = 0.0
+    ttft_ms: Optional[float] = None
+    latency_ms: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    cache_hit: Optional[bool] = None
+    status: str = "incomplete"
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._queued = time.monotonic()
+        self._sent = self._queued
+
+    def mark_sent(self):
+        self.queue_wait_ms = (time.monotonic() - self._queued) * 1000
+        self._sent = time.monotonic()
+
+    def mark_first_token(self):
+        if self.ttft_ms is None:
+            self.ttft_ms = (time.monotonic() - self._sent) * 1000
+
+    def finish(self):
+        self.latency_ms = (time.monotonic() - self._sent) * 1000
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+
+class TraceStore:
+    """Buffers trace spans and persists them to the llm_traces table"""
+
+    COLUMNS = [
+        "started_at", "agent", "provider", "model", "prompt_hash", "prompt_chars",
+        "streamed", "queue_wait_ms", "ttft_ms", "latency_ms", "prompt_tokens",
+        "completion_tokens", "cached_tokens", "cache_hit", "status", "error",
+        "attributes"
+    ]
+
+    INSERT = (
+        f"INSERT INTO llm_traces ({', '.join(COLUMNS)}) "
+        f"VALUES ({', '.join('?' for _ in COLUMNS)})"
+    )
+
+    def __init__(
+        self,
+        db,
+        flush_interval: float = 2.0,
+        max_buffer: int = 5000,
+        retention_days: float = 30.0,
+        prune_interval: float = 3600.0
+    ):
+        # database.Database, migrated (the table is created by migrations.py)
+        self.db = db
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        # 0 keeps spans forever
+        self.retention_days = retention_days
+        self.prune_interval = prune_interval
+        self.buffer: List[TraceSpan] = []
+        self.dropped = 0
+        self.pruned = 0
+
+    def record(self, span: TraceSpan):
+        if len(self.buffer) >= self.max_buffer:
+            # Storage is not keeping up; never let tracing eat the memory
+            self.dropped += 1
+            return
+        self.buffer.append(span)
+
+    def _row(self, span: TraceSpan) -> tuple:
+        data = asdict(span)
+        data["attributes"] = json.dumps(span.attributes) if span.attributes else None
+        return tuple(data[c] for c in self.COLUMNS)
+
+    async def flush(self):
+        if not self.buffer:
+            return
+        spans, self.buffer = self.buffer, []
+        await self.db.executemany(self.INSERT, [self._row(s) for s in spans])
+
+    async def prune(self) -> int:
+        """Delete spans older than the retention period; returns how many"""
+        if not self.retention_days:
+            return 0
+        cutoff = now_us() - int(self.retention_days * 86400 * 1_000_000)
+        removed = await self.db.write(
+            lambda conn: conn.execute(queries.DELETE_LLM_TRACES, (cutoff,)).rowcount
+        )
+        self.pruned += removed
+        return removed
+
+    async def run(self):
+        """Background task writing buffered spans and pruning old ones until cancelled"""
+        last_prune = None
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                try:
+                    await self.flush()
+                    if last_prune is None or time.monotonic() - last_prune > self.prune_interval:
+                        last_prune = time.monotonic()
+                        await self.prune()
+                except Exception as e:
+                    print(f"Failed to write LLM traces: {e}")
+        finally:
+            await self.flush()
+
+    @staticmethod
+    def _query(conn, since: int, slowest: int) -> Dict[str, Any]:
+        rows = conn.execute(queries.SELECT_LLM_TRACES, (since,)).fetchall()
+        slow = conn.execute(queries.SELECT_SLOWEST_LLM_TRACES, (since, slowest)).fetchall()
+
+        groups: Dict[tuple, List[tuple]] = {}
+        for row in rows:
+            groups.setdefault(row[:3], []).append(row)
+
+        by_agent = []
+        for (agent, provider, model), items in sorted(groups.items()):
+            ok = [r for r in items if r[3] == "ok"]
+            latencies = [r[6] for r in ok if r[6] is not None]
+            ttfts = [r[5] for r in ok if r[5] is not None]
+            waits = [r[4] for r in items if r[4] is not None]
+            prompt_tokens = sum(r[7] or 0 for r in ok)
+            completion_tokens = sum(r[8] or 0 for r in ok)
+            cache_known = [r[9] for r in ok if r[9] is not None]
+            generation_seconds = sum(
+                (r[6] - (r[5] or 0)) / 1000 for r in ok if r[6] is not None and r[8]
+            )
+            by_agent.append({
+                "agent": agent,
+                "provider": provider,
+                "model": model,
+                "calls": len(items),
+                "errors": sum(1 for r in items if r[3] == "error"),
+                "cancelled": sum(1 for r in items if r[3] == "cancelled"),
+                "p50_latency_ms": _percentile(latencies, 0.50),
+                "p95_latency_ms": _percentile(latencies, 0.95),
+                "p99_latency_ms": _percentile(latencies, 0.99),
+                "p50_ttft_ms": _percentile(ttfts, 0.50),
+                "p95_ttft_ms": _percentile(ttfts, 0.95),
+                "p95_queue_wait_ms": _percentile(waits, 0.95),
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "prompt_tokens_saved": sum(r[10] or 0 for r in items),
+                "completion_tokens_per_second": (
+                    round(completion_tokens / generation_seconds, 1) if generation_seconds > 0 else None
+                ),
+                "cache_hit_rate": (
+                    round(sum(cache_known) / len(cache_known), 3) if cache_known else None
+                )
+            })
+
+        slow_keys = [
+            "started_at", "agent", "provider", "model", "prompt_hash", "prompt_chars",
+            "queue_wait_ms", "ttft_ms", "latency_ms", "prompt_tokens", "completion_tokens"
+        ]
+        return {
+            "calls": len(rows),
+            "by_agent": by_agent,
+            "slowest": [
+                {**dict(zip(slow_keys, r)), "started_at": to_iso(r[0])} for r in slow
+            ]
+        }
+
+    async def summary(self, window_hours: float = 24.0, slowest: int = 10) -> Dict[str, Any]:
+        """Latency, token and cache statistics per agent over a time window"""
+        await self.flush()
+        since = now_us() - int(window_hours * 3600 * 1_000_000)
+        result = await self.db.read(self._query, since, slowest)
+        return {
+            "window_hours": window_hours,
+            "buffered": len(self.buffer),
+            "dropped": self.dropped,
+            "pruned": self.pruned,
+            **result
+        }
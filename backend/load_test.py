@@ -0,0 +1,283 @@
+"""
+Load driver for the AIROI server
+
+Replays many concurrent assessment sessions against the FastAPI endpoints
+and reports throughput and p50/p95/p99 latency per endpoint, plus the
+per-agent LLM figures from /metrics. Pair it with mock_llm_server.py to
+load-test without a GPU:
+
+    python mock_llm_server.py --port 11435 --latency lognormal:-1.0,0.5
+    python airoi_server.py
+    python load_test.py --llm-url http://localhost:11435 --sessions 50 --concurrency 10
+
+Requests the server sheds with 429 are retried after Retry-After, up to
+--max-retries times, and counted in the shed column.
+
+--mode orchestrator drives AIROIOrchestrator in-process instead, which
+measures the agent pipeline without the HTTP layer.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+
+CLIENT_MESSAGES = [
+    "We are a 120 person logistics company running SAP for finance and a homegrown TMS.",
+    "Invoices are reconciled by hand in spreadsheets, it takes three people two days a month.",
+    "Customer support answers around 400 tickets a week, mostly shipment status questions.",
+    "Our data lives in SAP, a Postgres database for the TMS and a lot of Excel on SharePoint.",
+    "We have two developers and no data science team, budget is around 50k for this year.",
+    "GDPR matters for us since we handle consignee addresses across the EU.",
+    "Dispatchers plan routes manually every morning which takes about an hour each.",
+    "The biggest pain is that management only sees KPIs a week after month end.",
+]
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+
+class Results:
+    """Latencies and failures per operation"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.shed: Dict[str, int] = {}
+        self.started = time.monotonic()
+        self.finished = self.started
+
+    def record(self, operation: str, seconds: float, ok: bool):
+        if ok:
+            self.latencies.setdefault(operation, []).append(seconds * 1000)
+        else:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    def record_shed(self, operation: str):
+        self.shed[operation] = self.shed.get(operation, 0) + 1
+
+    async def timed(self, operation: str, coro):
+        start = time.monotonic()
+        try:
+            result = await coro
+        except Exception:
+            self.record(operation, time.monotonic() - start, False)
+            raise
+        self.record(operation, time.monotonic() - start, True)
+        return result
+
+    def report(self) -> Dict[str, Any]:
+        elapsed = self.finished - self.started
+        operations = {}
+        for name in sorted(set(self.latencies) | set(self.errors) | set(self.shed)):
+            values = self.latencies.get(name, [])
+            operations[name] = {
+                "requests": len(values),
+                "errors": self.errors.get(name, 0),
+                "shed": self.shed.get(name, 0),
+                "throughput_per_second": round(len(values) / elapsed, 2) if elapsed else None,
+                "p50_ms": percentile(values, 0.50),
+                "p95_ms": percentile(values, 0.95),
+                "p99_ms": percentile(values, 0.99)
+            }
+        return {"elapsed_seconds": round(elapsed, 2), "operations": operations}
+
+
+async def http_session(client: httpx.AsyncClient, args, results: Results, index: int):
+    """One client going through discovery and, optionally, the assessment"""
+
+    async def request(operation: str, method: str, url: str, **kwargs) -> httpx.Response:
+        async def send():
+            for attempt in range(args.max_retries + 1):
+                response = await client.request(method, url, **kwargs)
+                if response.status_code != 429 or attempt == args.max_retries:
+                    break
+                results.record_shed(operation)
+                await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+            response.raise_for_status()
+            return response
+        return await results.timed(operation, send())
+
+    response = await request("POST /sessions", "POST", "/sessions", json={
+        "company_name": f"Load Test {index}",
+        "llm_config": {"provider": args.llm_provider, "url": args.llm_url, "model": args.llm_model}
+    })
+    session_id = response.json()["session_id"]
+
+    await request("POST /start-discovery", "POST", f"/sessions/{session_id}/start-discovery")
+
+    for turn in range(args.turns):
+        await asyncio.sleep(random.uniform(0, args.think_time))
+        await request("POST /chat", "POST", f"/sessions/{session_id}/chat", json={
+            "role": "user",
+            "content": CLIENT_MESSAGES[(index + turn) % len(CLIENT_MESSAGES)]
+        })
+
+    await request("GET /conversation", "GET", f"/sessions/{session_id}/conversation")
+
+    if args.assess:
+        await request("POST /generate-assessment", "POST", f"/sessions/{session_id}/generate-assessment?wait=true")
+        await request("GET /assessment", "GET", f"/sessions/{session_id}/assessment")
+
+
+async def orchestrator_session(orchestrator, args, results: Results, index: int):
+    """One conversation driven straight through the agents"""
+    from history_manager import ConversationMemory
+
+    history: List[Dict[str, Any]] = []
+    memory = ConversationMemory()
+
+    for turn in range(args.turns):
+        history.append({"role": "user", "content": CLIENT_MESSAGES[(index + turn) % len(CLIENT_MESSAGES)]})
+        reply = await results.timed(
+            "discovery.continue_audit",
+            orchestrator.discovery.continue_audit(history, memory=memory)
+        )
+        history.append({"role": "assistant", "content": reply})
+
+    if args.assess:
+        await results.timed(
+            "orchestrator.run_full_assessment",
+            orchestrator.run_full_assessment(history, memory=memory)
+        )
+
+
+async def run_sessions(args, results: Results, session) -> int:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    failed = 0
+
+    async def guarded(index: int):
+        nonlocal failed
+        async with semaphore:
+            try:
+                await session(index)
+            except Exception as e:
+                failed += 1
+                if args.verbose:
+                    print(f"Session {index} failed: {e}")
+
+    await asyncio.gather(*(guarded(i) for i in range(args.sessions)))
+    results.finished = time.monotonic()
+    return failed
+
+
+async def run_http(args) -> Dict[str, Any]:
+    results = Results()
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        failed = await run_sessions(
+            args, results, lambda i: http_session(client, args, results, i)
+        )
+        report = results.report()
+        report["failed_sessions"] = failed
+        try:
+            metrics = (await client.get("/metrics", params={"window_hours": 1})).json()
+            report["agents"] = metrics["llm"]["by_agent"]
+            report["admission"] = metrics.get("admission")
+        except Exception as e:
+            report["agents"] = f"unavailable: {e}"
+    return report
+
+
+async def run_orchestrator(args) -> Dict[str, Any]:
+    from airoi_backend import AIROIOrchestrator, LLMProvider
+    from database import Database
+    from llm_tracing import TraceStore
+    from migrations import migrate
+
+    import config
+
+    trace_db = Database(args.trace_db)
+    trace_db.open()
+    await trace_db.write(migrate)
+    try:
+        trace_store = TraceStore(trace_db)
+        llm = LLMProvider(
+            provider=args.llm_provider,
+            url=args.llm_url,
+            model=args.llm_model,
+            base_url=args.llm_url if args.llm_provider == "openai" else None,
+            tracer=trace_store
+        )
+        orchestrator = AIROIOrchestrator(
+            llm,
+            history_token_budget=config.HISTORY_TOKEN_BUDGET,
+            prompt_budgets=config.PROMPT_TOKEN_BUDGETS
+        )
+
+        results = Results()
+        failed = await run_sessions(
+            args, results, lambda i: orchestrator_session(orchestrator, args, results, i)
+        )
+        report = results.report()
+        report["failed_sessions"] = failed
+        report["agents"] = (await trace_store.summary(window_hours=1))["by_agent"]
+        return report
+    finally:
+        trace_db.close()
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\nElapsed: {report['elapsed_seconds']}s, failed sessions: {report['failed_sessions']}\n")
+    header = f"{'operation':<36} {'req':>6} {'err':>5} {'shed':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, row in report["operations"].items():
+        print(
+            f"{name:<36} {row['requests']:>6} {row['errors']:>5} {row['shed']:>5} "
+            f"{row['throughput_per_second'] or '-':>8} "
+            f"{row['p50_ms'] or '-':>9} {row['p95_ms'] or '-':>9} {row['p99_ms'] or '-':>9}"
+        )
+
+    agents = report.get("agents")
+    if isinstance(agents, list) and agents:
+        print(f"\n{'agent':<36} {'calls':>6} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ttft p95':>9}")
+        print("-" * len(header))
+        for row in agents:
+            print(
+                f"{row['agent']:<36} {row['calls']:>6} {row['errors']:>5} {row['p50_latency_ms'] or '-':>9} "
+                f"{row['p95_latency_ms'] or '-':>9} {row['p99_latency_ms'] or '-':>9} {row['p95_ttft_ms'] or '-':>9}"
+            )
+    elif agents:
+        print(f"\nAgent metrics {agents}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the AIROI server")
+    parser.add_argument("--mode", choices=["http", "orchestrator"], default="http")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--sessions", type=int, default=20, help="Total sessions to replay")
+    parser.add_argument("--concurrency", type=int, default=5, help="Sessions running at once")
+    parser.add_argument("--turns", type=int, default=4, help="Chat turns per session")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Max random pause before each turn (s)")
+    parser.add_argument("--assess", action="store_true", help="Generate the full assessment at the end")
+    parser.add_argument("--llm-provider", default="ollama")
+    parser.add_argument("--llm-url", default="http://localhost:11435")
+    parser.add_argument("--llm-model", default="llama3.1")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--max-retries", type=int, default=3, help="Retries of a request shed with 429")
+    parser.add_argument("--trace-db", default="load_test_traces.db", help="Trace database for orchestrator mode")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    runner = run_http if args.mode == "http" else run_orchestrator
+    report = asyncio.run(runner(args))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Schema migrations for the AIROI database
+
+The schema version is kept in SQLite's user_version pragma. Each migration
+runs in its own transaction together with the version bump, so a failed
+migration leaves the database at the previous version.
+"""
+
+import sqlite3
+from typing import Callable, List, Tuple
+
+from column_codec import ColumnCodec, dictionary_fetcher
+from queries import to_us
+from search import register_functions
+
+
+def _baseline(conn: sqlite3.Connection):
+    """Tables as originally created by init_db"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            company_name TEXT,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP,
+            status TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS conversations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT,
+            role TEXT,
+            agent TEXT,
+            content TEXT,
+            timestamp TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES sessions(id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS assessments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT,
+            audit_data TEXT,
+            opportunities TEXT,
+            roadmap TEXT,
+            created_at TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES sessions(id)
+        )
+    ''')
+
+
+def _integer_timestamps(conn: sqlite3.Connection):
+    """Store timestamps as epoch microseconds instead of ISO text"""
+    for table, columns in (
+        ("sessions", ("created_at", "updated_at")),
+        ("conversations", ("timestamp",)),
+        ("assessments", ("created_at",)),
+    ):
+        for column in columns:
+            rows = conn.execute(
+                f"SELECT rowid, {column} FROM {table} WHERE typeof({column}) = 'text'"
+            ).fetchall()
+            conn.executemany(
+                f"UPDATE {table} SET {column} = ? WHERE rowid = ?",
+                [(to_us(value), rowid) for rowid, value in rows]
+            )
+
+
+def _session_time_indexes(conn: sqlite3.Connection):
+    """Indexes matching the conversation and assessment lookups"""
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_conversations_session_time "
+        "ON conversations (session_id, timestamp, id)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_assessments_session_created "
+        "ON assessments (session_id, created_at)"
+    )
+    conn.execute("ANALYZE")
+
+
+def _session_state(conn: sqlite3.Connection):
+    """Columns needed to rehydrate a session that is not in memory"""
+    conn.execute("ALTER TABLE sessions ADD COLUMN llm_config TEXT")
+    conn.execute("ALTER TABLE sessions ADD COLUMN history_summary TEXT")
+    conn.execute("ALTER TABLE sessions ADD COLUMN summarized_count INTEGER NOT NULL DEFAULT 0")
+
+
+def _shared_sessions(conn: sqlite3.Connection):
+    """Session versions, locks and events for several worker processes"""
+    conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS session_locks (
+            session_id TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS session_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel TEXT NOT NULL,
+            message TEXT NOT NULL,
+            created_at INTEGER NOT NULL
+        )
+    ''')
+
+
+def _assessment_jobs(conn: sqlite3.Connection):
+    """Background assessment jobs and their per-stage checkpoints"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS assessment_jobs (
+            id TEXT PRIMARY KEY,
+            session_id TEXT NOT NULL,
+            status TEXT NOT NULL,
+            stage TEXT,
+            stages TEXT,
+            error TEXT,
+            owner TEXT,
+            lease_expires_at INTEGER NOT NULL DEFAULT 0,
+            assessment_id INTEGER,
+            created_at INTEGER NOT NULL,
+            updated_at INTEGER NOT NULL,
+            FOREIGN KEY (session_id) REFERENCES sessions(id)
+        )
+    ''')
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_assessment_jobs_session_created "
+        "ON assessment_jobs (session_id, created_at)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_assessment_jobs_status_lease "
+        "ON assessment_jobs (status, lease_expires_at)"
+    )
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS assessment_stages (
+            job_id TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            result TEXT NOT NULL,
+            completed_at INTEGER NOT NULL,
+            PRIMARY KEY (job_id, stage),
+            FOREIGN KEY (job_id) REFERENCES assessment_jobs(id)
+        )
+    ''')
+
+
+def _versioned_assessments(conn: sqlite3.Connection):
+    """Stage input hashes and numbered assessment versions per session"""
+    conn.execute("ALTER TABLE assessment_stages ADD COLUMN input_hash TEXT")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_assessment_stages_hash ON assessment_stages (input_hash)"
+    )
+    conn.execute("ALTER TABLE assessments ADD COLUMN version INTEGER")
+    conn.execute("ALTER TABLE assessments ADD COLUMN job_id TEXT")
+    conn.execute("ALTER TABLE assessments ADD COLUMN input_hashes TEXT")
+    # Existing assessments are numbered in the order they were generated
+    conn.execute('''
+        UPDATE assessments SET version = (
+            SELECT COUNT(*) FROM assessments AS earlier
+            WHERE earlier.session_id = assessments.session_id
+            AND (earlier.created_at < assessments.created_at
+                 OR (earlier.created_at = assessments.created_at AND earlier.id <= assessments.id))
+        )
+    ''')
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_assessments_session_version "
+        "ON assessments (session_id, version)"
+    )
+
+
+def _compression_dictionaries(conn: sqlite3.Connection):
+    """Dictionaries for compressed text columns, see column_codec.py"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS compression_dictionaries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            algorithm TEXT NOT NULL,
+            dictionary BLOB NOT NULL,
+            samples INTEGER NOT NULL,
+            created_at INTEGER NOT NULL
+        )
+    ''')
+
+
+def _full_text_search(conn: sqlite3.Connection):
+    """FTS5 indexes over conversation messages and assessments, see search.py"""
+    # The views decompress the stored values, so the indexes keep no copy
+    # of the text: snippets are cut from the rows they point to. session_id
+    # is indexed so session filters are part of the match
+    codec = ColumnCodec("off")
+    codec.fetch_dictionary = dictionary_fetcher(conn)
+    register_functions(conn, codec)
+    conn.execute('''
+        CREATE VIEW IF NOT EXISTS conversations_text AS
+        SELECT id, session_id, decompress(content) AS content FROM conversations
+    ''')
+    # Only the string values of the assessment JSON, not its keys
+    conn.execute('''
+        CREATE VIEW IF NOT EXISTS assessments_text AS
+        SELECT id, session_id,
+            json_text(decompress(audit_data)) AS audit_data,
+            json_text(decompress(opportunities)) AS opportunities,
+            json_text(decompress(roadmap)) AS roadmap
+        FROM assessments
+    ''')
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5(
+            session_id, content,
+            content='conversations_text', content_rowid='id',
+            tokenize='porter unicode61 remove_diacritics 2'
+        )
+    ''')
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS assessments_fts USING fts5(
+            session_id, audit_data, opportunities, roadmap,
+            content='assessments_text', content_rowid='id',
+            tokenize='porter unicode61 remove_diacritics 2'
+        )
+    ''')
+    conn.execute("INSERT INTO conversations_fts (conversations_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO assessments_fts (assessments_fts) VALUES ('rebuild')")
+
+
+def _session_archive(conn: sqlite3.Connection):
+    """Stubs of sessions moved to the archive, see archive.py"""
+    conn.execute("ALTER TABLE sessions ADD COLUMN archive TEXT")
+    # The archiver only ever looks for idle sessions that are still hot
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sessions_hot_updated ON sessions (updated_at) "
+        "WHERE archive IS NULL"
+    )
+
+
+def _llm_traces(conn: sqlite3.Connection):
+    """LLM call spans, see llm_tracing.py"""
+    # Databases traced before this migration already have the table, with
+    # ISO text start times
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS llm_traces (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at INTEGER NOT NULL,
+            agent TEXT,
+            provider TEXT,
+            model TEXT,
+            prompt_hash TEXT,
+            prompt_chars INTEGER,
+            streamed INTEGER,
+            queue_wait_ms REAL,
+            ttft_ms REAL,
+            latency_ms REAL,
+            prompt_tokens INTEGER,
+            completion_tokens INTEGER,
+            cached_tokens INTEGER,
+            cache_hit INTEGER,
+            status TEXT,
+            error TEXT,
+            attributes TEXT
+        )
+    ''')
+    rows = conn.execute(
+        "SELECT rowid, started_at FROM llm_traces WHERE typeof(started_at) = 'text'"
+    ).fetchall()
+    conn.executemany(
+        "UPDATE llm_traces SET started_at = ? WHERE rowid = ?",
+        [(to_us(value), rowid) for rowid, value in rows]
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_traces_started ON llm_traces (started_at)")
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "baseline tables", _baseline),
+    (2, "integer epoch-microsecond timestamps", _integer_timestamps),
+    (3, "session/time indexes", _session_time_indexes),
+    (4, "session state for rehydration", _session_state),
+    (5, "shared session versions, locks and events", _shared_sessions),
+    (6, "assessment jobs and stage checkpoints", _assessment_jobs),
+    (7, "versioned assessments and stage input hashes", _versioned_assessments),
+    (8, "compression dictionaries", _compression_dictionaries),
+    (9, "full-text search indexes", _full_text_search),
+    (10, "session archive stubs", _session_archive),
+    (11, "LLM traces with integer timestamps", _llm_traces),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply pending migrations; returns the resulting schema version"""
+    version = schema_version(conn)
+    if version > LATEST_VERSION:
+        raise RuntimeError(
+            f"Database schema version {version} is newer than this code ({LATEST_VERSION})"
+        )
+
+    if conn.in_transaction:
+        conn.commit()
+    for number, description, apply in MIGRATIONS:
+        if number <= version:
+            continue
+        conn.execute("BEGIN")
+        try:
+            apply(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        print(f"Applied database migration {number}: {description}")
+        version = number
+
+    return version
@@ -0,0 +1,316 @@
+"""
+Mock LLM server for load testing
+
+Speaks the Ollama /api/chat and OpenAI-compatible /v1/chat/completions
+protocols with configurable latency, generation speed, streaming and error
+rate, so the AIROI pipeline can be load-tested without a GPU.
+
+Usage:
+    python mock_llm_server.py --port 11434 --latency lognormal:-1.0,0.5 --tps 40
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+WORDS = (
+    "the team spends hours each week reconciling invoices between the ERP and "
+    "spreadsheets which delays month end close and creates errors that customers "
+    "notice support tickets are routed by hand and answers are scattered across "
+    "shared drives so new staff take months to become productive"
+).split()
+
+
+class LatencyModel:
+    """
+    Prompt-processing delay before the first token
+
+    Spec formats: fixed:S, uniform:LO,HI, normal:MEAN,STD, lognormal:MU,SIGMA
+    (all in seconds; lognormal parameters are of the underlying normal).
+    """
+
+    def __init__(self, spec: str):
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",")] if params else []
+        if kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return random.uniform(*self.params)
+        if self.kind == "normal":
+            return max(0.0, random.gauss(*self.params))
+        return random.lognormvariate(*self.params)
+
+
+class MockSettings:
+    def __init__(
+        self,
+        latency: str = "fixed:0.2",
+        tokens_per_second: float = 40.0,
+        completion_tokens: str = "40,120",
+        error_rate: float = 0.0,
+        max_concurrency: int = 1,
+        load_seconds: float = 0.0,
+        model: str = "llama3.1:latest"
+    ):
+        self.latency = LatencyModel(latency)
+        self.tokens_per_second = tokens_per_second
+        low, _, high = completion_tokens.partition(",")
+        self.completion_tokens = (int(low), int(high or low))
+        self.error_rate = error_rate
+        self.load_seconds = load_seconds
+        self.model = model
+        # Ollama evaluates a limited number of requests at once per model
+        self.slots = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+
+settings = MockSettings()
+model_loaded = False
+app = FastAPI(title="Mock LLM")
+
+
+def sample_schema(schema: Dict[str, Any], depth: int = 0) -> Any:
+    """Produce a plausible value that satisfies a JSON schema"""
+    kind = schema.get("type")
+    if "enum" in schema:
+        return random.choice(schema["enum"])
+    if kind == "object":
+        properties = schema.get("properties", {})
+        if not properties and isinstance(schema.get("additionalProperties"), dict):
+            values = schema["additionalProperties"]
+            return {random.choice(WORDS): sample_schema(values, depth + 1) for _ in range(2)}
+        if not properties:
+            return {"name": random.choice(WORDS).title(), "detail": " ".join(random.sample(WORDS, 6))}
+        return {key: sample_schema(sub, depth + 1) for key, sub in properties.items()}
+    if kind == "array":
+        count = random.randint(1, 3) if depth < 3 else 1
+        return [sample_schema(schema.get("items", {"type": "string"}), depth + 1) for _ in range(count)]
+    if kind == "integer":
+        return random.randint(1, 200)
+    if kind == "number":
+        return round(random.uniform(1000, 50000), 2)
+    if kind == "boolean":
+        return random.random() < 0.5
+    return " ".join(random.sample(WORDS, random.randint(2, 6)))
+
+
+def completion_text(schema: Optional[Dict[str, Any]]) -> str:
+    if schema:
+        return json.dumps(sample_schema(schema))
+    count = random.randint(*settings.completion_tokens)
+    return " ".join(random.choice(WORDS) for _ in range(count))
+
+
+def split_tokens(text: str) -> List[str]:
+    """Roughly one token per 4 characters"""
+    return [text[i:i + 4] for i in range(0, len(text), 4)] or [""]
+
+
+def prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    return sum(len(m.get("content") or "") for m in messages) // 4
+
+
+async def ensure_loaded():
+    global model_loaded
+    if not model_loaded:
+        await asyncio.sleep(settings.load_seconds)
+        model_loaded = True
+
+
+class Generation:
+    """Simulates one request holding a model slot while it is evaluated"""
+
+    def __init__(self, messages: List[Dict[str, Any]], schema: Optional[Dict[str, Any]]):
+        self.messages = messages
+        self.tokens = split_tokens(completion_text(schema))
+        self.prompt_tokens = prompt_tokens(messages)
+        self.started = time.monotonic()
+        self.prompt_seconds = 0.0
+
+    async def __aenter__(self):
+        if settings.slots:
+            await settings.slots.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        if settings.slots:
+            settings.slots.release()
+        return False
+
+    async def prefill(self):
+        await ensure_loaded()
+        self.prompt_seconds = settings.latency.sample()
+        await asyncio.sleep(self.prompt_seconds)
+
+    async def tokens_paced(self):
+        delay = 1.0 / settings.tokens_per_second if settings.tokens_per_second else 0
+        for token in self.tokens:
+            await asyncio.sleep(delay)
+            yield token
+
+
+def should_fail() -> bool:
+    return random.random() < settings.error_rate
+
+
+def error_response() -> JSONResponse:
+    return JSONResponse(status_code=503, content={"error": "mock overload"})
+
+
+@app.post("/api/generate")
+async def ollama_generate(request: Request):
+    await ensure_loaded()
+    body = await request.json()
+    return {"model": body.get("model", settings.model), "response": "", "done": True}
+
+
+@app.get("/api/ps")
+async def ollama_ps():
+    return {"models": [{"name": settings.model, "model": settings.model}] if model_loaded else []}
+
+
+@app.post("/api/chat")
+async def ollama_chat(request: Request):
+    body = await request.json()
+    if should_fail():
+        return error_response()
+
+    schema = body.get("format") if isinstance(body.get("format"), dict) else None
+    generation = Generation(body.get("messages", []), schema)
+    model = body.get("model", settings.model)
+
+    def final_chunk() -> Dict[str, Any]:
+        return {
+            "model": model,
+            "done": True,
+            "total_duration": int((time.monotonic() - generation.started) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": generation.prompt_tokens,
+            "prompt_eval_duration": int(generation.prompt_seconds * 1e9),
+            "eval_count": len(generation.tokens)
+        }
+
+    if not body.get("stream", True):
+        async with generation:
+            await generation.prefill()
+            content = "".join([t async for t in generation.tokens_paced()])
+        return {
+            "message": {"role": "assistant", "content": content},
+            **final_chunk()
+        }
+
+    async def events():
+        async with generation:
+            await generation.prefill()
+            async for token in generation.tokens_paced():
+                yield json.dumps({
+                    "model": model,
+                    "message": {"role": "assistant", "content": token},
+                    "done": False
+                }) + "\n"
+            yield json.dumps(final_chunk()) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.post("/v1/chat/completions")
+async def openai_chat(request: Request):
+    body = await request.json()
+    if should_fail():
+        return error_response()
+
+    response_format = body.get("response_format") or {}
+    schema = (response_format.get("json_schema") or {}).get("schema")
+    generation = Generation(body.get("messages", []), schema)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    model = body.get("model", settings.model)
+
+    def usage() -> Dict[str, int]:
+        return {
+            "prompt_tokens": generation.prompt_tokens,
+            "completion_tokens": len(generation.tokens),
+            "total_tokens": generation.prompt_tokens + len(generation.tokens)
+        }
+
+    if not body.get("stream"):
+        async with generation:
+            await generation.prefill()
+            content = "".join([t async for t in generation.tokens_paced()])
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": usage()
+        }
+
+    include_usage = (body.get("stream_options") or {}).get("include_usage")
+
+    async def events():
+        async with generation:
+            await generation.prefill()
+            async for token in generation.tokens_paced():
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            if include_usage:
+                yield f"data: {json.dumps({'id': completion_id, 'choices': [], 'usage': usage()})}\n\n"
+            yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def main():
+    global settings, model_loaded
+
+    parser = argparse.ArgumentParser(description="Mock Ollama / OpenAI-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", default="fixed:0.2",
+                        help="Time to first token: fixed:S, uniform:LO,HI, normal:MEAN,STD, lognormal:MU,SIGMA")
+    parser.add_argument("--tps", type=float, default=40.0, help="Generated tokens per second per request")
+    parser.add_argument("--completion-tokens", default="40,120", help="Free-text completion length range")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--max-concurrency", type=int, default=1,
+                        help="Requests evaluated at once (Ollama's OLLAMA_NUM_PARALLEL), 0 = unlimited")
+    parser.add_argument("--load-seconds", type=float, default=0.0, help="Simulated model load time")
+    parser.add_argument("--model", default="llama3.1:latest")
+    args = parser.parse_args()
+
+    settings = MockSettings(
+        latency=args.latency,
+        tokens_per_second=args.tps,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        max_concurrency=args.max_concurrency,
+        load_seconds=args.load_seconds,
+        model=args.model
+    )
+    model_loaded = args.load_seconds == 0
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Token-aware prompt building for agent payloads
+
+Structured data embedded in agent prompts is serialized compactly, stripped
+of empty fields, has repeated records replaced by a back-reference to their
+first occurrence, and is shrunk to a per-agent token budget. Every prompt also reports how many tokens that
+saved compared with pretty-printed JSON.
+"""
+
+import json
+from typing import Any, Dict, List
+
+from tokens import estimate_tokens, truncate_to_tokens
+
+
+# Token budget of the data embedded in each agent's prompt
+DEFAULT_PROMPT_BUDGETS = {
+    "opportunity_analyzer": 3000,
+    "roadmap_strategist": 4000,
+    "implementation_assistant": 1500,
+}
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def prune(value: Any) -> Any:
+    """Drop None, empty strings, lists and dicts at every level"""
+    if isinstance(value, dict):
+        pruned = {k: prune(v) for k, v in value.items()}
+        return {k: v for k, v in pruned.items() if not _is_empty(v)}
+    if isinstance(value, list):
+        pruned = [prune(v) for v in value]
+        return [v for v in pruned if not _is_empty(v)]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def _reference(value: Any, seen: Dict[str, str], path: str) -> Any:
+    """A back-reference if value already appeared and is longer than the reference"""
+    key = compact_json(value)
+    if key in seen:
+        reference = f"same as {seen[key]}"
+        return reference if len(reference) < len(key) else None
+    seen[key] = path
+    return None
+
+
+def dedupe(value: Any, seen: Dict[str, str], path: str) -> Any:
+    """
+    Replace records that already appeared earlier in the prompt
+
+    seen maps the compact JSON of each record (dict) to the path it first
+    appeared at, e.g. OPPORTUNITIES[0], and is updated in place so repeats
+    are found across sections as well as within them. Only whole records
+    are replaced; the fields of a record that is kept are never dropped.
+    """
+    if isinstance(value, dict):
+        reference = _reference(value, seen, path)
+        if reference is not None:
+            return reference
+        return {key: dedupe(item, seen, f"{path}.{key}") for key, item in value.items()}
+    if isinstance(value, list):
+        return [dedupe(item, seen, f"{path}[{i}]") for i, item in enumerate(value)]
+    return value
+
+
+def _shrink(value: Any) -> Any:
+    """
+    A slightly smaller version of value, or None if it cannot shrink
+
+    Lists lose their last item, strings are cut by a quarter and dicts shrink
+    their largest member.
+    """
+    if isinstance(value, list):
+        if len(value) > 1:
+            return value[:-1]
+        if value:
+            inner = _shrink(value[0])
+            return [inner] if inner is not None else None
+        return None
+    if isinstance(value, str):
+        tokens = estimate_tokens(value)
+        if tokens <= 8:
+            return None
+        return truncate_to_tokens(value, tokens * 3 // 4)
+    if isinstance(value, dict) and value:
+        largest = max(value, key=lambda k: len(compact_json(value[k])))
+        inner = _shrink(value[largest])
+        if inner is None:
+            return {k: v for k, v in value.items() if k != largest} or None
+        return {**value, largest: inner}
+    return None
+
+
+class PromptBuilder:
+    """
+    Assembles labelled data sections into a prompt within a token budget
+
+    Sections with a lower priority are shrunk first when the budget is
+    exceeded. A section or record repeating an earlier one is sent as a
+    back-reference to it.
+    """
+
+    def __init__(self, token_budget: int):
+        self.token_budget = token_budget
+        self.sections: List[Dict[str, Any]] = []
+        self.stats: Dict[str, Any] = {}
+
+    def add(self, title: str, value: Any, priority: int = 0) -> "PromptBuilder":
+        self.sections.append({"title": title, "value": value, "priority": priority})
+        return self
+
+    def _render(self, sections: List[Dict[str, Any]]) -> str:
+        return "\n\n".join(
+            f"{s['title']}:\n{compact_json(s['value'])}" for s in sections if not _is_empty(s["value"])
+        )
+
+    def build(self) -> str:
+        baseline = "\n\n".join(
+            f"{s['title']}:\n{json.dumps(s['value'], indent=2, ensure_ascii=False)}"
+            for s in self.sections
+        )
+
+        seen: Dict[str, str] = {}
+        sections = []
+        for section in self.sections:
+            value = prune(section["value"])
+            # dedupe compares records; a repeated list section is compared here
+            reference = _reference(value, seen, section["title"]) if isinstance(value, list) else None
+            value = reference or dedupe(value, seen, section["title"])
+            sections.append({**section, "value": value})
+
+        text = self._render(sections)
+        truncated = False
+        # Shrink the least important section that can still shrink
+        order = sorted(range(len(sections)), key=lambda i: sections[i]["priority"])
+        while estimate_tokens(text) > self.token_budget:
+            for index in order:
+                smaller = _shrink(sections[index]["value"])
+                if smaller is not None:
+                    sections[index]["value"] = smaller
+                    break
+                if not _is_empty(sections[index]["value"]):
+                    sections[index]["value"] = None
+                    break
+            else:
+                break
+            truncated = True
+            text = self._render(sections)
+
+        baseline_tokens = estimate_tokens(baseline)
+        prompt_tokens = estimate_tokens(text)
+        self.stats = {
+            "payload_tokens": prompt_tokens,
+            "payload_baseline_tokens": baseline_tokens,
+            "prompt_tokens_saved": max(0, baseline_tokens - prompt_tokens),
+            "payload_truncated": truncated
+        }
+        return text
+
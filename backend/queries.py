@@ -0,0 +1,363 @@
+"""
+SQL for the AIROI database
+
+Statements used on hot paths live here, together with the timestamp
+helpers, so they can be checked against the schema (see
+test_migrations.py) without importing the web server.
+
+Timestamps are stored as integer microseconds since the Unix epoch: they
+sort and compare as plain integers, index compactly and convert to ISO 8601
+only at the API boundary.
+"""
+
+import base64
+from datetime import datetime, timezone
+from typing import Optional, Tuple, Union
+
+
+def now_us() -> int:
+    """Current time in microseconds since the epoch"""
+    return to_us(datetime.now(timezone.utc))
+
+
+def to_us(value: Union[datetime, str]) -> int:
+    """Convert a datetime or ISO 8601 string to epoch microseconds"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        # Naive timestamps were always written in server local time
+        value = value.astimezone()
+    delta = value - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def to_iso(value: Optional[int]) -> Optional[str]:
+    """Convert epoch microseconds to a local ISO 8601 string"""
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value / 1_000_000).isoformat()
+
+
+INSERT_SESSION = (
+    "INSERT INTO sessions (id, company_name, created_at, updated_at, status, llm_config) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+# Everything needed to rehydrate an evicted session
+SELECT_SESSION_STATE = (
+    "SELECT company_name, created_at, status, llm_config, history_summary, summarized_count, version, "
+    "archive FROM sessions WHERE id = ?"
+)
+
+# What GET /sessions/{id} reports, read without restoring an archived session
+SELECT_SESSION_INFO = "SELECT company_name, created_at, status FROM sessions WHERE id = ?"
+
+# Every save bumps the version so other workers notice their copy is stale
+UPDATE_SESSION_SUMMARY = (
+    "UPDATE sessions SET history_summary = ?, summarized_count = ?, updated_at = ?, "
+    "version = version + 1 WHERE id = ? RETURNING version"
+)
+
+SELECT_SESSION_VERSION = "SELECT version FROM sessions WHERE id = ?"
+
+# Cross-process session locks; an expired lock can be taken over
+ACQUIRE_SESSION_LOCK = (
+    "INSERT INTO session_locks (session_id, owner, expires_at) VALUES (?, ?, ?) "
+    "ON CONFLICT (session_id) DO UPDATE SET owner = excluded.owner, "
+    "expires_at = excluded.expires_at WHERE session_locks.expires_at < ?"
+)
+
+RELEASE_SESSION_LOCK = "DELETE FROM session_locks WHERE session_id = ? AND owner = ?"
+
+# Extends the lease while a long turn holds the lock
+RENEW_SESSION_LOCK = "UPDATE session_locks SET expires_at = ? WHERE session_id = ? AND owner = ?"
+
+SELECT_SESSION_LOCK_OWNER = "SELECT owner FROM session_locks WHERE session_id = ?"
+
+# Events fanned out to the WebSocket connections of every worker
+INSERT_SESSION_EVENT = "INSERT INTO session_events (channel, message, created_at) VALUES (?, ?, ?)"
+
+SELECT_LAST_SESSION_EVENT = "SELECT MAX(id) FROM session_events"
+
+SELECT_SESSION_EVENTS = "SELECT id, channel, message FROM session_events WHERE id > ? ORDER BY id"
+
+DELETE_SESSION_EVENTS = "DELETE FROM session_events WHERE created_at < ?"
+
+# LLM call spans (llm_tracing.py): the /metrics window, and retention
+SELECT_LLM_TRACES = (
+    "SELECT agent, provider, model, status, queue_wait_ms, ttft_ms, latency_ms, "
+    "prompt_tokens, completion_tokens, cache_hit, "
+    "json_extract(attributes, '$.prompt_tokens_saved') "
+    "FROM llm_traces WHERE started_at >= ?"
+)
+
+SELECT_SLOWEST_LLM_TRACES = (
+    "SELECT started_at, agent, provider, model, prompt_hash, prompt_chars, "
+    "queue_wait_ms, ttft_ms, latency_ms, prompt_tokens, completion_tokens "
+    "FROM llm_traces WHERE started_at >= ? AND status = 'ok' "
+    "ORDER BY latency_ms DESC LIMIT ?"
+)
+
+DELETE_LLM_TRACES = "DELETE FROM llm_traces WHERE started_at < ?"
+
+# conversations.content and the assessments JSON columns are written and
+# read through column_codec.ColumnCodec (Database.codec)
+INSERT_CONVERSATION = (
+    "INSERT INTO conversations (session_id, role, agent, content, timestamp) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+
+# Keyset pagination on (timestamp, id): every page is an index range scan,
+# however deep into the history it starts
+SELECT_CONVERSATION_FIRST_PAGE = (
+    "SELECT id, role, agent, content, timestamp FROM conversations "
+    "WHERE session_id = ? ORDER BY timestamp, id LIMIT ?"
+)
+
+SELECT_CONVERSATION_PAGE = (
+    "SELECT id, role, agent, content, timestamp FROM conversations "
+    "WHERE session_id = ? AND (timestamp, id) > (?, ?) ORDER BY timestamp, id LIMIT ?"
+)
+
+# Working history of a rehydrated session: the messages after those already
+# covered by the stored summary
+SELECT_CONVERSATION_FROM = (
+    "SELECT role, agent, content FROM conversations "
+    "WHERE session_id = ? ORDER BY timestamp, id LIMIT -1 OFFSET ?"
+)
+
+# Assessments are numbered per session, starting at 1
+INSERT_ASSESSMENT = (
+    "INSERT INTO assessments "
+    "(session_id, audit_data, opportunities, roadmap, created_at, job_id, input_hashes, version) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, "
+    "(SELECT COALESCE(MAX(version), 0) + 1 FROM assessments WHERE session_id = ?))"
+)
+
+ASSESSMENT_COLUMNS = "id, version, audit_data, opportunities, roadmap, input_hashes, created_at"
+
+SELECT_LATEST_ASSESSMENT = (
+    f"SELECT {ASSESSMENT_COLUMNS} FROM assessments "
+    "WHERE session_id = ? ORDER BY created_at DESC LIMIT 1"
+)
+
+SELECT_ASSESSMENT_VERSION = (
+    f"SELECT {ASSESSMENT_COLUMNS} FROM assessments WHERE session_id = ? AND version = ?"
+)
+
+SELECT_ASSESSMENT_VERSIONS = (
+    "SELECT version, job_id, input_hashes, created_at FROM assessments "
+    "WHERE session_id = ? ORDER BY version"
+)
+
+SELECT_ASSESSMENT = f"SELECT {ASSESSMENT_COLUMNS} FROM assessments WHERE id = ?"
+
+# Background assessment jobs. Jobs are leased: a worker owns a job while its
+# lease is current, and any worker may take over a job whose lease expired
+INSERT_ASSESSMENT_JOB = (
+    "INSERT INTO assessment_jobs (id, session_id, status, created_at, updated_at) "
+    "VALUES (?, ?, 'queued', ?, ?)"
+)
+
+ASSESSMENT_JOB_COLUMNS = (
+    "id, session_id, status, stage, stages, error, assessment_id, created_at, updated_at"
+)
+
+SELECT_ASSESSMENT_JOB = f"SELECT {ASSESSMENT_JOB_COLUMNS} FROM assessment_jobs WHERE id = ?"
+
+SELECT_LATEST_ASSESSMENT_JOB = (
+    f"SELECT {ASSESSMENT_JOB_COLUMNS} FROM assessment_jobs "
+    "WHERE session_id = ? ORDER BY created_at DESC LIMIT 1"
+)
+
+# Unfinished jobs whose worker went away
+SELECT_ORPHANED_ASSESSMENT_JOBS = (
+    "SELECT id, session_id FROM assessment_jobs "
+    "WHERE status IN ('queued', 'running') AND lease_expires_at < ?"
+)
+
+CLAIM_ASSESSMENT_JOB = (
+    "UPDATE assessment_jobs SET status = 'running', error = NULL, owner = ?, "
+    "lease_expires_at = ?, updated_at = ? "
+    "WHERE id = ? AND status IN ('queued', 'running', 'failed') AND lease_expires_at < ?"
+)
+
+RENEW_ASSESSMENT_JOB = (
+    "UPDATE assessment_jobs SET lease_expires_at = ? WHERE id = ? AND owner = ?"
+)
+
+UPDATE_ASSESSMENT_JOB_PROGRESS = (
+    "UPDATE assessment_jobs SET stage = ?, stages = ?, updated_at = ? WHERE id = ? AND owner = ?"
+)
+
+FINISH_ASSESSMENT_JOB = (
+    "UPDATE assessment_jobs SET status = ?, error = ?, assessment_id = ?, "
+    "lease_expires_at = 0, updated_at = ? WHERE id = ? AND owner = ?"
+)
+
+# Give up a lease on shutdown so another worker resumes the job right away
+RELEASE_ASSESSMENT_JOB = (
+    "UPDATE assessment_jobs SET lease_expires_at = 0 WHERE id = ? AND owner = ?"
+)
+
+# Most recent result of any job of the session computed from the same inputs
+SELECT_REUSABLE_STAGE = (
+    "SELECT s.job_id, s.result FROM assessment_stages AS s "
+    "JOIN assessment_jobs AS j ON j.id = s.job_id "
+    "WHERE s.input_hash = ? AND j.session_id = ? ORDER BY s.completed_at DESC LIMIT 1"
+)
+
+SELECT_ASSESSMENT_STAGES = (
+    "SELECT stage, input_hash, completed_at FROM assessment_stages "
+    "WHERE job_id = ? ORDER BY completed_at"
+)
+
+INSERT_ASSESSMENT_STAGE = (
+    "INSERT OR REPLACE INTO assessment_stages (job_id, stage, input_hash, result, completed_at) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+
+# Dictionaries of the compressed text columns
+INSERT_COMPRESSION_DICTIONARY = (
+    "INSERT INTO compression_dictionaries (algorithm, dictionary, samples, created_at) "
+    "VALUES (?, ?, ?, ?)"
+)
+
+SELECT_COMPRESSION_DICTIONARY = (
+    "SELECT algorithm, dictionary FROM compression_dictionaries WHERE id = ?"
+)
+
+SELECT_LATEST_COMPRESSION_DICTIONARY = (
+    "SELECT id, dictionary FROM compression_dictionaries "
+    "WHERE algorithm = ? ORDER BY id DESC LIMIT 1"
+)
+
+# Full-text search, see search.py. Matches are ranked by bm25 (lower is
+# better) or ordered by recency; snippets are only cut for the page of
+# results returned
+SELECT_SESSIONS_BY_COMPANY = "SELECT id FROM sessions WHERE company_name LIKE ? ESCAPE '\\'"
+
+INSERT_CONVERSATION_FTS = "INSERT INTO conversations_fts (rowid, session_id, content) VALUES (?, ?, ?)"
+
+INSERT_ASSESSMENT_FTS = (
+    "INSERT INTO assessments_fts (rowid, session_id, audit_data, opportunities, roadmap) "
+    "SELECT id, session_id, audit_data, opportunities, roadmap FROM assessments_text WHERE id = ?"
+)
+
+SEARCH_CONVERSATIONS = (
+    "SELECT m.id, m.session_id, m.snippet, m.score, c.role, c.agent, c.timestamp, s.company_name "
+    "FROM (SELECT rowid AS id, session_id, "
+    "snippet(conversations_fts, 1, char(2), char(3), '…', 16) AS snippet, rank AS score "
+    "FROM conversations_fts WHERE conversations_fts MATCH ?{filters} "
+    "ORDER BY {order} LIMIT ? OFFSET ?) AS m "
+    "JOIN conversations AS c ON c.id = m.id LEFT JOIN sessions AS s ON s.id = m.session_id "
+    "ORDER BY {outer_order}"
+)
+
+# Matches in snippets are between char(2) and char(3) (see
+# search.SNIPPET_START). The first section whose snippet holds a match is
+# the one shown
+SEARCH_ASSESSMENTS = (
+    "SELECT m.id, m.session_id, m.score, a.version, a.created_at, s.company_name, "
+    "CASE WHEN instr(m.audit_data, char(2)) THEN 'audit_data' "
+    "WHEN instr(m.opportunities, char(2)) THEN 'opportunities' ELSE 'roadmap' END AS section, "
+    "CASE WHEN instr(m.audit_data, char(2)) THEN m.audit_data "
+    "WHEN instr(m.opportunities, char(2)) THEN m.opportunities ELSE m.roadmap END AS snippet "
+    "FROM (SELECT rowid AS id, session_id, "
+    "snippet(assessments_fts, 1, char(2), char(3), '…', 16) AS audit_data, "
+    "snippet(assessments_fts, 2, char(2), char(3), '…', 16) AS opportunities, "
+    "snippet(assessments_fts, 3, char(2), char(3), '…', 16) AS roadmap, rank AS score "
+    "FROM assessments_fts WHERE assessments_fts MATCH ?{filters} "
+    "ORDER BY {order} LIMIT ? OFFSET ?) AS m "
+    "JOIN assessments AS a ON a.id = m.id LEFT JOIN sessions AS s ON s.id = m.session_id "
+    "ORDER BY {outer_order}"
+)
+
+# Session archive, see archive.py. An archived session keeps its sessions
+# row as a stub pointing at the segment holding the rest of its rows
+SELECT_SESSION_ARCHIVE = "SELECT archive FROM sessions WHERE id = ?"
+
+# Last activity is the latest of any row of the session; sessions with a
+# running job or a held lock are never idle. Candidates come in the order
+# of the partial index, least recently updated first
+SELECT_IDLE_SESSIONS = (
+    "SELECT id, last_active FROM (SELECT s.id, MAX(s.updated_at, "
+    "COALESCE((SELECT MAX(timestamp) FROM conversations WHERE session_id = s.id), 0), "
+    "COALESCE((SELECT MAX(created_at) FROM assessments WHERE session_id = s.id), 0), "
+    "COALESCE((SELECT MAX(updated_at) FROM assessment_jobs WHERE session_id = s.id), 0)"
+    ") AS last_active FROM sessions AS s "
+    "WHERE s.archive IS NULL AND s.updated_at < ? "
+    "AND NOT EXISTS (SELECT 1 FROM assessment_jobs AS j "
+    "WHERE j.session_id = s.id AND j.status IN ('queued', 'running')) "
+    "AND NOT EXISTS (SELECT 1 FROM session_locks AS l WHERE l.session_id = s.id AND l.expires_at > ?) "
+    "ORDER BY s.updated_at) WHERE last_active < ? LIMIT ?"
+)
+
+# Changes with every row written for the session (messages and
+# assessments are append-only, job progress bumps updated_at)
+SELECT_SESSION_WATERMARK = (
+    "SELECT version, "
+    "(SELECT MAX(id) FROM conversations WHERE session_id = ?), "
+    "(SELECT MAX(id) FROM assessments WHERE session_id = ?), "
+    "(SELECT MAX(updated_at) FROM assessment_jobs WHERE session_id = ?) "
+    "FROM sessions WHERE id = ? AND archive IS NULL"
+)
+
+DELETE_SESSION_CONVERSATIONS_FTS = (
+    "INSERT INTO conversations_fts (conversations_fts, rowid, session_id, content) "
+    "SELECT 'delete', id, session_id, content FROM conversations_text WHERE session_id = ?"
+)
+
+DELETE_SESSION_ASSESSMENTS_FTS = (
+    "INSERT INTO assessments_fts (assessments_fts, rowid, session_id, audit_data, opportunities, roadmap) "
+    "SELECT 'delete', id, session_id, audit_data, opportunities, roadmap "
+    "FROM assessments_text WHERE session_id = ?"
+)
+
+DELETE_ARCHIVED_ROWS = (
+    "DELETE FROM assessment_stages WHERE job_id IN (SELECT id FROM assessment_jobs WHERE session_id = ?)",
+    "DELETE FROM assessment_jobs WHERE session_id = ?",
+    "DELETE FROM assessments WHERE session_id = ?",
+    "DELETE FROM conversations WHERE session_id = ?",
+)
+
+# The version bump makes other workers drop their cached copy
+ARCHIVE_SESSION = (
+    "UPDATE sessions SET status = 'archived', archive = ?, updated_at = ?, version = version + 1 "
+    "WHERE id = ?"
+)
+
+RESTORE_SESSION = (
+    "UPDATE sessions SET status = 'active', archive = NULL, updated_at = ? WHERE id = ? AND archive = ?"
+)
+
+SELECT_ARCHIVE_SEGMENTS = "SELECT DISTINCT archive FROM sessions WHERE archive IS NOT NULL"
+
+SELECT_SESSION_TIERS = (
+    "SELECT CASE WHEN archive IS NULL THEN 'hot' ELSE 'archived' END AS tier, COUNT(*) "
+    "FROM sessions GROUP BY tier"
+)
+
+# Hot read queries and the index each one must be served by
+HOT_QUERIES = {
+    "conversation_first_page": (SELECT_CONVERSATION_FIRST_PAGE, "idx_conversations_session_time"),
+    "conversation_page": (SELECT_CONVERSATION_PAGE, "idx_conversations_session_time"),
+    "latest_assessment": (SELECT_LATEST_ASSESSMENT, "idx_assessments_session_created"),
+    "idle_sessions": (SELECT_IDLE_SESSIONS, "idx_sessions_hot_updated"),
+    "llm_trace_window": (SELECT_LLM_TRACES, "idx_llm_traces_started"),
+}
+
+
+def encode_cursor(timestamp: int, row_id: int) -> str:
+    """Opaque pagination cursor pointing after the given row"""
+    return base64.urlsafe_b64encode(f"{timestamp}:{row_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split(":")
+        return int(timestamp), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
@@ -0,0 +1,219 @@
+"""
+Minimal asyncio client for the Redis protocol (RESP2)
+
+Covers what the shared session backend needs: plain commands, MULTI/EXEC
+transactions and pub/sub. Works against Redis, Valkey, KeyDB and the
+stand-in in resp_server.py.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, Set
+from urllib.parse import urlparse
+
+
+class RespError(Exception):
+    """Error reply from the server"""
+
+
+def encode_command(*args) -> bytes:
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        elif isinstance(arg, str):
+            data = arg.encode()
+        else:
+            data = str(arg).encode()
+        out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(out)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    """
+    Read one reply; bulk strings are returned as bytes
+
+    Error replies are returned as RespError instances rather than raised, so
+    errors nested in an EXEC reply do not abort parsing.
+    """
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by server")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode()
+    if kind == b"-":
+        return RespError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        length = int(body)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise ConnectionError(f"Unexpected reply: {line!r}")
+
+
+def parse_url(url: str):
+    """Host, port, password and database number from a redis:// URL"""
+    parts = urlparse(url)
+    db = int(parts.path.lstrip("/") or 0)
+    return parts.hostname or "localhost", parts.port or 6379, parts.password, db
+
+
+class RespConnection:
+    """One connection; commands are serialized, replies matched in order"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    async def connect(self):
+        host, port, password, db = parse_url(self.url)
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        if password:
+            await self.execute("AUTH", password)
+        if db:
+            await self.execute("SELECT", db)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+            self.writer = None
+
+    async def _roundtrip(self, *args) -> Any:
+        self.writer.write(encode_command(*args))
+        await self.writer.drain()
+        return await read_reply(self.reader)
+
+    async def execute(self, *args) -> Any:
+        async with self._lock:
+            reply = await self._roundtrip(*args)
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    @asynccontextmanager
+    async def exclusive(self) -> AsyncIterator[Callable[..., Awaitable[Any]]]:
+        """
+        Hold the connection for a sequence of commands, e.g. WATCH/MULTI/EXEC
+
+        Yields a function that runs one command and returns its reply.
+        """
+        async with self._lock:
+            async def run(*args):
+                reply = await self._roundtrip(*args)
+                if isinstance(reply, RespError):
+                    raise reply
+                return reply
+            yield run
+
+
+class RespClient:
+    """Small pool of command connections"""
+
+    def __init__(self, url: str, pool_size: int = 4):
+        self.url = url
+        self.pool_size = pool_size
+        self._idle: "asyncio.Queue[RespConnection]" = asyncio.Queue()
+        self._connections = []
+
+    async def connect(self):
+        for _ in range(self.pool_size):
+            conn = RespConnection(self.url)
+            await conn.connect()
+            self._connections.append(conn)
+            self._idle.put_nowait(conn)
+
+    async def close(self):
+        for conn in self._connections:
+            await conn.close()
+        self._connections = []
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[RespConnection]:
+        conn = await self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    async def execute(self, *args) -> Any:
+        async with self.connection() as conn:
+            return await conn.execute(*args)
+
+
+class RespSubscriber:
+    """
+    Dedicated pub/sub connection
+
+    Messages on subscribed channels are passed to on_message(channel,
+    message) as strings.
+    """
+
+    def __init__(self, url: str, on_message: Callable[[str, str], None]):
+        self.url = url
+        self.on_message = on_message
+        self.channels: Set[str] = set()
+        self._conn = RespConnection(url)
+        self._task: Optional[asyncio.Task] = None
+
+    async def connect(self):
+        await self._conn.connect()
+        self._task = asyncio.create_task(self._listen())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._conn.close()
+
+    async def _send(self, *args):
+        # Replies to (UN)SUBSCRIBE arrive through _listen like any message
+        self._conn.writer.write(encode_command(*args))
+        await self._conn.writer.drain()
+
+    async def subscribe(self, channel: str):
+        if channel not in self.channels:
+            self.channels.add(channel)
+            await self._send("SUBSCRIBE", channel)
+
+    async def unsubscribe(self, channel: str):
+        if channel in self.channels:
+            self.channels.discard(channel)
+            await self._send("UNSUBSCRIBE", channel)
+
+    async def _listen(self):
+        while True:
+            try:
+                reply = await read_reply(self._conn.reader)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                print(f"Pub/sub connection lost, reconnecting: {e}")
+                await self._reconnect()
+                continue
+            if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message":
+                self.on_message(reply[1].decode(), reply[2].decode())
+
+    async def _reconnect(self):
+        await self._conn.close()
+        while True:
+            try:
+                await self._conn.connect()
+                break
+            except OSError:
+                await asyncio.sleep(1.0)
+        for channel in self.channels:
+            await self._send("SUBSCRIBE", channel)
@@ -0,0 +1,309 @@
+"""
+In-memory stand-in for a Redis server
+
+Speaks enough of RESP2 to run the shared session backend against it: string
+and hash commands with expiry, MULTI/EXEC with WATCH, and pub/sub. Lets the
+scale-out mode be tested with several local workers without installing
+Redis. Single process, no persistence.
+
+Usage:
+    python resp_server.py --port 6379
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from resp import RespError, read_reply
+
+
+def encode_reply(value: Any) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, RespError):
+        return b"-%s\r\n" % str(value).encode()
+    if isinstance(value, bool):
+        return b":%d\r\n" % int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return b"+%s\r\n" % value.encode()
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(encode_reply(v) for v in value)
+    raise TypeError(f"Cannot encode {type(value)}")
+
+
+class Store:
+    """Keyspace shared by all client connections"""
+
+    def __init__(self):
+        self.data: Dict[bytes, Any] = {}
+        self.expires: Dict[bytes, float] = {}
+        # Bumped on every write; WATCH compares against it
+        self.revisions: Dict[bytes, int] = {}
+        self.channels: Dict[bytes, Set["Client"]] = {}
+
+    def _live(self, key: bytes) -> bool:
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.delete(key)
+        return key in self.data
+
+    def get(self, key: bytes) -> Any:
+        return self.data.get(key) if self._live(key) else None
+
+    def touch(self, key: bytes):
+        self.revisions[key] = self.revisions.get(key, 0) + 1
+
+    def delete(self, key: bytes) -> bool:
+        self.expires.pop(key, None)
+        if key in self.data:
+            del self.data[key]
+            self.touch(key)
+            return True
+        return False
+
+    def set(self, key: bytes, value: Any, ttl: Optional[float] = None):
+        self.data[key] = value
+        if ttl is None:
+            self.expires.pop(key, None)
+        else:
+            self.expires[key] = time.monotonic() + ttl
+        self.touch(key)
+
+    def revision(self, key: bytes) -> int:
+        self._live(key)
+        return self.revisions.get(key, 0)
+
+
+class Client:
+    def __init__(self, store: Store, writer: asyncio.StreamWriter):
+        self.store = store
+        self.writer = writer
+        self.queued: Optional[List[list]] = None
+        self.watched: Dict[bytes, int] = {}
+        self.subscriptions: Set[bytes] = set()
+
+    def send(self, value: Any):
+        self.writer.write(encode_reply(value))
+
+    def handle(self, args: List[bytes]):
+        name = args[0].decode().upper()
+        if self.queued is not None and name not in ("EXEC", "DISCARD", "MULTI", "WATCH"):
+            self.queued.append(args)
+            self.send("QUEUED")
+            return
+        handler = getattr(self, f"cmd_{name.lower()}", None)
+        if handler is None:
+            self.send(RespError(f"ERR unknown command '{name}'"))
+            return
+        try:
+            result = handler(*args[1:])
+        except (TypeError, ValueError) as e:
+            result = RespError(f"ERR {e}")
+        if result is not NotImplemented:
+            self.send(result)
+
+    # Connection
+    def cmd_ping(self, message: bytes = None):
+        return message if message is not None else "PONG"
+
+    def cmd_auth(self, *args):
+        return "OK"
+
+    def cmd_select(self, db):
+        return "OK"
+
+    # Strings and keys
+    def cmd_get(self, key):
+        value = self.store.get(key)
+        if value is not None and not isinstance(value, bytes):
+            return RespError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def cmd_set(self, key, value, *options):
+        ttl = None
+        nx = xx = False
+        options = [o.upper() if isinstance(o, bytes) else o for o in options]
+        i = 0
+        while i < len(options):
+            if options[i] == b"NX":
+                nx = True
+            elif options[i] == b"XX":
+                xx = True
+            elif options[i] == b"PX":
+                ttl = int(options[i + 1]) / 1000
+                i += 1
+            elif options[i] == b"EX":
+                ttl = int(options[i + 1])
+                i += 1
+            i += 1
+        exists = self.store.get(key) is not None
+        if (nx and exists) or (xx and not exists):
+            return None
+        self.store.set(key, value, ttl)
+        return "OK"
+
+    def cmd_del(self, *keys):
+        return sum(self.store.delete(k) for k in keys)
+
+    def cmd_exists(self, *keys):
+        return sum(self.store.get(k) is not None for k in keys)
+
+    def cmd_pexpire(self, key, ms):
+        if self.store.get(key) is None:
+            return 0
+        self.store.expires[key] = time.monotonic() + int(ms) / 1000
+        return 1
+
+    def cmd_expire(self, key, seconds):
+        return self.cmd_pexpire(key, int(seconds) * 1000)
+
+    # Hashes
+    def _hash(self, key, create=False) -> Optional[dict]:
+        value = self.store.get(key)
+        if value is None and create:
+            value = {}
+            self.store.data[key] = value
+        if value is not None and not isinstance(value, dict):
+            raise ValueError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def cmd_hset(self, key, *pairs):
+        if not pairs or len(pairs) % 2:
+            raise ValueError("wrong number of arguments for 'hset' command")
+        h = self._hash(key, create=True)
+        added = 0
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            added += field not in h
+            h[field] = value
+        self.store.touch(key)
+        return added
+
+    def cmd_hget(self, key, field):
+        h = self._hash(key)
+        return h.get(field) if h else None
+
+    def cmd_hgetall(self, key):
+        h = self._hash(key) or {}
+        return [item for pair in h.items() for item in pair]
+
+    def cmd_hincrby(self, key, field, amount):
+        h = self._hash(key, create=True)
+        value = int(h.get(field, b"0")) + int(amount)
+        h[field] = str(value).encode()
+        self.store.touch(key)
+        return value
+
+    # Transactions
+    def cmd_watch(self, *keys):
+        if self.queued is not None:
+            return RespError("ERR WATCH inside MULTI is not allowed")
+        for key in keys:
+            self.watched[key] = self.store.revision(key)
+        return "OK"
+
+    def cmd_unwatch(self):
+        self.watched.clear()
+        return "OK"
+
+    def cmd_multi(self):
+        if self.queued is not None:
+            return RespError("ERR MULTI calls can not be nested")
+        self.queued = []
+        return "OK"
+
+    def cmd_discard(self):
+        if self.queued is None:
+            return RespError("ERR DISCARD without MULTI")
+        self.queued = None
+        self.watched.clear()
+        return "OK"
+
+    def cmd_exec(self):
+        if self.queued is None:
+            return RespError("ERR EXEC without MULTI")
+        queued, self.queued = self.queued, None
+        changed = any(self.store.revision(k) != rev for k, rev in self.watched.items())
+        self.watched.clear()
+        if changed:
+            return None
+        # Commands run back to back on the event loop, so atomically
+        results = []
+        for args in queued:
+            handler = getattr(self, f"cmd_{args[0].decode().lower()}", None)
+            try:
+                results.append(handler(*args[1:]) if handler else RespError("ERR unknown command"))
+            except (TypeError, ValueError) as e:
+                results.append(RespError(f"ERR {e}"))
+        return results
+
+    # Pub/sub
+    def cmd_publish(self, channel, message):
+        subscribers = self.store.channels.get(channel, set())
+        for client in subscribers:
+            client.send([b"message", channel, message])
+        return len(subscribers)
+
+    def cmd_subscribe(self, *channels):
+        for channel in channels:
+            self.subscriptions.add(channel)
+            self.store.channels.setdefault(channel, set()).add(self)
+            self.send([b"subscribe", channel, len(self.subscriptions)])
+        return NotImplemented
+
+    def cmd_unsubscribe(self, *channels):
+        for channel in channels or list(self.subscriptions):
+            self.subscriptions.discard(channel)
+            self.store.channels.get(channel, set()).discard(self)
+            self.send([b"unsubscribe", channel, len(self.subscriptions)])
+        return NotImplemented
+
+    def disconnect(self):
+        for channel in self.subscriptions:
+            self.store.channels.get(channel, set()).discard(self)
+
+
+async def start_server(host: str = "127.0.0.1", port: int = 6379) -> asyncio.AbstractServer:
+    """Start a stand-in server on the running event loop"""
+    store = Store()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client = Client(store, writer)
+        try:
+            while True:
+                args = await read_reply(reader)
+                if not isinstance(args, list) or not args:
+                    writer.write(encode_reply(RespError("ERR Protocol error")))
+                    break
+                client.handle(args)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            client.disconnect()
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+async def serve(host: str, port: int):
+    server = await start_server(host, port)
+    print(f"RESP stand-in listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory Redis stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Full-text search over conversation messages and assessments
+
+The conversations_fts and assessments_fts FTS5 tables index the text of
+the conversations and assessments tables through the conversations_text
+and assessments_text views, which decompress the stored values (see
+migrations.py). The indexes are external content tables: they hold only
+the index, and snippets are cut from the rows a query returns.
+
+They are kept in sync by the code that writes the rows, in the same
+transaction: ConversationWriter indexes every batch of messages and
+AssessmentJobs every new assessment version.
+"""
+
+import html
+import json
+import re
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from column_codec import ColumnCodec
+import queries
+from queries import to_iso
+
+
+# FTS5 delimits matches in snippets with these control characters (see
+# queries.SEARCH_*). Unlike markdown such as **bold**, they do not occur in
+# chat or model text, so they only ever mark matches. Results carry the
+# snippet HTML-escaped, with the matches in <mark> tags
+SNIPPET_START = "\x02"
+SNIPPET_END = "\x03"
+
+KINDS = ("conversations", "assessments")
+
+# ORDER BY of the FTS query and of the page; rowids grow with insertion time
+SORT_ORDERS = {"relevance": ("rank", "m.score"), "recent": ("rowid DESC", "m.id DESC")}
+
+# Beyond this many sessions a company filter checks every match instead
+MAX_SESSION_TERMS = 100
+
+# A double-quoted phrase, or a word with an optional trailing * for prefix search
+_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+
+class SearchQueryError(ValueError):
+    """The search text does not contain anything to search for"""
+
+
+def json_text(value: Optional[str]) -> Optional[str]:
+    """The string values of a JSON document, without its keys and syntax"""
+    if value is None:
+        return None
+    strings = []
+
+    def collect(node):
+        if isinstance(node, str):
+            strings.append(node)
+        elif isinstance(node, dict):
+            for item in node.values():
+                collect(item)
+        elif isinstance(node, list):
+            for item in node:
+                collect(item)
+
+    collect(json.loads(value))
+    return "\n".join(strings)
+
+
+def register_functions(conn: sqlite3.Connection, codec: ColumnCodec):
+    """SQL functions the conversations_text and assessments_text views use"""
+    conn.create_function("decompress", 1, codec.decode, deterministic=True)
+    conn.create_function("json_text", 1, json_text, deterministic=True)
+
+
+def fts_query(text: str) -> str:
+    """
+    Turn user input into an FTS5 query matching all of its terms
+
+    Words and "quoted phrases" are matched as literals, so characters
+    that are FTS5 syntax (-, :, parentheses, AND/OR/NOT) cannot cause
+    syntax errors; a trailing * on a word searches for the prefix.
+    """
+    terms = []
+    for phrase, word in _TERM.findall(text):
+        prefix = bool(word) and word.endswith("*")
+        value = (phrase or word).rstrip("*").strip()
+        if not value:
+            continue
+        term = '"' + value.replace('"', '""') + '"'
+        terms.append(term + "*" if prefix else term)
+    if not terms:
+        raise SearchQueryError("Search query is empty")
+    return " ".join(terms)
+
+
+def index_conversations(conn: sqlite3.Connection, rows: Iterable[Tuple[int, str, str]]):
+    """Add messages, given as (id, session_id, content), to the index"""
+    conn.executemany(queries.INSERT_CONVERSATION_FTS, rows)
+
+
+def index_assessment(conn: sqlite3.Connection, assessment_id: int):
+    conn.execute(queries.INSERT_ASSESSMENT_FTS, (assessment_id,))
+
+
+def merge_index(conn: sqlite3.Connection, pages: int = 500) -> bool:
+    """
+    One bounded step of merging the index segments; True if it did any work
+
+    Deleting rows (see archive.py) only adds delete markers to the index.
+    Merging folds them in and frees their pages; run it until it returns
+    False, one transaction per step so writers are not held up.
+    """
+    before = conn.total_changes
+    for table in ("conversations_fts", "assessments_fts"):
+        # A negative page count merges segments whatever their level
+        conn.execute(f"INSERT INTO {table} ({table}, rank) VALUES ('merge', ?)", (-pages,))
+    return conn.total_changes - before > 2
+
+
+def like_pattern(text: str) -> str:
+    """LIKE pattern matching text as a substring, with % and _ taken literally"""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def search(
+    conn: sqlite3.Connection,
+    text: str,
+    kinds: Iterable[str] = KINDS,
+    session_id: Optional[str] = None,
+    company: Optional[str] = None,
+    sort: str = "relevance",
+    limit: int = 20,
+    offset: int = 0
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Matches per kind, best or most recent first
+
+    company matches session company names case-insensitively, as a
+    substring. Sorting by relevance scores every match; sort="recent"
+    stops after the page, which keeps very common terms fast.
+    """
+    if sort not in SORT_ORDERS:
+        raise SearchQueryError(f"Unknown sort order: {sort}")
+    terms = fts_query(text)
+
+    session_ids = [session_id] if session_id is not None else None
+    if company is not None:
+        matching = [
+            row[0] for row in conn.execute(queries.SELECT_SESSIONS_BY_COMPANY, (like_pattern(company),))
+        ]
+        session_ids = matching if session_ids is None else [s for s in session_ids if s in matching]
+    if session_ids is not None and not session_ids:
+        return {kind: [] for kind in kinds}
+
+    filters = ""
+    session_match = ""
+    filter_params: List[Any] = []
+    if session_ids is not None:
+        if len(session_ids) <= MAX_SESSION_TERMS:
+            # Intersecting with the session's postings beats checking every match
+            session_match = " AND ({session_id} : (" + " OR ".join(
+                '"' + s.replace('"', '""') + '"' for s in session_ids
+            ) + "))"
+        else:
+            filters = " AND session_id IN (SELECT id FROM sessions WHERE company_name LIKE ? ESCAPE '\\')"
+            filter_params.append(like_pattern(company))
+
+    results = {}
+    for kind in kinds:
+        columns = "{content}" if kind == "conversations" else "{audit_data opportunities roadmap}"
+        match = f"{columns} : ({terms}){session_match}"
+        sql = (queries.SEARCH_CONVERSATIONS if kind == "conversations" else queries.SEARCH_ASSESSMENTS)
+        order, outer_order = SORT_ORDERS[sort]
+        sql = sql.format(filters=filters, order=order, outer_order=outer_order)
+        rows = conn.execute(sql, [match, *filter_params, limit, offset]).fetchall()
+        results[kind] = [_result(kind, row) for row in rows]
+    return results
+
+
+def highlight(snippet: Optional[str]) -> Optional[str]:
+    """A snippet as escaped HTML, its matches in <mark> tags"""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(SNIPPET_START, "<mark>").replace(SNIPPET_END, "</mark>")
+
+
+def _result(kind: str, row: sqlite3.Row) -> Dict[str, Any]:
+    result = {"session_id": row["session_id"], "company_name": row["company_name"]}
+    if kind == "conversations":
+        result.update({
+            "message_id": row["id"],
+            "role": row["role"],
+            "agent": row["agent"],
+            "timestamp": to_iso(row["timestamp"]),
+            "snippet": highlight(row["snippet"])
+        })
+    else:
+        result.update({
+            "version": row["version"],
+            "generated_at": to_iso(row["created_at"]),
+            "section": row["section"],
+            "snippet": highlight(row["snippet"])
+        })
+    result["score"] = round(-row["score"], 3)
+    return result
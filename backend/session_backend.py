@@ -0,0 +1,499 @@
+"""
+Storage, locking and pub/sub behind the session store
+
+SessionStore keeps a per-process cache of sessions; the backend holds the
+state every worker agrees on. Two implementations:
+
+- SQLiteSessionBackend: session state in the sessions and conversations
+  tables; archived sessions are restored on load (see archive.py). With
+  shared=False (single worker) locks and pub/sub stay in
+  process. With shared=True, several worker processes on one host use the
+  same database file: locks are rows in session_locks, leased for
+  lock_timeout and renewed while a turn holds them, and events are rows in
+  session_events polled by every worker.
+- RedisSessionBackend: session state as a hash per session, locks with
+  SET NX PX and events with PUBLISH/SUBSCRIBE, so workers can run on any
+  number of hosts. Speaks RESP through resp.py; resp_server.py is a local
+  stand-in for testing.
+
+Every save bumps the session's version, which lets a worker detect that its
+cached copy was changed by another worker.
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+from archive import SessionArchive
+from conversation_writer import ConversationWriter
+from database import Database
+from history_manager import ConversationMemory
+import queries
+from queries import now_us, to_iso
+from resp import RespClient, RespSubscriber
+from session_store import Session, persisted_llm_config
+
+
+class SessionLockTimeout(Exception):
+    """Another worker held the session lock for too long"""
+
+
+class Subscription:
+    """
+    Messages published on one channel, received in this process
+
+    Messages are queued for get(), or passed straight to on_message when
+    given, which needs no task per subscriber.
+    """
+
+    def __init__(
+        self,
+        backend: "SessionBackend",
+        channel: str,
+        on_message: Optional[Callable[[str], None]] = None
+    ):
+        self.backend = backend
+        self.channel = channel
+        self.on_message = on_message
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue()
+
+    async def get(self) -> str:
+        return await self.queue.get()
+
+    async def close(self):
+        await self.backend._unsubscribe(self)
+
+
+class SessionBackend:
+    """Base class; in-process locks and pub/sub"""
+
+    shared = False
+
+    def __init__(self, lock_timeout: float = 120.0):
+        self.lock_timeout = lock_timeout
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def create(self, session: Session):
+        raise NotImplementedError
+
+    async def load(self, session_id: str) -> Optional[Session]:
+        raise NotImplementedError
+
+    async def save(self, session: Session, folded: int):
+        """Persist the session after a turn; folded messages were just compacted"""
+        raise NotImplementedError
+
+    async def info(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Company, creation time and status, read without restoring the session"""
+        session = await self.load(session_id)
+        if session is None:
+            return None
+        return {
+            "company_name": session.company_name,
+            "created_at": session.created_at,
+            "status": session.status
+        }
+
+    async def version(self, session_id: str) -> Optional[int]:
+        raise NotImplementedError
+
+    @asynccontextmanager
+    async def lock(self, session_id: str) -> AsyncIterator[None]:
+        """Serialize turns of one session"""
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        try:
+            async with lock:
+                yield
+        finally:
+            if not lock.locked() and self._locks.get(session_id) is lock:
+                del self._locks[session_id]
+
+    async def _keep_lease(self, session_id: str, renew: Callable[[], Awaitable[bool]]):
+        """
+        Renew a shared lock every third of lock_timeout until cancelled
+
+        Without this a turn outlasting lock_timeout, e.g. a slow LLM call,
+        would let another worker take the session over. renew returns
+        False once the lock is no longer ours.
+        """
+        while True:
+            await asyncio.sleep(self.lock_timeout / 3)
+            try:
+                if not await renew():
+                    print(f"Lost the lock of session {session_id}")
+                    return
+            except Exception as e:
+                print(f"Failed to renew the lock of session {session_id}: {e}")
+
+    async def publish(self, channel: str, message: str):
+        self._deliver(channel, message)
+
+    async def subscribe(
+        self, channel: str, on_message: Optional[Callable[[str], None]] = None
+    ) -> Subscription:
+        subscription = Subscription(self, channel, on_message)
+        self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    async def _unsubscribe(self, subscription: Subscription) -> bool:
+        """Returns True when the channel has no local subscribers left"""
+        subscribers = self._subscriptions.get(subscription.channel)
+        if subscribers is None:
+            return False
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscriptions[subscription.channel]
+            return True
+        return False
+
+    def _deliver(self, channel: str, message: str):
+        for subscription in list(self._subscriptions.get(channel, ())):
+            if subscription.on_message is not None:
+                try:
+                    subscription.on_message(message)
+                except Exception as e:
+                    print(f"Failed to handle message on {channel}: {e}")
+            else:
+                subscription.queue.put_nowait(message)
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """Session state in the AIROI database"""
+
+    def __init__(
+        self,
+        db: Database,
+        writer: ConversationWriter,
+        shared: bool = False,
+        lock_timeout: float = 120.0,
+        poll_interval: float = 0.05,
+        event_retention: float = 60.0,
+        archive: Optional[SessionArchive] = None
+    ):
+        super().__init__(lock_timeout)
+        self.db = db
+        self.writer = writer
+        self.archive = archive
+        self.shared = shared
+        self.poll_interval = poll_interval
+        self.event_retention = event_retention
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._last_event = 0
+        self._poller: Optional[asyncio.Task] = None
+        # Sessions whose shared lock a turn in this process holds
+        self._held: Set[str] = set()
+
+    async def start(self):
+        if self.shared:
+            row = await self.db.fetchone(queries.SELECT_LAST_SESSION_EVENT)
+            self._last_event = row[0] or 0
+            self._poller = asyncio.create_task(self._poll_events())
+
+    async def close(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            self._poller = None
+
+    async def create(self, session: Session):
+        created_us = now_us()
+        await self.db.execute(
+            queries.INSERT_SESSION,
+            (session.id, session.company_name, created_us, created_us, "active",
+             persisted_llm_config(session.llm_config))
+        )
+        session.created_at = to_iso(created_us)
+
+    async def load(self, session_id: str) -> Optional[Session]:
+        row = await self.db.fetchone(queries.SELECT_SESSION_STATE, (session_id,))
+        if row is None:
+            return None
+        status = row["status"]
+        if row["archive"] is not None and self.archive is not None:
+            if await self.archive.restore(session_id, row["archive"]):
+                status = "active"
+
+        if self.writer.pending(session_id):
+            await self.writer.flush()
+        rows = await self.db.fetchall(
+            queries.SELECT_CONVERSATION_FROM, (session_id, row["summarized_count"])
+        )
+        history = []
+        for message in rows:
+            entry = {"role": message["role"], "content": self.db.codec.decode(message["content"])}
+            if message["agent"]:
+                entry["agent"] = message["agent"]
+            history.append(entry)
+
+        return Session(
+            id=session_id,
+            company_name=row["company_name"],
+            llm_config=json.loads(row["llm_config"]) if row["llm_config"] else {},
+            created_at=to_iso(row["created_at"]),
+            status=status,
+            conversation_history=history,
+            memory=ConversationMemory(summary=row["history_summary"] or ""),
+            history_offset=row["summarized_count"],
+            version=row["version"]
+        )
+
+    async def save(self, session: Session, folded: int):
+        # The messages themselves are written by the conversation writer;
+        # other workers only see them once they are committed
+        if not folded and not self.shared:
+            return
+        if self.shared and self.writer.pending(session.id):
+            await self.writer.flush()
+
+        def update(conn):
+            # A turn that lost its lock must not overwrite the next owner's copy
+            if session.id in self._held:
+                row = conn.execute(queries.SELECT_SESSION_LOCK_OWNER, (session.id,)).fetchone()
+                if row is None or row[0] != self.owner:
+                    raise SessionLockTimeout(f"Lost the lock of session {session.id} before saving it")
+            return conn.execute(
+                queries.UPDATE_SESSION_SUMMARY,
+                (session.memory.summary, session.history_offset, now_us(), session.id)
+            ).fetchone()[0]
+
+        session.version = await self.db.write(update)
+
+    async def info(self, session_id: str) -> Optional[Dict[str, Any]]:
+        row = await self.db.fetchone(queries.SELECT_SESSION_INFO, (session_id,))
+        if row is None:
+            return None
+        return {
+            "company_name": row["company_name"],
+            "created_at": to_iso(row["created_at"]),
+            "status": row["status"]
+        }
+
+    async def version(self, session_id: str) -> Optional[int]:
+        row = await self.db.fetchone(queries.SELECT_SESSION_VERSION, (session_id,))
+        return row[0] if row else None
+
+    @asynccontextmanager
+    async def lock(self, session_id: str) -> AsyncIterator[None]:
+        # Turns in this process queue on the local lock, so only one of them
+        # at a time polls the shared lock
+        async with super().lock(session_id):
+            if not self.shared:
+                yield
+                return
+            await self._acquire(session_id)
+            self._held.add(session_id)
+            lease = asyncio.create_task(self._keep_lease(session_id, lambda: self._renew(session_id)))
+            try:
+                yield
+            finally:
+                lease.cancel()
+                await asyncio.gather(lease, return_exceptions=True)
+                self._held.discard(session_id)
+                await self.db.execute(queries.RELEASE_SESSION_LOCK, (session_id, self.owner))
+
+    async def _renew(self, session_id: str) -> bool:
+        expires = now_us() + int(self.lock_timeout * 1_000_000)
+        return await self.db.write(
+            lambda conn: conn.execute(
+                queries.RENEW_SESSION_LOCK, (expires, session_id, self.owner)
+            ).rowcount > 0
+        )
+
+    async def _acquire(self, session_id: str):
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            now = now_us()
+            acquired = await self.db.write(
+                lambda conn: conn.execute(
+                    queries.ACQUIRE_SESSION_LOCK,
+                    (session_id, self.owner, now + int(self.lock_timeout * 1_000_000), now)
+                ).rowcount
+            )
+            if acquired:
+                return
+            if time.monotonic() >= deadline:
+                raise SessionLockTimeout(f"Session {session_id} is locked by another worker")
+            await asyncio.sleep(self.poll_interval)
+
+    async def publish(self, channel: str, message: str):
+        if not self.shared:
+            self._deliver(channel, message)
+            return
+        await self.db.execute(queries.INSERT_SESSION_EVENT, (channel, message, now_us()))
+
+    async def _poll_events(self):
+        last_prune = time.monotonic()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                rows = await self.db.fetchall(queries.SELECT_SESSION_EVENTS, (self._last_event,))
+                for row in rows:
+                    self._last_event = row["id"]
+                    self._deliver(row["channel"], row["message"])
+                if time.monotonic() - last_prune > self.event_retention:
+                    last_prune = time.monotonic()
+                    cutoff = now_us() - int(self.event_retention * 1_000_000)
+                    await self.db.execute(queries.DELETE_SESSION_EVENTS, (cutoff,))
+            except Exception as e:
+                print(f"Failed to poll session events: {e}")
+
+
+class RedisSessionBackend(SessionBackend):
+    """Session state in Redis (or any server speaking its protocol)"""
+
+    shared = True
+
+    def __init__(
+        self,
+        url: str,
+        pool_size: int = 4,
+        lock_timeout: float = 120.0,
+        retry_interval: float = 0.05,
+        key_prefix: str = "airoi"
+    ):
+        super().__init__(lock_timeout)
+        self.client = RespClient(url, pool_size=pool_size)
+        self.subscriber = RespSubscriber(url, self._deliver)
+        self.retry_interval = retry_interval
+        self.key_prefix = key_prefix
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def _key(self, kind: str, session_id: str) -> str:
+        return f"{self.key_prefix}:{kind}:{session_id}"
+
+    async def start(self):
+        await self.client.connect()
+        await self.subscriber.connect()
+
+    async def close(self):
+        await self.subscriber.close()
+        await self.client.close()
+
+    @staticmethod
+    def _state(session: Session) -> str:
+        return json.dumps({
+            "company_name": session.company_name,
+            "llm_config": json.loads(persisted_llm_config(session.llm_config)),
+            "created_at": session.created_at,
+            "status": session.status,
+            "conversation_history": session.conversation_history,
+            "summary": session.memory.summary,
+            "history_offset": session.history_offset
+        })
+
+    async def create(self, session: Session):
+        session.created_at = to_iso(now_us())
+        await self.client.execute(
+            "HSET", self._key("session", session.id),
+            "state", self._state(session), "version", 0
+        )
+
+    async def load(self, session_id: str) -> Optional[Session]:
+        fields = await self.client.execute("HGETALL", self._key("session", session_id))
+        if not fields:
+            return None
+        values = dict(zip(fields[::2], fields[1::2]))
+        state = json.loads(values[b"state"])
+        return Session(
+            id=session_id,
+            company_name=state["company_name"],
+            llm_config=state["llm_config"],
+            created_at=state["created_at"],
+            status=state.get("status", "active"),
+            conversation_history=state["conversation_history"],
+            memory=ConversationMemory(summary=state["summary"]),
+            history_offset=state["history_offset"],
+            version=int(values[b"version"])
+        )
+
+    async def save(self, session: Session, folded: int):
+        key = self._key("session", session.id)
+        async with self.client.connection() as conn:
+            async with conn.exclusive() as run:
+                await run("MULTI")
+                await run("HSET", key, "state", self._state(session))
+                await run("HINCRBY", key, "version", 1)
+                replies = await run("EXEC")
+        session.version = replies[1]
+
+    async def version(self, session_id: str) -> Optional[int]:
+        value = await self.client.execute("HGET", self._key("session", session_id), "version")
+        return int(value) if value is not None else None
+
+    @asynccontextmanager
+    async def lock(self, session_id: str) -> AsyncIterator[None]:
+        async with super().lock(session_id):
+            key = self._key("lock", session_id)
+            token = uuid.uuid4().hex
+            deadline = time.monotonic() + self.lock_timeout
+            while not await self.client.execute(
+                "SET", key, token, "NX", "PX", int(self.lock_timeout * 1000)
+            ):
+                if time.monotonic() >= deadline:
+                    raise SessionLockTimeout(f"Session {session_id} is locked by another worker")
+                await asyncio.sleep(self.retry_interval)
+            lease = asyncio.create_task(self._keep_lease(session_id, lambda: self._renew(key, token)))
+            try:
+                yield
+            finally:
+                lease.cancel()
+                await asyncio.gather(lease, return_exceptions=True)
+                await self._release(key, token)
+
+    async def _renew(self, key: str, token: str) -> bool:
+        async with self.client.connection() as conn:
+            async with conn.exclusive() as run:
+                await run("WATCH", key)
+                if await run("GET", key) != token.encode():
+                    await run("UNWATCH")
+                    return False
+                await run("MULTI")
+                await run("PEXPIRE", key, int(self.lock_timeout * 1000))
+                replies = await run("EXEC")
+        return bool(replies and replies[0])
+
+    async def _release(self, key: str, token: str):
+        # Only delete the lock if it is still ours; WATCH makes the check and
+        # the delete atomic without server-side scripting
+        async with self.client.connection() as conn:
+            async with conn.exclusive() as run:
+                await run("WATCH", key)
+                if await run("GET", key) != token.encode():
+                    await run("UNWATCH")
+                    return
+                await run("MULTI")
+                await run("DEL", key)
+                await run("EXEC")
+
+    async def publish(self, channel: str, message: str):
+        await self.client.execute("PUBLISH", self._key("events", channel), message)
+
+    async def subscribe(
+        self, channel: str, on_message: Optional[Callable[[str], None]] = None
+    ) -> Subscription:
+        subscription = await super().subscribe(channel, on_message)
+        await self.subscriber.subscribe(self._key("events", channel))
+        return subscription
+
+    async def _unsubscribe(self, subscription: Subscription) -> bool:
+        last = await super()._unsubscribe(subscription)
+        if last:
+            await self.subscriber.unsubscribe(self._key("events", subscription.channel))
+        return last
+
+    def _deliver(self, channel: str, message: str):
+        prefix = f"{self.key_prefix}:events:"
+        if channel.startswith(prefix):
+            channel = channel[len(prefix):]
+        super()._deliver(channel, message)
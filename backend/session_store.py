@@ -0,0 +1,218 @@
+"""
+Bounded in-memory cache of assessment sessions
+
+Sessions are kept in LRU order under a count and memory cap and dropped
+after a period of inactivity. A session that is not resident, because it
+was evicted, the server restarted or another worker created it, is
+rehydrated from the session backend (see session_backend.py) on first
+access. With a shared backend the cached copy is revalidated against the
+backend's version on every access.
+
+Only the working history is resident: once the discovery agent has folded
+older turns into its rolling summary, those turns are dropped from memory
+and the summary is persisted with the number of messages it covers.
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from history_manager import ConversationMemory
+
+
+@dataclass
+class Session:
+    """Resident state of one assessment session"""
+    id: str
+    company_name: str
+    llm_config: Dict[str, Any]
+    created_at: str
+    status: str = "active"
+    conversation_history: List[Dict[str, Any]] = field(default_factory=list)
+    memory: ConversationMemory = field(default_factory=ConversationMemory)
+    # Messages of the stored conversation covered by memory.summary and no
+    # longer resident
+    history_offset: int = 0
+    # Backend version the resident copy corresponds to
+    version: int = 0
+    last_access: float = field(default_factory=time.monotonic)
+
+    def size_bytes(self) -> int:
+        """Approximate memory held by the session"""
+        return (
+            len(self.memory.summary)
+            + sum(len(m.get("content") or "") + 64 for m in self.conversation_history)
+            + 512
+        )
+
+
+def persisted_llm_config(llm_config: Dict[str, Any]) -> str:
+    """LLM settings to store with a session; API keys never reach the database"""
+    return json.dumps({k: v for k, v in llm_config.items() if k != "api_key"})
+
+
+class SessionStore:
+    """LRU cache of sessions in front of a session backend"""
+
+    def __init__(
+        self,
+        backend,
+        max_sessions: int = 1000,
+        max_bytes: int = 256 * 1024 * 1024,
+        idle_timeout: float = 1800.0
+    ):
+        self.backend = backend
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_timeout = idle_timeout
+        self.sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.rehydrated = 0
+        self.evicted = 0
+
+    async def create(self, session_id: str, company_name: str, llm_config: Dict[str, Any]) -> Session:
+        session = Session(
+            id=session_id,
+            company_name=company_name,
+            llm_config=llm_config,
+            created_at=""
+        )
+        await self.backend.create(session)
+        self._put(session)
+        return session
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        """The session, rehydrated from the backend if it is not resident or stale"""
+        session = self.sessions.get(session_id)
+        if session is not None and self.backend.shared:
+            version = await self.backend.version(session_id)
+            if version != session.version:
+                # Changed or deleted by another worker
+                self.stale += 1
+                self.sessions.pop(session_id, None)
+                session = None
+        if session is not None:
+            self.hits += 1
+            session.last_access = time.monotonic()
+            self.sessions.move_to_end(session_id)
+            return session
+
+        self.misses += 1
+        # Concurrent requests for the same session share one load
+        if session_id in self._loading:
+            return await asyncio.shield(self._loading[session_id])
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[session_id] = future
+        try:
+            session = await self.backend.load(session_id)
+            if session is not None:
+                self.rehydrated += 1
+                self._put(session)
+            future.set_result(session)
+            return session
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; avoid "exception never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._loading[session_id]
+
+    async def info(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Company, creation time and status of a session
+
+        Unlike get(), this does not restore an archived session, which is
+        reported with status "archived".
+        """
+        return await self.backend.info(session_id)
+
+    @asynccontextmanager
+    async def turn(self, session_id: str) -> AsyncIterator[Optional[Session]]:
+        """
+        Exclusive access to a session for one turn
+
+        Turns of the same session are serialized across workers. The
+        session is saved afterwards, also when the turn fails halfway, since
+        messages recorded before the failure are already in its history.
+        """
+        async with self.backend.lock(session_id):
+            session = await self.get(session_id)
+            try:
+                yield session
+            finally:
+                if session is not None:
+                    await self.save(session)
+
+    async def save(self, session: Session):
+        await self.backend.save(session, self._compact(session))
+        self._enforce_limits()
+
+    def _put(self, session: Session):
+        self.sessions[session.id] = session
+        self.sessions.move_to_end(session.id)
+        self._enforce_limits()
+
+    def _enforce_limits(self):
+        total = sum(s.size_bytes() for s in self.sessions.values())
+        while self.sessions and (len(self.sessions) > self.max_sessions or total > self.max_bytes):
+            _, session = self.sessions.popitem(last=False)
+            total -= session.size_bytes()
+            self.evicted += 1
+
+    @staticmethod
+    def _compact(session: Session) -> int:
+        """
+        Drop the turns the agent has folded into its summary
+
+        Returns the number of messages dropped. The backend persists the
+        summary with the number of stored messages it covers, so a
+        rehydrated session continues from the same point.
+        """
+        folded = session.memory.folded
+        if folded == 0:
+            return 0
+
+        del session.conversation_history[:folded]
+        session.history_offset += folded
+        # The summary now covers everything before the resident history
+        session.memory.folded = 0
+        session.memory.fingerprint = ""
+        return folded
+
+    def evict_idle(self) -> int:
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = [sid for sid, s in self.sessions.items() if s.last_access < cutoff]
+        for session_id in idle:
+            del self.sessions[session_id]
+        self.evicted += len(idle)
+        return len(idle)
+
+    async def run(self, interval: float = 60.0):
+        """Background task evicting idle sessions until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_idle()
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "shared": self.backend.shared,
+            "resident": len(self.sessions),
+            "resident_bytes": sum(s.size_bytes() for s in self.sessions.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "rehydrated": self.rehydrated,
+            "evicted": self.evicted
+        }
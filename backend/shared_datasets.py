@@ -0,0 +1,250 @@
+"""
+Datasets shared by every analytics process
+
+An uploaded DataFrame is published once, as an uncompressed Arrow IPC file
+in a shared directory (/dev/shm, which is memory, where available), next
+to a small JSON file with its description and reference counts. Any
+process, whether a server worker or a pool worker, attaches to it by
+data_id: the file is memory-mapped and numeric columns become read-only
+views of the mapping, so attaching costs no copy and the pages are shared
+by all processes through the page cache. Pool tasks therefore receive the
+data_id instead of a pickled DataFrame. Without pyarrow, or for columns
+Arrow cannot hold, the DataFrame is pickled to the same place instead and
+every attach loads a copy.
+
+References are counted per process id while a dataset is attached.
+Datasets unused for longer than the ttl are removed by sweep() once no
+live process refers to them; references of processes that died are
+dropped. Removing a file that is still mapped is safe: the mapping lives
+until it is released.
+"""
+
+import json
+import os
+import pickle
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+ARROW_SUFFIX = ".arrow"
+PICKLE_SUFFIX = ".pkl"
+META_SUFFIX = ".json"
+
+
+def default_directory() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "airoi-datasets")
+
+
+class DatasetNotFound(KeyError):
+    """No dataset with this data_id, or it was removed"""
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class SharedDatasets:
+    """
+    Publish, attach and clean up datasets in a shared directory
+
+    Instances only hold the directory and settings, so they can be passed
+    to pool workers along with a task.
+    """
+
+    def __init__(self, directory: Optional[str] = None, ttl: float = 86400.0):
+        self.directory = directory or default_directory()
+        self.ttl = ttl
+
+    def _path(self, data_id: str, suffix: str) -> str:
+        if not isinstance(data_id, str) or not data_id or "/" in data_id or data_id.startswith("."):
+            raise DatasetNotFound(data_id)
+        return os.path.join(self.directory, data_id + suffix)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Serializes metadata updates across processes"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "a+") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_meta(self, data_id: str) -> Dict[str, Any]:
+        try:
+            with open(self._path(data_id, META_SUFFIX)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            raise DatasetNotFound(data_id)
+
+    def _write_meta(self, data_id: str, meta: Dict[str, Any]):
+        _write_atomic(self._path(data_id, META_SUFFIX), json.dumps(meta).encode())
+
+    def publish(self, frame, info: Optional[Dict[str, Any]] = None) -> str:
+        """Store the DataFrame under a new data_id; info is kept alongside it"""
+        os.makedirs(self.directory, exist_ok=True)
+        data_id = str(uuid.uuid4())
+        data_format = "arrow"
+        try:
+            self._write_arrow(self._path(data_id, ARROW_SUFFIX), frame)
+        except Exception:
+            # No pyarrow, or columns Arrow cannot represent (mixed objects)
+            data_format = "pickle"
+            _write_atomic(self._path(data_id, PICKLE_SUFFIX), pickle.dumps(frame, pickle.HIGHEST_PROTOCOL))
+        now = time.time()
+        # Written last: a dataset exists once its metadata does
+        self._write_meta(data_id, {
+            "format": data_format,
+            "info": info or {},
+            "created_at": now,
+            "last_used": now,
+            "refs": {}
+        })
+        return data_id
+
+    @staticmethod
+    def _write_arrow(path: str, frame):
+        if pa is None:
+            raise RuntimeError("pyarrow is not installed")
+        table = pa.Table.from_pandas(frame)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with pa.OSFile(tmp, "wb") as sink:
+                # Uncompressed, so that columns can be mapped as they are
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def info(self, data_id: str) -> Dict[str, Any]:
+        """What was published with the dataset, without attaching to it"""
+        return self._read_meta(data_id)["info"]
+
+    def exists(self, data_id: str) -> bool:
+        try:
+            self._read_meta(data_id)
+        except DatasetNotFound:
+            return False
+        return True
+
+    def _count(self, data_id: str, delta: int) -> Dict[str, Any]:
+        with self._locked():
+            meta = self._read_meta(data_id)
+            pid = str(os.getpid())
+            refs = meta["refs"].get(pid, 0) + delta
+            if refs > 0:
+                meta["refs"][pid] = refs
+            else:
+                meta["refs"].pop(pid, None)
+            meta["last_used"] = time.time()
+            self._write_meta(data_id, meta)
+            return meta
+
+    @contextmanager
+    def attach(self, data_id: str) -> Iterator[Any]:
+        """The dataset as a DataFrame, referenced until the block ends"""
+        meta = self._count(data_id, 1)
+        try:
+            yield self._load(data_id, meta["format"])
+        finally:
+            try:
+                self._count(data_id, -1)
+            except DatasetNotFound:
+                pass
+
+    def _load(self, data_id: str, data_format: str):
+        if data_format == "arrow":
+            source = pa.memory_map(self._path(data_id, ARROW_SUFFIX))
+            table = pa.ipc.open_file(source).read_all()
+            # One block per column keeps pandas from copying them into one
+            return table.to_pandas(split_blocks=True)
+        with open(self._path(data_id, PICKLE_SUFFIX), "rb") as f:
+            return pickle.load(f)
+
+    def call(self, data_id: str, function: Callable, *args) -> Any:
+        """function(frame, *args) on the attached dataset, as a pool task"""
+        with self.attach(data_id) as frame:
+            return function(frame, *args)
+
+    def publish_from(self, loader: Callable, *args) -> Tuple[str, Dict[str, Any]]:
+        """Publish the (frame, info) returned by loader(*args), as a pool task"""
+        frame, info = loader(*args)
+        return self.publish(frame, info), info
+
+    def _remove(self, data_id: str):
+        for suffix in (META_SUFFIX, ARROW_SUFFIX, PICKLE_SUFFIX):
+            try:
+                os.remove(self._path(data_id, suffix))
+            except FileNotFoundError:
+                pass
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Remove datasets unused for longer than the ttl; returns how many"""
+        now = now or time.time()
+        removed = 0
+        if not os.path.isdir(self.directory):
+            return 0
+        with self._locked():
+            for data_id in self.list():
+                try:
+                    meta = self._read_meta(data_id)
+                except DatasetNotFound:
+                    continue
+                live = {pid: n for pid, n in meta["refs"].items() if _alive(int(pid))}
+                if live != meta["refs"]:
+                    meta["refs"] = live
+                    self._write_meta(data_id, meta)
+                if not live and self.ttl and now - meta["last_used"] > self.ttl:
+                    self._remove(data_id)
+                    removed += 1
+            # Data files whose metadata was never written, and temporary files
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                stem = name.split(".", 1)[0]
+                orphan = name.endswith(".tmp") or not os.path.exists(
+                    os.path.join(self.directory, stem + META_SUFFIX)
+                )
+                if name != ".lock" and orphan and now - os.path.getmtime(path) > 3600:
+                    os.remove(path)
+        return removed
+
+    def list(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return [
+            name[:-len(META_SUFFIX)] for name in os.listdir(self.directory)
+            if name.endswith(META_SUFFIX) and not name.startswith(".")
+        ]
@@ -1,3 +1,3 @@
 #!/bin/bash
 echo "Starting Analytics Backend on port 5002..."
-python api_server.py
+python analytics_asgi.py
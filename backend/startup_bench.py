@@ -0,0 +1,207 @@
+"""
+Startup time and idle memory of the backend services
+
+Starts a service in a fresh process, polls its health endpoint until it
+answers 200 and reports how long that took and the resident memory of the
+idle server process and of its children (pool workers). Imports dominate
+both figures, which is why the analysis libraries are only loaded when an
+analysis first needs them.
+
+Each service has a budget; with --check the run fails when the median of
+the runs is over it, which is how CI keeps startup from regressing:
+
+    python startup_bench.py --service analytics --runs 3 --check
+
+Set ANALYTICS_PREWARM in the environment to see what pre-warming costs.
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SERVICES: Dict[str, Dict[str, Any]] = {
+    "analytics": {
+        "command": [sys.executable, "-m", "uvicorn", "analytics_asgi:app", "--port", "{port}"],
+        "health": "/health",
+        "budget": {"seconds": 3.0, "rss_mb": 100}
+    },
+    "flask": {
+        "command": [sys.executable, "-m", "flask", "--app", "api_server", "run", "--port", "{port}"],
+        "health": "/health",
+        "budget": {"seconds": 3.0, "rss_mb": 80}
+    },
+    "airoi": {
+        "command": [sys.executable, "-m", "uvicorn", "airoi_server:app", "--port", "{port}"],
+        "health": "/",
+        "budget": {"seconds": 4.0, "rss_mb": 120},
+        # No model to warm up, and a throwaway database
+        "env": {"OLLAMA_WARMUP": "false", "DATABASE_PATH": "{tmp}/startup.db"}
+    },
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident set size of a process, where /proc is available"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def children(pid: int) -> List[int]:
+    """Descendants of a process, from the parent ids in /proc"""
+    parents: Dict[int, int] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; the fields after it don't
+                parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    found, frontier = [], [pid]
+    while frontier:
+        parent = frontier.pop()
+        for child, ppid in parents.items():
+            if ppid == parent:
+                found.append(child)
+                frontier.append(child)
+    return found
+
+
+def measure(service: str, idle: float = 1.0, timeout: float = 60.0) -> Dict[str, Any]:
+    """Start the service once: seconds until healthy, and idle memory"""
+    spec = SERVICES[service]
+    port = free_port()
+    with tempfile.TemporaryDirectory(prefix="startup-bench-") as tmp, \
+            tempfile.TemporaryFile() as log:
+        env = {**os.environ, **{k: v.format(tmp=tmp) for k, v in spec.get("env", {}).items()}}
+        command = [part.format(port=port) for part in spec["command"]]
+        url = f"http://127.0.0.1:{port}{spec['health']}"
+
+        started = time.monotonic()
+        process = subprocess.Popen(command, cwd=HERE, env=env, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            while True:
+                if process.poll() is not None:
+                    log.seek(0)
+                    raise RuntimeError(
+                        f"{service} exited with {process.returncode}:\n{log.read().decode(errors='replace')}"
+                    )
+                if time.monotonic() - started > timeout:
+                    raise RuntimeError(f"{service} was not healthy after {timeout}s")
+                try:
+                    with urllib.request.urlopen(url, timeout=1) as response:
+                        if response.status == 200:
+                            break
+                except (urllib.error.URLError, ConnectionError, socket.timeout):
+                    pass
+                time.sleep(0.02)
+            seconds = time.monotonic() - started
+
+            time.sleep(idle)
+            workers = [rss_mb(pid) for pid in children(process.pid)]
+            return {
+                "service": service,
+                "seconds_to_healthy": round(seconds, 3),
+                "rss_mb": rss_mb(process.pid),
+                "children": len(workers),
+                "children_rss_mb": round(sum(w for w in workers if w), 1)
+            }
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+def summarize(runs: List[Dict[str, Any]], budget: Dict[str, float]) -> Dict[str, Any]:
+    seconds = statistics.median(r["seconds_to_healthy"] for r in runs)
+    memory = [r["rss_mb"] for r in runs if r["rss_mb"] is not None]
+    rss = round(statistics.median(memory), 1) if memory else None
+    over = []
+    if seconds > budget["seconds"]:
+        over.append(f"{seconds:.2f}s to healthy > {budget['seconds']}s")
+    if rss is not None and rss > budget["rss_mb"]:
+        over.append(f"{rss} MB idle > {budget['rss_mb']} MB")
+    return {
+        "service": runs[0]["service"],
+        "runs": len(runs),
+        "seconds_to_healthy": round(seconds, 3),
+        "rss_mb": rss,
+        "children_rss_mb": statistics.median(r["children_rss_mb"] for r in runs),
+        "budget": budget,
+        "over_budget": over
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time and idle memory of the backend services")
+    parser.add_argument("--service", choices=[*SERVICES, "all"], default="all")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--idle", type=float, default=1.0, help="Seconds to wait before reading memory")
+    parser.add_argument("--max-seconds", type=float, help="Override the time budget")
+    parser.add_argument("--max-rss-mb", type=float, help="Override the memory budget")
+    parser.add_argument("--check", action="store_true", help="Exit with 1 when over budget")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    services = list(SERVICES) if args.service == "all" else [args.service]
+    results = []
+    for service in services:
+        budget = dict(SERVICES[service]["budget"])
+        if args.max_seconds is not None:
+            budget["seconds"] = args.max_seconds
+        if args.max_rss_mb is not None:
+            budget["rss_mb"] = args.max_rss_mb
+        runs = [measure(service, idle=args.idle) for _ in range(args.runs)]
+        results.append(summarize(runs, budget))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        header = f"{'service':<12} {'healthy s':>10} {'rss MB':>8} {'workers MB':>11}  budget"
+        print(header)
+        print("-" * len(header))
+        for row in results:
+            status = "; ".join(row["over_budget"]) or "ok"
+            print(
+                f"{row['service']:<12} {row['seconds_to_healthy']:>10.3f} {row['rss_mb'] or '-':>8} "
+                f"{row['children_rss_mb']:>11}  {status}"
+            )
+
+    if args.check and any(row["over_budget"] for row in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
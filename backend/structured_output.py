@@ -0,0 +1,558 @@
+"""
+Structured JSON output for agent results
+
+Schemas for the agent result types, an incremental parser that validates
+records while the model is still streaming, and a repair pass that fixes
+formatting slips locally or with a small targeted LLM call, so that one bad
+field never costs a full regeneration.
+"""
+
+import asyncio
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from llm_tracing import agent_context, current_agent
+
+
+AUDIT_DATA_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "company_name": {"type": "string"},
+        "industry": {"type": "string"},
+        "employee_count": {"type": "integer"},
+        "systems": {"type": "array", "items": {"type": "object"}},
+        "processes": {"type": "array", "items": {"type": "object"}},
+        "data_sources": {"type": "array", "items": {"type": "object"}},
+        "pain_points": {"type": "array", "items": {"type": "string"}},
+        "current_costs": {"type": "object", "additionalProperties": {"type": "number"}},
+        "technical_capabilities": {"type": "object", "additionalProperties": {"type": "string"}},
+        "compliance_requirements": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": [
+        "company_name", "industry", "employee_count", "systems", "processes",
+        "data_sources", "pain_points", "current_costs", "technical_capabilities",
+        "compliance_requirements"
+    ],
+    "additionalProperties": False
+}
+
+OPPORTUNITY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "description": {"type": "string"},
+        "phase": {"type": "string", "enum": ["quick_win", "foundation", "strategic"]},
+        "can_do": {"type": "array", "items": {"type": "string"}},
+        "cannot_do": {"type": "array", "items": {"type": "string"}},
+        "estimated_roi": {"type": "number"},
+        "confidence": {"type": "string", "enum": ["low", "medium", "high"]},
+        "timeframe_months": {"type": "integer"},
+        "risk_factors": {"type": "array", "items": {"type": "string"}},
+        "dependencies": {"type": "array", "items": {"type": "string"}},
+        "next_steps": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": [
+        "title", "description", "phase", "can_do", "cannot_do", "estimated_roi",
+        "confidence", "timeframe_months", "risk_factors", "dependencies", "next_steps"
+    ],
+    "additionalProperties": False
+}
+
+# OpenAI-style response_format requires an object at the top level
+OPPORTUNITIES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "opportunities": {"type": "array", "items": OPPORTUNITY_SCHEMA}
+    },
+    "required": ["opportunities"],
+    "additionalProperties": False
+}
+
+REPAIR_SYSTEM_PROMPT = """You fix JSON documents so that they match a JSON schema.
+
+Change only what the listed errors require and keep every other value as it is. Do not add commentary.
+
+OUTPUT: The corrected JSON only."""
+
+
+_PY_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "array": list,
+    "object": dict
+}
+
+
+def format_path(path: Tuple) -> str:
+    text = "$"
+    for part in path:
+        text += f"[{part}]" if isinstance(part, int) else f".{part}"
+    return text
+
+
+def subschema(schema: Dict, path: Tuple) -> Dict:
+    """Schema of the value found at path, or {} when unconstrained"""
+    for part in path:
+        if isinstance(part, int):
+            schema = schema.get("items", {})
+        else:
+            extra = schema.get("additionalProperties")
+            schema = schema.get("properties", {}).get(
+                part, extra if isinstance(extra, dict) else {}
+            )
+    return schema
+
+
+def validate(value: Any, schema: Dict, path: Tuple = ()) -> List[str]:
+    """Check value against the subset of JSON schema used here"""
+    where = format_path(path)
+    expected = schema.get("type")
+    if expected:
+        ok = isinstance(value, _PY_TYPES[expected])
+        if expected in ("integer", "number") and isinstance(value, bool):
+            ok = False
+        if not ok:
+            return [f"{where}: expected {expected}, got {type(value).__name__}"]
+
+    errors = []
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(f"{where}: must be one of {', '.join(schema['enum'])}")
+
+    if expected == "object":
+        properties = schema.get("properties", {})
+        extra = schema.get("additionalProperties")
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append(f"{format_path(path + (key,))}: missing")
+        for key, item in value.items():
+            if key in properties:
+                errors.extend(validate(item, properties[key], path + (key,)))
+            elif isinstance(extra, dict):
+                errors.extend(validate(item, extra, path + (key,)))
+            elif extra is False:
+                errors.append(f"{format_path(path + (key,))}: unexpected field")
+
+    if expected == "array" and "items" in schema:
+        for index, item in enumerate(value):
+            errors.extend(validate(item, schema["items"], path + (index,)))
+
+    return errors
+
+
+def _to_number(value: str) -> Optional[float]:
+    """Parse numbers written like '$25,000', '30%' or '1.5k'"""
+    text = value.strip().lower().replace(",", "")
+    multiplier = 1
+    if text.endswith("k"):
+        multiplier, text = 1_000, text[:-1]
+    elif text.endswith("m"):
+        multiplier, text = 1_000_000, text[:-1]
+    match = re.search(r"-?\d+(?:\.\d+)?", text)
+    if not match:
+        return None
+    return float(match.group()) * multiplier
+
+
+def _normalize_enum(value: str, options: List[str]) -> str:
+    """Map 'Quick Win', 'quick-win' or 'HIGH confidence' onto an enum value"""
+    normalized = re.sub(r"[^a-z0-9]+", "_", value.lower()).strip("_")
+    if normalized in options:
+        return normalized
+    for option in options:
+        if normalized.startswith(option) or option in normalized.split("_"):
+            return option
+    return value
+
+
+def coerce(value: Any, schema: Dict) -> Any:
+    """
+    Fix the type slips models commonly make, without any LLM call
+
+    Numbers written as strings, single values instead of lists, enum values in
+    the wrong case, missing list or object fields and unexpected fields are
+    all repaired. Anything it cannot fix is left for validate() to report.
+    """
+    expected = schema.get("type")
+
+    if expected == "object":
+        properties = schema.get("properties", {})
+        if isinstance(value, list):
+            # A bare array where the schema wraps it in a single field
+            arrays = [k for k, s in properties.items() if s.get("type") == "array"]
+            if len(arrays) == 1:
+                value = {arrays[0]: value}
+        if isinstance(value, str) and not properties:
+            value = {"name": value}
+        if not isinstance(value, dict):
+            return value
+
+        extra = schema.get("additionalProperties")
+        result = {}
+        for key, item in value.items():
+            if key in properties:
+                result[key] = coerce(item, properties[key])
+            elif isinstance(extra, dict):
+                result[key] = coerce(item, extra)
+            elif extra is not False:
+                result[key] = item
+        for key in schema.get("required", []):
+            if key not in result and key in properties:
+                if properties[key].get("type") == "array":
+                    result[key] = []
+                elif properties[key].get("type") == "object":
+                    result[key] = {}
+        return result
+
+    if expected == "array":
+        if value is None:
+            return []
+        if not isinstance(value, list):
+            value = [value]
+        if "items" in schema:
+            return [coerce(item, schema["items"]) for item in value]
+        return value
+
+    if expected in ("integer", "number"):
+        if isinstance(value, str):
+            parsed = _to_number(value)
+            if parsed is None:
+                return value
+            value = parsed
+        if isinstance(value, float) and expected == "integer":
+            return int(round(value))
+        return value
+
+    if expected == "string":
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        elif isinstance(value, list) and all(isinstance(v, str) for v in value):
+            value = "; ".join(value)
+        if isinstance(value, str) and "enum" in schema:
+            value = _normalize_enum(value, schema["enum"])
+        return value
+
+    return value
+
+
+def repair_json_text(text: str) -> Optional[Any]:
+    """
+    Parse JSON out of model output, fixing common formatting slips
+
+    Handles surrounding prose and code fences, trailing commas, Python
+    literals, raw newlines inside strings and output that was cut off
+    mid-document.
+    """
+    text = re.sub(r"```(?:json)?", "", text)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return None
+
+    out = []
+    stack = []
+    in_string = False
+    escape = False
+    # Positions in out just before a top-level-safe comma, with the open containers
+    cut_points = []
+
+    i = min(starts)
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            elif ch == "\n":
+                ch = "\\n"
+            out.append(ch)
+            i += 1
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            while out and out[-1] in " \t\r\n":
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack:
+                stack.pop()
+            out.append(ch)
+            if not stack:
+                break
+            i += 1
+            continue
+        elif ch == ",":
+            cut_points.append((len(out), list(stack)))
+        else:
+            for literal, replacement in (("True", "true"), ("False", "false"), ("None", "null")):
+                if text.startswith(literal, i) and not text[i - 1].isalnum():
+                    out.append(replacement)
+                    i += len(literal)
+                    break
+            else:
+                out.append(ch)
+                i += 1
+            continue
+
+        out.append(ch)
+        i += 1
+
+    candidate = "".join(out)
+    if in_string:
+        candidate += '"'
+    candidates = [candidate.rstrip().rstrip(",") + "".join(reversed(stack))]
+    # Output cut off mid-value: fall back to the last complete member
+    for position, open_containers in reversed(cut_points[-20:]):
+        candidates.append("".join(out[:position]) + "".join(reversed(open_containers)))
+
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+class _Frame:
+    __slots__ = ("kind", "start", "index", "key")
+
+    def __init__(self, kind: str, start: int, key: Optional[str] = None):
+        self.kind = kind
+        self.start = start
+        self.index = 0
+        self.key = key
+
+
+_KEY_PATTERN = re.compile(r'^\s*("(?:[^"\\]|\\.)*")\s*:\s*$', re.S)
+
+
+class IncrementalJSONParser:
+    """
+    Scans streamed JSON text and reports records as soon as they are complete
+
+    feed() returns (path, value, error) for every member of the root object,
+    every element of a root array, and every element of an array held
+    directly by the root object, e.g. ("opportunities", 2) for the third
+    opportunity. Text before the first bracket is skipped.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.pos = 0
+        self.stack: List[_Frame] = []
+        self.in_string = False
+        self.escape = False
+        self.root_start: Optional[int] = None
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Tuple[Tuple, Any, Optional[str]]]:
+        self.text += chunk
+        events = []
+
+        while self.pos < len(self.text) and not self.done:
+            ch = self.text[self.pos]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif not self.stack:
+                if ch in "{[":
+                    self.root_start = self.pos
+                    self.stack.append(_Frame(ch, self.pos + 1))
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                key = None
+                if len(self.stack) == 1 and self.stack[0].kind == "{":
+                    match = _KEY_PATTERN.match(self.text[self.stack[0].start:self.pos])
+                    if match:
+                        key = json.loads(match.group(1))
+                self.stack.append(_Frame(ch, self.pos + 1, key))
+            elif ch in ",}]":
+                frame = self.stack[-1]
+                event = self._member(frame, self.text[frame.start:self.pos])
+                if event:
+                    events.append(event)
+                if ch == ",":
+                    frame.start = self.pos + 1
+                    frame.index += 1
+                else:
+                    self.stack.pop()
+                    if not self.stack:
+                        self.done = True
+
+            self.pos += 1
+
+        return events
+
+    def _member(self, frame: _Frame, text: str) -> Optional[Tuple[Tuple, Any, Optional[str]]]:
+        depth = len(self.stack)
+        watched = depth == 1 or (
+            depth == 2 and frame.kind == "[" and self.stack[0].kind == "{" and frame.key
+        )
+        if not watched or not text.strip():
+            return None
+
+        try:
+            if depth == 1 and frame.kind == "{":
+                member = json.loads("{" + text + "}")
+                key, value = next(iter(member.items()))
+                return (key,), value, None
+            value = json.loads(text)
+        except (json.JSONDecodeError, StopIteration) as e:
+            path = (frame.index,) if depth == 1 else (frame.key, frame.index)
+            return path, None, f"{format_path(path)}: invalid JSON ({e})"
+
+        if depth == 1:
+            return (frame.index,), value, None
+        return (frame.key, frame.index), value, None
+
+    def result(self) -> Optional[Any]:
+        """The complete document, or None if it is not complete or valid"""
+        if not self.done:
+            return None
+        try:
+            return json.loads(self.text[self.root_start:self.pos])
+        except json.JSONDecodeError:
+            return None
+
+
+async def repair_with_llm(llm, value: Any, schema: Dict, errors: List[str]) -> Optional[Any]:
+    """Ask the model to fix one invalid record, showing it only that record"""
+    fragment = value if isinstance(value, str) else json.dumps(value, separators=(",", ":"))
+    with agent_context(f"{current_agent.get()}:repair"):
+        response = await llm.call(
+            [{
+                "role": "user",
+                "content": f"""SCHEMA:
+{json.dumps(schema, separators=(",", ":"))}
+
+ERRORS:
+{chr(10).join('- ' + e for e in errors)}
+
+JSON:
+{fragment}"""
+            }],
+            REPAIR_SYSTEM_PROMPT,
+            response_schema=schema
+        )
+
+    repaired = repair_json_text(response)
+    if repaired is None:
+        return None
+    repaired = coerce(repaired, schema)
+    return repaired if not validate(repaired, schema) else None
+
+
+def _record_of(error: str) -> Tuple:
+    """Path of the record an error belongs to: the array element, else the root"""
+    match = re.match(r"^\$\.([A-Za-z_]\w*)\[(\d+)\]", error) or re.match(r"^\$\[(\d+)\]", error)
+    if not match:
+        return ()
+    groups = match.groups()
+    if len(groups) == 2:
+        return (groups[0], int(groups[1]))
+    return (int(groups[0]),)
+
+
+async def generate_structured(
+    llm,
+    messages: List[Dict],
+    system_prompt: str,
+    schema: Dict
+) -> Tuple[Optional[Any], List[str]]:
+    """
+    Stream a schema-constrained answer and return (value, unresolved errors)
+
+    Records are validated while the answer streams. Invalid array elements
+    are repaired individually; if one still fails it is dropped instead of
+    failing the whole result.
+    """
+    parser = IncrementalJSONParser()
+    repairs: Dict[Tuple, asyncio.Task] = {}
+
+    def check(path: Tuple, value: Any, error: Optional[str]):
+        if error or len(path) < 2:
+            # Root members and unparsable records are handled once the
+            # document is complete
+            return
+        record_schema = subschema(schema, path)
+        value = coerce(value, record_schema)
+        record_errors = validate(value, record_schema, path)
+        if record_errors:
+            # Start fixing the record while the rest is still streaming
+            repairs[path] = asyncio.create_task(
+                repair_with_llm(llm, value, record_schema, record_errors)
+            )
+
+    try:
+        async for chunk in llm.stream(messages, system_prompt, response_schema=schema):
+            for path, value, error in parser.feed(chunk):
+                check(path, value, error)
+
+        value = parser.result()
+        if value is None:
+            value = repair_json_text(parser.text)
+        if value is None:
+            return None, ["no JSON found in model output"]
+
+        value = coerce(value, schema)
+        errors = validate(value, schema)
+
+        records: Dict[Tuple, List[str]] = {}
+        for error in errors:
+            records.setdefault(_record_of(error), []).append(error)
+
+        if () in records:
+            repaired = await repair_with_llm(llm, value, schema, records[()])
+            if repaired is None:
+                return None, records[()]
+            value = repaired
+            records = {}
+
+        unresolved = []
+        dropped = []
+        for path, record_errors in records.items():
+            task = repairs.pop(path, None)
+            record_schema = subschema(schema, path)
+            if task is None:
+                task = asyncio.create_task(
+                    repair_with_llm(llm, _get(value, path), record_schema, record_errors)
+                )
+            repaired = await task
+            if repaired is None:
+                unresolved.extend(record_errors)
+                dropped.append(path)
+            else:
+                _set(value, path, repaired)
+
+        # Drop from the end so earlier indices stay valid
+        for path in sorted(dropped, key=lambda p: p[-1], reverse=True):
+            del _get(value, path[:-1])[path[-1]]
+
+        return value, unresolved
+    finally:
+        for task in repairs.values():
+            task.cancel()
+
+
+def _get(value: Any, path: Tuple) -> Any:
+    for part in path:
+        value = value[part]
+    return value
+
+
+def _set(value: Any, path: Tuple, item: Any):
+    _get(value, path[:-1])[path[-1]] = item
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, Overloaded
+
+
+async def hold(admission, release, started, *args):
+    async with admission.admit(*args):
+        started.append(args)
+        await release.wait()
+
+
+def test_excess_chat_waits_then_is_rejected():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.05, session_limit=1)
+        release, started = asyncio.Event(), []
+        running = asyncio.create_task(hold(admission, release, started, "interactive", "s1", "a"))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(hold(admission, release, started, "interactive", "s2", "b"))
+        await asyncio.sleep(0)
+
+        # The queue is full
+        with pytest.raises(Overloaded) as rejected:
+            async with admission.admit("interactive", "s3", "c"):
+                pass
+        assert rejected.value.retry_after >= 1
+
+        # A second turn of the same session, and queued work that times out
+        with pytest.raises(Overloaded):
+            async with admission.admit("interactive", "s1", "a"):
+                pass
+        with pytest.raises(Overloaded) as timed_out:
+            await waiting
+        assert timed_out.value.reason == "queue wait timed out"
+
+        release.set()
+        await running
+        metrics = admission.metrics()
+        assert metrics["in_flight"] == {"interactive": 0, "batch": 0}
+        assert metrics["rejected"] == {
+            "queue is full": 1, "queue wait timed out": 1, "too many requests for this session": 1
+        }
+        assert admission.per_session == {} and admission.per_client == {}
+
+    asyncio.run(scenario())
+
+
+def test_batch_work_yields_to_chat():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=2, batch_max_in_flight=1)
+        job, chat, later = asyncio.Event(), asyncio.Event(), asyncio.Event()
+        started = []
+        tasks = [
+            asyncio.create_task(hold(admission, job, started, "batch")),
+            asyncio.create_task(hold(admission, later, started, "batch")),
+        ]
+        await asyncio.sleep(0)
+        # Only one job runs, the other one is deferred
+        assert started == [("batch",)]
+
+        tasks.append(asyncio.create_task(hold(admission, chat, started, "interactive", "s1")))
+        tasks.append(asyncio.create_task(hold(admission, later, started, "interactive", "s2")))
+        await asyncio.sleep(0)
+        assert started[1:] == [("interactive", "s1")]
+
+        # New jobs are refused while chat queues
+        with pytest.raises(Overloaded):
+            admission.check_batch_submission()
+
+        # The slot of the running job goes to the queued chat turn
+        job.set()
+        await tasks[0]
+        await asyncio.sleep(0)
+        assert started[2:] == [("interactive", "s2")]
+        assert admission.metrics()["waiting"] == {"interactive": 0, "batch": 1}
+        admission.check_batch_submission()
+
+        chat.set()
+        later.set()
+        await asyncio.gather(*tasks)
+        assert started[3:] == [("batch",)]
+
+    asyncio.run(scenario())
@@ -0,0 +1,61 @@
+from io import BytesIO
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+pytest.importorskip("multipart")
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+
+import analytics_asgi
+from analytics_asgi import AnalysisPool
+from shared_datasets import SharedDatasets
+
+
+CSV = "region,visits,orders,revenue,returns\n" + "".join(
+    f"{'north' if i % 2 else 'south'},{100 + i * 3},{10 + i % 7},{1000 + i * 37 % 400},{i % 3}\n"
+    for i in range(60)
+) + "west,,12,1100,1\n"
+
+
+def without_images(value):
+    """Responses compared without the base64 plots"""
+    if isinstance(value, dict):
+        return {k: without_images(v) for k, v in value.items() if k != "image"}
+    if isinstance(value, list):
+        return [without_images(v) for v in value]
+    return value
+
+
+def test_same_responses_as_the_flask_app(monkeypatch, tmp_path):
+    api_server = pytest.importorskip("api_server")
+    monkeypatch.setattr(analytics_asgi, "pool", AnalysisPool(1))
+    monkeypatch.setattr(analytics_asgi, "datasets", SharedDatasets(str(tmp_path)))
+
+    with TestClient(analytics_asgi.app) as asgi:
+        wsgi = api_server.app.test_client()
+
+        ours = asgi.post("/api/upload", files={"file": ("data.csv", CSV, "text/csv")})
+        theirs = wsgi.post("/api/upload", data={"file": (BytesIO(CSV.encode()), "data.csv")})
+        assert ours.status_code == theirs.status_code == 200
+        ours, theirs = ours.json()["data"], theirs.get_json()["data"]
+        asgi_id, flask_id = ours.pop("id"), theirs.pop("id")
+        assert ours == theirs == {"rows": 61, "columns": 5}
+
+        for path, body in (
+            ("/api/describe", {}),
+            ("/api/analyze", {"analysis_type": "regression"}),
+            ("/api/analyze", {"analysis_type": "visualization"}),
+            ("/api/analyze", {"analysis_type": "unknown"}),
+            ("/api/sixbox/analyze", {"box_type": "clustering"}),
+            ("/api/sixbox/analyze", {"box_type": "unknown"}),
+        ):
+            ours = asgi.post(path, json={"data_id": asgi_id, **body})
+            theirs = wsgi.post(path, json={"data_id": flask_id, **body})
+            assert ours.status_code == theirs.status_code
+            assert without_images(ours.json()) == without_images(theirs.get_json())
+
+        assert asgi.post("/api/describe", json={"data_id": "missing"}).status_code == 404
+        assert asgi.post("/api/upload").json() == {"success": False, "error": "No file uploaded"}
+        assert asgi.get("/health").json() == {"status": "healthy"}
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+import archive
+from archive import SessionArchive, collect, commit_archive, read_session, write_segment
+from column_codec import ColumnCodec
+from conversation_writer import ConversationWriter
+from database import Database
+from migrations import migrate
+import queries
+from queries import now_us, to_us
+import search
+from session_backend import SQLiteSessionBackend
+from session_store import SessionStore
+
+
+MARCH = to_us(datetime(2025, 3, 14, 9, 30, tzinfo=timezone.utc))
+
+
+def fts_consistent(conn):
+    for table in ("conversations_fts", "assessments_fts"):
+        conn.execute(f"INSERT INTO {table} ({table}, rank) VALUES ('integrity-check', 1)")
+    return True
+
+
+def test_segments_read_only_the_groups_of_a_session(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "ROW_GROUP_ROWS", 3)
+    rows = [
+        [i, f"s{i // 4}", "user", None, f"message {i}", i] for i in range(12)
+    ]
+    path = str(tmp_path / "2025-03" / "segment.arc")
+    write_segment(path, {"conversations": rows}, "zlib")
+
+    tables = read_session(path, "s1")
+    assert tables["conversations"] == rows[4:8]
+    assert read_session(path, "missing") == {}
+
+
+def test_idle_sessions_move_to_the_archive_and_back(tmp_path):
+    async def scenario():
+        db = Database(str(tmp_path / "t.db"), pool_size=1, codec=ColumnCodec("zlib", min_bytes=0))
+        db.open()
+        await db.write(migrate)
+        sessions = SessionArchive(db, str(tmp_path / "archive"), after_days=30, algorithm="zlib")
+        writer = ConversationWriter(db)
+        store = SessionStore(SQLiteSessionBackend(db, writer, archive=sessions))
+
+        for session_id in ("old", "recent"):
+            await store.create(session_id, "Acme", {})
+        await db.write(lambda conn: conn.execute(
+            "UPDATE sessions SET created_at = ?, updated_at = ? WHERE id = 'old'", (MARCH, MARCH)
+        ))
+        for i, content in enumerate(["Invoices are reconciled by hand", "How many per month?"]):
+            await writer.append("old", "user" if i == 0 else "assistant", content, MARCH + i)
+        await writer.append("recent", "user", "Invoices arrive by email", now_us())
+        await writer.flush()
+
+        def add_assessment(conn):
+            conn.execute(queries.INSERT_ASSESSMENT_JOB, ("job-1", "old", MARCH, MARCH))
+            conn.execute("UPDATE assessment_jobs SET status = 'completed'")
+            conn.execute(queries.INSERT_ASSESSMENT_STAGE, ("job-1", "analyze", "h1", "{}", MARCH))
+            assessment_id = conn.execute(queries.INSERT_ASSESSMENT, (
+                "old", db.codec.encode(json.dumps({"systems": ["SAP"]})),
+                db.codec.encode(json.dumps([{"title": "Invoice matching"}])),
+                db.codec.encode(json.dumps({"phases": []})), MARCH, "job-1", None, "old"
+            )).lastrowid
+            search.index_assessment(conn, assessment_id)
+        await db.write(add_assessment)
+        rows = await db.fetchall("SELECT id FROM conversations WHERE session_id = 'old'")
+        message_ids = [r["id"] for r in rows]
+
+        # Sessions resident in the cache are left alone
+        assert await sessions.archive_idle(lambda session_id: session_id in store.sessions) == 0
+        store.sessions.clear()
+        assert await sessions.archive_idle() == 1
+
+        stub = await db.fetchone("SELECT status, archive FROM sessions WHERE id = 'old'")
+        assert stub["status"] == "archived" and stub["archive"].startswith("2025-03/")
+        # Fetching the session's details reports the stub without restoring it
+        assert (await store.info("old"))["status"] == "archived"
+        assert os.path.exists(tmp_path / "archive" / stub["archive"])
+        for table in ("conversations", "assessments", "assessment_jobs"):
+            left = await db.fetchone(f"SELECT COUNT(*) FROM {table} WHERE session_id = 'old'")
+            assert left[0] == 0
+        assert (await db.fetchone("SELECT COUNT(*) FROM assessment_stages"))[0] == 0
+        found = await db.read(search.search, "invoices")
+        assert [r["session_id"] for r in found["conversations"]] == ["recent"]
+        assert found["assessments"] == []
+        assert await db.write(fts_consistent)
+
+        # Reading the session restores it, with the same row ids
+        session = await store.get("old")
+        assert [m["content"] for m in session.conversation_history] == [
+            "Invoices are reconciled by hand", "How many per month?"
+        ]
+        assert session.status == (await store.info("old"))["status"] == "active"
+        restored = await db.fetchall("SELECT id FROM conversations WHERE session_id = 'old'")
+        assert [r["id"] for r in restored] == message_ids
+        row = await db.fetchone(queries.SELECT_LATEST_ASSESSMENT, ("old",))
+        assert json.loads(db.codec.decode(row["opportunities"])) == [{"title": "Invoice matching"}]
+        assert tuple(await db.fetchone("SELECT job_id, input_hash FROM assessment_stages")) == ("job-1", "h1")
+        found = await db.read(search.search, "invoices")
+        assert sorted(r["session_id"] for r in found["conversations"]) == ["old", "recent"]
+        assert len(found["assessments"]) == 1
+        assert await db.write(fts_consistent)
+        assert await sessions.ensure_hot("old") is False
+
+        # The segment is only referenced by the restored session now
+        sessions.prune_grace = 0
+        assert await sessions.prune() == 1
+        assert archive.segment_files(str(tmp_path / "archive")) == []
+        assert sessions.metrics()["sessions_restored"] == 1
+
+        await writer.close()
+        db.close()
+
+    asyncio.run(scenario())
+
+
+def test_sessions_changed_while_archiving_stay_hot(tmp_path):
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    codec = ColumnCodec("off")
+    conn.execute(queries.INSERT_SESSION, ("s1", "Acme", MARCH, MARCH, "active", "{}"))
+    conn.execute(queries.INSERT_CONVERSATION, ("s1", "user", None, "hello", MARCH))
+
+    tables, watermarks = collect(conn, codec, ["s1"])
+    write_segment(str(tmp_path / "2025-03" / "a.arc"), tables)
+    conn.execute(queries.INSERT_CONVERSATION, ("s1", "assistant", None, "hi", now_us()))
+
+    assert commit_archive(conn, "2025-03/a.arc", watermarks) == []
+    assert conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0] == 2
+    assert conn.execute("SELECT archive FROM sessions").fetchone()[0] is None
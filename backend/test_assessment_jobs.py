@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import json
+
+from assessment_jobs import AssessmentJobs
+from conversation_writer import ConversationWriter
+from database import Database
+from migrations import migrate
+from session_backend import SQLiteSessionBackend
+from session_store import SessionStore
+
+
+KEYWORDS = ("erp", "invoices", "crm")
+
+
+def digest(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+class FakeOrchestrator:
+    """
+    Stands in for AIROIOrchestrator with the same checkpoint protocol
+
+    The audit data is the set of known keywords in the conversation, so
+    small talk leaves it unchanged. Stages listed in fail_on fail once.
+    """
+
+    def __init__(self, fail_on=()):
+        self.fail_on = set(fail_on)
+        self.calls = []
+
+    async def stage(self, checkpoint, name, inputs, compute):
+        key = digest(name, inputs)
+        stored = await checkpoint.load(name, key)
+        if stored is not None:
+            return stored
+        await checkpoint.started(name)
+        self.calls.append(name)
+        if name in self.fail_on:
+            self.fail_on.discard(name)
+            raise RuntimeError(f"{name} timed out")
+        result = compute()
+        await checkpoint.save(name, key, result)
+        return result
+
+    async def run_full_assessment(self, history, memory=None, checkpoint=None):
+        await checkpoint.plan(["audit_data", "opportunities", "roadmap"])
+        text = " ".join(m["content"].lower() for m in history)
+        audit = await self.stage(
+            checkpoint, "audit_data", [m["content"] for m in history],
+            lambda: {"topics": [k for k in KEYWORDS if k in text]}
+        )
+        opportunities = await self.stage(
+            checkpoint, "opportunities", [audit],
+            lambda: [{"title": f"Automate {t}"} for t in audit["topics"]]
+        )
+        roadmap = await self.stage(
+            checkpoint, "roadmap", [audit, opportunities],
+            lambda: {"roadmap": f"{len(opportunities)} steps"}
+        )
+        return {
+            "audit_data": audit,
+            "opportunities": opportunities,
+            "roadmap": roadmap,
+            "implementation_guides": {},
+            "generated_at": "2026-01-05T10:00:00"
+        }
+
+
+def run_jobs(tmp_path, orchestrator, steps):
+    """Run each step(session) followed by an assessment; returns the finished jobs"""
+    async def scenario():
+        db = Database(str(tmp_path / "t.db"), pool_size=1)
+        db.open()
+        await db.write(migrate)
+        writer = ConversationWriter(db)
+        store = SessionStore(SQLiteSessionBackend(db, writer))
+        session = await store.create("s1", "Acme", {})
+        events = []
+
+        async def publish(session_id, message):
+            events.append(message)
+
+        jobs = AssessmentJobs(db, store, lambda config: orchestrator, publish)
+        finished = []
+        for step in steps:
+            step(session)
+            finished.append(await jobs.wait((await jobs.submit("s1"))["job_id"]))
+        versions = await db.fetchall("SELECT id, version FROM assessments ORDER BY version")
+        await jobs.close()
+        await writer.close()
+        db.close()
+        return finished, events, [tuple(row) for row in versions]
+
+    return asyncio.run(scenario())
+
+
+def say(content):
+    return lambda session: session.conversation_history.append({"role": "user", "content": content})
+
+
+def test_failed_job_resumes_after_last_completed_stage(tmp_path):
+    orchestrator = FakeOrchestrator(fail_on=["roadmap"])
+    (first, second), events, _ = run_jobs(
+        tmp_path, orchestrator, [say("Our ERP is slow"), lambda session: None]
+    )
+
+    assert first["status"] == "failed"
+    assert "roadmap timed out" in first["error"]
+    assert first["completed_stages"] == ["audit_data", "opportunities"]
+
+    # The retry reruns only the stage that failed
+    assert second["job_id"] == first["job_id"]
+    assert second["status"] == "completed"
+    assert orchestrator.calls == ["audit_data", "opportunities", "roadmap", "roadmap"]
+
+    statuses = [e["status"] for e in events]
+    assert "failed" in statuses and statuses[-1] == "completed"
+    assert events[0]["stage"] == "audit_data"
+
+
+def test_regeneration_recomputes_only_changed_stages(tmp_path):
+    orchestrator = FakeOrchestrator()
+    jobs, events, versions = run_jobs(tmp_path, orchestrator, [
+        say("Our ERP is slow"),
+        say("Thanks, that helps"),       # audit data unchanged
+        lambda session: None,            # nothing changed at all
+        say("We also use a CRM"),        # audit data changes
+    ])
+
+    assert [job["status"] for job in jobs] == ["completed"] * 4
+    assert orchestrator.calls == [
+        "audit_data", "opportunities", "roadmap",
+        "audit_data",
+        "audit_data", "opportunities", "roadmap",
+    ]
+    completed = [e for e in events if e["status"] == "completed"]
+    assert completed[1]["reused_stages"] == ["opportunities", "roadmap"]
+    assert completed[2]["reused_stages"] == ["audit_data", "opportunities", "roadmap"]
+
+    # A rerun with identical inputs does not produce a new version
+    assert [job["assessment_id"] for job in jobs] == [1, 2, 2, 3]
+    assert versions == [(1, 1), (2, 2), (3, 3)]
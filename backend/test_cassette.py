@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from airoi_backend import LLMProvider
+from cassette import Cassette, CassetteMiss
+
+
+def serve(monkeypatch, handler):
+    client = httpx.AsyncClient
+    monkeypatch.setattr(
+        httpx, "AsyncClient", lambda **kwargs: client(transport=httpx.MockTransport(handler), **kwargs)
+    )
+
+
+def ollama_answers(request):
+    body = json.loads(request.content)
+    question = body["messages"][-1]["content"]
+    if body["stream"]:
+        lines = [
+            json.dumps({"message": {"content": word}, "done": False}) for word in ("streamed ", question)
+        ] + [json.dumps({"done": True, "eval_count": 2})]
+        return httpx.Response(200, content="\n".join(lines).encode())
+    return httpx.Response(200, json={"message": {"content": f"answer to {question}"}})
+
+
+async def conversation(llm):
+    first = await llm.call([{"role": "user", "content": "one"}], "system")
+    again = await llm.call([{"role": "user", "content": "one"}], "system")
+    streamed = [chunk async for chunk in llm.stream([{"role": "user", "content": "two"}], "system")]
+    return first, again, streamed
+
+
+def test_replay_answers_recorded_requests_without_a_server(tmp_path, monkeypatch):
+    path = str(tmp_path / "cassettes" / "session.jsonl")
+    serve(monkeypatch, ollama_answers)
+    recorded = asyncio.run(conversation(LLMProvider("ollama", cassette=Cassette(path, Cassette.RECORD))))
+    assert recorded == ("answer to one", "answer to one", ["streamed ", "two"])
+
+    def unreachable(request):
+        raise AssertionError("replay must not reach the server")
+
+    serve(monkeypatch, unreachable)
+    cassette = Cassette(path)
+    assert len(cassette) == 3
+    llm = LLMProvider("ollama", cassette=cassette)
+    assert asyncio.run(conversation(llm)) == recorded
+
+    with pytest.raises(CassetteMiss):
+        asyncio.run(llm.call([{"role": "user", "content": "never asked"}], "system"))
+    # The stream flag is part of the request, so a streamed answer is not reused
+    with pytest.raises(CassetteMiss):
+        asyncio.run(llm.call([{"role": "user", "content": "two"}], "system"))
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+from column_codec import (
+    ColumnCodec, available_algorithms, column_stats, compare, dictionary_fetcher, recompress, train
+)
+from conversation_writer import ConversationWriter
+from database import Database
+from migrations import migrate
+from queries import now_us
+from session_backend import SQLiteSessionBackend
+from session_store import SessionStore
+
+
+MESSAGE = (
+    "Invoices are reconciled by hand in spreadsheets, it takes three people two days a month. "
+    "Customer support answers around 400 tickets a week, mostly shipment status questions. "
+)
+OPPORTUNITIES = json.dumps([
+    {"title": f"Automate step {i}", "category": "quick_win", "estimated_roi": "high",
+     "description": "Extract structured data from forms and route them by content."}
+    for i in range(20)
+], indent=2)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize("algorithm", available_algorithms())
+def test_round_trip_and_plain_values(algorithm):
+    codec = ColumnCodec(algorithm)
+    stored = codec.encode(OPPORTUNITIES)
+    assert isinstance(stored, bytes) and len(stored) < len(OPPORTUNITIES) / 3
+    assert codec.decode(stored) == OPPORTUNITIES
+
+    # Short values and rows written before compression stay text
+    assert codec.encode("hi") == "hi"
+    assert codec.decode("legacy row") == "legacy row"
+    assert codec.decode(None) is None
+    assert ColumnCodec("off").encode(OPPORTUNITIES) == OPPORTUNITIES
+
+
+def test_dictionary_compresses_short_messages(conn):
+    for i in range(200):
+        conn.execute(
+            "INSERT INTO conversations (session_id, role, content, timestamp) VALUES ('s', 'user', ?, ?)",
+            (f"{i}: {MESSAGE}", i)
+        )
+    conn.commit()
+    plain = ColumnCodec("zlib", min_bytes=0)
+
+    dictionary_id = train(conn, "zlib")
+    trained = ColumnCodec("zlib", min_bytes=0)
+    trained.load(conn)
+    assert trained.dictionary_id == dictionary_id
+
+    message = f"latest: {MESSAGE}"
+    assert len(trained.encode(message)) < len(plain.encode(message)) / 2
+
+    # A worker started before the dictionary existed looks it up when reading
+    reader = ColumnCodec("zlib")
+    reader.fetch_dictionary = dictionary_fetcher(conn)
+    assert reader.decode(trained.encode(message)) == message
+
+    # Existing rows are rewritten with the dictionary
+    assert recompress(conn, trained) == 200
+    conversations = column_stats(conn)[0]
+    assert conversations["compressed"] == 200
+    assert conversations["bytes"] < len(MESSAGE) * 200 / 2
+
+    report = {row["codec"]: row for row in compare([f"{i}: {MESSAGE}" for i in range(50)])}
+    assert report["zlib+dictionary"]["ratio"] > report["zlib"]["ratio"] > report["off"]["ratio"]
+
+
+def test_conversations_are_compressed_at_rest(tmp_path):
+    async def scenario():
+        db = Database(str(tmp_path / "t.db"), pool_size=1, codec=ColumnCodec("zlib", min_bytes=64))
+        db.open()
+        await db.write(migrate)
+        writer = ConversationWriter(db)
+        backend = SQLiteSessionBackend(db, writer)
+        await SessionStore(backend).create("s1", "Acme", {})
+        await writer.append("s1", "user", MESSAGE * 4, now_us())
+        await writer.append("s1", "assistant", "ok", now_us())
+        await writer.flush()
+
+        kinds = await db.fetchall("SELECT typeof(content) AS kind FROM conversations ORDER BY id")
+        assert [row["kind"] for row in kinds] == ["blob", "text"]
+
+        session = await backend.load("s1")
+        assert [m["content"] for m in session.conversation_history] == [MESSAGE * 4, "ok"]
+
+        await writer.close()
+        db.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from conversation_writer import ConversationWriter
+from database import Database
+from migrations import migrate
+
+
+async def open_db(path):
+    db = Database(str(path), pool_size=1)
+    db.open()
+    await db.write(migrate)
+    return db
+
+
+async def stored(db):
+    rows = await db.fetchall("SELECT session_id, role FROM conversations ORDER BY id")
+    return [tuple(row) for row in rows]
+
+
+def test_group_durability_waits_for_one_shared_commit(tmp_path):
+    async def scenario():
+        db = await open_db(tmp_path / "t.db")
+        writer = ConversationWriter(db, durability="group", flush_interval=0.01)
+        writer.start()
+        try:
+            await asyncio.gather(*(
+                writer.append(f"s{i}", "user", f"message {i}", i) for i in range(5)
+            ))
+            # Every message is committed once append returns, in one batch
+            assert len(await stored(db)) == 5
+            assert writer.flushes == 1 and writer.rows_written == 5
+        finally:
+            await writer.close()
+            db.close()
+
+    asyncio.run(scenario())
+
+
+def test_async_durability_returns_before_the_write(tmp_path):
+    async def scenario():
+        db = await open_db(tmp_path / "t.db")
+        writer = ConversationWriter(db, durability="async", flush_interval=60)
+        writer.start()
+        try:
+            await writer.append("s1", "user", "hello", 1)
+            await writer.append("s1", "assistant", "hi there", 2)
+            assert await stored(db) == []
+            assert [m["content"] for m in writer.pending("s1")] == ["hello", "hi there"]
+        finally:
+            # Whatever is still buffered is written on shutdown
+            await writer.close()
+        assert await stored(db) == [("s1", "user"), ("s1", "assistant")]
+        db.close()
+
+    asyncio.run(scenario())
+
+
+def test_failed_write_fails_group_callers_and_retries_buffered_rows(tmp_path, monkeypatch):
+    def broken(self, conn, rows):
+        raise RuntimeError("disk full")
+
+    async def scenario():
+        db = await open_db(tmp_path / "t.db")
+        group = ConversationWriter(db, durability="group", flush_interval=60)
+        behind = ConversationWriter(db, durability="async", flush_interval=60)
+        try:
+            monkeypatch.setattr(ConversationWriter, "_insert", broken)
+            waiting = asyncio.create_task(group.append("s1", "user", "hello", 1))
+            await asyncio.sleep(0)
+            await behind.append("s2", "user", "hello", 1)
+            with pytest.raises(RuntimeError):
+                await group.flush()
+            with pytest.raises(RuntimeError, match="disk full"):
+                await waiting
+            with pytest.raises(RuntimeError):
+                await behind.flush()
+            assert group.buffer == [] and len(behind.buffer) == 1
+
+            monkeypatch.undo()
+            await behind.flush()
+            assert await stored(db) == [("s2", "user")]
+            assert behind.metrics()["failures"] == 1
+        finally:
+            db.close()
+
+    asyncio.run(scenario())
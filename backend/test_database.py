@@ -0,0 +1,61 @@
+import asyncio
+import threading
+
+import pytest
+
+from database import Database
+
+
+def test_queries_run_off_the_event_loop_and_reads_overlap_writes(tmp_path):
+    async def scenario():
+        db = Database(str(tmp_path / "t.db"), pool_size=2)
+        db.open()
+        try:
+            await db.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+            await db.execute("INSERT INTO items (name) VALUES ('first')")
+            assert (await db.fetchone("PRAGMA journal_mode"))[0] == "wal"
+
+            loop_thread = threading.get_ident()
+            writing, release = threading.Event(), threading.Event()
+
+            def slow_write(conn):
+                conn.execute("INSERT INTO items (name) VALUES ('second')")
+                writing.set()
+                release.wait(5)
+                return threading.current_thread().name
+
+            write = asyncio.ensure_future(db.write(slow_write))
+            await asyncio.to_thread(writing.wait, 5)
+            # WAL readers see the last commit while the write is open
+            rows = await db.read(lambda conn: (
+                threading.get_ident(), conn.execute("SELECT name FROM items").fetchall()
+            ))
+            assert rows[0] != loop_thread
+            assert [tuple(r) for r in rows[1]] == [("first",)]
+            release.set()
+            assert (await write).startswith("db-write")
+            assert len(await db.fetchall("SELECT * FROM items")) == 2
+        finally:
+            db.close()
+
+    asyncio.run(scenario())
+
+
+def test_failed_write_is_rolled_back(tmp_path):
+    async def scenario():
+        db = Database(str(tmp_path / "t.db"), pool_size=1)
+        db.open()
+        try:
+            await db.execute("CREATE TABLE items (name TEXT)")
+
+            def half_done(conn):
+                conn.execute("INSERT INTO items VALUES ('partial')")
+                raise RuntimeError("boom")
+
+            with pytest.raises(RuntimeError):
+                await db.write(half_done)
+            assert await db.fetchall("SELECT * FROM items") == []
+        finally:
+            db.close()
+
+    asyncio.run(scenario())
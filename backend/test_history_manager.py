@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from history_manager import SUMMARY_PREFIX, ConversationMemory, HistoryManager
+from tokens import estimate_messages_tokens
+
+
+class SummaryLLM:
+    def __init__(self):
+        self.prompts = []
+
+    async def call(self, messages, system_prompt, **kwargs):
+        self.prompts.append(messages[0]["content"])
+        return f"summary {len(self.prompts)}"
+
+
+def turns(count, words=40):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i} " + "detail " * words}
+        for i in range(count)
+    ]
+
+
+def build(manager, history, memory, reserve=0):
+    return asyncio.run(manager.build_messages(history, memory, reserve_tokens=reserve))
+
+
+def test_short_history_is_sent_verbatim():
+    llm = SummaryLLM()
+    history = turns(4)
+    messages = build(HistoryManager(llm, token_budget=2000), history, ConversationMemory())
+    assert messages == history
+    assert llm.prompts == []
+
+
+def test_old_turns_fold_into_a_summary_within_budget():
+    llm = SummaryLLM()
+    manager = HistoryManager(llm, token_budget=1500, summary_tokens=100)
+    memory = ConversationMemory()
+    history = turns(30)
+
+    messages = build(manager, history, memory, reserve=200)
+
+    assert estimate_messages_tokens(messages) <= 1300
+    assert messages[0] == {"role": "system", "content": SUMMARY_PREFIX + memory.summary}
+    assert messages[1:] == history[memory.folded:]
+    assert len(history) - memory.folded >= manager.min_recent_messages
+    calls = len(llm.prompts)
+    assert calls >= 1 and "turn 0 " in llm.prompts[0]
+
+    # The window was left with headroom: the next turn needs no new summary
+    history.append({"role": "user", "content": "one more question"})
+    build(manager, history, memory, reserve=200)
+    assert len(llm.prompts) == calls
+
+    # An edited earlier turn invalidates the cached summary
+    history[0] = {"role": "user", "content": "a different opening"}
+    build(manager, history, memory, reserve=200)
+    assert len(llm.prompts) > calls
+    assert "a different opening" in llm.prompts[calls]
+
+
+def test_fit_truncates_the_largest_message():
+    manager = HistoryManager(SummaryLLM(), token_budget=400)
+    history = [{"role": "user", "content": "short"}, {"role": "user", "content": "x" * 5000}]
+
+    messages = build(manager, history, ConversationMemory())
+
+    assert estimate_messages_tokens(messages) <= 400
+    # The earlier turn is folded, and the latest one is always kept, cut down
+    assert [m["role"] for m in messages] == ["system", "user"]
+    assert messages[-1]["content"].startswith("xxx") and messages[-1]["content"].endswith("[...]")
+
+
+def test_budget_must_leave_room_for_history():
+    with pytest.raises(ValueError):
+        build(HistoryManager(SummaryLLM(), token_budget=100), turns(2), ConversationMemory(), reserve=100)
@@ -0,0 +1,117 @@
+import asyncio
+import gzip
+import json
+
+import pytest
+
+from http_compression import CompressionMiddleware, Compressor, init_flask, negotiate, not_modified
+
+
+DOCUMENT = json.dumps([{"title": f"Opportunity {i}", "estimated_roi": "high"} for i in range(100)]).encode()
+
+
+def json_app(body, headers=()):
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json"), *headers]
+        })
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+
+def call(app, headers=(), method="GET"):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "headers": [(name.encode(), value.encode()) for name, value in headers]
+    }
+    asyncio.run(app(scope, None, send))
+    start, *bodies = messages
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, b"".join(
+        m.get("body", b"") for m in bodies
+    )
+
+
+def test_negotiation():
+    assert negotiate("gzip, deflate, br", ["br", "gzip"]) == "br"
+    assert negotiate("br;q=0.5, gzip", ["br", "gzip"]) == "gzip"
+    assert negotiate("gzip;q=0, *", ["gzip"]) is None
+    assert negotiate("*;q=0.1", ["zstd", "gzip"]) == "zstd"
+    assert negotiate("identity", ["gzip"]) is None
+    assert negotiate(None, ["gzip"]) is None
+
+    assert not_modified('"abc"', '"abc"')
+    assert not_modified('W/"x", "abc-gzip"', '"abc"')
+    assert not not_modified('"abd"', '"abc"')
+
+
+def test_middleware_compresses_and_revalidates():
+    compressor = Compressor(minimum_size=100, encodings=["gzip"])
+    app = CompressionMiddleware(json_app(DOCUMENT), compressor)
+
+    status, headers, body = call(app, [("accept-encoding", "gzip, br")])
+    assert status == 200 and headers["content-encoding"] == "gzip"
+    assert headers["vary"] == "Accept-Encoding"
+    assert gzip.decompress(body) == DOCUMENT
+    assert int(headers["content-length"]) == len(body) < len(DOCUMENT) / 4
+    etag = headers["etag"]
+    assert etag.endswith('-gzip"')
+
+    # The ETag of either representation revalidates the resource
+    status, headers, body = call(app, [("accept-encoding", "gzip"), ("if-none-match", etag)])
+    assert (status, body) == (304, b"")
+    assert "content-length" not in headers and headers["vary"] == "Accept-Encoding"
+    status, identity, body = call(app)
+    assert "content-encoding" not in identity and body == DOCUMENT
+    assert call(app, [("if-none-match", identity["etag"])])[0] == 304
+
+    # Bodies under the minimum, and POST responses, are not validated or compressed
+    status, headers, body = call(CompressionMiddleware(json_app(b"{}"), compressor), [("accept-encoding", "gzip")])
+    assert body == b"{}" and "content-encoding" not in headers
+    status, headers, body = call(app, [("accept-encoding", "gzip")], method="POST")
+    assert "etag" not in headers and headers["content-encoding"] == "gzip"
+
+    assert compressor.metrics()["responses"] == {"compressed": 2, "not_modified": 2, "identity": 2}
+    assert compressor.cache.hits == 0 and compressor.cache.misses == 1
+
+
+def test_endpoint_etags_and_streams_pass_through():
+    compressor = Compressor(minimum_size=100, encodings=["gzip"])
+    versioned = CompressionMiddleware(json_app(DOCUMENT, [(b"etag", b'"assessment-7"')]), compressor)
+    for _ in range(3):
+        status, headers, body = call(versioned, [("accept-encoding", "gzip")])
+        assert headers["etag"] == '"assessment-7-gzip"'
+    assert (compressor.cache.misses, compressor.cache.hits) == (1, 2)
+
+    async def stream(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/x-ndjson")]})
+        await send({"type": "http.response.body", "body": DOCUMENT, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    status, headers, body = call(CompressionMiddleware(stream, compressor), [("accept-encoding", "gzip")])
+    assert body == DOCUMENT and "content-encoding" not in headers
+
+
+def test_flask_responses():
+    flask = pytest.importorskip("flask")
+    app = flask.Flask(__name__)
+    init_flask(app, Compressor(minimum_size=100, encodings=["gzip"]))
+
+    @app.route("/document")
+    def document():
+        return flask.Response(DOCUMENT, mimetype="application/json")
+
+    client = app.test_client()
+    response = client.get("/document", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.data) == DOCUMENT
+    again = client.get("/document", headers={"If-None-Match": response.headers["ETag"]})
+    assert again.status_code == 304 and again.data == b""
@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+import httpx
+
+from airoi_backend import LLMProvider
+
+
+def ollama(monkeypatch, handler):
+    """Route the provider's HTTP requests to handler instead of a server"""
+    client = httpx.AsyncClient
+    monkeypatch.setattr(
+        httpx, "AsyncClient", lambda **kwargs: client(transport=httpx.MockTransport(handler), **kwargs)
+    )
+
+
+def test_warm_up_loads_the_model_and_prefills_each_system_prompt(monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append((request.url.path, json.loads(request.content)))
+        if request.url.path == "/api/chat":
+            return httpx.Response(200, json={"message": {"content": "."}})
+        return httpx.Response(200, json={})
+
+    ollama(monkeypatch, handler)
+    llm = LLMProvider("ollama", url="http://ollama", model="llama3.1:latest", keep_alive="30m")
+    asyncio.run(llm.warm_up(["analyzer prompt", "discovery prompt"]))
+
+    assert requests[0] == ("/api/generate", {"model": "llama3.1:latest", "prompt": "", "keep_alive": "30m"})
+    assert [(path, body["messages"], body["options"]) for path, body in requests[1:]] == [
+        ("/api/chat", [{"role": "system", "content": "analyzer prompt"}], {"num_predict": 1}),
+        ("/api/chat", [{"role": "system", "content": "discovery prompt"}], {"num_predict": 1}),
+    ]
+    assert all(body["keep_alive"] == "30m" for _, body in requests)
+
+    # Every chat request asks Ollama to keep the model resident
+    asyncio.run(llm.call([{"role": "user", "content": "hi"}], "system"))
+    assert requests[-1][1]["keep_alive"] == "30m"
+
+
+def test_model_residency_is_read_from_ollama(monkeypatch):
+    loaded = []
+    ollama(monkeypatch, lambda request: httpx.Response(200, json={"models": loaded}))
+    llm = LLMProvider("ollama", url="http://ollama", model="llama3.1:latest")
+
+    assert asyncio.run(llm.is_model_loaded()) is False
+    loaded.append({"name": "llama3.1:latest"})
+    assert asyncio.run(llm.is_model_loaded()) is True
+    # Hosted providers keep their models loaded
+    assert asyncio.run(LLMProvider("groq", api_key="key").is_model_loaded()) is True
@@ -0,0 +1,122 @@
+import asyncio
+import time
+
+import pytest
+
+from airoi_backend import MultiProviderLLM
+from llm_resilience import CircuitBreaker
+
+
+class FakeProvider:
+    def __init__(self, provider, delay=0.0, fail=False, chunks=("ok",), fail_after_chunks=None):
+        self.provider = provider
+        self.config = {}
+        self.delay = delay
+        self.fail = fail
+        self.chunks = chunks
+        self.fail_after_chunks = fail_after_chunks
+        self.calls = 0
+        self.cancelled = 0
+
+    async def call(self, messages, system_prompt, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise RuntimeError(f"{self.provider} is down")
+        return self.provider
+
+    async def stream(self, messages, system_prompt, **kwargs):
+        self.calls += 1
+        for i, chunk in enumerate(self.chunks):
+            if self.fail_after_chunks == i:
+                raise RuntimeError(f"{self.provider} dropped the stream")
+            yield chunk
+
+
+def collect(llm):
+    async def scenario():
+        return [chunk async for chunk in llm.stream([], "system")]
+    return asyncio.run(scenario())
+
+
+def test_slow_call_is_hedged_after_p95_and_the_loser_cancelled():
+    slow, fast = FakeProvider("slow", delay=5), FakeProvider("fast", delay=0.01)
+    llm = MultiProviderLLM([slow, fast], default_hedge_delay=10, min_hedge_delay=0.01)
+    for _ in range(20):
+        llm.latency[0].record(0.05)
+
+    started = time.monotonic()
+    assert asyncio.run(llm.call([], "system")) == "fast"
+    assert time.monotonic() - started < 1
+    assert slow.cancelled == 1
+    # The cancelled call is sampled with the time it ran before losing
+    assert len(llm.latency[0].samples) == 21
+    assert llm.latency[0].samples[-1] >= 0.05
+    assert llm.breakers[0].state == CircuitBreaker.CLOSED
+
+
+def test_fails_over_once_every_call_in_flight_failed():
+    first = FakeProvider("first", delay=0.02, fail=True)
+    second = FakeProvider("second", fail=True)
+    third = FakeProvider("third")
+    # Far from the hedge delay: only failures move on to the next provider
+    llm = MultiProviderLLM([first, second, third], default_hedge_delay=10)
+
+    started = time.monotonic()
+    assert asyncio.run(llm.call([], "system")) == "third"
+    assert time.monotonic() - started < 1
+    assert (first.calls, second.calls, third.calls) == (1, 1, 1)
+    # Failed calls are sampled as well
+    assert [len(l.samples) for l in llm.latency] == [1, 1, 1]
+    assert llm.latency[0].samples[0] >= 0.02
+
+    everything_down = MultiProviderLLM([FakeProvider("a", fail=True), FakeProvider("b", fail=True)])
+    with pytest.raises(RuntimeError, match="All LLM providers failed"):
+        asyncio.run(everything_down.call([], "system"))
+
+
+def test_breaker_skips_a_failing_provider_until_a_trial_succeeds():
+    flaky, backup = FakeProvider("flaky", fail=True), FakeProvider("backup")
+    llm = MultiProviderLLM([flaky, backup], failure_threshold=1, recovery_timeout=0.05)
+
+    assert asyncio.run(llm.call([], "system")) == "backup"
+    assert llm.breakers[0].state == CircuitBreaker.OPEN
+    assert asyncio.run(llm.call([], "system")) == "backup"
+    assert flaky.calls == 1
+
+    time.sleep(0.06)
+    flaky.fail = False
+    assert asyncio.run(llm.call([], "system")) == "flaky"
+    assert llm.breakers[0].state == CircuitBreaker.CLOSED
+
+    # Half-open lets a single trial through, and a failed trial reopens
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_stream_fails_over_only_before_the_first_chunk():
+    broken = FakeProvider("broken", chunks=("a", "b"), fail_after_chunks=0)
+    backup = FakeProvider("backup", chunks=("x", "y"))
+    assert collect(MultiProviderLLM([broken, backup])) == ["x", "y"]
+
+    cut_off = FakeProvider("cut off", chunks=("a", "b"), fail_after_chunks=1)
+    backup = FakeProvider("backup", chunks=("x", "y"))
+    llm = MultiProviderLLM([cut_off, backup])
+    received = []
+
+    async def scenario():
+        async for chunk in llm.stream([], "system"):
+            received.append(chunk)
+
+    with pytest.raises(RuntimeError, match="dropped the stream"):
+        asyncio.run(scenario())
+    assert received == ["a"]
+    assert backup.calls == 0
@@ -0,0 +1,64 @@
+import asyncio
+import sqlite3
+from datetime import datetime, timedelta
+
+from database import Database
+from llm_tracing import TraceSpan, TraceStore
+from migrations import migrate
+from queries import now_us, to_us
+
+
+def span(agent, latency_ms, started_at=None, status="ok"):
+    traced = TraceSpan(agent=agent, provider="ollama", model="llama3.1", status=status)
+    traced.latency_ms = latency_ms
+    if started_at is not None:
+        traced.started_at = started_at
+    return traced
+
+
+def test_spans_are_summarized_and_pruned(tmp_path):
+    async def scenario():
+        db = Database(str(tmp_path / "t.db"), pool_size=1)
+        db.open()
+        await db.write(migrate)
+        store = TraceStore(db, retention_days=7)
+        try:
+            old = now_us() - 10 * 86400 * 1_000_000
+            for traced in (span("discovery", 100), span("discovery", 300), span("roadmap", 50),
+                           span("roadmap", 900, status="error"), span("discovery", 5000, started_at=old)):
+                store.record(traced)
+
+            summary = await store.summary(window_hours=24, slowest=2)
+            assert summary["calls"] == 4
+            by_agent = {row["agent"]: row for row in summary["by_agent"]}
+            assert by_agent["discovery"]["calls"] == 2
+            assert by_agent["roadmap"]["errors"] == 1
+            assert [row["latency_ms"] for row in summary["slowest"]] == [300, 100]
+            datetime.fromisoformat(summary["slowest"][0]["started_at"])
+            assert (await store.summary(window_hours=24, slowest=0))["slowest"] == []
+
+            assert await store.prune() == 1
+            assert (await db.fetchone("SELECT COUNT(*) FROM llm_traces"))[0] == 4
+        finally:
+            db.close()
+
+    asyncio.run(scenario())
+
+
+def test_traces_written_before_migrations_get_integer_timestamps():
+    conn = sqlite3.connect(":memory:")
+    # As created by the TraceStore of earlier versions
+    conn.execute(
+        "CREATE TABLE llm_traces (id INTEGER PRIMARY KEY AUTOINCREMENT, started_at TIMESTAMP, "
+        "agent TEXT, provider TEXT, model TEXT, prompt_hash TEXT, prompt_chars INTEGER, streamed INTEGER, "
+        "queue_wait_ms REAL, ttft_ms REAL, latency_ms REAL, prompt_tokens INTEGER, completion_tokens INTEGER, "
+        "cached_tokens INTEGER, cache_hit INTEGER, status TEXT, error TEXT, attributes TEXT)"
+    )
+    written = (datetime.now() - timedelta(hours=1)).isoformat()
+    conn.execute("INSERT INTO llm_traces (started_at, agent) VALUES (?, 'discovery')", (written,))
+    conn.commit()
+
+    migrate(conn)
+
+    assert conn.execute("SELECT started_at FROM llm_traces").fetchone() == (to_us(written),)
+    conn.close()
@@ -0,0 +1,103 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from migrations import LATEST_VERSION, MIGRATIONS, migrate, schema_version
+from queries import HOT_QUERIES, INSERT_CONVERSATION, now_us, to_iso, to_us
+
+
+LEGACY_SCHEMA = '''
+    CREATE TABLE sessions (
+        id TEXT PRIMARY KEY, company_name TEXT, created_at TIMESTAMP,
+        updated_at TIMESTAMP, status TEXT
+    );
+    CREATE TABLE conversations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT, role TEXT,
+        agent TEXT, content TEXT, timestamp TIMESTAMP
+    );
+    CREATE TABLE assessments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT, audit_data TEXT,
+        opportunities TEXT, roadmap TEXT, created_at TIMESTAMP
+    );
+'''
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    yield conn
+    conn.close()
+
+
+def test_fresh_database_reaches_latest_version(conn):
+    assert migrate(conn) == LATEST_VERSION
+    assert schema_version(conn) == LATEST_VERSION
+
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {index for _, index in HOT_QUERIES.values()} <= indexes
+
+
+def test_migrate_is_idempotent(conn):
+    migrate(conn)
+    assert migrate(conn) == LATEST_VERSION
+
+
+def test_legacy_iso_timestamps_become_integers(conn):
+    conn.executescript(LEGACY_SCHEMA)
+    written = datetime(2025, 12, 6, 14, 30, 15, 250000).isoformat()
+    conn.execute(
+        "INSERT INTO sessions VALUES ('s1', 'Acme', ?, ?, 'active')", (written, written)
+    )
+    conn.execute(
+        "INSERT INTO conversations (session_id, role, content, timestamp) VALUES ('s1', 'user', 'hi', ?)",
+        (written,)
+    )
+    conn.commit()
+
+    migrate(conn)
+
+    value, kind = conn.execute("SELECT timestamp, typeof(timestamp) FROM conversations").fetchone()
+    assert kind == "integer"
+    assert value == to_us(written)
+    assert to_iso(value) == written
+
+
+def test_failed_migration_keeps_previous_version(conn, monkeypatch):
+    def broken(conn):
+        conn.execute("CREATE TABLE half_done (id INTEGER)")
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr("migrations.MIGRATIONS", MIGRATIONS[:1] + [(2, "broken", broken)])
+    with pytest.raises(RuntimeError):
+        migrate(conn)
+
+    assert schema_version(conn) == 1
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_queries_use_their_index(conn, name):
+    migrate(conn)
+    start = now_us()
+    conn.executemany(
+        INSERT_CONVERSATION,
+        [(f"s{i % 50}", "user", None, f"message {i}", start + i) for i in range(2000)]
+    )
+    conn.executemany(
+        "INSERT INTO assessments (session_id, audit_data, opportunities, roadmap, created_at) "
+        "VALUES (?, '{}', '[]', '{}', ?)",
+        [(f"s{i % 50}", start + i) for i in range(200)]
+    )
+    conn.execute("ANALYZE")
+
+    sql, index = HOT_QUERIES[name]
+    params = ("s1",) + (1,) * (sql.count("?") - 1)
+    plan = " | ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+
+    assert index in plan, plan
+    assert "SCAN" not in plan.replace(f"SCAN {index}", ""), plan
+    assert "TEMP B-TREE" not in plan, plan
+    if name == "conversation_page":
+        # The cursor must bound the index range, not filter a full session scan
+        assert "timestamp>?" in plan, plan
@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+from airoi_backend import ConfidenceLevel, ImplementationAssistant, Opportunity, Phase
+from prompt_builder import PromptBuilder
+from tokens import estimate_tokens
+
+
+AUDIT = {
+    "company_name": "Acme Logistics",
+    "systems": [{"name": "SAP", "notes": ""}, {"name": "Salesforce", "notes": None}],
+    "pain_points": [f"Invoices for region {i} are reconciled by hand every week" for i in range(40)],
+    "current_costs": {},
+}
+
+
+def compact(value):
+    return json.dumps(value, separators=(",", ":"))
+
+
+class RecordingLLM:
+    def __init__(self):
+        self.messages = []
+
+    async def call(self, messages, system_prompt, **kwargs):
+        self.messages.append(messages)
+        return "guide"
+
+
+def test_payload_is_compact_and_empty_fields_are_dropped():
+    builder = PromptBuilder(10_000).add("AUDIT DATA", AUDIT)
+    text = builder.build()
+
+    assert text.startswith("AUDIT DATA:\n{")
+    assert json.loads(text.split("\n", 1)[1])["systems"] == [{"name": "SAP"}, {"name": "Salesforce"}]
+    assert "current_costs" not in text
+    assert builder.stats["payload_truncated"] is False
+    assert builder.stats["prompt_tokens_saved"] > 0
+
+
+def test_lower_priority_sections_shrink_first_to_fit_the_budget():
+    opportunities = [{"title": "Invoice matching", "next_steps": ["pilot with finance"]}]
+    builder = PromptBuilder(300)
+    builder.add("OPPORTUNITIES", opportunities, priority=1)
+    builder.add("AUDIT DATA", AUDIT, priority=0)
+    text = builder.build()
+
+    assert estimate_tokens(text) <= 300
+    assert builder.stats["payload_truncated"] is True
+    assert compact(opportunities) in text
+    # The audit lost pain points from the end, not its first ones
+    assert "region 0 " in text and "region 39 " not in text
+
+
+def test_records_sharing_values_keep_all_their_fields():
+    shared = {"dependencies": ["ERP integration with the finance team"], "risk_factors": ["Vendor data quality"]}
+    opportunities = [{"title": "Invoice matching", **shared}, {"title": "Payment matching", **shared}]
+    text = PromptBuilder(10_000).add("OPPORTUNITIES", opportunities).build()
+
+    assert json.loads(text.split("\n", 1)[1]) == opportunities
+
+
+def test_repeated_records_and_sections_refer_back_to_the_first():
+    system = {"name": "SAP", "notes": "Finance and procurement, on premise since 2009"}
+    builder = PromptBuilder(10_000)
+    builder.add("OPPORTUNITIES", [{"title": "Invoice matching", "system": system}])
+    builder.add("AUDIT DATA", {"systems": [system]})
+    builder.add("AUDIT AGAIN", {"systems": [system]})
+    text = builder.build()
+
+    assert text.count("on premise") == 1
+    assert '"systems":["same as OPPORTUNITIES[0].system"]' in text
+    assert text.endswith('AUDIT AGAIN:\n"same as AUDIT DATA"')
+
+
+def test_agents_send_data_that_repeats_their_instructions():
+    llm = RecordingLLM()
+    assistant = ImplementationAssistant(llm)
+    opportunity = Opportunity(
+        title="Invoice matching", description="Match invoices to purchase orders", phase=Phase.QUICK_WIN,
+        can_do=["Infrastructure as Code (Terraform/CloudFormation)"], cannot_do=["approve payments"],
+        estimated_roi=25000, confidence=ConfidenceLevel.HIGH, timeframe_months=3,
+        risk_factors=["Highlight security considerations"], dependencies=[],
+        next_steps=["Always include rollback mechanisms", "pilot with finance"]
+    )
+
+    asyncio.run(assistant.generate_implementation_guide(opportunity))
+
+    data = llm.messages[0][0]["content"].split("\n\n")[1]
+    for value in ("Terraform", "security considerations", "rollback mechanisms", "pilot with finance"):
+        assert value in data
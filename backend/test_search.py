@@ -0,0 +1,164 @@
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+from column_codec import ColumnCodec
+from conversation_writer import ConversationWriter
+from database import Database
+from migrations import MIGRATIONS, migrate
+import queries
+from queries import now_us
+import search
+
+
+def add_session(conn, session_id, company):
+    conn.execute(queries.INSERT_SESSION, (session_id, company, 0, 0, "active", "{}"))
+
+
+def add_assessment(conn, codec, session_id, opportunities, audit=None, roadmap=None):
+    assessment_id = conn.execute(
+        queries.INSERT_ASSESSMENT,
+        (session_id, codec.encode(json.dumps(audit or {"systems": ["Excel"]})),
+         codec.encode(json.dumps(opportunities)), codec.encode(json.dumps(roadmap or {"phases": []})),
+         now_us(), None, None, session_id)
+    ).lastrowid
+    search.index_assessment(conn, assessment_id)
+
+
+def test_query_syntax_is_escaped():
+    assert search.fts_query('SAP-based "shipment status" reconcil* NOT') == (
+        '"SAP-based" "shipment status" "reconcil"* "NOT"'
+    )
+    with pytest.raises(search.SearchQueryError):
+        search.fts_query('  ""  * ')
+
+
+def test_existing_rows_are_indexed_by_the_migration():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    codec = ColumnCodec("zlib", min_bytes=0)
+    # A database from before the search indexes
+    for number, _, apply in MIGRATIONS:
+        if number <= 8:
+            apply(conn)
+    add_session(conn, "s1", "Acme")
+    conn.execute(
+        queries.INSERT_CONVERSATION,
+        ("s1", "user", None, codec.encode("Invoices are reconciled by hand"), 1)
+    )
+    conn.execute("PRAGMA user_version = 8")
+    migrate(conn)
+
+    results = search.search(conn, "reconcile", kinds=["conversations"])["conversations"]
+    assert [r["snippet"] for r in results] == ["Invoices are <mark>reconciled</mark> by hand"]
+
+
+@pytest.mark.parametrize("max_session_terms", [search.MAX_SESSION_TERMS, 0])
+def test_company_filter_takes_wildcards_literally(monkeypatch, max_session_terms):
+    monkeypatch.setattr(search, "MAX_SESSION_TERMS", max_session_terms)
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    migrate(conn)
+    companies = {"s1": "100% Foods", "s2": "1000 Foods", "s3": "A_B Trading", "s4": "AXB Trading", "s5": "C\\D"}
+    for session_id, company in companies.items():
+        add_session(conn, session_id, company)
+        message_id = conn.execute(
+            queries.INSERT_CONVERSATION, (session_id, "user", None, "Invoices by hand", 1)
+        ).lastrowid
+        search.index_conversations(conn, [(message_id, session_id, "Invoices by hand")])
+
+    def found(company):
+        results = search.search(conn, "invoices", ["conversations"], company=company)["conversations"]
+        return sorted(r["session_id"] for r in results)
+
+    assert found("0% foods") == ["s1"]
+    assert found("a_b") == ["s3"]
+    assert found("C\\D") == ["s5"]
+    assert found("%") == ["s1"]
+
+
+def test_search_ranks_filters_and_finds_assessments(tmp_path):
+    async def scenario():
+        db = Database(str(tmp_path / "t.db"), pool_size=1, codec=ColumnCodec("zlib", min_bytes=0))
+        db.open()
+        await db.write(migrate)
+
+        def setup(conn):
+            add_session(conn, "s1", "Acme Logistics")
+            add_session(conn, "s2", "Globex")
+            add_assessment(conn, db.codec, "s1", [
+                {"title": "Invoice matching", "description": "Match SAP invoices to purchase orders"}
+            ])
+        await db.write(setup)
+
+        writer = ConversationWriter(db)
+        for session_id, content in [
+            ("s1", "We run SAP for finance and reconcile invoices in Excel."),
+            ("s1", "Dispatchers plan routes manually."),
+            ("s2", "SAP SAP SAP: our whole company runs on SAP."),
+        ]:
+            await writer.append(session_id, "user", content, now_us())
+        await writer.flush()
+
+        results = await db.read(search.search, "sap")
+        conversations = results["conversations"]
+        # The message that is mostly about SAP ranks first
+        assert [r["session_id"] for r in conversations] == ["s2", "s1"]
+        assert conversations[1]["snippet"] == "We run <mark>SAP</mark> for finance and reconcile invoices in Excel."
+        assert conversations[1]["company_name"] == "Acme Logistics"
+
+        [assessment] = results["assessments"]
+        assert assessment["version"] == 1
+        assert assessment["section"] == "opportunities"
+        assert "<mark>SAP</mark>" in assessment["snippet"] and "title" not in assessment["snippet"]
+
+        recent = await db.read(search.search, "sap", ["conversations"], None, None, "recent")
+        assert [r["session_id"] for r in recent["conversations"]] == ["s2", "s1"]
+
+        by_session = await db.read(search.search, "sap", ["conversations"], "s1")
+        assert [r["session_id"] for r in by_session["conversations"]] == ["s1"]
+        by_company = await db.read(search.search, "sap", search.KINDS, None, "globex")
+        assert [r["session_id"] for r in by_company["conversations"]] == ["s2"]
+        assert by_company["assessments"] == []
+
+        # Only the page of results returned is decompressed
+        for i in range(5):
+            await writer.append("s2", "user", f"Warehouse {i}: " + "pick, pack and ship. " * 20, now_us())
+        await writer.flush()
+        before = db.codec.values_decoded
+        page = await db.read(search.search, "warehouse", ["conversations"], None, None, "relevance", 2)
+        assert len(page["conversations"]) == 2
+        assert db.codec.values_decoded - before == 2
+
+        await writer.close()
+        db.close()
+
+    asyncio.run(scenario())
+
+
+def test_markdown_in_the_text_is_not_taken_for_a_match():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    codec = ColumnCodec("off")
+    migrate(conn)
+    add_session(conn, "s1", "Acme")
+    conn.execute(
+        queries.INSERT_CONVERSATION,
+        ("s1", "assistant", None, codec.encode("**Step 1:** move invoices to <b>SAP</b> & archive"), 1)
+    )
+    search.index_conversations(conn, [(1, "s1", "**Step 1:** move invoices to <b>SAP</b> & archive")])
+    add_assessment(
+        conn, codec, "s1", [{"title": "**Quick win:** automate triage"}],
+        roadmap={"roadmap": "## Phase 2\n**Foundation:** migrate invoices to SAP"}
+    )
+
+    results = search.search(conn, "invoices")
+    assert [r["snippet"] for r in results["conversations"]] == [
+        "**Step 1:** move <mark>invoices</mark> to &lt;b&gt;SAP&lt;/b&gt; &amp; archive"
+    ]
+    [assessment] = results["assessments"]
+    # The opportunities come first and hold bold text, but the match is in the roadmap
+    assert assessment["section"] == "roadmap"
+    assert "<mark>invoices</mark>" in assessment["snippet"]
@@ -0,0 +1,106 @@
+import sqlite3
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import airoi_server
+import config
+import mock_llm_server
+from mock_llm_server import MockSettings
+
+
+@pytest.fixture
+def client(tmp_path):
+    """The API on a fresh database, its LLM answered in-process by the mock server"""
+    asgi_client = httpx.AsyncClient
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(airoi_server.db, "path", str(tmp_path / "airoi.db"))
+        mp.setattr(airoi_server, "orchestrators", {})
+        mp.setattr(config, "OLLAMA_WARMUP", False)
+        mp.setattr(config, "ARCHIVE_AFTER_DAYS", 0)
+        mp.setattr(mock_llm_server, "settings", MockSettings(
+            latency="fixed:0", tokens_per_second=0, completion_tokens="8", max_concurrency=0
+        ))
+        mp.setattr(httpx, "AsyncClient", lambda **kwargs: asgi_client(
+            transport=httpx.ASGITransport(app=mock_llm_server.app), base_url="http://ollama", **kwargs
+        ))
+        with TestClient(airoi_server.app) as client:
+            yield client
+
+
+def create_session(client):
+    response = client.post("/sessions", json={"company_name": "Acme", "llm_config": {}})
+    assert response.status_code == 200
+    return response.json()["session_id"]
+
+
+def test_chat_is_answered_by_the_discovery_agent(client):
+    session_id = create_session(client)
+
+    reply = client.post(f"/sessions/{session_id}/chat", json={"role": "user", "content": "We sell tools"})
+
+    assert reply.status_code == 200
+    assert reply.json()["agent"] == "discovery" and reply.json()["content"]
+    conversation = client.get(f"/sessions/{session_id}/conversation").json()["messages"]
+    assert [(m["role"], m["content"]) for m in conversation] == [
+        ("user", "We sell tools"), ("assistant", reply.json()["content"])
+    ]
+
+
+def test_session_reports_its_stored_status(client, tmp_path):
+    session_id = create_session(client)
+    assert client.get(f"/sessions/{session_id}").json()["status"] == "active"
+
+    with sqlite3.connect(tmp_path / "airoi.db") as conn:
+        conn.execute("UPDATE sessions SET status = 'archived', archive = 'x.arc' WHERE id = ?", (session_id,))
+    session = client.get(f"/sessions/{session_id}").json()
+
+    assert session["status"] == "archived" and session["company_name"] == "Acme"
+    assert client.get("/sessions/missing").status_code == 404
+
+
+def test_failed_llm_call_is_a_bad_gateway(client):
+    session_id = create_session(client)
+    mock_llm_server.settings.error_rate = 1.0
+
+    reply = client.post(f"/sessions/{session_id}/chat", json={"role": "user", "content": "hello"})
+
+    assert reply.status_code == 502
+    assert reply.json()["detail"].startswith("LLM call failed")
+
+
+def test_generate_assessment_runs_every_agent(client):
+    session_id = create_session(client)
+    client.post(f"/sessions/{session_id}/chat", json={"role": "user", "content": "Invoices are manual"})
+
+    response = client.post(f"/sessions/{session_id}/generate-assessment", params={"wait": True})
+
+    assert response.status_code == 200
+    assessment = response.json()
+    assert isinstance(assessment["audit_data"], dict)
+    assert isinstance(assessment["opportunities"], list)
+    assert isinstance(assessment["roadmap"], dict)
+    stored = client.get(f"/sessions/{session_id}/assessment").json()
+    assert stored["version"] == assessment["version"] == 1
+
+
+def test_websocket_chat_turn(client):
+    session_id = create_session(client)
+
+    with client.websocket_connect(f"/ws/{session_id}") as websocket:
+        for frame in ("not json", "[1, 2]", '{"role": "user"}', '{"content": 42}'):
+            websocket.send_text(frame)
+            error = websocket.receive_json()
+            assert error["type"] == "error" and error["error"].startswith("Invalid message")
+
+        websocket.send_json({"content": "We run an ERP"})
+        reply = websocket.receive_json()
+        assert reply["agent"] == "discovery" and reply["content"]
+
+        mock_llm_server.settings.error_rate = 1.0
+        websocket.send_json({"content": "And spreadsheets"})
+        assert websocket.receive_json()["error"].startswith("LLM call failed")
+
+    roles = [m["role"] for m in client.get(f"/sessions/{session_id}/conversation").json()["messages"]]
+    assert roles == ["user", "assistant", "user"]
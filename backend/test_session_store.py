@@ -0,0 +1,276 @@
+import asyncio
+
+import pytest
+
+from conversation_writer import ConversationWriter
+from database import Database
+from migrations import migrate
+from queries import now_us
+from resp_server import start_server
+from session_backend import RedisSessionBackend, SessionLockTimeout, SQLiteSessionBackend
+from session_store import SessionStore
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class Worker:
+    """One server process: its own connections, writer and session cache"""
+
+    def __init__(self, path, shared=False, **limits):
+        self.db = Database(str(path), pool_size=1)
+        self.writer = ConversationWriter(self.db)
+        self.backend = SQLiteSessionBackend(
+            self.db, self.writer, shared=shared, lock_timeout=2.0, poll_interval=0.01
+        )
+        self.store = SessionStore(self.backend, **limits)
+
+    async def open(self):
+        self.db.open()
+        await self.db.write(migrate)
+        await self.backend.start()
+        return self
+
+    async def close(self):
+        await self.backend.close()
+        await self.writer.close()
+        self.db.close()
+
+    async def add_turns(self, session_id, count):
+        async with self.store.turn(session_id) as session:
+            for i in range(count):
+                content = f"message {len(session.conversation_history) + session.history_offset}"
+                session.conversation_history.append({"role": "user", "content": content})
+                await self.writer.append(session_id, "user", content, now_us())
+
+
+def contents(session):
+    return [m["content"] for m in session.conversation_history]
+
+
+def test_evicted_session_is_rehydrated(tmp_path):
+    async def scenario():
+        worker = await Worker(tmp_path / "t.db", max_sessions=1).open()
+        await worker.store.create("s1", "Acme", {"provider": "groq", "api_key": "secret"})
+        await worker.add_turns("s1", 3)
+        await worker.store.create("s2", "Globex", {})
+
+        assert "s1" not in worker.store.sessions
+        session = await worker.store.get("s1")
+        await worker.close()
+        return worker.store, session
+
+    store, session = run(scenario())
+    assert session.company_name == "Acme"
+    assert session.llm_config == {"provider": "groq"}
+    assert contents(session) == ["message 0", "message 1", "message 2"]
+    assert store.metrics()["rehydrated"] == 1
+
+
+def test_compacted_history_stays_compacted(tmp_path):
+    async def scenario():
+        worker = await Worker(tmp_path / "t.db").open()
+        session = await worker.store.create("s1", "Acme", {})
+        await worker.add_turns("s1", 5)
+        session.memory.summary = "earlier turns"
+        session.memory.folded = 3
+        await worker.store.save(session)
+        resident = list(session.conversation_history)
+
+        worker.store.sessions.clear()
+        rehydrated = await worker.store.get("s1")
+        await worker.close()
+        return resident, rehydrated
+
+    resident, rehydrated = run(scenario())
+    assert [m["content"] for m in resident] == ["message 3", "message 4"]
+    assert rehydrated.conversation_history == resident
+    assert rehydrated.memory.summary == "earlier turns"
+    assert rehydrated.history_offset == 3
+
+
+def test_unknown_session(tmp_path):
+    async def scenario():
+        worker = await Worker(tmp_path / "t.db").open()
+        session = await worker.store.get("missing")
+        await worker.close()
+        return session
+
+    assert run(scenario()) is None
+
+
+def test_shared_sqlite_workers_see_each_others_turns(tmp_path):
+    async def scenario():
+        a = await Worker(tmp_path / "t.db", shared=True).open()
+        b = await Worker(tmp_path / "t.db", shared=True).open()
+        subscription = await b.backend.subscribe("session:s1")
+
+        await a.store.create("s1", "Acme", {})
+        await a.add_turns("s1", 2)
+        seen_by_b = contents(await b.store.get("s1"))
+
+        await b.add_turns("s1", 1)
+        seen_by_a = contents(await a.store.get("s1"))
+
+        await a.backend.publish("session:s1", "hello")
+        message = await asyncio.wait_for(subscription.get(), timeout=1.0)
+
+        await subscription.close()
+        await a.close()
+        await b.close()
+        return seen_by_b, seen_by_a, message, a.store.metrics()
+
+    seen_by_b, seen_by_a, message, metrics = run(scenario())
+    assert seen_by_b == ["message 0", "message 1"]
+    assert seen_by_a == ["message 0", "message 1", "message 2"]
+    assert message == "hello"
+    assert metrics["stale"] == 1
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "redis"])
+def test_turns_are_serialized_across_workers(tmp_path, backend):
+    async def scenario():
+        server = await start_server("127.0.0.1", 0)
+        url = "redis://127.0.0.1:%d/0" % server.sockets[0].getsockname()[1]
+        backends = [
+            RedisSessionBackend(url, pool_size=2, lock_timeout=2.0, retry_interval=0.005)
+            if backend == "redis" else
+            SQLiteSessionBackend(
+                Database(str(tmp_path / "t.db"), pool_size=1), None,
+                shared=True, lock_timeout=2.0, poll_interval=0.005
+            )
+            for _ in range(2)
+        ]
+        for b in backends:
+            if backend == "sqlite":
+                b.db.open()
+                await b.db.write(migrate)
+            await b.start()
+
+        inside = []
+        overlaps = []
+
+        async def hold(b):
+            async with b.lock("s1"):
+                if inside:
+                    overlaps.append(True)
+                inside.append(b)
+                await asyncio.sleep(0.02)
+                inside.remove(b)
+
+        await asyncio.gather(*(hold(b) for b in backends for _ in range(3)))
+
+        for b in backends:
+            await b.close()
+            if backend == "sqlite":
+                b.db.close()
+        server.close()
+        await server.wait_closed()
+        return overlaps
+
+    assert run(scenario()) == []
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "redis"])
+def test_turn_longer_than_the_lock_timeout_keeps_the_lock(tmp_path, backend):
+    async def scenario():
+        server = await start_server("127.0.0.1", 0)
+        url = "redis://127.0.0.1:%d/0" % server.sockets[0].getsockname()[1]
+        backends = [
+            RedisSessionBackend(url, pool_size=2, lock_timeout=timeout, retry_interval=0.005)
+            if backend == "redis" else
+            SQLiteSessionBackend(
+                Database(str(tmp_path / "t.db"), pool_size=1), None,
+                shared=True, lock_timeout=timeout, poll_interval=0.005
+            )
+            for timeout in (0.15, 2.0)
+        ]
+        for b in backends:
+            if backend == "sqlite":
+                b.db.open()
+                await b.db.write(migrate)
+            await b.start()
+        slow, other = backends
+        events = []
+
+        async def slow_turn():
+            async with slow.lock("s1"):
+                events.append("slow in")
+                await asyncio.sleep(0.5)
+                events.append("slow out")
+
+        async def other_turn():
+            await asyncio.sleep(0.05)
+            async with other.lock("s1"):
+                events.append("other in")
+
+        await asyncio.gather(slow_turn(), other_turn())
+
+        for b in backends:
+            await b.close()
+            if backend == "sqlite":
+                b.db.close()
+        server.close()
+        await server.wait_closed()
+        return events
+
+    assert run(scenario()) == ["slow in", "slow out", "other in"]
+
+
+def test_turn_that_lost_its_lock_does_not_save(tmp_path):
+    async def scenario():
+        a = await Worker(tmp_path / "t.db", shared=True).open()
+        b = await Worker(tmp_path / "t.db", shared=True).open()
+        await a.store.create("s1", "Acme", {})
+        try:
+            async with a.store.turn("s1") as session:
+                session.memory.summary = "stale copy"
+                # Another worker took the lock over, e.g. while this one was paused
+                await a.db.execute(
+                    "UPDATE session_locks SET owner = ? WHERE session_id = 's1'", (b.backend.owner,)
+                )
+        except SessionLockTimeout:
+            lost = True
+        else:
+            lost = False
+        row = await b.db.fetchone("SELECT history_summary, version FROM sessions WHERE id = 's1'")
+        await a.close()
+        await b.close()
+        return lost, tuple(row)
+
+    assert run(scenario()) == (True, (None, 0))
+
+
+def test_redis_backend_against_stand_in():
+    async def scenario():
+        server = await start_server("127.0.0.1", 0)
+        url = "redis://127.0.0.1:%d/0" % server.sockets[0].getsockname()[1]
+        a = RedisSessionBackend(url, pool_size=2)
+        b = RedisSessionBackend(url, pool_size=2)
+        await a.start()
+        await b.start()
+        store_a, store_b = SessionStore(a), SessionStore(b)
+        subscription = await b.subscribe("session:s1")
+        await asyncio.sleep(0.05)
+
+        await store_a.create("s1", "Acme", {"api_key": "secret", "model": "m"})
+        async with store_a.turn("s1") as session:
+            session.conversation_history.append({"role": "user", "content": "hi"})
+        session_b = await store_b.get("s1")
+
+        await a.publish("session:s1", "reply")
+        message = await asyncio.wait_for(subscription.get(), timeout=1.0)
+
+        await subscription.close()
+        await a.close()
+        await b.close()
+        server.close()
+        await server.wait_closed()
+        return session_b, message
+
+    session_b, message = run(scenario())
+    assert contents(session_b) == ["hi"]
+    assert session_b.llm_config == {"model": "m"}
+    assert session_b.version == 1
+    assert message == "reply"
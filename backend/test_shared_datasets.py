@@ -0,0 +1,79 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+from shared_datasets import DatasetNotFound, SharedDatasets
+
+
+def frame(rows=1000):
+    return pd.DataFrame({
+        "visits": range(rows),
+        "revenue": [i * 1.5 for i in range(rows)],
+        "region": ["north" if i % 2 else "south" for i in range(rows)]
+    })
+
+
+def test_attach_maps_the_published_frame(tmp_path):
+    datasets = SharedDatasets(str(tmp_path))
+    data_id = datasets.publish(frame(), {"rows": 1000})
+
+    assert datasets.info(data_id) == {"rows": 1000}
+    assert os.path.exists(tmp_path / f"{data_id}.arrow")
+    with datasets.attach(data_id) as attached:
+        pd.testing.assert_frame_equal(attached, frame())
+        # Numeric columns are views of the mapped file, not copies
+        assert not attached["revenue"].to_numpy().flags.writeable
+        assert json.loads((tmp_path / f"{data_id}.json").read_text())["refs"] == {str(os.getpid()): 1}
+    assert json.loads((tmp_path / f"{data_id}.json").read_text())["refs"] == {}
+
+    assert datasets.call(data_id, len) == 1000
+    with pytest.raises(DatasetNotFound):
+        datasets.info("../missing")
+
+
+def test_other_processes_attach_by_id(tmp_path):
+    datasets = SharedDatasets(str(tmp_path))
+    data_id = datasets.publish(frame())
+    probe = (
+        "import sys; from shared_datasets import SharedDatasets\n"
+        f"print(SharedDatasets(sys.argv[1]).call({data_id!r}, lambda df: int(df['visits'].sum())))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", probe, str(tmp_path)],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+    ).stdout
+    assert int(output) == sum(range(1000))
+
+
+def test_frames_arrow_cannot_hold_are_pickled(tmp_path):
+    datasets = SharedDatasets(str(tmp_path))
+    mixed = pd.DataFrame({"value": [1, "two", 3.0]})
+    data_id = datasets.publish(mixed)
+
+    assert os.path.exists(tmp_path / f"{data_id}.pkl")
+    with datasets.attach(data_id) as attached:
+        assert attached["value"].tolist() == [1, "two", 3.0]
+
+
+def test_sweep_removes_unused_datasets(tmp_path):
+    datasets = SharedDatasets(str(tmp_path), ttl=60)
+    idle, held = datasets.publish(frame(10)), datasets.publish(frame(10))
+
+    # A reference of a process that no longer exists does not keep a dataset
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    meta = json.loads((tmp_path / f"{idle}.json").read_text())
+    meta["refs"] = {str(dead.pid): 1}
+    (tmp_path / f"{idle}.json").write_text(json.dumps(meta))
+
+    with datasets.attach(held):
+        assert datasets.sweep() == 0
+        assert datasets.sweep(now=meta["last_used"] + 120) == 1
+    assert datasets.list() == [held]
+    assert not datasets.exists(idle)
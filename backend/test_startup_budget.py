@@ -0,0 +1,39 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+import startup_bench
+
+
+HEAVY = ("pandas", "sklearn", "matplotlib", "seaborn", "scipy")
+
+
+def imported_after(code):
+    """Heavy modules loaded by running code in a fresh interpreter"""
+    probe = f"import sys, json\n{code}\nprint(json.dumps(sorted({{m.split('.')[0] for m in sys.modules}})))"
+    output = subprocess.run(
+        [sys.executable, "-c", probe], cwd=startup_bench.HERE, capture_output=True, text=True, check=True
+    ).stdout
+    return [m for m in json.loads(output.splitlines()[-1]) if m in HEAVY]
+
+
+def test_analysis_libraries_load_on_demand():
+    pytest.importorskip("flask_cors")
+    pytest.importorskip("dotenv")
+    assert imported_after("import api_server, analytics_asgi") == []
+    pytest.importorskip("sklearn")
+    pytest.importorskip("seaborn")
+    assert imported_after("import analytics_core; analytics_core.prewarm(['regression'])") == [
+        "matplotlib", "pandas", "scipy", "sklearn"
+    ]
+
+
+@pytest.mark.parametrize("service", ["analytics", "flask"])
+def test_startup_within_budget(service):
+    pytest.importorskip("uvicorn")
+    pytest.importorskip("flask_cors")
+    budget = startup_bench.SERVICES[service]["budget"]
+    summary = startup_bench.summarize([startup_bench.measure(service, idle=0.5)], budget)
+    assert summary["over_budget"] == []
@@ -0,0 +1,119 @@
+import asyncio
+import json
+
+from structured_output import (
+    AUDIT_DATA_SCHEMA, OPPORTUNITIES_SCHEMA, OPPORTUNITY_SCHEMA, IncrementalJSONParser,
+    coerce, generate_structured, repair_json_text, validate
+)
+
+
+def opportunity(title, **fields):
+    return {
+        "title": title, "description": f"{title} description", "phase": "quick_win",
+        "can_do": ["draft"], "cannot_do": ["approve"], "estimated_roi": 1.5, "confidence": "high",
+        "timeframe_months": 3, "risk_factors": [], "dependencies": [], "next_steps": ["pilot"],
+        **fields
+    }
+
+
+class StubLLM:
+    """Streams a canned answer in small chunks and answers repair calls"""
+
+    def __init__(self, answer, repairs=()):
+        self.answer = answer
+        self.repairs = list(repairs)
+        self.repair_prompts = []
+
+    async def stream(self, messages, system_prompt, response_schema=None):
+        for i in range(0, len(self.answer), 7):
+            yield self.answer[i:i + 7]
+
+    async def call(self, messages, system_prompt, response_schema=None):
+        self.repair_prompts.append(messages[-1]["content"])
+        return self.repairs.pop(0)
+
+
+def test_repair_json_text_fixes_formatting_slips():
+    fenced = 'Here is the summary:\n```json\n{"systems": ["crm", "erp",], "remote": True,}\n```\nThanks'
+    assert repair_json_text(fenced) == {"systems": ["crm", "erp"], "remote": True}
+
+    # Brackets inside strings, and a raw newline in a string
+    assert repair_json_text('{"note": "uses {braces} and ]", "text": "two\nlines"}') == {
+        "note": "uses {braces} and ]", "text": "two\nlines"
+    }
+
+    # Cut off mid-string: the string and the open containers are closed
+    truncated = '{"opportunities": [{"title": "A"}, {"title": "B", "description": "half a sent'
+    assert repair_json_text(truncated) == {
+        "opportunities": [{"title": "A"}, {"title": "B", "description": "half a sent"}]
+    }
+    # Cut off mid-key: everything up to the last complete member is kept
+    truncated = '{"opportunities": [{"title": "A"}, {"title": "B", "descr'
+    assert repair_json_text(truncated) == {"opportunities": [{"title": "A"}, {"title": "B"}]}
+
+    assert repair_json_text("no json here") is None
+
+
+def test_parser_reports_records_as_they_complete():
+    document = json.dumps({
+        "summary": "mentions } and { and \"quotes\"",
+        "opportunities": [{"title": "first }]"}, {"title": "second"}]
+    })
+    parser = IncrementalJSONParser()
+    events = []
+    # Chunk boundaries fall inside strings and right after the braces in them
+    for i in range(0, len(document), 5):
+        events.extend(parser.feed(document[i:i + 5]))
+
+    assert events == [
+        (("summary",), "mentions } and { and \"quotes\"", None),
+        (("opportunities", 0), {"title": "first }]"}, None),
+        (("opportunities", 1), {"title": "second"}, None),
+        (("opportunities",), [{"title": "first }]"}, {"title": "second"}], None),
+    ]
+    assert parser.result() == json.loads(document)
+
+    broken = IncrementalJSONParser()
+    events = broken.feed('prose first [{"title": "ok"}, {"title": oops}, ')
+    assert events[0] == ((0,), {"title": "ok"}, None)
+    assert events[1][0] == (1,) and events[1][1] is None and "invalid JSON" in events[1][2]
+    assert broken.result() is None
+
+
+def test_coerce_fixes_types_without_an_llm():
+    value = coerce({
+        "title": "Triage", "description": "Route tickets", "phase": "Quick Win",
+        "confidence": "HIGH confidence", "estimated_roi": "$25,000", "timeframe_months": "6.4",
+        "can_do": "classify tickets", "next_steps": None, "owner": "dropped"
+    }, OPPORTUNITY_SCHEMA)
+
+    assert value["phase"] == "quick_win"
+    assert value["confidence"] == "high"
+    assert value["estimated_roi"] == 25000.0
+    assert value["timeframe_months"] == 6
+    assert value["can_do"] == ["classify tickets"]
+    assert value["next_steps"] == []
+    # Missing required arrays are filled in, unexpected fields removed
+    assert value["cannot_do"] == value["risk_factors"] == value["dependencies"] == []
+    assert "owner" not in value
+    assert validate(value, OPPORTUNITY_SCHEMA) == []
+
+    assert coerce([opportunity("A")], OPPORTUNITIES_SCHEMA) == {"opportunities": [opportunity("A")]}
+    audit = coerce({"company_name": "Acme", "industry": "retail", "employee_count": "1.2k"}, AUDIT_DATA_SCHEMA)
+    assert audit["employee_count"] == 1200 and audit["systems"] == [] and audit["current_costs"] == {}
+
+
+def test_only_the_invalid_record_is_sent_for_repair():
+    answer = json.dumps({"opportunities": [
+        opportunity("Keep"), opportunity("Fix", phase="someday"), opportunity("Drop", confidence="unsure")
+    ]})
+    llm = StubLLM(answer, repairs=[json.dumps(opportunity("Fix")), "still not json"])
+
+    value, errors = asyncio.run(generate_structured(llm, [], "system", OPPORTUNITIES_SCHEMA))
+
+    assert [o["title"] for o in value["opportunities"]] == ["Keep", "Fix"]
+    assert errors == ["$.opportunities[2].confidence: must be one of low, medium, high"]
+    assert len(llm.repair_prompts) == 2
+    assert '"title":"Fix"' in llm.repair_prompts[0]
+    assert "Keep" not in llm.repair_prompts[0] and "Drop" not in llm.repair_prompts[0]
+    assert "$.opportunities[1].phase: must be one of quick_win, foundation, strategic" in llm.repair_prompts[0]
@@ -0,0 +1,135 @@
+import asyncio
+import json
+
+from session_backend import SessionBackend
+from ws_hub import CLOSE_IDLE, CLOSE_SLOW, Hub
+
+
+class FakeSocket:
+    """Records frames; sends block while paused, like a client not reading"""
+
+    def __init__(self):
+        self.frames = []
+        self.closed = None
+        self.reading = asyncio.Event()
+        self.reading.set()
+
+    async def send_text(self, text):
+        await self.reading.wait()
+        self.frames.append(json.loads(text))
+
+    async def close(self, code=1000, reason=""):
+        self.closed = code
+
+    def messages(self):
+        received = []
+        for frame in self.frames:
+            received.extend(frame["messages"] if frame.get("type") == "batch" else [frame])
+        return received
+
+
+def progress(job_id, stage):
+    return {"type": "assessment_progress", "job_id": job_id, "stage": stage}
+
+
+def test_publish_skips_source_connection():
+    async def scenario():
+        hub = Hub(SessionBackend())
+        sockets = [FakeSocket() for _ in range(3)]
+        connections = [await hub.connect("s1", socket) for socket in sockets]
+        other = FakeSocket()
+        await hub.connect("s2", other)
+
+        await hub.publish("s1", {"content": "hi"}, source=connections[0].id)
+        await asyncio.sleep(0.01)
+
+        assert sockets[0].frames == []
+        assert sockets[1].messages() == sockets[2].messages() == [{"content": "hi"}]
+        assert other.frames == []
+
+        # The session's subscription goes away with its last connection
+        for connection in connections:
+            await hub.disconnect(connection)
+        assert "session:s1" not in hub.backend._subscriptions
+        assert hub.metrics()["connections"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_slow_client_gets_coalesced_progress_and_drops_oldest():
+    async def scenario():
+        hub = Hub(SessionBackend(), max_queue=4)
+        socket = FakeSocket()
+        socket.reading.clear()
+        connection = await hub.connect("s1", socket)
+
+        connection.send({"content": "first"})
+        await asyncio.sleep(0.01)  # the first frame is now stuck in send_text
+        for stage in ("audit_data", "opportunities", "roadmap"):
+            hub.deliver("s1", progress("job", stage))
+        for i in range(5):
+            connection.send({"content": i})
+
+        socket.reading.set()
+        await asyncio.sleep(0.01)
+
+        received = socket.messages()
+        assert received[0] == {"content": "first"}
+        # The progress message was coalesced, then dropped with the oldest chat messages
+        assert received[1:] == [{"content": i} for i in range(1, 5)]
+        metrics = hub.metrics()
+        assert metrics["coalesced"] == 2
+        assert metrics["dropped"] == 2
+        # Everything queued while blocked went out as one frame
+        assert metrics["frames_sent"] == 2 and metrics["batched_frames"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_overflow_close_policy_disconnects_slow_client():
+    async def scenario():
+        hub = Hub(SessionBackend(), max_queue=2, overflow="close", send_timeout=0.05)
+        socket = FakeSocket()
+        socket.reading.clear()
+        connection = await hub.connect("s1", socket)
+        for i in range(4):
+            connection.send({"content": i})
+        await asyncio.sleep(0.01)
+
+        assert connection.closed and socket.closed == CLOSE_SLOW
+        assert hub.metrics()["connections"] == 0
+
+        # A client that never reads is closed after the send timeout
+        hub = Hub(SessionBackend(), send_timeout=0.05)
+        socket = FakeSocket()
+        socket.reading.clear()
+        connection = await hub.connect("s1", socket)
+        connection.send({"content": "stuck"})
+        await asyncio.sleep(0.1)
+        assert socket.closed == CLOSE_SLOW
+
+    asyncio.run(scenario())
+
+
+def test_heartbeat_and_idle_close():
+    async def scenario():
+        hub = Hub(SessionBackend(), heartbeat_interval=0.05, idle_timeout=0.2)
+        quiet, answering, busy = FakeSocket(), FakeSocket(), FakeSocket()
+        quiet_connection = await hub.connect("s1", quiet)
+        answering_connection = await hub.connect("s1", answering)
+        busy_connection = await hub.connect("s1", busy)
+        busy_connection.busy = True
+
+        heartbeat = asyncio.create_task(hub.run())
+        for _ in range(10):
+            await asyncio.sleep(0.05)
+            answering_connection.touch()
+        heartbeat.cancel()
+
+        assert {"type": "ping"} in quiet.messages()
+        assert quiet.closed == CLOSE_IDLE and quiet_connection.closed
+        assert answering.closed is None
+        assert busy.closed is None
+        assert hub.metrics()["closed_idle"] == 1
+
+    asyncio.run(scenario())
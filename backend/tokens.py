@@ -0,0 +1,41 @@
+"""
+Token estimation helpers
+
+Llama-family tokenizers average roughly four characters of English text per
+token. We assume 3.5 so that budgets computed with the estimate stay under
+the model's real context limit.
+"""
+
+import math
+from typing import Dict, List
+
+CHARS_PER_TOKEN = 3.5
+
+# Chat templates add role markers and separators around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a piece of text"""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def estimate_message_tokens(message: Dict) -> int:
+    """Estimate the tokens a single chat message occupies in the prompt"""
+    return estimate_tokens(message.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+
+
+def estimate_messages_tokens(messages: List[Dict]) -> int:
+    """Estimate the tokens a list of chat messages occupies in the prompt"""
+    return sum(estimate_message_tokens(m) for m in messages)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down so that it fits in roughly max_tokens tokens"""
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text
+    marker = " [...]"
+    return text[:max(0, max_chars - len(marker))] + marker
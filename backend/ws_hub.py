@@ -0,0 +1,290 @@
+"""
+WebSocket connection hub
+
+Maps session ids to the WebSocket connections of this process and gives
+any task (chat turns, agents, background jobs) a way to push messages to
+them. Messages published on a session's channel by any worker reach every
+local connection of that session.
+
+Each connection has a bounded outbound queue drained by a send task that
+only exists while messages are queued, so an idle connection costs a few
+hundred bytes besides the socket itself:
+
+- Progress updates of the same job are coalesced: a slow client gets the
+  latest state instead of every intermediate step.
+- When the queue is full the oldest message is dropped, or the connection
+  is closed with overflow="close".
+- Messages queued together are sent as one frame,
+  {"type": "batch", "messages": [...]}.
+- The hub sends {"type": "ping"} to connections that have been quiet for a
+  heartbeat interval and closes those that send nothing, not even
+  {"type": "pong"}, within the idle timeout. ASGI does not expose protocol
+  level pings, hence the JSON messages.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Set
+
+OVERFLOW_POLICIES = ("drop_oldest", "close")
+
+CLOSE_IDLE = 4408
+CLOSE_SLOW = 4429
+
+
+def coalesce_key(message: Dict[str, Any]) -> Optional[str]:
+    """Messages with the same key replace each other while still queued"""
+    kind = message.get("type")
+    if kind == "assessment_progress":
+        return f"assessment:{message.get('job_id')}"
+    if kind == "ping":
+        return "ping"
+    return None
+
+
+class Connection:
+    """One WebSocket and its outbound queue"""
+
+    __slots__ = (
+        "hub", "session_id", "websocket", "id", "queue", "pending", "sender",
+        "last_seen", "busy", "closed"
+    )
+
+    def __init__(self, hub: "Hub", session_id: str, websocket):
+        self.hub = hub
+        self.session_id = session_id
+        self.websocket = websocket
+        self.id = uuid.uuid4().hex
+        self.queue: deque = deque()
+        # Queued entries by coalesce key; created on first use
+        self.pending: Optional[Dict[str, list]] = None
+        self.sender: Optional[asyncio.Task] = None
+        self.last_seen = time.monotonic()
+        # Set while a request of this client is being handled
+        self.busy = False
+        self.closed = False
+
+    def touch(self):
+        """Record that the client sent something"""
+        self.last_seen = time.monotonic()
+
+    def send(self, message: Dict[str, Any], key: Optional[str] = None) -> bool:
+        """Queue a message; returns False if the connection is closed"""
+        if self.closed:
+            return False
+        hub = self.hub
+
+        if key is not None and self.pending and key in self.pending:
+            self.pending[key][1] = message
+            hub.coalesced += 1
+            return True
+
+        if len(self.queue) >= hub.max_queue:
+            if hub.overflow == "close":
+                hub.closed_slow += 1
+                asyncio.ensure_future(self.close(CLOSE_SLOW, "Client too slow"))
+                return False
+            self._forget(self.queue.popleft())
+            hub.dropped += 1
+
+        entry = [key, message]
+        self.queue.append(entry)
+        if key is not None:
+            if self.pending is None:
+                self.pending = {}
+            self.pending[key] = entry
+        if self.sender is None:
+            # Messages queued before the task first runs go out as one batch
+            self.sender = asyncio.ensure_future(self._drain())
+        return True
+
+    def _forget(self, entry: list):
+        key = entry[0]
+        if key is not None and self.pending and self.pending.get(key) is entry:
+            del self.pending[key]
+            if not self.pending:
+                self.pending = None
+
+    async def _drain(self):
+        hub = self.hub
+        try:
+            if hub.batch_delay:
+                await asyncio.sleep(hub.batch_delay)
+            while self.queue and not self.closed:
+                texts = []
+                size = 0
+                while self.queue and len(texts) < hub.batch_max_messages and size < hub.batch_max_bytes:
+                    entry = self.queue.popleft()
+                    self._forget(entry)
+                    text = json.dumps(entry[1])
+                    texts.append(text)
+                    size += len(text)
+
+                if len(texts) == 1:
+                    frame = texts[0]
+                else:
+                    frame = '{"type": "batch", "messages": [' + ", ".join(texts) + "]}"
+                    hub.batched_frames += 1
+                await asyncio.wait_for(self.websocket.send_text(frame), hub.send_timeout)
+                hub.frames_sent += 1
+                hub.messages_sent += len(texts)
+        except asyncio.TimeoutError:
+            hub.closed_slow += 1
+            await self.close(CLOSE_SLOW, "Client too slow")
+        except Exception:
+            # The socket is gone; the receive loop will notice as well
+            await self.close()
+        finally:
+            self.sender = None
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        self.pending = None
+        if self.sender is not None and self.sender is not asyncio.current_task():
+            self.sender.cancel()
+        self.sender = None
+        await self.hub._unregister(self)
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+
+class Hub:
+    """WebSocket connections of this process, grouped by session"""
+
+    def __init__(
+        self,
+        backend,
+        max_queue: int = 256,
+        overflow: str = "drop_oldest",
+        batch_max_messages: int = 50,
+        batch_max_bytes: int = 64 * 1024,
+        batch_delay: float = 0.0,
+        send_timeout: float = 10.0,
+        heartbeat_interval: float = 20.0,
+        idle_timeout: float = 60.0
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.backend = backend
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.batch_max_messages = batch_max_messages
+        self.batch_max_bytes = batch_max_bytes
+        self.batch_delay = batch_delay
+        self.send_timeout = send_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.sessions: Dict[str, Set[Connection]] = {}
+        self._subscriptions: Dict[str, Any] = {}
+        self.connections = 0
+        self.frames_sent = 0
+        self.messages_sent = 0
+        self.batched_frames = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.closed_slow = 0
+        self.closed_idle = 0
+
+    async def connect(self, session_id: str, websocket) -> Connection:
+        """Register an accepted WebSocket"""
+        connection = Connection(self, session_id, websocket)
+        connections = self.sessions.setdefault(session_id, set())
+        connections.add(connection)
+        self.connections += 1
+
+        if session_id not in self._subscriptions:
+            # One subscription per session, shared by its local connections
+            self._subscriptions[session_id] = None
+            subscription = await self.backend.subscribe(
+                f"session:{session_id}", self._receiver(session_id)
+            )
+            if self.sessions.get(session_id):
+                self._subscriptions[session_id] = subscription
+            else:
+                # Everyone left while subscribing
+                self._subscriptions.pop(session_id, None)
+                await subscription.close()
+        return connection
+
+    async def disconnect(self, connection: Connection):
+        await connection.close()
+
+    async def _unregister(self, connection: Connection):
+        connections = self.sessions.get(connection.session_id)
+        if connections is None or connection not in connections:
+            return
+        connections.discard(connection)
+        self.connections -= 1
+        if not connections:
+            del self.sessions[connection.session_id]
+            subscription = self._subscriptions.pop(connection.session_id, None)
+            if subscription is not None:
+                await subscription.close()
+
+    def _receiver(self, session_id: str) -> Callable[[str], None]:
+        def receive(raw: str):
+            event = json.loads(raw)
+            self.deliver(session_id, event["message"], exclude=event.get("source"))
+        return receive
+
+    def deliver(self, session_id: str, message: Dict[str, Any], exclude: Optional[str] = None) -> int:
+        """Queue a message for this process's connections of the session"""
+        key = coalesce_key(message)
+        delivered = 0
+        for connection in list(self.sessions.get(session_id, ())):
+            if connection.id != exclude and connection.send(message, key):
+                delivered += 1
+        return delivered
+
+    async def publish(self, session_id: str, message: Dict[str, Any], source: Optional[str] = None):
+        """
+        Send a message to the session's connections on every worker
+
+        source is the id of a connection that already has the message.
+        """
+        await self.backend.publish(
+            f"session:{session_id}", json.dumps({"source": source, "message": message})
+        )
+
+    async def run(self):
+        """Background task sending heartbeats and closing idle connections"""
+        while True:
+            await asyncio.sleep(min(self.heartbeat_interval, self.idle_timeout) / 2)
+            now = time.monotonic()
+            for connections in list(self.sessions.values()):
+                for connection in list(connections):
+                    quiet = now - connection.last_seen
+                    if quiet > self.idle_timeout and not connection.busy:
+                        self.closed_idle += 1
+                        await connection.close(CLOSE_IDLE, "Idle timeout")
+                    elif quiet > self.heartbeat_interval:
+                        connection.send({"type": "ping"}, "ping")
+
+    async def close(self):
+        for connections in list(self.sessions.values()):
+            for connection in list(connections):
+                await connection.close(1001, "Server shutting down")
+
+    def metrics(self) -> Dict[str, Any]:
+        depths = [len(c.queue) for cs in self.sessions.values() for c in cs]
+        return {
+            "connections": self.connections,
+            "sessions": len(self.sessions),
+            "queued_messages": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "frames_sent": self.frames_sent,
+            "messages_sent": self.messages_sent,
+            "batched_frames": self.batched_frames,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "closed_slow": self.closed_slow,
+            "closed_idle": self.closed_idle
+        }
@@ -0,0 +1,280 @@
+"""
+WebSocket load driver
+
+Opens many concurrent, mostly idle WebSocket connections and reports the
+server's resident memory per connection as they ramp up, to check that
+one worker holds 10k+ connections with flat memory per connection:
+
+    ulimit -n 65536
+    WS_HEARTBEAT_INTERVAL=5 python airoi_server.py
+    python ws_load_test.py --connections 10000 --sessions 100 --hold 30
+
+Clients answer the hub's {"type": "ping"} heartbeats with pongs, so
+connections stay open for the whole --hold period. A few sessions get a
+chat message published to them during the hold to measure fan-out.
+
+--mode hub drives ws_hub.Hub in-process with stand-in sockets instead and
+measures the hub's own allocations per connection with tracemalloc; it
+needs no server.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import resource
+import struct
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+
+def raise_file_limit(wanted: int):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = min(max(soft, wanted), hard)
+    if target > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    if target < wanted:
+        print(f"Open file limit is {target}, fewer than {wanted}; raise it with ulimit -n")
+
+
+def encode_frame(opcode: int, payload: bytes) -> bytes:
+    """Client frames are masked (RFC 6455 5.3)"""
+    mask = os.urandom(4)
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, 0x80 | length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 0x80 | 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 0x80 | 127, length)
+    masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return header + mask + masked
+
+
+async def read_frame(reader: asyncio.StreamReader):
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        (length,) = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", await reader.readexactly(8))
+    return opcode, await reader.readexactly(length)
+
+
+class Client:
+    """One raw WebSocket connection; no dependency beyond asyncio"""
+
+    def __init__(self, stats: Dict[str, int]):
+        self.stats = stats
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def connect(self, url: str):
+        parts = urlparse(url)
+        reader, self.writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.writer.write(
+            f"GET {parts.path} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode()
+        )
+        status = await reader.readline()
+        if b" 101 " not in status:
+            raise ConnectionError(status.decode().strip())
+        await reader.readuntil(b"\r\n\r\n")
+        return reader
+
+    async def run(self, url: str, stop: asyncio.Event):
+        try:
+            reader = await self.connect(url)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError) as e:
+            self.stats["failed"] += 1
+            if self.stats["failed"] <= 3:
+                print(f"Connection failed: {e}")
+            return
+        self.stats["open"] += 1
+        receiving = asyncio.create_task(self.receive(reader))
+        stopping = asyncio.create_task(stop.wait())
+        await asyncio.wait([receiving, stopping], return_when=asyncio.FIRST_COMPLETED)
+        receiving.cancel()
+        stopping.cancel()
+        self.stats["open"] -= 1
+        self.writer.close()
+
+    async def receive(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                opcode, payload = await read_frame(reader)
+                if opcode == 0x8:
+                    self.stats["closed_by_server"] += 1
+                    return
+                if opcode == 0x9:
+                    self.writer.write(encode_frame(0xA, payload))
+                    continue
+                message = json.loads(payload)
+                if message.get("type") == "ping":
+                    self.stats["pings"] += 1
+                    self.writer.write(encode_frame(0x1, b'{"type": "pong"}'))
+                elif message.get("type") == "batch":
+                    self.stats["messages"] += len(message["messages"])
+                else:
+                    self.stats["messages"] += 1
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self.stats["dropped"] += 1
+
+
+async def server_rss(client: httpx.AsyncClient) -> Optional[int]:
+    response = await client.get("/metrics")
+    return response.json().get("process", {}).get("rss_bytes")
+
+
+async def run_server(args) -> Dict[str, Any]:
+    raise_file_limit(args.connections + 256)
+    base = args.base_url.rstrip("/")
+    ws_base = base.replace("http", "ws", 1)
+    stats = {"open": 0, "failed": 0, "dropped": 0, "closed_by_server": 0, "pings": 0, "messages": 0}
+    stop = asyncio.Event()
+    samples: List[Dict[str, Any]] = []
+
+    async with httpx.AsyncClient(base_url=base, timeout=60) as http:
+        session_ids = []
+        for i in range(args.sessions):
+            response = await http.post("/sessions", json={
+                "company_name": f"WS load {i}",
+                "llm_config": {"provider": "ollama", "model": "llama3.1"}
+            })
+            session_ids.append(response.json()["session_id"])
+
+        baseline = await server_rss(http)
+        checkpoints = {args.connections * q // 4 for q in (1, 2, 3, 4)}
+        clients = []
+        started = time.monotonic()
+        for i in range(args.connections):
+            url = f"{ws_base}/ws/{session_ids[i % len(session_ids)]}"
+            clients.append(asyncio.create_task(Client(stats).run(url, stop)))
+            if args.ramp and i % args.ramp == 0:
+                await asyncio.sleep(0)
+            if i + 1 in checkpoints:
+                # Let the handshakes of this step finish before sampling
+                while stats["open"] + stats["failed"] < i + 1:
+                    await asyncio.sleep(0.05)
+                rss = await server_rss(http)
+                samples.append({
+                    "connections": stats["open"],
+                    "rss_mb": round(rss / 2**20, 1) if rss else None,
+                    "bytes_per_connection": (
+                        round((rss - baseline) / stats["open"]) if rss and baseline and stats["open"] else None
+                    )
+                })
+                print(f"{stats['open']} connections, server RSS {samples[-1]['rss_mb']} MB")
+        ramp_seconds = time.monotonic() - started
+
+        # Fan out a chat message to a few sessions through the REST endpoint
+        for session_id in session_ids[:args.chat_sessions]:
+            await http.post(f"/sessions/{session_id}/chat", json={"role": "user", "content": "Hello"})
+
+        await asyncio.sleep(args.hold)
+        hub = (await http.get("/metrics")).json().get("websockets")
+
+    stop.set()
+    await asyncio.gather(*clients)
+    return {
+        "connections": args.connections,
+        "ramp_seconds": round(ramp_seconds, 1),
+        "samples": samples,
+        "client": stats,
+        "hub": hub
+    }
+
+
+class StandInSocket:
+    """Accepts frames without a network; the hub only calls send_text and close"""
+
+    __slots__ = ("sent",)
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_text(self, text: str):
+        self.sent += 1
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+
+async def run_hub(args) -> Dict[str, Any]:
+    from session_backend import SessionBackend
+    from ws_hub import Hub
+
+    hub = Hub(SessionBackend())
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    checkpoints = {args.connections * q // 4 for q in (1, 2, 3, 4)}
+    samples = []
+    sockets = []
+    for i in range(args.connections):
+        socket = StandInSocket()
+        sockets.append(socket)
+        await hub.connect(f"session-{i % args.sessions}", socket)
+        if i + 1 in checkpoints:
+            used = tracemalloc.get_traced_memory()[0] - baseline
+            samples.append({
+                "connections": i + 1,
+                "bytes_per_connection": round(used / (i + 1))
+            })
+            print(f"{i + 1} connections, {samples[-1]['bytes_per_connection']} bytes each")
+
+    tracemalloc.stop()
+
+    started = time.monotonic()
+    for i in range(args.sessions):
+        await hub.publish(f"session-{i}", {"type": "chat", "content": "Hello"})
+    while any(c.sender is not None for cs in hub.sessions.values() for c in cs):
+        await asyncio.sleep(0.001)
+    fanout_ms = (time.monotonic() - started) * 1000
+
+    await hub.close()
+    return {
+        "connections": args.connections,
+        "samples": samples,
+        "fanout_ms": round(fanout_ms, 1),
+        "hub": hub.metrics()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the WebSocket hub")
+    parser.add_argument("--mode", choices=["server", "hub"], default="server")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--sessions", type=int, default=100, help="Sessions the connections are spread over")
+    parser.add_argument("--chat-sessions", type=int, default=0, help="Sessions sent a chat message during the hold")
+    parser.add_argument("--hold", type=float, default=30.0, help="Seconds to keep all connections open")
+    parser.add_argument("--ramp", type=int, default=100, help="Connections opened per event loop turn")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_hub(args) if args.mode == "hub" else run_server(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print()
+    print(f"Connections: {report['connections']}")
+    for sample in report["samples"]:
+        print(f"  {sample['connections']:>7} open: {sample['bytes_per_connection']} bytes per connection")
+    if "client" in report:
+        print(f"Client: {report['client']}")
+    else:
+        print(f"Fan-out to all connections: {report['fanout_ms']} ms")
+    print(f"Hub: {report['hub']}")
+
+
+if __name__ == "__main__":
+    main()